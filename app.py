@@ -4,14 +4,15 @@ Application Flask pour exécuter des scripts Python localement
 Évolutif : ajoute facilement de nouveaux scripts
 """
 
-from flask import Flask, render_template, jsonify, request, redirect, url_for, flash
+from flask import Flask, render_template, jsonify, request, redirect, url_for, flash, g, send_file, abort
 from flask_cors import CORS
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
-import subprocess
 import os
 import json
 import sys
 import re
+import time
+import threading
 from datetime import datetime
 from functools import wraps
 from dotenv import load_dotenv
@@ -19,6 +20,16 @@ from dotenv import load_dotenv
 # Charger les variables d'environnement depuis .env
 load_dotenv()
 
+# Modules partagés avec les scripts (métriques, clients HTTP)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scripts'))
+import metrics_store
+import tracing
+import script_profiler
+import idempotency
+import run_queue
+import process_control
+import scheduler
+
 # Importer le système d'authentification
 from auth import (User, get_user_by_id, get_user_by_email, create_default_admin,
                  get_all_users, create_user, update_user, delete_user)
@@ -39,16 +50,76 @@ CORS(app)  # Active CORS pour toutes les routes
 app.config['SECRET_KEY'] = os.environ.get('FLASK_SECRET_KEY', 'dev-key-change-in-production')
 
 # Configuration de la base de données
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///script_runner.db'
+# $DATABASE_URL: base séparée (benchmarks), sinon script_runner.db
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///script_runner.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
 # Importer et initialiser la base de données
-from models import db, FormSubmission
+from models import db, FormSubmission, ScriptRun, Schedule, upgrade_schema, get_utc_time, to_local_time
 db.init_app(app)
 
 # Créer les tables au démarrage si elles n'existent pas
 with app.app_context():
     db.create_all()
+    upgrade_schema()
+
+    # Durée des requêtes SQL, exposée sur /metrics
+    from sqlalchemy import event
+
+    @event.listens_for(db.engine, 'before_cursor_execute')
+    def _query_start(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+    @event.listens_for(db.engine, 'after_cursor_execute')
+    def _query_end(conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - conn.info['query_start'].pop()
+        operation = statement.split(None, 1)[0].lower() if statement.strip() else 'autre'
+        metrics_store.observe('db_query_duration_seconds', duration, {'operation': operation},
+                              help='Durée des requêtes SQL de l\'application par type')
+
+
+@app.template_filter('heure_locale')
+def heure_locale(value, format='%d.%m.%Y %H:%M:%S'):
+    """Date UTC de la base affichée en heure locale (Europe/Zurich), '-' si absente"""
+    return to_local_time(value).strftime(format) if value else '-'
+
+
+@app.after_request
+def flush_metrics(response):
+    """Écrit les métriques de la requête dans le fichier partagé entre workers"""
+    metrics_store.flush()
+    return response
+
+
+@app.before_request
+def start_trace():
+    """Span serveur de la requête (parent: en-tête traceparent entrant s'il existe)"""
+    if request.endpoint in (None, 'static', 'metrics'):
+        return
+    g.trace_span = tracing.start_span(
+        f"{request.method} {request.url_rule}", tracing.SERVER,
+        parent=request.headers.get('traceparent'),
+        **{'http.request.method': request.method, 'http.route': str(request.url_rule)}
+    )
+
+
+@app.after_request
+def trace_status(response):
+    span = g.get('trace_span')
+    if span is not None:
+        span.set_attribute('http.response.status_code', response.status_code)
+        if response.status_code >= 500:
+            span.set_error(f"HTTP {response.status_code}")
+    return response
+
+
+@app.teardown_request
+def end_trace(error=None):
+    span = g.pop('trace_span', None)
+    if span is not None:
+        if error is not None:
+            span.set_error(f"{type(error).__name__}: {error}")
+        span.end()
 
 # Configuration de Flask-Login
 login_manager = LoginManager()
@@ -194,6 +265,21 @@ def save_textes(textes):
 # Pour ajouter un nouveau script :
 # 1. Ajoute ton script dans le dossier 'scripts/'
 # 2. Ajoute une entrée dans SCRIPTS ci-dessous
+#
+# Option 'profile': 'cprofile' | 'sample' | 'importtime' pour profiler
+# chaque exécution du script (voir scripts/script_profiler.py)
+#
+# Option 'idempotency_window': durée (secondes) pendant laquelle une requête
+# aux arguments identiques est rattachée à l'exécution précédente au lieu de
+# relancer le script (voir idempotency.py)
+#
+# Options 'max_concurrent' (exécutions simultanées du script, en plus de la
+# limite globale MAX_CONCURRENT_SCRIPTS) et 'priority' (passage dans la file
+# d'attente, la plus haute d'abord; défaut 0), voir run_queue.py
+#
+# Options 'timeout' (secondes, défaut SCRIPT_TIMEOUT), 'cpu_limit' (secondes
+# de CPU) et 'memory_limit' (Mo): le script est arrêté au-delà, la limite
+# atteinte est enregistrée dans l'historique (voir process_control.py)
 # ==========================================
 
 SCRIPTS = {
@@ -212,7 +298,30 @@ SCRIPTS = {
 8. Génère un rapport RegBL dans 5. Rapport/53. Annexes/
 9. Crée une page Notion avec les informations du projet''',
         'category': 'Bexio',
-        'args': ['numero_offre']
+        'args': ['numero_offre'],
+        'idempotency_window': 600,
+        'max_concurrent': 2,
+        'priority': 5,
+        'timeout': 300,
+        'cpu_limit': 120,
+        'memory_limit': 1024
+    },
+    'offres_acceptees_batch': {
+        'name': 'Offres Acceptées (lot)',
+        'file': '202512_Offres_acceptees.py',
+        'description': 'Traiter plusieurs offres Bexio acceptées en une fois',
+        'description_detaillee': '''1. Prend une liste de numéros d'offres (ex: "12, 13, 14")
+   ou "acceptees" pour toutes les offres acceptées dans Bexio
+2. Ignore les offres déjà traitées avec succès (reprise après échec partiel)
+3. Traite jusqu'à 4 offres en parallèle (même traitement que "Offre Acceptée")
+4. Affiche un résumé succès/échec par offre''',
+        'category': 'Bexio',
+        'args': ['numeros_offres'],
+        'max_concurrent': 1,
+        # Lot complet: plus long qu'une offre, mais toujours borné
+        'timeout': 1200,
+        'cpu_limit': 600,
+        'memory_limit': 2048
     },
     'facture_payee': {
         'name': 'Facture Payée',
@@ -225,7 +334,31 @@ SCRIPTS = {
 5. Marque la facture comme payée dans Bexio
 6. Marque la facture comme payée dans Notion (coche la propriété "Payé")''',
         'category': 'Bexio',
-        'args': ['numero_facture']
+        'args': ['numero_facture'],
+        'idempotency_window': 600,
+        'max_concurrent': 2,
+        'priority': 5,
+        'timeout': 300,
+        'cpu_limit': 120,
+        'memory_limit': 1024
+    },
+    'rapprochement_factures': {
+        'name': 'Rapprochement Factures',
+        'file': '202512_Facture_payee.py',
+        'description': 'Marquer en une passe toutes les factures ouvertes payées',
+        'description_detaillee': '''1. Liste les factures ouvertes dans Bexio
+2. Retient celles dont le solde est nul dans Bexio,
+   ou celles payées selon un relevé camt.053/054 (chemin du fichier .xml)
+3. Synchronise une seule fois le miroir Notion
+4. Traite jusqu'à 4 factures en parallèle (même traitement que "Facture Payée")
+5. Affiche un résumé succès/échec par facture''',
+        'category': 'Bexio',
+        'fixed_args': ['--rapprochement'],
+        'args': ['source'],
+        'max_concurrent': 1,
+        'timeout': 1200,
+        'cpu_limit': 600,
+        'memory_limit': 2048
     },
     'creer_devis': {
         'name': 'Créer Devis CECB',
@@ -240,7 +373,31 @@ SCRIPTS = {
         'category': 'Bexio',
         'args': ['form_data'],
         'has_form': True,
-        'form_template': 'form_devis_cecb.html'
+        'form_template': 'form_devis_cecb.html',
+        'idempotency_window': 600,
+        # Création interactive: passe avant les traitements par lot
+        'priority': 10,
+        'timeout': 120,
+        'cpu_limit': 60,
+        'memory_limit': 1024
+    },
+    'sync_contacts_bexio': {
+        'name': 'Synchroniser Contacts Bexio',
+        'file': '202512_Creer_devis.py',
+        'description': 'Mettre à jour le miroir local des contacts Bexio (à planifier)',
+        'description_detaillee': '''1. Récupère les contacts modifiés depuis la dernière synchronisation
+2. Une fois par jour (ou mode "complet"): parcours complet paginé,
+   les contacts supprimés dans Bexio sont retirés
+3. "Créer Devis CECB" lit ce miroir sans le rafraîchir; s'il date de plus
+   de 48 h, les contacts sont cherchés directement dans Bexio
+À planifier dans /admin/schedules, par exemple "*/15 * * * *"''',
+        'category': 'Bexio',
+        'fixed_args': ['--sync-contacts'],
+        'args': ['mode'],
+        'max_concurrent': 1,
+        'timeout': 600,
+        'cpu_limit': 300,
+        'memory_limit': 1024
     },
 }
 
@@ -340,7 +497,11 @@ def index():
 @app.route('/run_script', methods=['POST'])
 @login_required
 def run_script():
-    """Exécute un script et retourne le résultat"""
+    """
+    Place une exécution de script dans la file d'attente
+
+    Répond aussitôt 202 avec run_id: le client suit l'exécution sur GET /runs/<id>.
+    """
     data = request.json
     script_id = data.get('script_id')
     args = data.get('args', {})
@@ -360,6 +521,109 @@ def run_script():
             'error': f'Fichier {script_path} non trouvé'
         }), 404
 
+    # Profilage: demandé par un admin ('profile' dans la requête) ou configuré pour le script
+    profile_mode = data.get('profile')
+    if profile_mode and not (current_user.is_authenticated and current_user.is_admin()):
+        return jsonify({
+            'success': False,
+            'error': 'Le profilage est réservé aux administrateurs'
+        }), 403
+    profile_mode = profile_mode or script_config.get('profile')
+    if profile_mode and profile_mode not in script_profiler.MODES:
+        return jsonify({
+            'success': False,
+            'error': f'Mode de profilage inconnu: {profile_mode}'
+        }), 400
+
+    # Priorité dans la file d'attente: celle du script, ou fixée par un admin pour cette exécution
+    priority = data.get('priority')
+    if priority is not None and not (current_user.is_authenticated and current_user.is_admin()):
+        return jsonify({
+            'success': False,
+            'error': 'La priorité est réservée aux administrateurs'
+        }), 403
+    try:
+        priority = int(priority if priority is not None else script_config.get('priority', 0))
+    except (TypeError, ValueError):
+        return jsonify({
+            'success': False,
+            'error': f'Priorité invalide: {priority}'
+        }), 400
+
+    # Idempotence: une requête répétée (double-clic, nouvel envoi) est rattachée
+    # à l'exécution d'origine au lieu de relancer le script
+    user_id = current_user.id if current_user.is_authenticated else None
+    idem_key, idem_source = idempotency.compute_key(
+        user_id, script_id, args,
+        client_key=request.headers.get('Idempotency-Key') or data.get('idempotency_key'),
+        derive_from_args='idempotency_window' in script_config,
+        profile=profile_mode
+    )
+    if idem_key:
+        window = script_config.get('idempotency_window', idempotency.DEFAULT_WINDOW)
+        existing = idempotency.claim(idem_key, script_id, user_id, idem_source, window)
+        if existing is not None:
+            metrics_store.inc('script_idempotent_replays_total', {'script_id': script_id, 'state': existing.status},
+                              help='Requêtes /run_script rattachées à une exécution identique')
+            if existing.status != 'running' and existing.response is not None:
+                payload, status = idempotency.replay_response(existing)
+                return jsonify(payload), status
+            if existing.run_id is None:
+                return jsonify({
+                    'success': False,
+                    'error': 'Une exécution identique est toujours en cours'
+                }), 409
+            # Exécution d'origine en attente ou en cours: le client suit son statut
+            return jsonify(accepted_payload(existing.run_id, idempotent_replay=True)), 202
+
+    try:
+        run = enqueue_script(script_id, script_config, args, profile_mode, idem_key, priority)
+    except Exception as e:
+        db.session.rollback()
+        if idem_key:
+            idempotency.record_result(idem_key, {'success': False, 'error': str(e)[:500]}, 500)
+        return jsonify({
+            'success': False,
+            'error': f'Erreur lors de l\'exécution : {str(e)}'
+        }), 500
+
+    # Répartiteur dans ce worker (sauf tâche dédiée: SCHEDULER_ENABLED=0), réveillé tout de suite
+    if os.environ.get('SCHEDULER_ENABLED') != '0':
+        scheduler.start(app, dispatch_queued, tick=scheduler.TICK_INTERVAL if SCHEDULES_IN_WORKER else None)
+    scheduler.wake()
+    return jsonify(accepted_payload(run.id)), 202
+
+
+def accepted_payload(run_id, **extra):
+    """Réponse 202 de /run_script: exécution en attente, statut à suivre sur GET /runs/<id>"""
+    run = db.session.get(ScriptRun, run_id)
+    return {
+        'success': True,
+        'status': run.status if run is not None else 'queued',
+        'run_id': run_id,
+        'status_url': url_for('run_status', run_id=run_id),
+        **extra
+    }
+
+
+def enqueue_script(script_id, script_config, args, profile_mode, idem_key=None, priority=0):
+    """
+    Enregistre la demande d'exécution en attente (ScriptRun, FormSubmission des devis)
+
+    Le script est lancé ensuite par le répartiteur (dispatch_queued), dans l'ordre
+    de la file d'attente (run_queue.py).
+
+    Args:
+        script_id: Clé du script dans SCRIPTS
+        script_config: Entrée de SCRIPTS
+        args: Arguments reçus par /run_script
+        profile_mode: Mode de profilage, ou None
+        idem_key: Clé d'idempotence réservée, associée à l'exécution dès sa création
+        priority: Priorité dans la file d'attente
+
+    Returns:
+        ScriptRun en statut "queued"
+    """
     # Sauvegarder la soumission AVANT l'exécution pour les devis CECB
     submission = None
     if script_id == 'creer_devis':
@@ -398,87 +662,441 @@ def run_script():
         except Exception as e:
             # En cas d'erreur de sauvegarde, logger mais continuer l'exécution
             print(f"⚠️  Erreur lors de la sauvegarde de la soumission: {str(e)}")
+            db.session.rollback()
+            submission = None
+
+    # Historique des exécutions (porte aussi l'artefact de profilage)
+    current = tracing.current_span()
+    run = ScriptRun(
+        script_id=script_id,
+        user_id=current_user.id if current_user.is_authenticated else None,
+        status='queued',
+        priority=priority,
+        trace_id=tracing.current_trace_id(),
+        traceparent=current.traceparent if current is not None else None,
+        profiler=profile_mode,
+        args=args,
+        submission_id=submission.id if submission is not None else None,
+        idempotency_key=idem_key
+    )
+    db.session.add(run)
+    db.session.commit()
+    if idem_key:
+        idempotency.attach_run(idem_key, run.id)
+    return run
+
+
+def dispatch_queued():
+    """
+    Passe du répartiteur (boucle du planificateur): lance les exécutions admises
+
+    Chaque exécution admise est lancée dans son propre thread; les exécutions
+    restées trop longtemps en attente sont closes avec une réponse 503, celles
+    dont le worker s'est arrêté avec une réponse 500.
+    """
+    started, expired, orphaned = run_queue.dispatch({sid: cfg.get('max_concurrent') for sid, cfg in SCRIPTS.items()})
+    for run_id in orphaned:
+        run = db.session.get(ScriptRun, run_id)
+        metrics_store.inc('script_orphaned_runs_total', {'script_id': run.script_id},
+                          help='Exécutions closes après l\'arrêt du worker qui les exécutait')
+        update_submission(run_submission(run), 'error', error_message='Exécution interrompue: worker arrêté')
+        complete_run(run, {
+            'success': False,
+            'error': 'Exécution interrompue: le worker qui exécutait le script s\'est arrêté',
+            'run_id': run.id,
+            'outcome_unknown': True
+        }, 500)
+    for run_id in expired:
+        run = db.session.get(ScriptRun, run_id)
+        metrics_store.inc('script_queue_timeouts_total', {'script_id': run.script_id},
+                          help='Exécutions abandonnées faute de place dans la file d\'attente')
+        update_submission(run_submission(run), 'error',
+                          error_message='Trop de scripts en cours: réessayez dans quelques minutes')
+        complete_run(run, {
+            'success': False,
+            'error': 'Trop de scripts en cours d\'exécution, réessayez dans quelques minutes',
+            'run_id': run.id
+        }, 503)
+    for run_id in started:
+        threading.Thread(target=launch_run, args=(run_id,), name=f'run-{run_id}', daemon=True).start()
+    if expired or orphaned:
+        metrics_store.flush()
+
+
+def launch_run(run_id):
+    """
+    Lance une exécution admise par le répartiteur (thread d'arrière-plan)
+
+    Le span de l'exécution rejoint la trace de la requête /run_script d'origine.
+    """
+    with app.app_context():
+        run = db.session.get(ScriptRun, run_id)
+        script_config = SCRIPTS.get(run.script_id)
+        if script_config is None:
+            finish_run(run, 'error', None, error_message='Script introuvable')
+            complete_run(run, {'success': False, 'error': f'Script {run.script_id} non trouvé', 'run_id': run.id}, 404)
+            return
+
+        span = tracing.start_span(f'run {run.script_id}', tracing.INTERNAL, parent=run.traceparent,
+                                  script_id=run.script_id, run_id=run.id)
+        try:
+            payload, status = execute_run(run, script_config)
+        except Exception as e:
+            # execute_run gère les erreurs du script: ne reste que l'imprévu (base indisponible...),
+            # le script a pu s'exécuter
+            db.session.rollback()
+            finish_run(run, 'error', None, error_message=str(e)[:500])
+            payload, status = {'success': False, 'error': f'Erreur lors de l\'exécution : {str(e)}', 'run_id': run_id,
+                               'outcome_unknown': True}, 500
+        if span is not None:
+            if status >= 500:
+                span.set_error(payload.get('error', f'HTTP {status}'))
+            span.end()
+        complete_run(run, payload, status)
+        if run.schedule_id is not None:
+            metrics_store.inc('scheduled_runs_total', {'script_id': run.script_id, 'status': run.status},
+                              help='Exécutions lancées par le planificateur')
+            print(f"🗓️  Planification {run.schedule_id}: exécution #{run_id} terminée ({run.status}, HTTP {status})")
+        # Aucune requête dans ce thread (ni dans la tâche dédiée): écrire les métriques ici
+        metrics_store.flush()
+
+
+def execute_run(run, script_config):
+    """
+    Exécute le script d'une exécution passée en "running" par le répartiteur
 
+    Le script est lancé avec ses limites de temps, CPU et mémoire
+    (process_control.py) et peut être annulé par POST /runs/<id>/cancel.
+
+    Args:
+        run: ScriptRun en statut "running"
+        script_config: Entrée de SCRIPTS
+
+    Returns:
+        (réponse JSON, code HTTP), rendue par GET /runs/<id>
+    """
+    script_id = run.script_id
+    script_path = os.path.join('scripts', script_config['file'])
+    args = run.args or {}
+    profile_mode = run.profiler
+    submission = run_submission(run)
+    artifact = None
+    limits = process_control.Limits.from_config(script_config)
+    # Script lancé: un échec ultérieur laisse son résultat inconnu (devis peut-être créé)
+    started = False
     try:
+        run.limits = {'timeout': limits.timeout, 'cpu_limit': limits.cpu_limit, 'memory_limit': limits.memory_limit}
+        db.session.commit()
+
         # Prépare les arguments si nécessaire
-        cmd = ['python', script_path]
+        # Arguments fixes déclarés dans SCRIPTS (ex: mode rapprochement)
+        script_args = list(script_config.get('fixed_args', []))
         if 'args' in script_config:
             for arg_name in script_config['args']:
                 if arg_name in args:
-                    cmd.append(args[arg_name])
+                    script_args.append(args[arg_name])
 
-        # Exécute le script avec encodage UTF-8
-        start_time = datetime.now()
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            encoding='utf-8',  # Force UTF-8 pour gérer les caractères spéciaux
-            errors='replace',  # Remplace les caractères non décodables
-            timeout=300  # Timeout de 5 minutes
-        )
-        end_time = datetime.now()
-        duration = (end_time - start_time).total_seconds()
+        if profile_mode:
+            artifact = script_profiler.artifact_path(run.id, script_id, profile_mode)
+            cmd = script_profiler.build_command(profile_mode, script_path, script_args, artifact)
+        else:
+            cmd = ['python', script_path] + script_args
 
-        # Mettre à jour la soumission avec le résultat
-        if submission:
-            try:
-                if result.returncode == 0:
-                    # Succès : extraire l'ID et le numéro de document
-                    quote_id = extract_quote_id_from_output(result.stdout)
-                    document_nr = extract_document_nr_from_output(result.stdout)
-
-                    submission.status = 'quote_created'
-                    submission.bexio_quote_id = quote_id
-                    submission.bexio_document_nr = document_nr
-                else:
-                    # Échec : sauvegarder l'erreur
-                    submission.status = 'error'
-                    submission.error_message = result.stderr[:500] if result.stderr else 'Erreur inconnue'
+        # Attente entre la demande et le lancement du script
+        metrics_store.observe('script_queue_wait_seconds', run.queue_wait or 0.0,
+                              {'script_id': script_id},
+                              help='Attente entre la requête /run_script et le lancement du script')
 
+        def on_start(pid, enforced):
+            nonlocal started
+            started = True
+            # PID et limites appliquées visibles pendant l'exécution (/admin/runs, annulation)
+            try:
+                run.pid = pid
+                run.limits = dict(run.limits or {}, enforced=enforced)
                 db.session.commit()
             except Exception as e:
-                print(f"⚠️  Erreur lors de la mise à jour de la soumission: {str(e)}")
+                print(f"⚠️  Erreur lors de l'enregistrement du processus: {str(e)}")
                 db.session.rollback()
+            run_queue.heartbeat(run.id, force=True)
 
-        return jsonify({
+        def should_cancel():
+            # Vérifiée à chaque intervalle: signe de vie du worker, puis annulation demandée
+            run_queue.heartbeat(run.id)
+            return run_queue.cancel_requested(run.id)
+
+        # Exécute le script (encodage UTF-8) dans son propre groupe de processus
+        result = process_control.run(
+            cmd,
+            limits,
+            env=tracing.inject_env(),  # TRACEPARENT: les spans du script rejoignent la trace de la requête
+            should_cancel=should_cancel,
+            on_start=on_start
+        )
+        run_queue.forget_heartbeat(run.id)
+        duration = result.duration
+        metrics_store.observe('script_duration_seconds', duration, {'script_id': script_id},
+                              help='Durée d\'exécution des scripts')
+
+        if result.outcome == 'timeout':
+            metrics_store.inc('script_timeouts_total', {'script_id': script_id},
+                              help='Scripts arrêtés après leur timeout')
+            finish_run(run, 'timeout', duration, error_message=f'Timeout ({limits.timeout} s)',
+                       artifact=artifact, limit_exceeded='timeout')
+            update_submission(submission, 'error',
+                              error_message=f'Timeout: le script a dépassé le temps d\'exécution maximal ({limits.timeout} s)')
+            return {
+                'success': False,
+                'error': f'Le script a dépassé le temps d\'exécution maximal ({limits.timeout} s)',
+                'stdout': result.stdout,
+                'run_id': run.id,
+                'outcome_unknown': True
+            }, 408
+
+        if result.outcome == 'cancelled':
+            metrics_store.inc('script_cancellations_total', {'script_id': script_id, 'state': 'running'},
+                              help='Exécutions de scripts annulées')
+            finish_run(run, 'cancelled', duration, error_message='Exécution annulée', artifact=artifact)
+            update_submission(submission, 'error', error_message='Exécution annulée')
+            return {
+                'success': False,
+                'cancelled': True,
+                'error': 'Exécution annulée',
+                'stdout': result.stdout,
+                'stderr': result.stderr,
+                'run_id': run.id,
+                'outcome_unknown': True
+            }, 200
+
+        metrics_store.inc('script_runs_total', {'script_id': script_id, 'returncode': result.returncode},
+                          help='Exécutions de scripts terminées par code de retour')
+        if result.limit_exceeded:
+            metrics_store.inc('script_limit_exceeded_total', {'script_id': script_id, 'limit': result.limit_exceeded},
+                              help='Scripts arrêtés par une limite de ressources')
+
+        stderr = result.stderr
+        if profile_mode == 'importtime':
+            # -X importtime écrit sur stderr: l'artefact garde ces lignes, l'utilisateur le reste
+            stderr, import_lines = script_profiler.split_importtime(stderr)
+            artifact.write_text(import_lines, encoding='utf-8')
+
+        if result.limit_exceeded == 'cpu':
+            stderr += f"\nLimite de temps CPU dépassée ({limits.cpu_limit} s)"
+        elif result.limit_exceeded == 'memory':
+            stderr += f"\nLimite mémoire dépassée ({limits.memory_limit} Mo)"
+
+        finish_run(run, 'success' if result.returncode == 0 else 'error', duration,
+                   returncode=result.returncode, error_message=stderr[-500:] if result.returncode else None,
+                   artifact=artifact, limit_exceeded=result.limit_exceeded)
+
+        # Mettre à jour la soumission avec le résultat
+        if result.returncode == 0:
+            # Succès : extraire l'ID et le numéro de document
+            update_submission(submission, 'quote_created',
+                              quote_id=extract_quote_id_from_output(result.stdout),
+                              document_nr=extract_document_nr_from_output(result.stdout))
+        else:
+            # Échec : sauvegarder l'erreur
+            update_submission(submission, 'error', error_message=stderr[:500] if stderr else 'Erreur inconnue')
+
+        return {
             'success': result.returncode == 0,
             'stdout': result.stdout,
-            'stderr': result.stderr,
+            'stderr': stderr,
             'returncode': result.returncode,
             'duration': f'{duration:.2f}s',
-            'timestamp': datetime.now().strftime('%H:%M:%S')
-        })
+            'timestamp': datetime.now().strftime('%H:%M:%S'),
+            'trace_id': run.trace_id or tracing.current_trace_id(),
+            'run_id': run.id,
+            'profile': run.profile_summary,
+            'limit_exceeded': result.limit_exceeded
+        }, 200
 
-    except subprocess.TimeoutExpired:
-        # Timeout : mettre à jour la soumission
-        if submission:
-            try:
-                submission.status = 'error'
-                submission.error_message = 'Timeout: le script a dépassé le temps d\'exécution maximal (5 min)'
-                db.session.commit()
-            except Exception:
-                db.session.rollback()
+    except Exception as e:
+        db.session.rollback()
+        finish_run(run, 'error', None, error_message=str(e)[:500])
 
-        return jsonify({
+        # Erreur générale : mettre à jour la soumission
+        update_submission(submission, 'error', error_message=str(e)[:500])
+
+        return {
             'success': False,
-            'error': 'Le script a dépassé le temps d\'exécution maximal (5 min)'
-        }), 408
+            'error': f'Erreur lors de l\'exécution : {str(e)}',
+            'run_id': run.id,
+            'outcome_unknown': started
+        }, 500
+
 
+def complete_run(run, payload, http_status):
+    """
+    Enregistre la réponse finale d'une exécution (GET /runs/<id>, clé d'idempotence)
+
+    Args:
+        run: ScriptRun terminé
+        payload: Réponse JSON
+        http_status: Code HTTP de la réponse
+    """
+    try:
+        run.response = payload
+        run.http_status = http_status
+        db.session.commit()
     except Exception as e:
-        # Erreur générale : mettre à jour la soumission
-        if submission:
-            try:
-                submission.status = 'error'
-                submission.error_message = str(e)[:500]
-                db.session.commit()
-            except Exception:
-                db.session.rollback()
+        print(f"⚠️  Erreur lors de l'enregistrement de la réponse: {str(e)}")
+        db.session.rollback()
+    if run.idempotency_key:
+        idempotency.record_result(run.idempotency_key, payload, http_status)
+
+
+def run_submission(run):
+    """Soumission du devis liée à l'exécution, ou None"""
+    if run.submission_id is None:
+        return None
+    return db.session.get(FormSubmission, run.submission_id)
+
 
+def finish_run(run, status, duration, returncode=None, error_message=None, artifact=None, limit_exceeded=None):
+    """
+    Enregistre la fin d'une exécution dans l'historique
+
+    Args:
+        run: ScriptRun en cours
+        status: 'success', 'error', 'timeout' ou 'cancelled'
+        duration: Durée en secondes (None si inconnue)
+        returncode: Code de retour du script
+        error_message: Fin de stderr ou message d'erreur
+        artifact: Artefact de profilage, résumé (top N) s'il a été écrit
+        limit_exceeded: Limite ayant arrêté le script ('timeout', 'cpu', 'memory')
+    """
+    try:
+        run.status = status
+        run.duration = duration
+        run.returncode = returncode
+        run.error_message = error_message
+        run.limit_exceeded = limit_exceeded
+        run.finished_at = get_utc_time()
+        if artifact is not None and artifact.exists():
+            run.profile_path = str(artifact)
+            run.profile_summary = script_profiler.summarize(run.profiler, artifact)
+        db.session.commit()
+    except Exception as e:
+        print(f"⚠️  Erreur lors de l'enregistrement de l'exécution: {str(e)}")
+        db.session.rollback()
+
+
+def update_submission(submission, status, quote_id=None, document_nr=None, error_message=None):
+    """
+    Reporte le résultat de l'exécution sur la soumission du devis (si elle existe)
+
+    Args:
+        submission: FormSubmission créée avant l'exécution, ou None
+        status: 'quote_created' ou 'error'
+        quote_id: ID du devis Bexio créé
+        document_nr: Numéro du devis Bexio
+        error_message: Message d'erreur affiché dans l'historique des soumissions
+    """
+    if submission is None:
+        return
+    try:
+        submission.status = status
+        if status == 'quote_created':
+            submission.bexio_quote_id = quote_id
+            submission.bexio_document_nr = document_nr
+        else:
+            submission.error_message = error_message
+        db.session.commit()
+    except Exception as e:
+        print(f"⚠️  Erreur lors de la mise à jour de la soumission: {str(e)}")
+        db.session.rollback()
+
+
+@app.route('/runs/<int:run_id>')
+@login_required
+def run_status(run_id):
+    """
+    Statut d'une exécution lancée par /run_script (propriétaire ou admin)
+
+    Exécution terminée: réponse complète du script (stdout, stderr, durée...) avec
+    done=True et le code HTTP qu'aurait eu la réponse dans http_status.
+    """
+    run = db.session.get(ScriptRun, run_id)
+    if run is None:
         return jsonify({
             'success': False,
-            'error': f'Erreur lors de l\'exécution : {str(e)}'
-        }), 500
+            'error': 'Exécution non trouvée'
+        }), 404
+    if run.user_id != current_user.id and not current_user.is_admin():
+        return jsonify({
+            'success': False,
+            'error': 'Seul l\'auteur de l\'exécution ou un administrateur peut la consulter'
+        }), 403
+
+    if run.response is not None:
+        return jsonify(dict(run.response, done=True, status=run.status, http_status=run.http_status))
+    if run.status not in ('queued', 'running'):
+        # Close sans réponse enregistrée (worker arrêté, exécution planifiée ancienne)
+        return jsonify({
+            'success': run.status == 'success',
+            'done': True,
+            'status': run.status,
+            'error': run.error_message,
+            'returncode': run.returncode,
+            'run_id': run.id
+        })
+    return jsonify({
+        'success': True,
+        'done': False,
+        'status': run.status,
+        'run_id': run.id,
+        'queue_wait': run.queue_wait
+    })
+
+
+@app.route('/runs/<int:run_id>/cancel', methods=['POST'])
+@login_required
+def cancel_run(run_id):
+    """
+    Annule une exécution en attente ou en cours (propriétaire ou admin)
+
+    Une exécution en cours est arrêtée (groupe de processus, SIGTERM puis SIGKILL)
+    par le worker qui l'exécute, dans la seconde qui suit.
+    """
+    run = db.session.get(ScriptRun, run_id)
+    if run is None:
+        return jsonify({
+            'success': False,
+            'error': 'Exécution non trouvée'
+        }), 404
+    if run.user_id != current_user.id and not current_user.is_admin():
+        return jsonify({
+            'success': False,
+            'error': 'Seul l\'auteur de l\'exécution ou un administrateur peut l\'annuler'
+        }), 403
+    if run.status not in ('queued', 'running'):
+        return jsonify({
+            'success': False,
+            'error': f'Exécution déjà terminée ({run.status})',
+            'status': run.status
+        }), 409
+
+    state = run_queue.cancel(run, current_user.id)
+    if state == 'cancelled':
+        # Jamais lancée (ou processus disparu): aucun worker n'enregistrera la réponse
+        metrics_store.inc('script_cancellations_total', {'script_id': run.script_id, 'state': 'queued'},
+                          help='Exécutions de scripts annulées')
+        update_submission(run_submission(run), 'error', error_message='Exécution annulée')
+        complete_run(run, {
+            'success': False,
+            'cancelled': True,
+            'error': 'Exécution annulée',
+            'run_id': run.id,
+            # Processus disparu après son lancement: le script a pu aller au bout
+            'outcome_unknown': run.started_at is not None
+        }, 200)
+    return jsonify({
+        'success': True,
+        'status': state,
+        'run_id': run.id
+    }), 202 if state == 'cancelling' else 200
 
 
 @app.route('/list_scripts')
@@ -488,6 +1106,24 @@ def list_scripts():
     return jsonify(SCRIPTS)
 
 
+@app.route('/metrics')
+def metrics():
+    """
+    Métriques Prometheus agrégées de tous les processus (workers Flask et scripts)
+
+    Accès: en-tête "Authorization: Bearer $METRICS_TOKEN" si la variable est définie,
+    sinon session utilisateur connectée.
+    """
+    token = os.environ.get('METRICS_TOKEN')
+    if token:
+        if request.headers.get('Authorization', '') != f'Bearer {token}':
+            return 'Unauthorized\n', 401, {'Content-Type': 'text/plain; charset=utf-8'}
+    elif not current_user.is_authenticated:
+        return login_manager.unauthorized()
+
+    return metrics_store.render(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+
 @app.route('/devis/nouveau')
 @app.route('/devis/nouveau/<int:submission_id>')
 @login_required
@@ -682,6 +1318,186 @@ def admin_textes():
     return render_template('admin_textes.html', textes=textes)
 
 
+@app.route('/admin/runs', methods=['GET'])
+@login_required
+@admin_required
+def admin_runs():
+    """Historique des exécutions, avec le résumé des profils"""
+    query = ScriptRun.query
+    if request.args.get('profiled'):
+        query = query.filter(ScriptRun.profiler.isnot(None))
+    if request.args.get('schedule', type=int):
+        query = query.filter(ScriptRun.schedule_id == request.args.get('schedule', type=int))
+    runs = query.order_by(ScriptRun.created_at.desc()).limit(100).all()
+    return render_template('admin_runs.html', runs=runs, scripts=SCRIPTS,
+                           modes=script_profiler.MODES)
+
+
+@app.route('/admin/runs/<int:run_id>/profile', methods=['GET'])
+@login_required
+@admin_required
+def admin_run_profile(run_id):
+    """Télécharge l'artefact de profilage d'une exécution (.prof, échantillons ou importtime)"""
+    run = ScriptRun.query.filter_by(id=run_id).first()
+    if run is None or not run.profile_path or not os.path.exists(run.profile_path):
+        abort(404)
+    return send_file(os.path.abspath(run.profile_path), as_attachment=True,
+                     download_name=os.path.basename(run.profile_path))
+
+
+# ==========================================
+# PLANIFICATIONS (scheduler.py)
+# ==========================================
+
+def schedulable_scripts():
+    """Scripts pouvant être planifiés: ceux sans formulaire"""
+    return {script_id: config for script_id, config in SCRIPTS.items() if not config.get('has_form')}
+
+
+def validate_schedule(data, schedule=None):
+    """
+    Valide les champs d'une planification (création ou modification)
+
+    Args:
+        data: Champs reçus (name, script_id, args, cron, priority, enabled)
+        schedule: Planification modifiée, None pour une création
+
+    Returns:
+        (champs validés, message d'erreur ou None)
+    """
+    values = {}
+    script_id = data.get('script_id', schedule.script_id if schedule else None)
+    if script_id not in schedulable_scripts():
+        return None, f'Script {script_id} non planifiable'
+    values['script_id'] = script_id
+
+    if 'args' in data or schedule is None:
+        args = data.get('args') or {}
+        if not isinstance(args, dict):
+            return None, 'Arguments invalides: objet JSON attendu'
+        unknown = [name for name in args if name not in SCRIPTS[script_id].get('args', [])]
+        if unknown:
+            return None, f'Argument(s) inconnu(s) pour {script_id}: {", ".join(unknown)}'
+        values['args'] = {name: str(value) for name, value in args.items() if str(value).strip()}
+
+    if 'cron' in data or schedule is None:
+        cron = (data.get('cron') or '').strip()
+        try:
+            scheduler.next_run(cron)
+        except scheduler.CronError as e:
+            return None, str(e)
+        values['cron'] = cron
+
+    if 'priority' in data:
+        priority = data.get('priority')
+        try:
+            values['priority'] = int(priority) if priority not in (None, '') else None
+        except (TypeError, ValueError):
+            return None, f'Priorité invalide: {priority}'
+
+    if 'name' in data or schedule is None:
+        values['name'] = (data.get('name') or '').strip() or SCRIPTS[script_id]['name']
+    if 'enabled' in data:
+        values['enabled'] = bool(data.get('enabled'))
+    return values, None
+
+
+@app.route('/admin/schedules', methods=['GET'])
+@login_required
+@admin_required
+def admin_schedules():
+    """Planifications et historique de leurs exécutions"""
+    schedules = Schedule.query.order_by(Schedule.name).all()
+    runs = (ScriptRun.query.filter(ScriptRun.schedule_id.isnot(None))
+            .order_by(ScriptRun.created_at.desc()).limit(50).all())
+    return render_template('admin_schedules.html', schedules=schedules, runs=runs, scripts=SCRIPTS,
+                           schedulable=schedulable_scripts(),
+                           names={s.id: s.name for s in schedules})
+
+
+@app.route('/admin/schedules/create', methods=['POST'])
+@login_required
+@admin_required
+def admin_schedules_create():
+    """Créer une planification"""
+    values, error = validate_schedule(request.json or {})
+    if error:
+        return jsonify({
+            'success': False,
+            'error': error
+        }), 400
+
+    schedule = Schedule(created_by=current_user.id, **values)
+    schedule.next_run_at = scheduler.next_run_utc(schedule.cron)
+    db.session.add(schedule)
+    db.session.commit()
+    return jsonify({
+        'success': True,
+        'message': f'Planification {schedule.name} créée',
+        'schedule': schedule.to_dict()
+    })
+
+
+@app.route('/admin/schedules/update/<int:schedule_id>', methods=['POST'])
+@login_required
+@admin_required
+def admin_schedules_update(schedule_id):
+    """
+    Modifier une planification (champs fournis seulement)
+
+    "run_now": true avance l'échéance: le planificateur lance l'exécution à sa
+    prochaine vérification, sans chevauchement avec une exécution en cours.
+    """
+    schedule = db.session.get(Schedule, schedule_id)
+    if schedule is None:
+        return jsonify({
+            'success': False,
+            'error': 'Planification non trouvée'
+        }), 404
+
+    data = request.json or {}
+    values, error = validate_schedule(data, schedule)
+    if error:
+        return jsonify({
+            'success': False,
+            'error': error
+        }), 400
+
+    reschedule = values.get('cron', schedule.cron) != schedule.cron or (values.get('enabled') and not schedule.enabled)
+    for name, value in values.items():
+        setattr(schedule, name, value)
+    if data.get('run_now'):
+        schedule.next_run_at = get_utc_time()
+    elif reschedule:
+        schedule.next_run_at = scheduler.next_run_utc(schedule.cron)
+    db.session.commit()
+    return jsonify({
+        'success': True,
+        'message': f'Planification {schedule.name} mise à jour',
+        'schedule': schedule.to_dict()
+    })
+
+
+@app.route('/admin/schedules/delete/<int:schedule_id>', methods=['DELETE'])
+@login_required
+@admin_required
+def admin_schedules_delete(schedule_id):
+    """Supprimer une planification (son historique d'exécutions est conservé)"""
+    schedule = db.session.get(Schedule, schedule_id)
+    if schedule is None:
+        return jsonify({
+            'success': False,
+            'error': 'Planification non trouvée'
+        }), 404
+
+    db.session.delete(schedule)
+    db.session.commit()
+    return jsonify({
+        'success': True,
+        'message': f'Planification {schedule.name} supprimée'
+    })
+
+
 @app.route('/admin/users', methods=['GET'])
 @login_required
 @admin_required
@@ -818,7 +1634,6 @@ def get_building_data():
             }), 400
 
         # Importer le module geo_admin_client
-        sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'scripts'))
         from geo_admin_client import GeoAdminClient
 
         # Récupérer les données du bâtiment
@@ -850,6 +1665,29 @@ def get_building_data():
         }), 500
 
 
+# ==========================================
+# PLANIFICATEUR ET RÉPARTITEUR
+# ==========================================
+# La boucle du planificateur lance aussi les exécutions en attente (dispatch_queued).
+# - SCHEDULER_ENABLED=1: boucle complète dans chaque worker (échéances réservées
+#   en base, un seul worker lance chaque exécution)
+# - non défini: répartiteur seul, démarré dans le worker à la première requête
+#   /run_script; échéances dans la tâche dédiée: flask --app app scheduler
+# - SCHEDULER_ENABLED=0: tout dans la tâche dédiée
+
+SCHEDULES_IN_WORKER = os.environ.get('SCHEDULER_ENABLED') == '1'
+
+if SCHEDULES_IN_WORKER:
+    scheduler.start(app, dispatch_queued)
+
+
+@app.cli.command('scheduler')
+def scheduler_command():
+    """Fait tourner le planificateur et le répartiteur au premier plan"""
+    print(f"🗓️  Planificateur démarré (vérification toutes les {scheduler.TICK_INTERVAL} s)")
+    scheduler.run_forever(app, dispatch_queued)
+
+
 if __name__ == '__main__':
     print("\n" + "="*60)
     print("🚀 Script Runner - Application démarrée")
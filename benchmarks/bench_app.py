@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark de charge de l'application Flask contre des services imités
+
+Démarre les stand-ins (benchmarks/stand_ins.py), l'application dans ce processus
+(base SQLite, métriques, miroir de contacts et utilisateurs dans un dossier
+temporaire), puis envoie des requêtes à /run_script (creer_devis),
+/api/building_data et /api/submissions à concurrence croissante.
+
+Pour chaque endpoint et niveau de concurrence: latences p50/p95/p99 et débit.
+Les résultats sont écrits en JSON dans benchmarks/results/ et peuvent être
+comparés à un run précédent avec --comparer.
+
+Usage:
+    python benchmarks/bench_app.py [--concurrence 1,2,4,8] [--requetes 20] [--latence 50]
+                                   [--erreurs 0.02] [--endpoints run_script,building_data,submissions]
+                                   [--label avant] [--comparer benchmarks/results/<run>.json]
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import itertools
+import platform
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import requests
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import stand_ins  # noqa: E402
+
+BENCH_EMAIL = "bench@example.ch"
+BENCH_PASSWORD = "bench-password"
+
+# Intervalle de suivi des exécutions en file d'attente (GET /runs/<id>)
+POLL_INTERVAL = 0.1
+
+CONFIG_PY = '''# Configuration générée par benchmarks/bench_app.py (services imités)
+BEXIO_API_TOKEN = "bench"
+GOOGLE_MAPS_API_KEY = "bench"
+BEXIO_BASE_URL = "https://api.bexio.com"
+ETA_CONSULT_ADDRESS = "Route de l'Hôpital 16b, 1180 Rolle, Suisse"
+ETA_CONSULT_COORDS = (46.4571, 6.3375)
+BEXIO_IDS = {"user_id": 1, "currency_id": 1, "language_id": 2, "country_id": 1,
+             "unit_id": 3, "tax_id": 28, "mwst_type": 0, "template_slug": "standard"}
+CONTACT_TYPES = {"Privé": 1, "Société": 2}
+SALUTATIONS = {"Mme": 1, "M.": 2, "Mx": None}
+'''
+
+_compteur = itertools.count(1)
+
+
+# ==========================================
+# ENVIRONNEMENT
+# ==========================================
+
+def preparer_environnement(dossier: Path, overrides: str):
+    """Variables lues par l'application et par les scripts qu'elle lance"""
+    (dossier / "config.py").write_text(CONFIG_PY, encoding="utf-8")
+    os.environ.update({
+        "HTTP_HOST_OVERRIDES": overrides,
+        "DATABASE_URL": f"sqlite:///{dossier / 'bench.db'}",
+        "METRICS_DB_PATH": str(dossier / "metrics.db"),
+        "TRACES_PATH": str(dossier / "traces.jsonl"),
+        "BEXIO_CONTACT_MIRROR_PATH": str(dossier / "bexio_contacts.db"),
+        "PROFILES_DIR": str(dossier / "profiles"),
+        # config.py des services imités si la racine n'en a pas (sinon celui de la racine, hôtes redirigés)
+        "PYTHONPATH": os.pathsep.join(filter(None, [str(dossier), os.environ.get("PYTHONPATH")])),
+    })
+
+
+def demarrer_application(dossier: Path) -> str:
+    """Importe app.py avec un utilisateur de benchmark et le sert sur un port libre"""
+    os.chdir(ROOT)
+    sys.path.insert(0, str(ROOT))
+    import auth
+    auth.USERS_FILE = str(dossier / "users.json")
+    auth.create_user(BENCH_EMAIL, BENCH_PASSWORD, "admin")
+
+    from werkzeug.serving import make_server
+    import app as application
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+
+    server = make_server("127.0.0.1", 0, application.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="bench-app", daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}"
+
+
+# ==========================================
+# REQUÊTES
+# ==========================================
+
+def formulaire_devis(numero: int) -> Dict:
+    return {
+        "type_certificat": "CECB",
+        "type_contact": "Privé",
+        "prenom": "Bench",
+        "nom_famille": f"Charge{numero}",
+        "email": f"bench{numero}@example.ch",
+        "rue_facturation": f"Rue du Banc {numero}",
+        "npa_facturation": "1180",
+        "localite_facturation": "Rolle",
+    }
+
+
+def creer_devis(session: requests.Session, base: str, numero: int) -> requests.Response:
+    """POST /run_script (202) puis GET /runs/<id> jusqu'à la fin de l'exécution"""
+    response = session.post(f"{base}/run_script", json={
+        "script_id": "creer_devis", "args": {"form_data": json.dumps(formulaire_devis(numero))}})
+    if response.status_code != 202:
+        return response
+    run_id = response.json()["run_id"]
+    while True:
+        time.sleep(POLL_INTERVAL)
+        response = session.get(f"{base}/runs/{run_id}")
+        if response.status_code != 200 or response.json().get("done"):
+            return response
+
+
+ENDPOINTS = {
+    # Création complète d'un devis: file d'attente, sous-processus, Bexio, geo.admin, Distance Matrix
+    "run_script": creer_devis,
+    # Adresse différente à chaque requête: le cache LRU de GeoAdminClient ne sert pas
+    "building_data": lambda session, base, n: session.post(f"{base}/api/building_data", json={
+        "adresse": f"Chemin du Benchmark {n}", "npa": "1180", "localite": "Rolle"}),
+    "submissions": lambda session, base, n: session.get(f"{base}/api/submissions"),
+}
+
+
+def reussie(response: requests.Response) -> bool:
+    if response.status_code != 200:
+        return False
+    try:
+        return response.json().get("success", True) is not False
+    except ValueError:
+        return False
+
+
+def percentile(valeurs: List[float], p: float) -> float:
+    """Percentile par interpolation linéaire (valeurs triées)"""
+    if not valeurs:
+        return 0.0
+    k = (len(valeurs) - 1) * p / 100
+    bas = int(k)
+    haut = min(bas + 1, len(valeurs) - 1)
+    return valeurs[bas] + (valeurs[haut] - valeurs[bas]) * (k - bas)
+
+
+def mesurer(base: str, endpoint: str, concurrence: int, nombre: int) -> Dict:
+    """Envoie nombre requêtes avec concurrence clients connectés en parallèle"""
+    local = threading.local()
+
+    def session():
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+            local.session.post(f"{base}/login", data={"email": BENCH_EMAIL, "password": BENCH_PASSWORD})
+        return local.session
+
+    def une_requete(_):
+        s = session()
+        debut = time.perf_counter()
+        try:
+            ok = reussie(ENDPOINTS[endpoint](s, base, next(_compteur)))
+        except requests.exceptions.RequestException:
+            ok = False
+        return time.perf_counter() - debut, ok
+
+    with ThreadPoolExecutor(max_workers=concurrence) as executor:
+        # Connexion hors mesure
+        list(executor.map(lambda _: session(), range(concurrence)))
+        debut = time.perf_counter()
+        resultats = list(executor.map(une_requete, range(nombre)))
+        duree = time.perf_counter() - debut
+
+    latences = sorted(d for d, _ in resultats)
+    return {
+        "endpoint": endpoint,
+        "concurrence": concurrence,
+        "requetes": nombre,
+        "erreurs": sum(1 for _, ok in resultats if not ok),
+        "p50_ms": round(percentile(latences, 50) * 1000, 1),
+        "p95_ms": round(percentile(latences, 95) * 1000, 1),
+        "p99_ms": round(percentile(latences, 99) * 1000, 1),
+        "moyenne_ms": round(sum(latences) / len(latences) * 1000, 1),
+        "debit_rps": round(nombre / duree, 2),
+    }
+
+
+# ==========================================
+# RÉSULTATS
+# ==========================================
+
+def commit_git() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def afficher(resultats: List[Dict], reference: Optional[Dict] = None):
+    """Tableau des résultats; avec une référence, écart relatif de p50, p95 et du débit"""
+    index = {(r["endpoint"], r["concurrence"]): r for r in (reference or {}).get("resultats", [])}
+
+    def ecart(valeur, ancienne):
+        if not ancienne:
+            return ""
+        return f" ({(valeur - ancienne) / ancienne * 100:+.0f}%)"
+
+    print(f"\n{'endpoint':<14} {'conc.':>5} {'req.':>5} {'err.':>5} {'p50 ms':>16} {'p95 ms':>16} "
+          f"{'p99 ms':>9} {'débit req/s':>18}")
+    for r in resultats:
+        ref = index.get((r["endpoint"], r["concurrence"]), {})
+        print(f"{r['endpoint']:<14} {r['concurrence']:>5} {r['requetes']:>5} {r['erreurs']:>5} "
+              f"{str(r['p50_ms']) + ecart(r['p50_ms'], ref.get('p50_ms')):>16} "
+              f"{str(r['p95_ms']) + ecart(r['p95_ms'], ref.get('p95_ms')):>16} "
+              f"{r['p99_ms']:>9} "
+              f"{str(r['debit_rps']) + ecart(r['debit_rps'], ref.get('debit_rps')):>18}")
+
+
+def enregistrer(run: Dict, label: Optional[str]) -> Path:
+    RESULTS_DIR.mkdir(exist_ok=True)
+    nom = datetime.now().strftime("%Y%m%d-%H%M%S") + (f"-{label}" if label else "")
+    chemin = RESULTS_DIR / f"{nom}.json"
+    with open(chemin, "w", encoding="utf-8") as f:
+        json.dump(run, f, ensure_ascii=False, indent=2)
+    return chemin
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de charge de l'application (services imités)")
+    parser.add_argument("--concurrence", default="1,2,4,8", help="Niveaux de concurrence, ex: 1,2,4,8")
+    parser.add_argument("--requetes", type=int, default=20, help="Requêtes par endpoint et par niveau")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS), help=f"Parmi: {', '.join(ENDPOINTS)}")
+    parser.add_argument("--latence", default="50", help="Latence des services en ms (ex: 50 ou bexio=120,google=200)")
+    parser.add_argument("--gigue", default="0", help="Gigue des services en ms, même format")
+    parser.add_argument("--erreurs", default="0", help="Taux de 503 des services (0-1), même format")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--label", help="Suffixe du fichier de résultats")
+    parser.add_argument("--comparer", help="Fichier de résultats d'un run précédent")
+    args = parser.parse_args()
+
+    endpoints = [e.strip() for e in args.endpoints.split(",") if e.strip()]
+    inconnus = [e for e in endpoints if e not in ENDPOINTS]
+    if inconnus:
+        parser.error(f"Endpoint(s) inconnu(s): {', '.join(inconnus)}")
+    niveaux = [int(n) for n in args.concurrence.split(",")]
+
+    reference = None
+    if args.comparer:
+        with open(args.comparer, encoding="utf-8") as f:
+            reference = json.load(f)
+
+    dossier = Path(tempfile.mkdtemp(prefix="bench_app_"))
+    services = stand_ins.demarrer(args.latence, args.gigue, args.erreurs, args.seed)
+    preparer_environnement(dossier, stand_ins.host_overrides(services))
+    base = demarrer_application(dossier)
+    print(f"Application: {base}  (données: {dossier})")
+
+    resultats = []
+    for endpoint in endpoints:
+        for niveau in niveaux:
+            resultat = mesurer(base, endpoint, niveau, args.requetes)
+            resultats.append(resultat)
+            print(f"   {endpoint:<14} concurrence {niveau:>3}: p50 {resultat['p50_ms']:8.1f} ms  "
+                  f"p95 {resultat['p95_ms']:8.1f} ms  {resultat['debit_rps']:6.2f} req/s  "
+                  f"{resultat['erreurs']} erreur(s)")
+
+    run = {
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit_git(),
+        "python": platform.python_version(),
+        "parametres": {
+            "concurrence": niveaux, "requetes": args.requetes, "endpoints": endpoints,
+            "latence_ms": args.latence, "gigue_ms": args.gigue, "erreurs": args.erreurs, "seed": args.seed,
+        },
+        "services": {s.name: {"appels": s.appels, "erreurs_injectees": s.erreurs} for s in services.values()},
+        "resultats": resultats,
+    }
+    afficher(resultats, reference)
+    print(f"\nRésultats: {enregistrer(run, args.label)}")
+
+    for s in services.values():
+        s.stop()
+
+
+if __name__ == "__main__":
+    main()
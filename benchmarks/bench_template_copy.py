@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark des stratégies de copie des templates (scripts/file_copy.py)
+
+Crée trois faux templates (.3dm, .gh, .bld) dans un dossier de travail puis
+mesure, pour chaque stratégie, la copie séquentielle et parallèle des trois.
+
+Usage:
+    python benchmarks/bench_template_copy.py [--dir /chemin/sur/le/fs/a/tester] [--runs 5] [--taille-3dm 200]
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+from file_copy import STRATEGIES, StrategyUnavailable, copy_file  # noqa: E402
+
+
+def creer_templates(dossier: Path, taille_3dm_mo: int):
+    """Crée des fichiers de taille réaliste (contenu aléatoire, non compressible)"""
+    tailles = {"modele.3dm": taille_3dm_mo, "modele.gh": 5, "modele.bld": 2}
+    sources = []
+    for nom, mo in tailles.items():
+        chemin = dossier / nom
+        with open(chemin, "wb") as f:
+            for _ in range(mo):
+                f.write(os.urandom(1024 * 1024))
+        sources.append(chemin)
+    return sources
+
+
+def copier(strategie, paires, parallele):
+    if strategie == "shutil.copy2":
+        fonction = lambda paire: shutil.copy2(*paire)
+    else:
+        fonction = lambda paire: copy_file(*paire, strategies=[strategie])
+
+    if parallele:
+        with ThreadPoolExecutor(max_workers=len(paires)) as executor:
+            list(executor.map(fonction, paires))
+    else:
+        for paire in paires:
+            fonction(paire)
+
+
+def mesurer(strategie, sources, dossier, runs, parallele):
+    durees = []
+    for run in range(runs):
+        cible = dossier / f"run_{strategie}_{run}"
+        cible.mkdir()
+        paires = [(s, cible / s.name) for s in sources]
+        debut = time.perf_counter()
+        copier(strategie, paires, parallele)
+        if hasattr(os, "sync"):
+            os.sync()
+        durees.append(time.perf_counter() - debut)
+        shutil.rmtree(cible)
+    return durees
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark des stratégies de copie de templates")
+    parser.add_argument("--dir", help="Dossier de travail (système de fichiers à tester)")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--taille-3dm", type=int, default=200, help="Taille du template .3dm en Mo")
+    args = parser.parse_args()
+
+    base = Path(tempfile.mkdtemp(prefix="bench_copy_", dir=args.dir))
+    try:
+        sources = creer_templates(base, args.taille_3dm)
+        total_mo = sum(s.stat().st_size for s in sources) / (1024 * 1024)
+        print(f"Dossier: {base}  ({total_mo:.0f} Mo par jeu de templates, {args.runs} runs)")
+        print(f"{'strategie':<18} {'mode':<10} {'mediane':>9} {'min':>9}")
+
+        for strategie in ["shutil.copy2", *STRATEGIES]:
+            for parallele in (False, True):
+                mode = "parallele" if parallele else "sequentiel"
+                try:
+                    durees = mesurer(strategie, sources, base, args.runs, parallele)
+                except StrategyUnavailable as e:
+                    print(f"{strategie:<18} {mode:<10} indisponible ({e})")
+                    break
+                print(f"{strategie:<18} {mode:<10} {statistics.median(durees):8.3f}s {min(durees):8.3f}s")
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,456 @@
+# -*- coding: utf-8 -*-
+"""
+Serveurs HTTP locaux imitant les API appelées par les scripts
+
+Bexio, geo.admin.ch (SearchServer / MapServer), Google Distance Matrix, Notion
+et Microsoft Graph: seuls les endpoints utilisés par scripts/ sont servis, avec
+des données plausibles gardées en mémoire. Chaque service a une latence
+(+ gigue aléatoire) et un taux d'erreurs 503 réglables.
+
+Les scripts y sont redirigés par $HTTP_HOST_OVERRIDES (scripts/http_client.py).
+Graph n'est joignable que par OneDriveClient(graph_endpoint=...): le jeton
+MSAL est toujours demandé à login.microsoftonline.com.
+
+Usage:
+    python benchmarks/stand_ins.py [--latence 50] [--latence bexio=120,google=200] [--erreurs 0.05]
+"""
+
+import json
+import time
+import random
+import argparse
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+Reponse = Tuple[int, object]
+
+
+class StandIn:
+    """Service imité: serveur local, latence, taux d'erreurs et compteur d'appels"""
+
+    name = ""
+    host = ""
+
+    def __init__(self, latence: float = 0.0, gigue: float = 0.0, taux_erreurs: float = 0.0,
+                 seed: Optional[int] = None):
+        """
+        Args:
+            latence: Délai ajouté à chaque réponse (secondes)
+            gigue: Délai aléatoire supplémentaire, entre 0 et gigue (secondes)
+            taux_erreurs: Proportion de réponses 503 (0 à 1)
+            seed: Graine du tirage des erreurs et de la gigue (reproductibilité)
+        """
+        self.latence = latence
+        self.gigue = gigue
+        self.taux_erreurs = taux_erreurs
+        self.appels = 0
+        self.erreurs = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StandIn":
+        """Démarre le serveur sur un port libre de 127.0.0.1"""
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def _dispatch(self):
+                longueur = int(self.headers.get("Content-Length") or 0)
+                brut = self.rfile.read(longueur) if longueur else b""
+                status, payload = stand_in.repondre(self.command, self.path, brut,
+                                                    self.headers.get("Content-Type", ""))
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _dispatch
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name=f"stand-in-{self.name}", daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def repondre(self, method: str, path: str, brut: bytes, content_type: str) -> Reponse:
+        """Applique latence et erreurs puis délègue à handle()"""
+        with self._lock:
+            self.appels += 1
+            delai = self.latence + (self._random.uniform(0, self.gigue) if self.gigue else 0.0)
+            en_erreur = self.taux_erreurs > 0 and self._random.random() < self.taux_erreurs
+            if en_erreur:
+                self.erreurs += 1
+        if delai:
+            time.sleep(delai)
+        if en_erreur:
+            return 503, {"error": "stand-in: erreur injectée"}
+
+        body = brut
+        if brut and "json" in content_type:
+            body = json.loads(brut.decode("utf-8"))
+        parts = urlsplit(path)
+        with self._lock:
+            return self.handle(method, unquote(parts.path), parse_qs(parts.query), body)
+
+    def handle(self, method: str, path: str, query: Dict, body) -> Reponse:
+        raise NotImplementedError
+
+
+# ==========================================
+# BEXIO
+# ==========================================
+
+class BexioStandIn(StandIn):
+    """Contacts, relations, offres et factures Bexio (API 2.0 / 3.0)"""
+
+    name = "bexio"
+    host = "api.bexio.com"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.contacts: Dict[int, Dict] = {}
+        self.relations: Dict[int, list] = {}
+        self.offres: Dict[int, Dict] = {}
+        self.factures: Dict[int, Dict] = {}
+        self._ids = 1000
+
+    def _next_id(self) -> int:
+        self._ids += 1
+        return self._ids
+
+    @staticmethod
+    def _now() -> str:
+        return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    @staticmethod
+    def _page(items, query):
+        offset = int(query.get("offset", ["0"])[0])
+        limit = int(query.get("limit", ["500"])[0])
+        return items[offset:offset + limit]
+
+    def handle(self, method, path, query, body):
+        segments = [s for s in path.split("/") if s]
+
+        if segments[:2] == ["2.0", "contact"]:
+            return self._contacts(method, segments[2:], query, body)
+
+        if segments[:2] == ["2.0", "kb_offer"]:
+            if method == "POST" and len(segments) == 2:
+                offre_id = self._next_id()
+                self.offres[offre_id] = dict(body, id=offre_id, document_nr=f"AN-{offre_id:05d}",
+                                             kb_item_status_id=2, updated_at=self._now())
+                return 201, self.offres[offre_id]
+            if method == "POST" and segments[2:] == ["search"]:
+                return 200, self._page(list(self.offres.values()), query)
+            return self._document(self.offres, segments[2:], "AN")
+
+        if segments[:2] == ["2.0", "kb_invoice"]:
+            if method == "POST" and segments[2:] == ["search"]:
+                return 200, self._page(list(self.factures.values()), query)
+            return self._document(self.factures, segments[2:], "RE")
+
+        if segments[:2] == ["3.0", "kb_invoices"] and segments[3:] == ["mark_as_paid"]:
+            return 200, {"id": int(segments[2]), "status": "paid"}
+
+        return 404, {"error": f"stand-in bexio: {method} {path}"}
+
+    def _document(self, documents: Dict[int, Dict], rest, prefix: str) -> Reponse:
+        """GET d'une offre ou facture (créée à la demande) et de son PDF"""
+        doc_id = int(rest[0])
+        document = documents.setdefault(doc_id, {
+            "id": doc_id, "document_nr": f"{prefix}-{doc_id:05d}", "contact_id": 1,
+            "title": f"CECB - Rue du Stand-in {doc_id % 90 + 1} - 1180 Rolle",
+            "total": "1250.00", "total_remaining_payments": "0.00", "kb_item_status_id": 9,
+        })
+        if rest[1:] == ["pdf"]:
+            return 200, {"name": f"{document['document_nr']}.pdf", "mime": "application/pdf",
+                         "content": "JVBERi0xLjQKJSBzdGFuZC1pbgo="}
+        return 200, document
+
+    def _contacts(self, method, rest, query, body) -> Reponse:
+        if not rest:
+            if method == "POST":
+                contact_id = self._next_id()
+                self.contacts[contact_id] = dict(body, id=contact_id, updated_at=self._now())
+                return 201, self.contacts[contact_id]
+            contacts = sorted(self.contacts.values(), key=lambda c: c["id"])
+            terme = query.get("search", [""])[0].lower()
+            if terme:
+                contacts = [c for c in contacts
+                            if terme in (c.get("mail") or "").lower() or terme in (c.get("name_1") or "").lower()]
+            return 200, self._page(contacts, query)
+
+        if rest == ["search"]:
+            contacts = sorted(self.contacts.values(), key=lambda c: c["id"])
+            for critere in body or []:
+                if critere.get("field") == "updated_at" and critere.get("criteria") == ">=":
+                    contacts = [c for c in contacts if c["updated_at"] >= critere["value"]]
+            return 200, self._page(contacts, query)
+
+        contact_id = int(rest[0])
+        if contact_id not in self.contacts:
+            return 404, {"error": "contact inconnu"}
+        if rest[1:] == ["contact_relation"]:
+            relations = self.relations.setdefault(contact_id, [])
+            if method == "POST":
+                relation = dict(body, id=self._next_id(), contact_id=contact_id)
+                relations.append(relation)
+                return 201, relation
+            return 200, relations
+        if method == "PATCH":
+            self.contacts[contact_id].update(body, updated_at=self._now())
+        return 200, self.contacts[contact_id]
+
+
+# ==========================================
+# GEO.ADMIN.CH
+# ==========================================
+
+class GeoAdminStandIn(StandIn):
+    """SearchServer (featuresearch / locations), MapServer (feature, identify)"""
+
+    name = "geo_admin"
+    host = "api3.geo.admin.ch"
+
+    @staticmethod
+    def _egid(texte: str) -> int:
+        # Stable pour une même adresse
+        return 100000 + sum(ord(c) * (i + 1) for i, c in enumerate(texte)) % 900000
+
+    def handle(self, method, path, query, body):
+        if path.endswith("/SearchServer"):
+            texte = query.get("searchText", [""])[0]
+            egid = self._egid(texte)
+            return 200, {"results": [{"attrs": {
+                "featureId": f"{egid}_0", "label": texte, "detail": texte.lower(),
+                "lat": 46.4571, "lon": 6.3375, "y": 515000, "x": 146000,  # LV03
+            }}]}
+
+        if path.endswith("/identify"):
+            return 200, {"results": [{"featureId": "1000001_0", "properties": {
+                "egid": 1000001, "gastw": 3, "garea": 180, "gbauj": 1975, "gkat": 1020,
+            }}]}
+
+        if "/MapServer/" in path:
+            feature_id = path.rsplit("/", 1)[-1]
+            egid = int(feature_id.split("_")[0]) if feature_id.split("_")[0].isdigit() else 1000001
+            return 200, {"feature": {"featureId": feature_id, "attributes": {
+                "egid": egid, "garea": 80 + egid % 400, "gastw": 1 + egid % 5, "gbauj": 1900 + egid % 120,
+                "gebnr": str(egid % 1000), "lparz": str(egid % 5000),
+            }}}
+
+        return 404, {"error": f"stand-in geo.admin: {method} {path}"}
+
+
+# ==========================================
+# GOOGLE DISTANCE MATRIX
+# ==========================================
+
+class DistanceMatrixStandIn(StandIn):
+    """/maps/api/distancematrix/json: distance déduite des adresses (stable)"""
+
+    name = "google"
+    host = "maps.googleapis.com"
+
+    def handle(self, method, path, query, body):
+        if not path.endswith("/distancematrix/json"):
+            return 404, {"error_message": f"stand-in google: {path}", "status": "INVALID_REQUEST"}
+        origine = query.get("origins", [""])[0]
+        destination = query.get("destinations", [""])[0]
+        metres = 2000 + sum(map(ord, origine + destination)) % 60000
+        return 200, {"status": "OK", "rows": [{"elements": [{
+            "status": "OK",
+            "distance": {"value": metres, "text": f"{metres / 1000:.1f} km"},
+            "duration": {"value": metres // 15, "text": f"{metres // 900} min"},
+        }]}]}
+
+
+# ==========================================
+# NOTION
+# ==========================================
+
+class NotionStandIn(StandIn):
+    """Pages (création, mise à jour) et requêtes de base de données paginées"""
+
+    name = "notion"
+    host = "api.notion.com"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pages: Dict[str, Dict] = {}
+
+    def handle(self, method, path, query, body):
+        segments = [s for s in path.split("/") if s]
+        if segments[:2] == ["v1", "pages"]:
+            if method == "POST":
+                page_id = f"page-{len(self.pages) + 1:06d}"
+                self.pages[page_id] = dict(body or {}, id=page_id, object="page",
+                                           last_edited_time=datetime.now().isoformat())
+                return 200, self.pages[page_id]
+            page = self.pages.setdefault(segments[2], {"id": segments[2], "object": "page", "properties": {}})
+            if method == "PATCH":
+                page.setdefault("properties", {}).update((body or {}).get("properties", {}))
+            return 200, page
+
+        if segments[:2] == ["v1", "databases"] and segments[3:] == ["query"]:
+            pages = list(self.pages.values())
+            debut = int((body or {}).get("start_cursor") or 0)
+            taille = int((body or {}).get("page_size") or 100)
+            suite = debut + taille < len(pages)
+            return 200, {"object": "list", "results": pages[debut:debut + taille], "has_more": suite,
+                         "next_cursor": str(debut + taille) if suite else None}
+
+        return 404, {"object": "error", "message": f"stand-in notion: {method} {path}"}
+
+
+# ==========================================
+# MICROSOFT GRAPH
+# ==========================================
+
+class GraphStandIn(StandIn):
+    """Éléments OneDrive par chemin: lecture, enfants, création de dossiers, upload simple, $batch"""
+
+    name = "graph"
+    host = "graph.microsoft.com"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.items: Dict[str, Dict] = {"": {"id": "root", "folder": {}}}
+
+    def _chemin(self, path: str) -> Tuple[str, Optional[str]]:
+        # /me/drive/root:/a/b:/children -> ("a/b", "children")
+        reste = path.split("/me/drive/root", 1)[-1]
+        if reste.startswith(":"):
+            chemin, _, action = reste[1:].partition(":")
+            return chemin.strip("/"), action.strip("/") or None
+        return "", reste.strip("/") or None
+
+    def handle(self, method, path, query, body):
+        if path.endswith("/$batch"):
+            reponses = []
+            for req in (body or {}).get("requests", []):
+                status, payload = self.handle(req["method"], urlsplit(req["url"]).path, {}, req.get("body"))
+                reponses.append({"id": req["id"], "status": status, "body": payload})
+            return 200, {"responses": reponses}
+
+        chemin, action = self._chemin(path)
+        if method == "GET" and action == "children":
+            prefixe = f"{chemin}/" if chemin else ""
+            enfants = [dict(item, name=p.rsplit("/", 1)[-1]) for p, item in self.items.items()
+                       if p.startswith(prefixe) and p and "/" not in p[len(prefixe):]]
+            return 200, {"value": enfants}
+        if method == "GET":
+            if chemin not in self.items:
+                return 404, {"error": {"code": "itemNotFound"}}
+            return 200, dict(self.items[chemin], name=chemin.rsplit("/", 1)[-1])
+        if method == "POST" and action == "children":
+            nouveau = f"{chemin}/{body['name']}".strip("/")
+            if nouveau in self.items:
+                return 409, {"error": {"code": "nameAlreadyExists"}}
+            self.items[nouveau] = {"id": f"id-{len(self.items)}", "folder": {}}
+            return 201, dict(self.items[nouveau], name=body["name"])
+        if method == "PUT" and action == "content":
+            self.items[chemin] = {"id": f"id-{len(self.items)}", "file": {}, "size": len(body or b"")}
+            return 201, dict(self.items[chemin], name=chemin.rsplit("/", 1)[-1])
+
+        return 400, {"error": {"code": "invalidRequest", "path": path}}
+
+
+# ==========================================
+# DÉMARRAGE
+# ==========================================
+
+SERVICES = {cls.name: cls for cls in (BexioStandIn, GeoAdminStandIn, DistanceMatrixStandIn, NotionStandIn, GraphStandIn)}
+
+
+def par_service(valeur, defaut: float = 0.0) -> Dict[str, float]:
+    """
+    Lit "50" (tous les services) ou "bexio=120,google=200" (les autres: defaut)
+
+    Returns:
+        {nom du service: valeur}
+    """
+    resultat = {name: defaut for name in SERVICES}
+    for item in str(valeur if valeur is not None else "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        if "=" in item:
+            name, _, nombre = item.partition("=")
+            if name.strip() not in SERVICES:
+                raise ValueError(f"Service inconnu: {name} (services: {', '.join(SERVICES)})")
+            resultat[name.strip()] = float(nombre)
+        else:
+            resultat = {name: float(item) for name in SERVICES}
+    return resultat
+
+
+def demarrer(latence_ms="0", gigue_ms="0", taux_erreurs="0", seed: Optional[int] = None) -> Dict[str, StandIn]:
+    """
+    Démarre tous les services imités
+
+    Args:
+        latence_ms: Latence en ms, globale ou par service ("bexio=120,google=200")
+        gigue_ms: Gigue en ms, même format
+        taux_erreurs: Taux de 503, même format
+        seed: Graine des tirages aléatoires
+
+    Returns:
+        {nom du service: StandIn démarré}
+    """
+    latences = par_service(latence_ms)
+    gigues = par_service(gigue_ms)
+    erreurs = par_service(taux_erreurs)
+    return {
+        name: cls(latences[name] / 1000, gigues[name] / 1000, erreurs[name], seed).start()
+        for name, cls in SERVICES.items()
+    }
+
+
+def host_overrides(stand_ins: Dict[str, StandIn]) -> str:
+    """Valeur de $HTTP_HOST_OVERRIDES redirigeant chaque hôte vers son service local"""
+    return ",".join(f"{s.host}={s.url}" for s in stand_ins.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Services imités (Bexio, geo.admin, Google, Notion, Graph)")
+    parser.add_argument("--latence", default="0", help="ms, ex: 50 ou bexio=120,google=200")
+    parser.add_argument("--gigue", default="0", help="ms, même format")
+    parser.add_argument("--erreurs", default="0", help="taux de 503 (0-1), même format")
+    options = parser.parse_args()
+
+    stand_ins = demarrer(options.latence, options.gigue, options.erreurs)
+    for s in stand_ins.values():
+        print(f"   {s.name:<10} {s.host:<22} -> {s.url}")
+    print(f"\nexport HTTP_HOST_OVERRIDES='{host_overrides(stand_ins)}'")
+    print("Ctrl+C pour arrêter")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        for s in stand_ins.values():
+            s.stop()
+
+
+if __name__ == "__main__":
+    main()
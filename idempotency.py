@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+"""
+Clés d'idempotence pour /run_script
+Évite un second devis Bexio (et une seconde FormSubmission) après un double-clic
+ou un nouvel envoi suite à une réponse lente
+
+La clé vient du jeton fourni par le client (en-tête Idempotency-Key ou champ
+"idempotency_key"), sinon, pour les scripts déclarant 'idempotency_window' dans
+SCRIPTS, d'une empreinte des arguments normalisés (form_data compris).
+
+Une requête répétée dans la fenêtre est rattachée à l'exécution d'origine:
+- en attente ou en cours: la requête reçoit l'exécution d'origine (202, run_id)
+  et suit son statut sur GET /runs/<id>
+- réussie: le résultat enregistré est rendu immédiatement
+- interrompue en cours d'exécution (timeout, annulation, worker arrêté): résultat
+  inconnu, le script a pu créer le devis; la réponse enregistrée est rendue
+  pendant toute la fenêtre, comme pour une exécution réussie
+- échouée: la clé est libérée, la requête relance le script
+"""
+
+import os
+import json
+import hashlib
+from datetime import timedelta
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import and_, insert, or_
+from sqlalchemy.exc import IntegrityError
+
+from models import db, IdempotencyKey, get_utc_time
+import process_control
+import run_queue
+
+# Fenêtre de validité par défaut (secondes) des clés fournies par le client
+DEFAULT_WINDOW = int(os.environ.get('IDEMPOTENCY_WINDOW', 600))
+
+# Au-delà, une exécution encore "running" est considérée abandonnée (worker arrêté):
+# attente maximale en file + timeout maximal des scripts + marge
+RUNNING_TTL = run_queue.QUEUE_TIMEOUT + process_control.MAX_TIMEOUT + run_queue.HEARTBEAT_TTL
+
+MAX_CLIENT_KEY_LENGTH = 200
+
+
+# ==========================================
+# CALCUL DE LA CLÉ
+# ==========================================
+
+def normalize_value(value):
+    """
+    Forme canonique d'un argument: espaces superflus et casse ignorés, champs vides retirés
+
+    Une chaîne contenant un objet JSON (form_data) est normalisée champ par champ.
+    """
+    if isinstance(value, str):
+        text = value.strip()
+        if text.startswith('{'):
+            try:
+                return normalize_value(json.loads(text))
+            except ValueError:
+                pass
+        return ' '.join(text.split()).casefold()
+    if isinstance(value, dict):
+        return {str(k): normalize_value(v) for k, v in sorted(value.items())
+                if v not in (None, '') and not (isinstance(v, str) and not v.strip())}
+    if isinstance(value, (list, tuple)):
+        return [normalize_value(v) for v in value]
+    return value
+
+
+def args_fingerprint(args: Dict) -> str:
+    """Empreinte SHA-256 des arguments normalisés"""
+    canonical = json.dumps(normalize_value(args or {}), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def compute_key(user_id: Optional[str], script_id: str, args: Dict, client_key: Optional[str] = None,
+                derive_from_args: bool = False, profile: Optional[str] = None) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Clé d'idempotence d'une requête
+
+    Args:
+        user_id: Utilisateur (les clés ne sont partagées qu'entre ses propres requêtes)
+        script_id: Script demandé
+        args: Arguments de la requête
+        client_key: Jeton fourni par le client, prioritaire
+        derive_from_args: Dériver la clé des arguments si le client n'en fournit pas
+        profile: Mode de profilage (une exécution profilée n'est pas rattachée à une normale)
+
+    Returns:
+        (clé, source 'client' ou 'args'), ou (None, None) si la requête n'est pas idempotente
+    """
+    client_key = (client_key or '').strip()[:MAX_CLIENT_KEY_LENGTH]
+    if client_key:
+        source, material = 'client', client_key
+    elif derive_from_args:
+        source, material = 'args', args_fingerprint(args)
+    else:
+        return None, None
+    raw = '\x1f'.join([user_id or '', script_id, profile or '', source, material])
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest(), source
+
+
+# ==========================================
+# RÉSERVATION ET RATTACHEMENT
+# ==========================================
+
+def claim(key: str, script_id: str, user_id: Optional[str], source: str,
+          window: int = DEFAULT_WINDOW) -> Optional[IdempotencyKey]:
+    """
+    Réserve la clé pour une nouvelle exécution
+
+    La réservation est un INSERT sur la clé primaire: entre plusieurs workers, un seul
+    l'obtient. Une clé échouée, expirée ou abandonnée est d'abord libérée.
+
+    Args:
+        key: Clé calculée par compute_key
+        script_id: Script demandé
+        user_id: Utilisateur
+        source: 'client' ou 'args'
+        window: Fenêtre de validité d'une exécution réussie (secondes)
+
+    Returns:
+        None si la clé est réservée pour cette requête, sinon l'entrée existante
+        (exécution en cours, réussie ou au résultat inconnu) à laquelle se rattacher
+    """
+    for _ in range(3):
+        now = get_utc_time()
+        IdempotencyKey.query.filter(
+            IdempotencyKey.key == key,
+            or_(
+                IdempotencyKey.status == 'error',
+                and_(IdempotencyKey.status.in_(('success', 'unknown')),
+                     IdempotencyKey.created_at < now - timedelta(seconds=window)),
+                and_(IdempotencyKey.status == 'running',
+                     IdempotencyKey.created_at < now - timedelta(seconds=max(window, RUNNING_TTL))),
+            )
+        ).delete(synchronize_session='fetch')
+        try:
+            db.session.execute(insert(IdempotencyKey).values(key=key, script_id=script_id, user_id=user_id,
+                                                             source=source, status='running', created_at=now))
+            db.session.commit()
+            return None
+        except IntegrityError:
+            db.session.rollback()
+        existing = db.session.get(IdempotencyKey, key)
+        if existing is not None:
+            return existing
+        # Libérée entre-temps par l'autre requête: nouvel essai
+    raise RuntimeError(f"Clé d'idempotence {key[:12]} indisponible")
+
+
+def attach_run(key: str, run_id: int):
+    """Associe l'exécution en attente à la clé réservée (rendue aux requêtes répétées)"""
+    try:
+        IdempotencyKey.query.filter_by(key=key).update({'run_id': run_id}, synchronize_session=False)
+        db.session.commit()
+    except Exception as e:
+        print(f"⚠️  Erreur lors de l'enregistrement de la clé d'idempotence: {str(e)}")
+        db.session.rollback()
+
+
+def record_result(key: str, payload: Dict, http_status: int):
+    """
+    Enregistre la réponse de l'exécution d'origine
+
+    Une exécution échouée libère la clé pour les requêtes suivantes; les requêtes
+    déjà rattachées lisent tout de même cette réponse sur GET /runs/<id>. Une
+    réponse marquée 'outcome_unknown' (script interrompu après son lancement)
+    garde la clé: relancer pourrait créer un second devis.
+    """
+    if payload.get('success'):
+        status = 'success'
+    elif payload.get('outcome_unknown'):
+        status = 'unknown'
+    else:
+        status = 'error'
+    try:
+        IdempotencyKey.query.filter_by(key=key).update({
+            'status': status,
+            'run_id': payload.get('run_id'),
+            'response': payload,
+            'http_status': http_status,
+            'finished_at': get_utc_time(),
+        }, synchronize_session=False)
+        db.session.commit()
+    except Exception as e:
+        print(f"⚠️  Erreur lors de l'enregistrement de la clé d'idempotence: {str(e)}")
+        db.session.rollback()
+
+
+def replay_response(entry: IdempotencyKey) -> Tuple[Dict, int]:
+    """Réponse de l'exécution d'origine, marquée comme rejouée"""
+    payload = dict(entry.response or {})
+    payload['idempotent_replay'] = True
+    return payload, entry.http_status or 200
@@ -6,20 +6,61 @@ Ce module définit les modèles SQLAlchemy pour la persistance des données.
 
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime, timezone
+from typing import Optional
+from zoneinfo import ZoneInfo
 
 # Instance SQLAlchemy à partager avec app.py
 db = SQLAlchemy()
 
+# Fuseau d'affichage et des expressions cron (tzdata requis sous Windows)
+LOCAL_TZ = ZoneInfo('Europe/Zurich')
 
-def get_local_time():
+
+def get_utc_time():
+    """
+    Retourne l'heure actuelle en UTC, sans fuseau
+
+    Toutes les dates enregistrées en base sont en UTC: l'heure locale saute d'une
+    heure aux changements d'heure, et les délais (signe de vie, attente en file,
+    idempotence) calculés sur elle seraient faux d'une heure.
     """
-    Retourne l'heure actuelle en timezone Suisse (Europe/Zurich)
-    UTC+1 en hiver, UTC+2 en été
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def to_local_time(value: Optional[datetime]) -> Optional[datetime]:
+    """Date UTC de la base -> heure locale (Europe/Zurich) sans fuseau, pour l'affichage"""
+    if value is None:
+        return None
+    return value.replace(tzinfo=timezone.utc).astimezone(LOCAL_TZ).replace(tzinfo=None)
+
+
+def utc_isoformat(value: Optional[datetime]) -> Optional[str]:
+    """Date UTC de la base au format ISO avec son fuseau (+00:00), pour l'API"""
+    if value is None:
+        return None
+    return value.replace(tzinfo=timezone.utc).isoformat()
+
+
+def upgrade_schema():
     """
-    # Pour simplifier, on utilise UTC+1 (heure de Suisse en hiver)
-    # En production, utiliser pytz pour gérer correctement les fuseaux horaires
-    from datetime import timedelta
-    return datetime.now(timezone.utc) + timedelta(hours=1)
+    Ajoute aux tables existantes les colonnes apparues depuis leur création
+
+    db.create_all() ne crée que les tables manquantes; les nouvelles colonnes sont
+    toutes nullables, un ALTER TABLE ... ADD COLUMN suffit. À appeler après create_all().
+    """
+    from sqlalchemy import inspect, text
+
+    inspector = inspect(db.engine)
+    with db.engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(dialect=db.engine.dialect)
+                    conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                    print(f"🔧 Colonne ajoutée: {table.name}.{column.name}")
 
 
 class FormSubmission(db.Model):
@@ -54,8 +95,8 @@ class FormSubmission(db.Model):
     building_address = db.Column(db.String(300), nullable=True)
 
     # Timestamps
-    created_at = db.Column(db.DateTime, default=get_local_time, index=True)
-    updated_at = db.Column(db.DateTime, default=get_local_time, onupdate=get_local_time)
+    created_at = db.Column(db.DateTime, default=get_utc_time, index=True)
+    updated_at = db.Column(db.DateTime, default=get_utc_time, onupdate=get_utc_time)
 
     def __repr__(self):
         return f'<FormSubmission {self.id} - {self.client_name} - {self.status}>'
@@ -75,6 +116,186 @@ class FormSubmission(db.Model):
             'certificate_type': self.certificate_type,
             'client_name': self.client_name,
             'building_address': self.building_address,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'created_at': utc_isoformat(self.created_at),
+            'updated_at': utc_isoformat(self.updated_at),
+        }
+
+
+class ScriptRun(db.Model):
+    """Modèle pour l'historique des exécutions de scripts (/run_script)"""
+
+    __tablename__ = 'script_runs'
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    # Script lancé et utilisateur (ID string depuis users.json)
+    script_id = db.Column(db.String(50), nullable=False, index=True)
+    user_id = db.Column(db.String(50), nullable=True, index=True)
+
+    # Statut et résultat
+    status = db.Column(db.String(20), default='running')  # queued, running, success, error, timeout, cancelled, skipped
+    returncode = db.Column(db.Integer, nullable=True)
+    duration = db.Column(db.Float, nullable=True)
+    error_message = db.Column(db.Text, nullable=True)
+
+    # Trace associée (scripts/tracing.py)
+    trace_id = db.Column(db.String(32), nullable=True)
+
+    # Profilage à la demande (scripts/script_profiler.py)
+    profiler = db.Column(db.String(20), nullable=True)  # cprofile, sample, importtime
+    profile_path = db.Column(db.String(300), nullable=True)
+    profile_summary = db.Column(db.JSON, nullable=True)
+
+    # File d'attente (run_queue.py): priorité et lancement effectif
+    priority = db.Column(db.Integer, nullable=True, default=0)
+    started_at = db.Column(db.DateTime, nullable=True)
+
+    # Processus et limites (process_control.py): timeout, cpu_limit, memory_limit, enforced
+    pid = db.Column(db.Integer, nullable=True)
+    heartbeat_at = db.Column(db.DateTime, nullable=True)  # signe de vie du worker qui exécute le script
+    limits = db.Column(db.JSON, nullable=True)
+    limit_exceeded = db.Column(db.String(20), nullable=True)  # timeout, cpu, memory
+
+    # Annulation demandée (POST /runs/<id>/cancel), appliquée par le worker qui exécute le script
+    cancel_requested = db.Column(db.Boolean, nullable=True, default=False)
+    cancelled_by = db.Column(db.String(50), nullable=True)
+
+    # Planification à l'origine de l'exécution (scheduler.py), None si lancée à la main
+    schedule_id = db.Column(db.Integer, nullable=True, index=True)
+
+    # Demande à lancer par le répartiteur (run_queue.dispatch): arguments, soumission
+    # du devis, clé d'idempotence et span de la requête /run_script
+    args = db.Column(db.JSON, nullable=True)
+    submission_id = db.Column(db.Integer, nullable=True)
+    idempotency_key = db.Column(db.String(64), nullable=True)
+    traceparent = db.Column(db.String(55), nullable=True)
+
+    # Réponse finale rendue par GET /runs/<id> (même contenu que l'ancienne réponse de /run_script)
+    response = db.Column(db.JSON, nullable=True)
+    http_status = db.Column(db.Integer, nullable=True)
+
+    # Timestamps
+    created_at = db.Column(db.DateTime, default=get_utc_time, index=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    @property
+    def queue_wait(self):
+        """Attente en file avant le lancement (secondes), None si pas encore lancé"""
+        if self.started_at is None or self.created_at is None:
+            return None
+        return (self.started_at - self.created_at).total_seconds()
+
+    def __repr__(self):
+        return f'<ScriptRun {self.id} - {self.script_id} - {self.status}>'
+
+    def to_dict(self):
+        """Convertit l'exécution en dictionnaire pour API"""
+        return {
+            'id': self.id,
+            'script_id': self.script_id,
+            'user_id': self.user_id,
+            'status': self.status,
+            'returncode': self.returncode,
+            'duration': self.duration,
+            'error_message': self.error_message,
+            'trace_id': self.trace_id,
+            'profiler': self.profiler,
+            'profile_summary': self.profile_summary,
+            'priority': self.priority,
+            'queue_wait': self.queue_wait,
+            'pid': self.pid,
+            'heartbeat_at': utc_isoformat(self.heartbeat_at),
+            'limits': self.limits,
+            'limit_exceeded': self.limit_exceeded,
+            'cancel_requested': bool(self.cancel_requested),
+            'cancelled_by': self.cancelled_by,
+            'schedule_id': self.schedule_id,
+            'created_at': utc_isoformat(self.created_at),
+            'started_at': utc_isoformat(self.started_at),
+            'finished_at': utc_isoformat(self.finished_at),
+        }
+
+
+class IdempotencyKey(db.Model):
+    """
+    Clé d'idempotence d'une requête /run_script (voir idempotency.py)
+
+    Une requête répétée avec la même clé dans la fenêtre de validité est rattachée
+    à l'exécution d'origine (en cours ou réussie) au lieu d'en lancer une nouvelle.
+    """
+
+    __tablename__ = 'idempotency_keys'
+
+    # Empreinte SHA-256 (utilisateur, script, jeton client ou arguments normalisés)
+    key = db.Column(db.String(64), primary_key=True)
+
+    script_id = db.Column(db.String(50), nullable=False)
+    user_id = db.Column(db.String(50), nullable=True, index=True)
+    source = db.Column(db.String(20), nullable=False)  # client, args
+
+    # Exécution d'origine et sa réponse JSON, rendue aux requêtes répétées
+    run_id = db.Column(db.Integer, nullable=True)
+    status = db.Column(db.String(20), default='running')  # running, success, unknown, error
+    response = db.Column(db.JSON, nullable=True)
+    http_status = db.Column(db.Integer, nullable=True)
+
+    # Timestamps
+    created_at = db.Column(db.DateTime, default=get_utc_time, index=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<IdempotencyKey {self.key[:12]} - {self.script_id} - {self.status}>'
+
+
+class Schedule(db.Model):
+    """
+    Exécution récurrente d'un script (voir scheduler.py)
+
+    À chaque échéance de l'expression cron, une exécution du script est placée
+    dans la file d'attente avec les arguments enregistrés.
+    """
+
+    __tablename__ = 'schedules'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+
+    # Script de SCRIPTS et ses arguments fixes ({nom d'argument: valeur})
+    script_id = db.Column(db.String(50), nullable=False)
+    args = db.Column(db.JSON, nullable=True)
+
+    # Expression cron (heure locale) et priorité dans la file (None: celle du script)
+    cron = db.Column(db.String(100), nullable=False)
+    priority = db.Column(db.Integer, nullable=True)
+    enabled = db.Column(db.Boolean, default=True)
+
+    # Prochaine échéance (UTC, comme toutes les dates) et dernière exécution créée
+    # (ScriptRun.schedule_id pour l'historique)
+    next_run_at = db.Column(db.DateTime, nullable=True, index=True)
+    last_run_at = db.Column(db.DateTime, nullable=True)
+    last_run_id = db.Column(db.Integer, nullable=True)
+
+    created_by = db.Column(db.String(50), nullable=True)
+    created_at = db.Column(db.DateTime, default=get_utc_time)
+    updated_at = db.Column(db.DateTime, default=get_utc_time, onupdate=get_utc_time)
+
+    def __repr__(self):
+        return f'<Schedule {self.id} - {self.script_id} - {self.cron}>'
+
+    def to_dict(self):
+        """Convertit la planification en dictionnaire pour API"""
+        return {
+            'id': self.id,
+            'name': self.name,
+            'script_id': self.script_id,
+            'args': self.args or {},
+            'cron': self.cron,
+            'priority': self.priority,
+            'enabled': bool(self.enabled),
+            'next_run_at': utc_isoformat(self.next_run_at),
+            'last_run_at': utc_isoformat(self.last_run_at),
+            'last_run_id': self.last_run_id,
+            'created_by': self.created_by,
+            'created_at': utc_isoformat(self.created_at),
+            'updated_at': utc_isoformat(self.updated_at),
         }
@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+"""
+Lancement des scripts dans un groupe de processus, avec limites de ressources
+Timeout, temps CPU et mémoire par script ('timeout', 'cpu_limit', 'memory_limit' de SCRIPTS)
+
+Le script démarre dans une nouvelle session: l'annulation et le timeout arrêtent
+tout le groupe (sous-processus compris), SIGTERM puis SIGKILL après un délai de grâce.
+
+Limites appliquées au processus lancé (POSIX, ignorées sous Windows):
+- temps CPU: RLIMIT_CPU, le noyau envoie SIGXCPU puis SIGKILL 5 s plus tard
+- mémoire: RLIMIT_DATA (mémoire allouée, Linux >= 4.7), l'allocation échoue avec
+  MemoryError. Pas RLIMIT_AS: l'espace d'adressage réservé par les arènes malloc
+  de chaque thread et les bibliothèques chargées déclenchait des MemoryError
+  bien avant que le script n'utilise la mémoire autorisée. MALLOC_ARENA_MAX
+  limite en plus le nombre d'arènes des scripts ainsi limités
+"""
+
+import os
+import sys
+import time
+import signal
+import subprocess
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Timeout par défaut des scripts (secondes)
+DEFAULT_TIMEOUT = int(os.environ.get('SCRIPT_TIMEOUT', 300))
+
+# Timeout maximal accepté dans SCRIPTS
+MAX_TIMEOUT = 1800
+
+# Délai entre SIGTERM et SIGKILL lors de l'arrêt du groupe
+TERMINATE_GRACE = 5
+
+# Marge entre les limites CPU souple (SIGXCPU) et dure (SIGKILL)
+CPU_HARD_MARGIN = 5
+
+POLL_INTERVAL = 0.5
+
+# Arènes malloc des scripts sous limite mémoire (glibc: 8 par cœur par défaut)
+MALLOC_ARENA_MAX = 2
+
+
+@dataclass
+class Limits:
+    """Limites d'une exécution (None: pas de limite)"""
+    timeout: int = DEFAULT_TIMEOUT
+    cpu_limit: Optional[int] = None  # secondes de CPU
+    memory_limit: Optional[int] = None  # Mo de mémoire allouée
+
+    @classmethod
+    def from_config(cls, script_config: Dict) -> 'Limits':
+        """Limites déclarées dans une entrée de SCRIPTS"""
+        timeout = min(int(script_config.get('timeout', DEFAULT_TIMEOUT)), MAX_TIMEOUT)
+        return cls(timeout=timeout, cpu_limit=script_config.get('cpu_limit'),
+                   memory_limit=script_config.get('memory_limit'))
+
+
+@dataclass
+class ProcessResult:
+    """Résultat d'un script lancé par run()"""
+    returncode: Optional[int]
+    stdout: str
+    stderr: str
+    duration: float
+    pid: int
+    outcome: str = 'exited'  # exited, timeout, cancelled
+    limit_exceeded: Optional[str] = None  # timeout, cpu, memory
+    enforced: List[str] = field(default_factory=list)  # limites réellement appliquées
+    cpu_time: Optional[float] = None  # temps CPU du script (dernière mesure), None si inconnu
+
+
+# ==========================================
+# LIMITES DE RESSOURCES
+# ==========================================
+
+def _rlimits(limits: Limits):
+    """(ressource, (souple, dure)) à appliquer pour ces limites"""
+    rlimits = []
+    if resource is None:
+        return rlimits
+    if limits.cpu_limit:
+        rlimits.append(('cpu', resource.RLIMIT_CPU, (limits.cpu_limit, limits.cpu_limit + CPU_HARD_MARGIN)))
+    if limits.memory_limit:
+        size = limits.memory_limit * 1024 * 1024
+        rlimit = getattr(resource, 'RLIMIT_DATA', resource.RLIMIT_AS)
+        rlimits.append(('memory', rlimit, (size, size)))
+    return rlimits
+
+
+def apply_limits(pid: int, limits: Limits) -> List[str]:
+    """
+    Applique les limites CPU et mémoire à un processus déjà lancé (prlimit, Linux)
+
+    Appliquées juste après le lancement, avant que le script n'ait chargé ses
+    modules: contrairement à preexec_fn, sans risque avec les threads du serveur.
+
+    Returns:
+        Noms des limites appliquées ('cpu', 'memory')
+    """
+    enforced = []
+    for name, rlimit, values in _rlimits(limits):
+        try:
+            resource.prlimit(pid, rlimit, values)
+            enforced.append(name)
+        except (OSError, ValueError, AttributeError) as e:
+            print(f"⚠️  Limite {name} non appliquée au processus {pid}: {str(e)}")
+    return enforced
+
+
+def _preexec(limits: Limits):
+    """preexec_fn des systèmes POSIX sans prlimit (macOS)"""
+    rlimits = _rlimits(limits)
+
+    def set_limits():
+        for _, rlimit, values in rlimits:
+            resource.setrlimit(rlimit, values)
+    return set_limits
+
+
+def cpu_time(pid: int) -> Optional[float]:
+    """Temps CPU consommé par le processus (secondes, /proc sous Linux), None si inconnu"""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        # utime et stime: champs 14 et 15 de /proc/<pid>/stat (après le nom)
+        return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def detect_limit(returncode: Optional[int], stderr: str, limits: Limits,
+                 used_cpu: Optional[float] = None) -> Optional[str]:
+    """
+    Limite de ressources à l'origine de l'arrêt du script, si c'est le cas
+
+    SIGXCPU vient toujours de RLIMIT_CPU. SIGKILL peut venir d'ailleurs (OOM killer,
+    administrateur): attribué à la limite CPU seulement si le script l'a atteinte.
+
+    Args:
+        used_cpu: Temps CPU mesuré pendant l'exécution (None si inconnu)
+    """
+    if returncode is None or returncode == 0:
+        return None
+    if limits.cpu_limit and hasattr(signal, 'SIGXCPU'):
+        if returncode == -signal.SIGXCPU:
+            return 'cpu'
+        if returncode == -signal.SIGKILL and used_cpu is not None and used_cpu >= limits.cpu_limit:
+            return 'cpu'
+    if limits.memory_limit and 'MemoryError' in (stderr or '')[-2000:]:
+        return 'memory'
+    return None
+
+
+# ==========================================
+# ARRÊT DU GROUPE DE PROCESSUS
+# ==========================================
+
+def terminate_group(proc: subprocess.Popen, grace: float = TERMINATE_GRACE):
+    """Arrête le script et ses sous-processus: SIGTERM, puis SIGKILL après le délai de grâce"""
+    if sys.platform == 'win32':
+        proc.kill()
+        return
+    for sig in (signal.SIGTERM, signal.SIGKILL):
+        try:
+            os.killpg(proc.pid, sig)
+        except ProcessLookupError:
+            return
+        try:
+            proc.wait(timeout=grace)
+            return
+        except subprocess.TimeoutExpired:
+            continue
+
+
+# ==========================================
+# EXÉCUTION
+# ==========================================
+
+def run(cmd: List[str], limits: Limits, env: Optional[Dict] = None,
+        should_cancel: Optional[Callable[[], bool]] = None,
+        on_start: Optional[Callable[[int, List[str]], None]] = None,
+        poll_interval: float = POLL_INTERVAL) -> ProcessResult:
+    """
+    Lance le script et attend sa fin, son timeout ou son annulation
+
+    Args:
+        cmd: Commande à lancer
+        limits: Timeout et limites de ressources
+        env: Variables d'environnement du script
+        should_cancel: Appelée toutes les poll_interval secondes; True arrête le script
+        on_start: Appelée après le lancement avec (pid, limites appliquées)
+        poll_interval: Intervalle de vérification de l'annulation (secondes)
+
+    Returns:
+        ProcessResult (returncode None si le script a été arrêté avant sa fin)
+    """
+    posix = sys.platform != 'win32'
+    use_prlimit = posix and hasattr(resource, 'prlimit')
+    if limits.memory_limit:
+        env = dict(os.environ if env is None else env)
+        env.setdefault('MALLOC_ARENA_MAX', str(MALLOC_ARENA_MAX))
+    start = time.monotonic()
+    proc = subprocess.Popen(
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        encoding='utf-8',  # Force UTF-8 pour gérer les caractères spéciaux
+        errors='replace',  # Remplace les caractères non décodables
+        env=env,
+        start_new_session=posix,  # groupe de processus propre au script
+        preexec_fn=_preexec(limits) if posix and not use_prlimit and _rlimits(limits) else None
+    )
+    if use_prlimit:
+        enforced = apply_limits(proc.pid, limits)
+    else:
+        enforced = [name for name, _, _ in _rlimits(limits)]
+    enforced.append('timeout')
+    if on_start:
+        on_start(proc.pid, enforced)
+
+    outcome = 'exited'
+    deadline = start + limits.timeout
+    used_cpu = None
+    while True:
+        try:
+            # communicate() peut être rappelée après un timeout sans perdre la sortie
+            stdout, stderr = proc.communicate(timeout=max(0.0, min(poll_interval, deadline - time.monotonic())))
+            break
+        except subprocess.TimeoutExpired:
+            pass
+        if limits.cpu_limit:
+            measured = cpu_time(proc.pid)
+            used_cpu = measured if measured is not None else used_cpu
+        if time.monotonic() >= deadline:
+            outcome = 'timeout'
+        elif should_cancel is not None and should_cancel():
+            outcome = 'cancelled'
+        else:
+            continue
+        if proc.poll() is not None:
+            # Terminé de lui-même entre-temps: sa sortie et son code de retour font foi
+            outcome = 'exited'
+            continue
+        terminate_group(proc)
+        stdout, stderr = proc.communicate()
+        break
+
+    returncode = proc.returncode if outcome == 'exited' else None
+    limit_exceeded = 'timeout' if outcome == 'timeout' else detect_limit(returncode, stderr, limits, used_cpu)
+    return ProcessResult(returncode=returncode, stdout=stdout or '', stderr=stderr or '',
+                         duration=time.monotonic() - start, pid=proc.pid, outcome=outcome,
+                         limit_exceeded=limit_exceeded, enforced=enforced, cpu_time=used_cpu)
@@ -0,0 +1,335 @@
+# -*- coding: utf-8 -*-
+"""
+File d'attente des exécutions de scripts (/run_script)
+Limite le nombre de scripts lancés en parallèle, par script et au total
+
+Chaque exécution est créée en statut "queued" (ScriptRun) et /run_script répond
+aussitôt (202). Le répartiteur (dispatch, appelé par la boucle du planificateur)
+admet les exécutions en attente et les lance; aucune requête n'attend de place.
+L'état est dans la base: les limites valent pour tous les workers de l'application,
+et plusieurs répartiteurs peuvent tourner sans lancer deux fois la même exécution.
+
+Ordre de passage parmi les exécutions en attente:
+1. priorité ('priority' de SCRIPTS, ou fixée par un admin pour une exécution)
+2. utilisateur ayant le moins d'exécutions en cours (partage équitable)
+3. ancienneté de la demande
+
+Une exécution bloquée par la limite de son script ne bloque pas les autres scripts.
+Une exécution annulée en attente (cancel) quitte la file sans être lancée.
+
+Le worker qui exécute un script enregistre un signe de vie (heartbeat) toutes les
+HEARTBEAT_INTERVAL secondes. Une exécution "running" sans signe de vie depuis
+HEARTBEAT_TTL secondes, ou dont le processus a disparu, n'occupe plus de place
+(admission, planifications) et est close par le répartiteur (reap_orphans).
+Ces délais sont calculés sur l'heure UTC (models.get_utc_time), jamais sur l'heure
+locale qui saute d'une heure aux changements d'heure.
+"""
+
+import os
+import sys
+import time
+import threading
+from collections import Counter
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import aliased
+
+from models import db, ScriptRun, get_utc_time
+
+# Limite globale de scripts lancés en même temps (tous workers confondus)
+DEFAULT_MAX_CONCURRENT = int(os.environ.get('MAX_CONCURRENT_SCRIPTS', 4))
+
+# Attente maximale en file avant abandon par le répartiteur (secondes)
+QUEUE_TIMEOUT = int(os.environ.get('SCRIPT_QUEUE_TIMEOUT', 600))
+
+# Signe de vie du worker qui exécute un script (secondes)
+HEARTBEAT_INTERVAL = int(os.environ.get('RUN_HEARTBEAT_INTERVAL', 10))
+
+# Sans signe de vie depuis ce délai, une exécution "running" est abandonnée (worker arrêté)
+HEARTBEAT_TTL = int(os.environ.get('RUN_HEARTBEAT_TTL', 60))
+
+
+# ==========================================
+# ORDRE DE PASSAGE
+# ==========================================
+
+def admission_order(queued: Iterable, running: Iterable, limits: Dict[str, Optional[int]],
+                    global_limit: int = DEFAULT_MAX_CONCURRENT) -> List[int]:
+    """
+    Exécutions en attente qui peuvent être lancées maintenant, dans l'ordre
+
+    Args:
+        queued: Exécutions en attente (script_id, user_id, priority, created_at, id)
+        running: Exécutions en cours
+        limits: Limite par script_id (None: seulement la limite globale)
+        global_limit: Limite globale
+
+    Returns:
+        IDs des exécutions à lancer
+    """
+    per_script = Counter(r.script_id for r in running)
+    per_user = Counter(r.user_id for r in running)
+    total = sum(per_script.values())
+    pending = list(queued)
+    admitted = []
+
+    while pending and total < global_limit:
+        candidates = [r for r in pending
+                      if limits.get(r.script_id) is None or per_script[r.script_id] < limits[r.script_id]]
+        if not candidates:
+            break
+        # Recalculé à chaque place attribuée: les utilisateurs passent à tour de rôle
+        run = min(candidates, key=lambda r: (-(r.priority or 0), per_user[r.user_id], r.created_at, r.id))
+        admitted.append(run.id)
+        pending.remove(run)
+        per_script[run.script_id] += 1
+        per_user[run.user_id] += 1
+        total += 1
+
+    return admitted
+
+
+# ==========================================
+# LANCEMENT
+# ==========================================
+
+def _running_filter(model, now):
+    # Dernier signe de vie (ou lancement, avant le premier) récent, en UTC
+    last_seen = func.coalesce(model.heartbeat_at, model.started_at)
+    return (model.status == 'running') & (last_seen >= now - timedelta(seconds=HEARTBEAT_TTL))
+
+
+def _queued_filter(model, now):
+    # Demandes plus anciennes: abandonnées par le répartiteur (ou aucun répartiteur actif)
+    return (model.status == 'queued') & (model.created_at >= now - timedelta(seconds=QUEUE_TIMEOUT))
+
+
+def active_filter(model, now):
+    """Condition SQL: exécution en attente ou en cours (hors exécutions abandonnées)"""
+    return _queued_filter(model, now) | _running_filter(model, now)
+
+
+def try_start(run_id: int, script_id: str, limit: Optional[int],
+              global_limit: int = DEFAULT_MAX_CONCURRENT) -> bool:
+    """
+    Passe l'exécution en "running" si les limites le permettent encore
+
+    Le comptage et la mise à jour sont un seul UPDATE conditionnel: deux workers
+    ne peuvent pas prendre la même dernière place.
+
+    Returns:
+        True si l'exécution peut être lancée
+    """
+    now = get_utc_time()
+    other = aliased(ScriptRun)
+    running_total = select(func.count()).select_from(other).where(_running_filter(other, now)).scalar_subquery()
+    conditions = [ScriptRun.id == run_id, ScriptRun.status == 'queued', running_total < global_limit]
+    if limit is not None:
+        same_script = aliased(ScriptRun)
+        running_script = (select(func.count()).select_from(same_script)
+                          .where(_running_filter(same_script, now), same_script.script_id == script_id)
+                          .scalar_subquery())
+        conditions.append(running_script < limit)
+
+    result = db.session.execute(update(ScriptRun).where(*conditions)
+                                .values(status='running', started_at=now)
+                                .execution_options(synchronize_session=False))
+    db.session.commit()
+    return result.rowcount == 1
+
+
+def expire_queued(timeout: float = QUEUE_TIMEOUT) -> List[int]:
+    """
+    Abandonne les exécutions en attente depuis plus de timeout secondes (statut "error")
+
+    Returns:
+        IDs abandonnés par cet appel (un autre répartiteur ne les reçoit pas)
+    """
+    now = get_utc_time()
+    stale = db.session.execute(select(ScriptRun.id).where(
+        ScriptRun.status == 'queued', ScriptRun.created_at < now - timedelta(seconds=timeout))).scalars().all()
+    expired = []
+    for run_id in stale:
+        result = db.session.execute(update(ScriptRun)
+                                    .where(ScriptRun.id == run_id, ScriptRun.status == 'queued')
+                                    .values(status='error', finished_at=now,
+                                            error_message=f"File d'attente: aucune place libérée en {timeout:.0f} s")
+                                    .execution_options(synchronize_session=False))
+        if result.rowcount == 1:
+            expired.append(run_id)
+    db.session.commit()
+    return expired
+
+
+def reap_orphans() -> List[int]:
+    """
+    Close les exécutions "running" dont le worker s'est arrêté (statut "error")
+
+    Orpheline: aucun signe de vie depuis HEARTBEAT_TTL secondes, ou processus
+    disparu et aucun signe de vie depuis deux intervalles (le worker qui vient de
+    voir le script se terminer enregistre sa fin dans l'intervalle). Un signe de
+    vie daté de plus de HEARTBEAT_TTL dans le futur (horloge système reculée,
+    date enregistrée avant le passage à l'UTC) ne prouve rien: processus vérifié.
+
+    Returns:
+        IDs clos par cet appel (un autre répartiteur ne les reçoit pas)
+    """
+    now = get_utc_time()
+    last_seen = func.coalesce(ScriptRun.heartbeat_at, ScriptRun.started_at)
+    expired = last_seen < now - timedelta(seconds=HEARTBEAT_TTL)
+    candidates = db.session.execute(select(ScriptRun.id, ScriptRun.pid, last_seen, expired).where(
+        ScriptRun.status == 'running',
+        (last_seen < now - timedelta(seconds=2 * HEARTBEAT_INTERVAL))
+        | (last_seen > now + timedelta(seconds=HEARTBEAT_TTL)))).all()
+    reaped = []
+    for run_id, pid, seen, silent in candidates:
+        if not silent and (pid is None or _process_alive(pid)):
+            continue
+        result = db.session.execute(update(ScriptRun)
+                                    .where(ScriptRun.id == run_id, ScriptRun.status == 'running',
+                                           func.coalesce(ScriptRun.heartbeat_at, ScriptRun.started_at) == seen)
+                                    .values(status='error', finished_at=now,
+                                            error_message='Exécution interrompue: worker arrêté')
+                                    .execution_options(synchronize_session=False))
+        if result.rowcount == 1:
+            reaped.append(run_id)
+    db.session.commit()
+    return reaped
+
+
+def dispatch(limits: Dict[str, Optional[int]], global_limit: int = DEFAULT_MAX_CONCURRENT,
+             timeout: float = QUEUE_TIMEOUT) -> Tuple[List[int], List[int], List[int]]:
+    """
+    Une passe du répartiteur: passe en "running" les exécutions admises
+
+    Chaque exécution admise est réservée par try_start: si plusieurs répartiteurs
+    (workers, tâche dédiée) tournent, un seul la reçoit et la lance.
+
+    Args:
+        limits: Limite par script_id
+        global_limit: Limite globale
+        timeout: Attente maximale en file (secondes)
+
+    Returns:
+        (IDs à lancer par l'appelant, IDs abandonnés faute de place à temps,
+         IDs orphelins clos)
+    """
+    # Nouvelle transaction: état écrit par les autres workers
+    db.session.rollback()
+    orphaned = reap_orphans()
+    expired = expire_queued(timeout)
+    now = get_utc_time()
+    queued = ScriptRun.query.filter(_queued_filter(ScriptRun, now)).all()
+    running = ScriptRun.query.filter(_running_filter(ScriptRun, now)).all()
+    scripts = {r.id: r.script_id for r in queued}
+
+    started = [run_id for run_id in admission_order(queued, running, limits, global_limit)
+               if try_start(run_id, scripts[run_id], limits.get(scripts[run_id]), global_limit)]
+    return started, expired, orphaned
+
+
+# ==========================================
+# ANNULATION
+# ==========================================
+
+def _process_alive(pid: Optional[int]) -> bool:
+    """Le processus existe encore (même machine); True si inconnu"""
+    if not pid or sys.platform == 'win32':
+        # Sous Windows, os.kill(pid, 0) enverrait CTRL_C_EVENT
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        return True
+    return True
+
+
+def cancel(run: ScriptRun, cancelled_by: Optional[str]) -> str:
+    """
+    Demande l'annulation d'une exécution
+
+    - en attente: retirée de la file immédiatement
+    - en cours: le worker qui l'exécute arrête le groupe de processus à sa prochaine
+      vérification (process_control.run); si le processus n'existe plus (worker
+      arrêté), l'exécution est close et sa place libérée
+
+    Returns:
+        'cancelled' (terminée), 'cancelling' (arrêt demandé au worker) ou le statut
+        final si l'exécution était déjà terminée
+    """
+    now = get_utc_time()
+    values = {'cancel_requested': True, 'cancelled_by': cancelled_by}
+    result = db.session.execute(update(ScriptRun)
+                                .where(ScriptRun.id == run.id, ScriptRun.status == 'queued')
+                                .values(status='cancelled', finished_at=now, **values)
+                                .execution_options(synchronize_session=False))
+    if result.rowcount == 0:
+        db.session.execute(update(ScriptRun)
+                                    .where(ScriptRun.id == run.id, ScriptRun.status == 'running')
+                                    .values(**values)
+                                    .execution_options(synchronize_session=False))
+    db.session.commit()
+    db.session.refresh(run)
+
+    if run.status == 'running' and run.pid and not _process_alive(run.pid):
+        db.session.execute(update(ScriptRun)
+                           .where(ScriptRun.id == run.id, ScriptRun.status == 'running')
+                           .values(status='cancelled', finished_at=now,
+                                   error_message='Processus introuvable: exécution close')
+                           .execution_options(synchronize_session=False))
+        db.session.commit()
+        db.session.refresh(run)
+
+    if run.status == 'running':
+        return 'cancelling'
+    return run.status
+
+
+_last_heartbeat: Dict[int, float] = {}
+_heartbeat_lock = threading.Lock()
+
+
+def heartbeat(run_id: int, force: bool = False):
+    """
+    Enregistre un signe de vie de l'exécution (au plus toutes les HEARTBEAT_INTERVAL secondes)
+
+    Args:
+        run_id: Exécution en cours dans ce worker
+        force: Écrire même si le dernier signe de vie est récent (lancement)
+    """
+    with _heartbeat_lock:
+        now = time.monotonic()
+        if not force and now - _last_heartbeat.get(run_id, 0) < HEARTBEAT_INTERVAL:
+            return
+        _last_heartbeat[run_id] = now
+    try:
+        db.session.execute(update(ScriptRun).where(ScriptRun.id == run_id, ScriptRun.status == 'running')
+                           .values(heartbeat_at=get_utc_time())
+                           .execution_options(synchronize_session=False))
+        db.session.commit()
+    except Exception as e:
+        print(f"⚠️  Erreur lors de l'enregistrement du signe de vie: {str(e)}")
+        db.session.rollback()
+
+
+def forget_heartbeat(run_id: int):
+    """Exécution terminée: oublie son dernier signe de vie"""
+    with _heartbeat_lock:
+        _last_heartbeat.pop(run_id, None)
+
+
+def cancel_requested(run_id: int) -> bool:
+    """Annulation demandée pour cette exécution (lue dans une nouvelle transaction)"""
+    try:
+        requested = db.session.execute(select(ScriptRun.cancel_requested)
+                                       .where(ScriptRun.id == run_id)).scalar()
+        db.session.commit()
+        return bool(requested)
+    except Exception as e:
+        print(f"⚠️  Erreur lors de la vérification de l'annulation: {str(e)}")
+        db.session.rollback()
+        return False
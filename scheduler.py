@@ -0,0 +1,339 @@
+# -*- coding: utf-8 -*-
+"""
+Planification des scripts (exécutions récurrentes)
+Expressions cron stockées en base (Schedule), exécutions placées dans la file d'attente
+
+Chaque planification lance une entrée de SCRIPTS avec des arguments fixes. Quand
+une échéance est atteinte, l'exécution est créée en statut "queued" (run_queue.py)
+et lancée comme une requête /run_script: mêmes limites de concurrence, de temps
+et de ressources, même historique (ScriptRun.schedule_id).
+
+La boucle du planificateur est aussi le répartiteur de la file d'attente: toutes
+les DISPATCH_INTERVAL secondes (ou dès qu'une requête la réveille), elle lance les
+exécutions en attente admises par run_queue.dispatch.
+
+- Une planification ne se chevauche jamais: si son exécution précédente est encore
+  en attente ou en cours, l'échéance est enregistrée comme "skipped"
+- Échéances manquées (application arrêtée): une seule exécution au redémarrage
+- Plusieurs workers peuvent faire tourner le planificateur: chaque échéance est
+  réservée par un UPDATE conditionnel, un seul worker la lance
+
+Format cron (heure locale): minute heure jour mois jour_semaine
+  ex: "30 2 * * *" (chaque nuit à 2h30), "0 */4 * * 1-5", "@daily"
+
+Heure locale: Europe/Zurich, pour la correspondance avec l'expression cron
+seulement. Les échéances (next_run_at) sont enregistrées et comparées en UTC,
+comme toutes les dates de la base. Changements d'heure: une échéance dans l'heure
+sautée au printemps (2h30) est lancée une heure plus tard (3h30 heure d'été),
+une échéance à heure fixe dans l'heure répétée en automne est lancée une seule
+fois; les expressions à intervalle ("*/15") continuent toutes les 15 minutes.
+"""
+
+import os
+import time
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy import select, update
+
+from models import db, Schedule, ScriptRun, LOCAL_TZ, get_utc_time, to_local_time
+import run_queue
+
+# Intervalle entre deux vérifications des échéances (secondes)
+TICK_INTERVAL = int(os.environ.get('SCHEDULER_TICK', 30))
+
+# Intervalle entre deux passes du répartiteur (secondes)
+DISPATCH_INTERVAL = float(os.environ.get('SCHEDULER_DISPATCH_INTERVAL', 0.5))
+
+# Horizon de recherche de la prochaine échéance (expressions impossibles: "0 0 30 2 *")
+MAX_LOOKAHEAD_DAYS = 366 * 5
+
+ALIASES = {
+    '@yearly': '0 0 1 1 *',
+    '@annually': '0 0 1 1 *',
+    '@monthly': '0 0 1 * *',
+    '@weekly': '0 0 * * 0',
+    '@daily': '0 0 * * *',
+    '@midnight': '0 0 * * *',
+    '@hourly': '0 * * * *',
+}
+
+MONTHS = ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec']
+DAYS = ['sun', 'mon', 'tue', 'wed', 'thu', 'fri', 'sat']
+
+
+class CronError(ValueError):
+    """Exception levée pour une expression cron invalide"""
+    pass
+
+
+# ==========================================
+# EXPRESSIONS CRON
+# ==========================================
+
+class CronExpression:
+    """Expression cron à 5 champs (listes, plages, pas, noms de mois et de jours)"""
+
+    # (nom, minimum, maximum, noms)
+    FIELDS = [
+        ('minute', 0, 59, None),
+        ('heure', 0, 23, None),
+        ('jour', 1, 31, None),
+        ('mois', 1, 12, MONTHS),
+        ('jour de la semaine', 0, 7, DAYS),
+    ]
+
+    def __init__(self, expression: str):
+        self.expression = (expression or '').strip()
+        text = ALIASES.get(self.expression.lower(), self.expression)
+        parts = text.split()
+        if len(parts) != 5:
+            raise CronError(f"Expression cron invalide '{self.expression}': 5 champs attendus "
+                            "(minute heure jour mois jour_semaine)")
+
+        values = [self._parse_field(part, *spec) for part, spec in zip(parts, self.FIELDS)]
+        self.minutes, self.hours, self.days, self.months, weekdays = values
+        # 0 et 7: dimanche
+        self.weekdays = {d % 7 for d in weekdays}
+        # Comme cron: si jour et jour de la semaine sont restreints, l'un OU l'autre suffit
+        self.day_restricted = not parts[2].startswith('*')
+        self.weekday_restricted = not parts[4].startswith('*')
+
+    def _parse_field(self, text, name, low, high, names):
+        values = set()
+        for item in text.lower().split(','):
+            step = 1
+            if '/' in item:
+                item, step_text = item.split('/', 1)
+                if not step_text.isdigit() or int(step_text) == 0:
+                    raise CronError(f"Pas invalide pour le champ {name}: '{step_text}'")
+                step = int(step_text)
+            if item == '*':
+                start, end = low, high
+            elif '-' in item:
+                start_text, end_text = item.split('-', 1)
+                start, end = self._value(start_text, name, names), self._value(end_text, name, names)
+            else:
+                start = self._value(item, name, names)
+                end = high if step > 1 else start
+            if not (low <= start <= high and low <= end <= high) or start > end:
+                raise CronError(f"Valeur hors limites pour le champ {name} ({low}-{high}): '{item}'")
+            values.update(range(start, end + 1, step))
+        return values
+
+    @staticmethod
+    def _value(text, name, names):
+        if names and text[:3] in names:
+            return names.index(text[:3]) + (1 if names is MONTHS else 0)
+        if not text.isdigit():
+            raise CronError(f"Valeur invalide pour le champ {name}: '{text}'")
+        return int(text)
+
+    def _day_matches(self, day: datetime) -> bool:
+        if day.month not in self.months:
+            return False
+        in_days = day.day in self.days
+        in_weekdays = (day.isoweekday() % 7) in self.weekdays
+        if self.day_restricted and self.weekday_restricted:
+            return in_days or in_weekdays
+        return in_days and in_weekdays
+
+    def next_after(self, moment: datetime) -> Optional[datetime]:
+        """
+        Première échéance strictement après moment (à la minute)
+
+        Returns:
+            Échéance, ou None si l'expression ne correspond à aucune date
+        """
+        start = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        day = start.replace(hour=0, minute=0)
+        for _ in range(MAX_LOOKAHEAD_DAYS):
+            if self._day_matches(day):
+                for hour in sorted(self.hours):
+                    for minute in sorted(self.minutes):
+                        candidate = day.replace(hour=hour, minute=minute)
+                        if candidate >= start:
+                            return candidate
+            day += timedelta(days=1)
+        return None
+
+
+def next_run(cron: str, after: Optional[datetime] = None) -> datetime:
+    """
+    Prochaine échéance d'une expression cron (heure locale, sans fuseau)
+
+    Raises:
+        CronError: Si l'expression est invalide ou ne correspond à aucune date
+    """
+    after = after or local_now()
+    result = CronExpression(cron).next_after(after)
+    if result is None:
+        raise CronError(f"L'expression '{cron}' ne correspond à aucune date")
+    return result
+
+
+def local_now() -> datetime:
+    """Heure locale (Europe/Zurich) sans fuseau, celle des expressions cron"""
+    return datetime.now(LOCAL_TZ).replace(tzinfo=None)
+
+
+def _to_utc(local: datetime, fold: int) -> datetime:
+    """Heure locale sans fuseau -> UTC sans fuseau (fold: 1re ou 2e occurrence d'une heure répétée)"""
+    return local.replace(tzinfo=LOCAL_TZ, fold=fold).astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def next_run_utc(cron: str, after: Optional[datetime] = None) -> datetime:
+    """
+    Prochaine échéance d'une expression cron (heure locale) strictement après after, en UTC
+
+    Heure répétée en automne: comme cron, seules les expressions qui tournent à
+    chaque heure ont aussi des échéances dans sa seconde occurrence (les heures
+    locales candidates partent donc d'une heure avant after); une expression à
+    heure fixe n'est lancée qu'une fois.
+
+    Args:
+        after: Instant UTC sans fuseau (défaut: maintenant)
+
+    Raises:
+        CronError: Si l'expression est invalide ou ne correspond à aucune date
+    """
+    after = after or get_utc_time()
+    expression = CronExpression(cron)
+    folds = (0, 1) if len(expression.hours) == 24 else (0,)
+    local = to_local_time(after) - timedelta(hours=1)
+    best = None
+    while True:
+        candidate = expression.next_after(local)
+        if candidate is None:
+            raise CronError(f"L'expression '{cron}' ne correspond à aucune date")
+        instants = [_to_utc(candidate, fold) for fold in folds]
+        if best is not None and min(instants) > best:
+            return best
+        for instant in instants:
+            if instant > after and (best is None or instant < best):
+                best = instant
+        local = candidate
+
+
+# ==========================================
+# ÉCHÉANCES
+# ==========================================
+
+def claim_due(now: Optional[datetime] = None) -> List[Tuple[int, int]]:
+    """
+    Crée les exécutions des planifications arrivées à échéance
+
+    Pour chaque planification due, la réservation de l'échéance (avancer
+    next_run_at), le contrôle de chevauchement et la création de l'exécution
+    sont une seule transaction.
+
+    Args:
+        now: Instant UTC sans fuseau (défaut: maintenant)
+
+    Returns:
+        [(run_id, schedule_id)] des exécutions créées en statut "queued" (lancées par le répartiteur)
+    """
+    now = now or get_utc_time()
+    # Valeurs lues une fois: un rollback expire les objets de la session
+    due = db.session.execute(select(Schedule.id, Schedule.next_run_at, Schedule.cron,
+                                    Schedule.script_id, Schedule.priority, Schedule.args)
+                             .where(Schedule.enabled.is_(True), Schedule.next_run_at <= now)).all()
+    db.session.commit()
+    created = []
+    for schedule_id, scheduled_for, cron, script_id, priority, args in due:
+        try:
+            following = next_run_utc(cron, now)
+        except CronError as e:
+            print(f"⚠️  Planification {schedule_id} désactivée: {str(e)}")
+            db.session.execute(update(Schedule).where(Schedule.id == schedule_id).values(enabled=False)
+                               .execution_options(synchronize_session=False))
+            db.session.commit()
+            continue
+
+        claimed = db.session.execute(update(Schedule)
+                                     .where(Schedule.id == schedule_id, Schedule.enabled.is_(True),
+                                            Schedule.next_run_at == scheduled_for,
+                                            Schedule.next_run_at <= now)
+                                     .values(next_run_at=following, last_run_at=now)
+                                     .execution_options(synchronize_session=False))
+        if claimed.rowcount != 1:
+            # Réservée par un autre worker (ou modifiée entre-temps)
+            db.session.rollback()
+            continue
+
+        previous = db.session.execute(select(ScriptRun.id).where(
+            ScriptRun.schedule_id == schedule_id, run_queue.active_filter(ScriptRun, get_utc_time())
+        ).order_by(ScriptRun.id.desc()).limit(1)).scalar()
+        if previous is not None:
+            run = ScriptRun(script_id=script_id, status='skipped', schedule_id=schedule_id,
+                            priority=priority, finished_at=now,
+                            error_message=f'Exécution #{previous} de la planification toujours en cours')
+        else:
+            run = ScriptRun(script_id=script_id, status='queued', schedule_id=schedule_id, priority=priority,
+                            args=args or {})
+        db.session.add(run)
+        db.session.flush()
+        db.session.execute(update(Schedule).where(Schedule.id == schedule_id)
+                           .values(last_run_id=run.id)
+                           .execution_options(synchronize_session=False))
+        db.session.commit()
+        if run.status == 'queued':
+            created.append((run.id, schedule_id))
+    return created
+
+
+# ==========================================
+# BOUCLE DU PLANIFICATEUR
+# ==========================================
+
+_wake = threading.Event()
+_thread = None
+_thread_lock = threading.Lock()
+
+
+def wake():
+    """Réveille la boucle de ce processus (nouvelle exécution en attente)"""
+    _wake.set()
+
+
+def run_forever(app, dispatch: Callable[[], None], tick: Optional[float] = TICK_INTERVAL,
+                stop: Optional[threading.Event] = None, interval: float = DISPATCH_INTERVAL):
+    """
+    Crée les exécutions des échéances toutes les tick secondes et répartit la file
+
+    Args:
+        app: Application Flask (contexte pour la base)
+        dispatch: Passe du répartiteur (lance les exécutions admises), appelée à chaque tour
+        tick: Intervalle de vérification des échéances (secondes), None: file seulement
+        stop: Événement d'arrêt (défaut: jamais)
+        interval: Intervalle entre deux passes du répartiteur (secondes)
+    """
+    stop = stop or threading.Event()
+    next_check = time.monotonic()
+    while not stop.is_set():
+        try:
+            with app.app_context():
+                if tick is not None and time.monotonic() >= next_check:
+                    claim_due()
+                    next_check = time.monotonic() + tick
+                dispatch()
+        except Exception as e:
+            print(f"⚠️  Erreur du planificateur: {str(e)}")
+        _wake.wait(interval)
+        _wake.clear()
+
+
+def start(app, dispatch: Callable[[], None], tick: Optional[float] = TICK_INTERVAL) -> threading.Thread:
+    """
+    Démarre la boucle dans un thread d'arrière-plan (une seule par processus)
+
+    Returns:
+        Thread de la boucle (celui déjà démarré le cas échéant)
+    """
+    global _thread
+    with _thread_lock:
+        if _thread is None or not _thread.is_alive():
+            _thread = threading.Thread(target=run_forever, args=(app, dispatch, tick), name='scheduler', daemon=True)
+            _thread.start()
+        return _thread
@@ -14,13 +14,14 @@ Fonctionnalités :
 
 Usage:
     python 202512_Creer_devis.py '{"type_contact": "Privé", ...}'
+    python 202512_Creer_devis.py --sync-contacts [complet]   (miroir des contacts, planifié)
 """
 
 import sys
 import json
 import logging
 from datetime import datetime
-from typing import Dict
+from typing import TYPE_CHECKING, Dict
 
 # ==========================================
 # CONFIGURATION DE L'ENCODAGE UTF-8
@@ -41,12 +42,11 @@ logger = logging.getLogger(__name__)
 # ==========================================
 # IMPORTS DES MODULES PERSONNALISÉS
 # ==========================================
+# Modules légers seulement: la pile HTTP (requests, clients Bexio / geo.admin /
+# Google) est importée par create_quote, après validation du formulaire.
 try:
-    from config_manager import ConfigManager
-    from bexio_client import BexioClient
-    from geo_admin_client import GeoAdminClient
-    from contact_manager import ContactManager
-    from quote_calculator import QuoteCalculator
+    from config_manager import ConfigManager, disable_proxy
+    import tracing
     from quote_position import QuotePositionBuilder
     from validators import validate_form_data, sanitize_form_data, ValidationError
     import legal_texts
@@ -55,6 +55,10 @@ except ImportError as e:
     logger.error("📋 Vérifiez que tous les fichiers Python sont présents dans le dossier scripts/")
     sys.exit(1)
 
+if TYPE_CHECKING:
+    from bexio_client import BexioClient
+    from http_client import StepReport
+
 
 # ==========================================
 # FONCTION PRINCIPALE DE CRÉATION DE DEVIS
@@ -79,6 +83,25 @@ def create_quote(form_data: Dict, config_mgr: ConfigManager) -> Dict:
     logger.info(f"📋 Type de certificat: {type_certificat}")
     logger.info(f"👤 Contact: {form_data['prenom']} {form_data['nom_famille']}")
 
+    import http_client
+
+    # Appels HTTP et durée de chaque étape, affichés en fin de création
+    etapes = http_client.StepReport()
+    try:
+        return _create_quote_steps(form_data, config_mgr, type_certificat, etapes)
+    finally:
+        etapes.print_report()
+
+
+def _create_quote_steps(form_data: Dict, config_mgr: ConfigManager, type_certificat: str,
+                        etapes: "StepReport") -> Dict:
+    """Étapes de create_quote, chacune mesurée par etapes.step()"""
+    from bexio_client import BexioClient
+    from bexio_contact_mirror import BexioContactMirror
+    from geo_admin_client import GeoAdminClient
+    from contact_manager import ContactManager
+    from quote_calculator import QuoteCalculator
+
     # 1. Initialiser les clients
     logger.info(f"\n{'=' * 60}")
     logger.info("🔧 INITIALISATION DES CLIENTS")
@@ -89,62 +112,66 @@ def create_quote(form_data: Dict, config_mgr: ConfigManager) -> Dict:
         "CONTACT_TYPES": config_mgr.get_contact_types(),
         "SALUTATIONS": config_mgr.get_salutations(),
         "BEXIO_IDS": config_mgr.get_bexio_ids()
-    })
+    }, contact_mirror=BexioContactMirror(bexio))
 
     # 2. Gérer le contact
-    logger.info(f"\n{'=' * 60}")
-    logger.info("👥 GESTION DU CONTACT")
-    logger.info("=" * 60)
+    with etapes.step("contact"):
+        logger.info(f"\n{'=' * 60}")
+        logger.info("👥 GESTION DU CONTACT")
+        logger.info("=" * 60)
 
-    contact_ids = contact_mgr.get_or_create_contact(form_data)
+        contact_ids = contact_mgr.get_or_create_contact(form_data)
 
     # 3. Récupérer les données du bâtiment
-    logger.info(f"\n{'=' * 60}")
-    logger.info("🏗️  RÉCUPÉRATION DONNÉES BÂTIMENT")
-    logger.info("=" * 60)
+    with etapes.step("batiment"):
+        logger.info(f"\n{'=' * 60}")
+        logger.info("🏗️  RÉCUPÉRATION DONNÉES BÂTIMENT")
+        logger.info("=" * 60)
 
-    adresse_batiment = form_data.get("rue_batiment", form_data["rue_facturation"])
-    npa_batiment = form_data.get("npa_batiment", form_data["npa_facturation"])
-    localite_batiment = form_data.get("localite_batiment", form_data["localite_facturation"])
+        adresse_batiment = form_data.get("rue_batiment", form_data["rue_facturation"])
+        npa_batiment = form_data.get("npa_batiment", form_data["npa_facturation"])
+        localite_batiment = form_data.get("localite_batiment", form_data["localite_facturation"])
 
-    # Utiliser le cache pour optimiser les performances
-    building_data = GeoAdminClient.get_building_data_cached(
-        adresse_batiment,
-        npa_batiment,
-        localite_batiment
-    )
+        # Utiliser le cache pour optimiser les performances
+        building_data = GeoAdminClient.get_building_data_cached(
+            adresse_batiment,
+            npa_batiment,
+            localite_batiment
+        )
 
-    if not building_data:
-        building_data = GeoAdminClient.get_default_building_data()
+        if not building_data:
+            building_data = GeoAdminClient.get_default_building_data()
 
     # 4. Calculer les prix (sauf pour Conseil Incitatif)
-    pricing = None
-    if type_certificat != "Conseil Incitatif":
-        logger.info(f"\n{'=' * 60}")
-        logger.info("💰 CALCUL DES PRIX")
-        logger.info("=" * 60)
+    with etapes.step("prix"):
+        pricing = None
+        if type_certificat != "Conseil Incitatif":
+            logger.info(f"\n{'=' * 60}")
+            logger.info("💰 CALCUL DES PRIX")
+            logger.info("=" * 60)
 
-        calculator = QuoteCalculator(
-            config_mgr.get_all_tarifs(),
-            config_mgr.get_google_maps_api_key(),
-            config_mgr.get_eta_consult_address()
-        )
+            calculator = QuoteCalculator(
+                config_mgr.get_all_tarifs(),
+                config_mgr.get_google_maps_api_key(),
+                config_mgr.get_eta_consult_address()
+            )
 
-        pricing = calculator.calculate_quote_pricing(building_data, form_data)
+            pricing = calculator.calculate_quote_pricing(building_data, form_data)
 
     # 5. Créer l'offre dans Bexio
-    logger.info(f"\n{'=' * 60}")
-    logger.info("📄 CRÉATION DE L'OFFRE BEXIO")
-    logger.info("=" * 60)
+    with etapes.step("offre"):
+        logger.info(f"\n{'=' * 60}")
+        logger.info("📄 CRÉATION DE L'OFFRE BEXIO")
+        logger.info("=" * 60)
 
-    quote = create_bexio_quote(
-        bexio,
-        form_data,
-        contact_ids,
-        building_data,
-        pricing,
-        config_mgr
-    )
+        quote = create_bexio_quote(
+            bexio,
+            form_data,
+            contact_ids,
+            building_data,
+            pricing,
+            config_mgr
+        )
 
     # 6. Afficher le résumé
     print_summary(quote, contact_ids, pricing, type_certificat)
@@ -153,7 +180,7 @@ def create_quote(form_data: Dict, config_mgr: ConfigManager) -> Dict:
 
 
 def create_bexio_quote(
-    bexio_client: BexioClient,
+    bexio_client: "BexioClient",
     form_data: Dict,
     contact_ids: Dict,
     building_data: Dict,
@@ -183,39 +210,40 @@ def create_bexio_quote(
     title = f"{type_certificat} - {adresse_batiment}, {npa_batiment}, {localite_batiment}"
 
     # Créer les positions selon le type de certificat
-    position_builder = QuotePositionBuilder(
-        config_mgr.get_bexio_ids(),
-        config_mgr.get_all_tarifs()
-    )
-
-    # Préparer les textes légaux avec le module legal_texts
-    legal_texts_dict = {
-        "prestations_incluses_cecb": legal_texts.PRESTATIONS_INCLUSES_CECB,
-        "prestations_non_incluses_cecb": legal_texts.PRESTATIONS_NON_INCLUSES_CECB,
-        "prestations_incluses_cecb_plus": legal_texts.PRESTATIONS_INCLUSES_CECB_PLUS,
-        "prestations_non_incluses_cecb_plus": legal_texts.PRESTATIONS_NON_INCLUSES_CECB_PLUS,
-        "prestations_incluses_conseil": legal_texts.PRESTATIONS_INCLUSES_CONSEIL,
-        "responsabilite_cecb": legal_texts.RESPONSABILITE_CECB,
-        "subventions_cecb_plus": legal_texts.SUBVENTIONS_CECB_PLUS,
-        "format_custom_message": legal_texts.format_custom_message
-    }
-
-    # Construire les positions selon le type
-    if type_certificat == "CECB":
-        positions_objects = position_builder.build_cecb_positions(
-            building_data, form_data, pricing, legal_texts_dict
-        )
-    elif type_certificat == "CECB Plus":
-        positions_objects = position_builder.build_cecb_plus_positions(
-            building_data, form_data, pricing, legal_texts_dict
-        )
-    else:  # Conseil Incitatif
-        positions_objects = position_builder.build_conseil_incitatif_positions(
-            building_data, form_data, legal_texts_dict
+    with tracing.span("positions"):
+        position_builder = QuotePositionBuilder(
+            config_mgr.get_bexio_ids(),
+            config_mgr.get_all_tarifs()
         )
 
-    # Convertir en format Bexio
-    positions = [pos.to_bexio_format() for pos in positions_objects]
+        # Préparer les textes légaux avec le module legal_texts
+        legal_texts_dict = {
+            "prestations_incluses_cecb": legal_texts.PRESTATIONS_INCLUSES_CECB,
+            "prestations_non_incluses_cecb": legal_texts.PRESTATIONS_NON_INCLUSES_CECB,
+            "prestations_incluses_cecb_plus": legal_texts.PRESTATIONS_INCLUSES_CECB_PLUS,
+            "prestations_non_incluses_cecb_plus": legal_texts.PRESTATIONS_NON_INCLUSES_CECB_PLUS,
+            "prestations_incluses_conseil": legal_texts.PRESTATIONS_INCLUSES_CONSEIL,
+            "responsabilite_cecb": legal_texts.RESPONSABILITE_CECB,
+            "subventions_cecb_plus": legal_texts.SUBVENTIONS_CECB_PLUS,
+            "format_custom_message": legal_texts.format_custom_message
+        }
+
+        # Construire les positions selon le type
+        if type_certificat == "CECB":
+            positions_objects = position_builder.build_cecb_positions(
+                building_data, form_data, pricing, legal_texts_dict
+            )
+        elif type_certificat == "CECB Plus":
+            positions_objects = position_builder.build_cecb_plus_positions(
+                building_data, form_data, pricing, legal_texts_dict
+            )
+        else:  # Conseil Incitatif
+            positions_objects = position_builder.build_conseil_incitatif_positions(
+                building_data, form_data, legal_texts_dict
+            )
+
+        # Convertir en format Bexio
+        positions = [pos.to_bexio_format() for pos in positions_objects]
 
     # Récupérer le pourcentage d'acompte depuis les tarifs
     pct_acompte = config_mgr.get_tarif("pct_acompte", 30)
@@ -237,7 +265,8 @@ def create_bexio_quote(
         payload["contact_sub_id"] = contact_ids["contact_sub_id"]
 
     # Créer l'offre
-    quote = bexio_client.create_quote(payload)
+    with tracing.span("bexio_post"):
+        quote = bexio_client.create_quote(payload)
 
     logger.info(f"✅ Offre créée avec succès !")
     logger.info(f"   ID: {quote.get('id')}")
@@ -283,6 +312,36 @@ def print_summary(quote: Dict, contact_ids: Dict, pricing: Dict, type_certificat
     logger.info("=" * 60)
 
 
+# ==========================================
+# SYNCHRONISATION DU MIROIR DE CONTACTS
+# ==========================================
+
+def sync_contacts(config_mgr: ConfigManager, full: bool = False) -> int:
+    """
+    Synchronise le miroir local des contacts Bexio (planification "sync_contacts_bexio")
+
+    Hors du devis: create_quote ne fait que lire le miroir, et passe par ?search=
+    pour un contact absent ou un miroir périmé.
+
+    Args:
+        config_mgr: Gestionnaire de configuration
+        full: True pour un parcours complet (sinon incrémental, complet une fois par jour)
+
+    Returns:
+        Nombre de contacts reçus
+    """
+    from bexio_client import BexioClient
+    from bexio_contact_mirror import BexioContactMirror
+
+    bexio = BexioClient(config_mgr.get_bexio_api_token(), config_mgr.get_bexio_base_url())
+    mirror = BexioContactMirror(bexio)
+    try:
+        with tracing.span("sync_contacts"):
+            return mirror.sync(full=True) if full else mirror.refresh()
+    finally:
+        mirror.close()
+
+
 # ==========================================
 # MAIN
 # ==========================================
@@ -299,6 +358,17 @@ def main():
         logger.error("Usage: python 202512_Creer_devis.py '{...json...}'")
         sys.exit(1)
 
+    if sys.argv[1] == "--sync-contacts":
+        try:
+            config_mgr = ConfigManager()
+            disable_proxy()
+            count = sync_contacts(config_mgr, full=sys.argv[2:3] == ["complet"])
+            logger.info(f"✅ Miroir des contacts à jour ({count} contact(s) reçu(s))")
+            sys.exit(0)
+        except Exception as e:
+            logger.error(f"\n❌ ERREUR DE SYNCHRONISATION: {e}")
+            sys.exit(1)
+
     try:
         form_data = json.loads(sys.argv[1])
     except json.JSONDecodeError as e:
@@ -307,14 +377,17 @@ def main():
 
     try:
         # 2. Initialiser le gestionnaire de configuration
-        config_mgr = ConfigManager()
-        config_mgr.validate_config()
+        with tracing.span("config"):
+            config_mgr = ConfigManager()
+            config_mgr.validate_config()
 
         # 3. Nettoyer et valider les données du formulaire
-        form_data = sanitize_form_data(form_data)
-        validate_form_data(form_data)
+        with tracing.span("validation"):
+            form_data = sanitize_form_data(form_data)
+            validate_form_data(form_data)
 
         # 4. Créer le devis
+        disable_proxy()
         quote = create_quote(form_data, config_mgr)
 
         # Succès
@@ -332,4 +405,10 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    try:
+        with tracing.span("creer_devis"):
+            main()
+    finally:
+        # Rapport des appels HTTP, si la pile HTTP a été chargée (pas en cas d'erreur de validation)
+        if "http_client" in sys.modules:
+            sys.modules["http_client"].print_report()
@@ -11,8 +11,15 @@ import json
 import requests
 from datetime import datetime
 from pathlib import Path
-import base64
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
+import http_client
+from camt_parser import normalize_reference, parse_camt_credits, reference_pattern
+from notion_mirror import NotionMirror, get_page_title
+from pdf_stream import download_base64_pdf
+from project_folder_index import ProjectFolderIndex
+from workflow_stages import captured_stdout
 
 # Charger les variables d'environnement depuis .env (remonte au dossier parent)
 env_path = Path(__file__).resolve().parent.parent / '.env'
@@ -45,6 +52,12 @@ DOSSIERS_ACTIFS = get_default_path(
     "/home/etaconsult/dossiers_actifs"
 )
 
+# Statut Bexio d'une facture ouverte (kb_item_status_id "En attente")
+STATUT_FACTURE_OUVERTE = 8
+
+# Client HTTP partage: session poolee par hote, timeout, retries et metriques
+SESSION = http_client.get_client()
+
 # ============================================
 # FONCTIONS BEXIO
 # ============================================
@@ -56,21 +69,18 @@ def get_facture(numero_facture):
         "Authorization": f"Bearer {BEXIO_TOKEN}",
         "Accept": "application/json"
     }
-    response = requests.get(url, headers=headers)
+    response = SESSION.get(url, headers=headers)
     response.raise_for_status()
     return response.json()
 
-def get_facture_pdf(numero_facture):
-    """Récupère le PDF d'une facture en base64"""
+def get_facture_pdf(numero_facture, pdf_path):
+    """Télécharge le PDF d'une facture directement dans pdf_path (décodage base64 en flux)"""
     url = f"https://api.bexio.com/2.0/kb_invoice/{numero_facture}/pdf"
     headers = {
         "Authorization": f"Bearer {BEXIO_TOKEN}",
         "Accept": "application/json"
     }
-    response = requests.get(url, headers=headers)
-    response.raise_for_status()
-    data = response.json()
-    return data.get("content")
+    return download_base64_pdf(SESSION, url, headers, pdf_path)
 
 def marquer_facture_payee_bexio(numero_facture):
     """Marque la facture comme payée dans Bexio"""
@@ -80,7 +90,7 @@ def marquer_facture_payee_bexio(numero_facture):
         "Accept": "application/json"
     }
 
-    response = requests.post(url, headers=headers)
+    response = SESSION.post(url, headers=headers)
 
     if response.status_code in [200, 201]:
         print(f"[OK] Facture marquée comme payée dans Bexio")
@@ -89,6 +99,29 @@ def marquer_facture_payee_bexio(numero_facture):
         print(f"[!] Erreur Bexio: {response.status_code} - {response.text}")
         return False
 
+def get_factures_ouvertes():
+    """Récupère toutes les factures ouvertes dans Bexio (paginé)"""
+    url = "https://api.bexio.com/2.0/kb_invoice/search"
+    headers = {
+        "Authorization": f"Bearer {BEXIO_TOKEN}",
+        "Accept": "application/json",
+        "Content-Type": "application/json"
+    }
+    criteres = [{"field": "kb_item_status_id", "value": str(STATUT_FACTURE_OUVERTE), "criteria": "="}]
+
+    factures = []
+    limite = 500
+    offset = 0
+    while True:
+        response = SESSION.post(url, headers=headers, json=criteres,
+                                params={"limit": limite, "offset": offset, "order_by": "id"})
+        response.raise_for_status()
+        page = response.json()
+        factures.extend(page)
+        if len(page) < limite:
+            return factures
+        offset += limite
+
 # ============================================
 # FONCTIONS DE PARSING
 # ============================================
@@ -120,29 +153,32 @@ def parse_titre_facture(titre):
 # FONCTIONS DOSSIERS
 # ============================================
 
-def trouver_dossier_projet(rue, localite):
-    """Cherche le dossier projet correspondant dans les dossiers actifs"""
+_index_dossiers = None
+_index_lock = threading.Lock()
 
-    # Nettoyer les noms pour la recherche
-    rue_clean = rue.replace(".", "").replace(",", "").strip()
-    localite_clean = localite.strip()
+def get_index_dossiers():
+    """Retourne l'index des dossiers projet (chargé une seule fois)"""
+    global _index_dossiers
+    if _index_dossiers is None:
+        _index_dossiers = ProjectFolderIndex(DOSSIERS_ACTIFS)
+    return _index_dossiers
 
-    print(f"\n[RECHERCHE] Dossier pour: {rue}, {localite}")
+def trouver_dossier_projet(rue, localite):
+    """Cherche le dossier projet correspondant dans les dossiers actifs (via l'index persistant)"""
 
-    # Chercher dans tous les sous-dossiers de "Dossiers actifs"
-    for dossier in DOSSIERS_ACTIFS.iterdir():
-        if not dossier.is_dir():
-            continue
+    print(f"\n[RECHERCHE] Dossier pour: {rue}, {localite}")
 
-        nom_dossier = dossier.name
+    with _index_lock:
+        candidats = get_index_dossiers().find(rue, localite)
 
-        # Vérifier si le dossier contient la rue ET la localité
-        if localite_clean.lower() in nom_dossier.lower():
-            # Vérifier aussi la rue (partiellement)
-            rue_parts = rue_clean.split()
-            if any(part.lower() in nom_dossier.lower() for part in rue_parts if len(part) > 3):
-                print(f"   [OK] Trouvé: {nom_dossier}")
-                return dossier
+    if candidats:
+        dossier = candidats[0]
+        print(f"   [OK] Trouvé: {dossier.name}")
+        if len(candidats) > 1:
+            print(f"   [!] {len(candidats) - 1} autre(s) candidat(s):")
+            for autre in candidats[1:4]:
+                print(f"       - {autre.name}")
+        return dossier
 
     print(f"   [!] Dossier non trouvé")
     return None
@@ -151,53 +187,35 @@ def trouver_dossier_projet(rue, localite):
 # FONCTIONS NOTION
 # ============================================
 
-def chercher_page_notion(rue, localite):
-    """Cherche une page dans Notion par son titre"""
-
-    url = f"https://api.notion.com/v1/databases/{NOTION_DATABASE_ID}/query"
-    headers = {
-        "Authorization": f"Bearer {NOTION_TOKEN}",
-        "Content-Type": "application/json",
-        "Notion-Version": "2022-06-28"
-    }
-
-    # Rechercher par titre contenant la localité
-    data = {
-        "filter": {
-            "property": "Nom",
-            "title": {
-                "contains": localite
-            }
-        }
-    }
-
-    response = requests.post(url, headers=headers, json=data)
-    response.raise_for_status()
-    results = response.json().get("results", [])
+_notion_mirror = None
 
-    # Affiner la recherche en vérifiant rue ET localité
-    # Nettoyer et normaliser les apostrophes
-    rue_clean = rue.replace(".", "").replace(",", "").replace("'", " ").replace("'", " ").strip().lower()
+def get_notion_mirror():
+    """Retourne le miroir local de la base Notion (ouvert une seule fois)"""
+    global _notion_mirror
+    if _notion_mirror is None:
+        _notion_mirror = NotionMirror(NOTION_TOKEN, NOTION_DATABASE_ID, session=SESSION)
+    return _notion_mirror
 
-    # Mots à ignorer (trop courants)
-    mots_ignores = ["chem", "chemin", "rue", "route", "av", "avenue", "rte"]
+def synchroniser_notion():
+    """Synchronise le miroir Notion (les erreurs réseau n'empêchent pas la recherche locale)"""
+    try:
+        get_notion_mirror().sync()
+    except requests.exceptions.RequestException as e:
+        print(f"   [!] Synchronisation Notion impossible, utilisation du miroir local: {e}")
 
-    for page in results:
-        titre = page["properties"]["Nom"]["title"][0]["text"]["content"] if page["properties"]["Nom"]["title"] else ""
-        titre_clean = titre.replace(".", "").replace(",", "").replace("'", " ").replace("'", " ").strip().lower()
+def chercher_page_notion(rue, localite, synchroniser=True):
+    """Cherche une page dans le miroir local de Notion (synchronisé de manière incrémentale)"""
 
-        # Vérifier que la localité ET au moins une partie significative de la rue sont présentes
-        if localite.lower() in titre_clean:
-            # Extraire les mots significatifs de la rue (> 2 lettres et pas dans la liste ignorée)
-            rue_parts = [part for part in rue_clean.split() if len(part) > 2 and part not in mots_ignores]
+    mirror = get_notion_mirror()
 
-            # Vérifier si au moins un mot significatif de la rue est présent dans le titre
-            if any(part in titre_clean for part in rue_parts):
-                print(f"   [DEBUG] Mots cherchés: {rue_parts}")
-                print(f"   [DEBUG] Trouvé dans: {titre}")
-                return page
+    # Récupérer uniquement les pages modifiées depuis la dernière synchronisation
+    if synchroniser:
+        synchroniser_notion()
 
-    return None
+    page = mirror.find(rue, localite)
+    if page:
+        print(f"   [DEBUG] Trouvé dans: {get_page_title(page)}")
+    return page
 
 def marquer_facture_payee(page_id):
     """Coche la propriété 'Payé' dans Notion"""
@@ -217,15 +235,260 @@ def marquer_facture_payee(page_id):
         }
     }
 
-    response = requests.patch(url, headers=headers, json=data)
+    response = SESSION.patch(url, headers=headers, json=data)
 
     if response.status_code == 200:
         print(f"[OK] Propriété 'Payé' cochée dans Notion")
+        # Répercuter la mise à jour dans le miroir local
+        get_notion_mirror().record_page(response.json())
         return True
     else:
         print(f"[!] Erreur Notion: {response.text}")
         return False
 
+# ============================================
+# TRAITEMENT D'UNE FACTURE
+# ============================================
+
+class FactureIntrouvable(Exception):
+    """Titre non exploitable ou dossier projet introuvable"""
+    pass
+
+def traiter_facture(numero_facture, facture=None, synchroniser=True):
+    """
+    Archive le PDF et marque une facture comme payée (Bexio + Notion)
+
+    Args:
+        numero_facture: ID Bexio de la facture
+        facture: Facture déjà récupérée (évite un appel en mode rapprochement)
+        synchroniser: Synchroniser le miroir Notion avant la recherche
+
+    Returns:
+        Tuple (chemin du dossier projet, numéro de document)
+
+    Raises:
+        FactureIntrouvable: Si le titre ne peut être parsé ou le dossier trouvé
+    """
+    # 1. Récupérer la facture
+    if facture is None:
+        print(f"\n[BEXIO] Récupération de la facture {numero_facture}...")
+        facture = get_facture(numero_facture)
+
+    titre = facture.get("title", "")
+    document_nr = facture.get("document_nr", "")
+    montant = facture.get("total", 0)
+
+    print(f"   Titre: {titre}")
+    print(f"   Montant: {montant} CHF")
+    print(f"   Référence: {document_nr}")
+
+    # 2. Parser le titre
+    infos = parse_titre_facture(titre)
+    if not infos:
+        raise FactureIntrouvable(
+            f"Impossible de parser le titre de la facture (format attendu: 'Type - Rue num, NPA, Localité'): {titre}"
+        )
+
+    rue = infos["rue"]
+    localite = infos["localite"]
+
+    # 3. Trouver le dossier projet
+    dossier_projet = trouver_dossier_projet(rue, localite)
+    if not dossier_projet:
+        raise FactureIntrouvable(f"Dossier projet introuvable sur le serveur (recherché: {rue}, {localite})")
+
+    # 4. Télécharger et sauvegarder le PDF de la facture
+    print(f"\n[PDF] Téléchargement de la facture...")
+    try:
+        # Le dossier facture est créé s'il n'existe pas
+        pdf_path = get_facture_pdf(numero_facture, dossier_projet / "1. Admin" / "12. Facture" / f"{document_nr}.pdf")
+        if pdf_path:
+            print(f"   [OK] PDF sauvegardé: {pdf_path}")
+        else:
+            print(f"   [!] PDF non disponible")
+    except Exception as e:
+        print(f"   [!] Erreur PDF: {e}")
+        # On continue quand même pour marquer comme payé
+
+    # 5. Marquer comme payée dans Bexio
+    print(f"\n[BEXIO] Marquage de la facture comme payée...")
+    payee_bexio = marquer_facture_payee_bexio(numero_facture)
+
+    # 6. Mettre à jour Notion
+    print(f"\n[NOTION] Recherche de la page...")
+    page = chercher_page_notion(rue, localite, synchroniser=synchroniser)
+
+    if page:
+        page_id = page["id"]
+        titre_page = get_page_title(page)
+        print(f"   [OK] Page trouvée: {titre_page}")
+
+        marquer_facture_payee(page_id)
+    else:
+        print(f"   [!] Page Notion non trouvée pour {rue}, {localite}")
+
+    if not payee_bexio:
+        raise RuntimeError(f"Facture {document_nr} non marquée comme payée dans Bexio")
+
+    return dossier_projet, document_nr
+
+# ============================================
+# RAPPROCHEMENT
+# ============================================
+
+def montant_facture(facture):
+    """Montant total d'une facture en float"""
+    try:
+        return float(facture.get("total") or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+def est_soldee_dans_bexio(facture):
+    """Une facture ouverte sans solde restant a déjà reçu son paiement dans Bexio"""
+    restant = facture.get("total_remaining_payments")
+    try:
+        return restant is not None and float(restant) <= 0.005
+    except (TypeError, ValueError):
+        return False
+
+def rapprocher_paiements(factures, credits):
+    """
+    Associe les crédits bancaires aux factures ouvertes
+
+    Un crédit correspond à une facture si son montant est identique et que sa
+    référence ou sa communication contient le numéro de document (ex: "RE-00123")
+    comme mot entier: "RE-0001" ne correspond pas à un paiement de "RE-00012".
+
+    Returns:
+        Liste de tuples (facture, credit)
+    """
+    par_numero = {}
+    for facture in factures:
+        if normalize_reference(facture.get("document_nr", "")):
+            par_numero[reference_pattern(facture["document_nr"])] = facture
+
+    correspondances = []
+    deja_utilisees = set()
+    for credit in credits:
+        # Référence SCOR "RFxx...": le numéro suit les chiffres de contrôle
+        reference = re.sub(r"^RF\d{2}", "", normalize_reference(credit["reference"]))
+        communication = f"{reference} {credit['texte']}".upper()
+        for motif, facture in par_numero.items():
+            if facture["id"] in deja_utilisees or not motif.search(communication):
+                continue
+            # Comparaison au centime (1499.99 - 1500 vaut -0.00999... en float)
+            if round(montant_facture(facture) * 100) == round(credit["montant"] * 100):
+                correspondances.append((facture, credit))
+                deja_utilisees.add(facture["id"])
+                break
+    return correspondances
+
+def rapprochement(fichier_camt=None, parallele=4, simulation=False):
+    """
+    Marque en une passe toutes les factures ouvertes qui ont été payées
+
+    Sans relevé: factures ouvertes dont le solde restant dans Bexio est nul.
+    Avec relevé camt.053/054: factures ouvertes dont le paiement figure dans le relevé.
+
+    Les factures ouvertes sont listées une seule fois, le miroir Notion est
+    synchronisé une seule fois et l'index des dossiers est partagé entre les
+    traitements parallèles.
+
+    Returns:
+        Dict {document_nr: {"statut": "ok"|"erreur", ...}}
+    """
+    print(f"\n[BEXIO] Récupération des factures ouvertes...")
+    factures = get_factures_ouvertes()
+    print(f"   {len(factures)} facture(s) ouverte(s)")
+
+    if fichier_camt:
+        credits = parse_camt_credits(Path(fichier_camt))
+        print(f"   {len(credits)} crédit(s) dans {Path(fichier_camt).name}")
+        payees = [facture for facture, _ in rapprocher_paiements(factures, credits)]
+    else:
+        payees = [facture for facture in factures if est_soldee_dans_bexio(facture)]
+
+    print(f"\n[RAPPROCHEMENT] {len(payees)} facture(s) payée(s) à traiter")
+    for facture in payees:
+        print(f"   - {facture.get('document_nr')} ({montant_facture(facture):.2f} CHF) {facture.get('title', '')}")
+
+    if simulation or not payees:
+        return {}
+
+    print(f"\n[NOTION] Synchronisation du miroir...")
+    synchroniser_notion()
+
+    def traiter(facture):
+        debut = datetime.now()
+        with captured_stdout() as sortie:
+            try:
+                dossier, _ = traiter_facture(facture["id"], facture=facture, synchroniser=False)
+                resultat = {"statut": "ok", "dossier": str(dossier)}
+            except Exception as e:
+                resultat = {"statut": "erreur", "erreur": str(e)}
+        resultat["duree"] = round((datetime.now() - debut).total_seconds(), 2)
+        return facture.get("document_nr") or str(facture["id"]), resultat, sortie.getvalue()
+
+    resultats = {}
+    with ThreadPoolExecutor(max_workers=parallele) as executor:
+        futures = [executor.submit(traiter, facture) for facture in payees]
+        for future in as_completed(futures):
+            document_nr, resultat, sortie = future.result()
+            print(f"\n{'-' * 50}\n[FACTURE {document_nr}]")
+            print(sortie, end="")
+            resultats[document_nr] = resultat
+
+    # Résumé
+    ok = [n for n, r in resultats.items() if r["statut"] == "ok"]
+    ko = [n for n, r in resultats.items() if r["statut"] != "ok"]
+    print("\n" + "=" * 50)
+    print(f"[RAPPROCHEMENT] {len(ok)} facture(s) marquée(s) payée(s), {len(ko)} en erreur")
+    for numero in ok:
+        print(f"   [OK] {numero} ({resultats[numero]['duree']}s) -> {resultats[numero]['dossier']}")
+    for numero in ko:
+        print(f"   [X]  {numero}: {resultats[numero]['erreur']}")
+    print("=" * 50)
+    return resultats
+
+class ErreurUsage(ValueError):
+    """Ligne de commande invalide"""
+    pass
+
+USAGE = "Usage: python script.py <numero_facture> | --rapprochement [fichier_camt.xml] [--parallele N] [--simulation]"
+
+def lire_arguments(argv):
+    """
+    Analyse la ligne de commande (ou le champ unique de l'interface web)
+
+    Usage:
+        python script.py <numero_facture>
+        python script.py --rapprochement [fichier_camt.xml] [--parallele N] [--simulation]
+
+    Le champ unique de l'interface web (un seul argument) est decoupe sur les espaces;
+    les arguments de la ligne de commande sont pris tels quels (chemin camt avec espaces).
+
+    Raises:
+        ErreurUsage: Si une option a une valeur invalide
+    """
+    options = {"numero": None, "rapprochement": False, "camt": None, "parallele": 4, "simulation": False}
+    mots = argv[0].split() if len(argv) == 1 else [arg for arg in argv if arg]
+    while mots:
+        mot = mots.pop(0)
+        if mot in ("--rapprochement", "rapprochement"):
+            options["rapprochement"] = True
+        elif mot == "--parallele":
+            valeur = mots.pop(0) if mots else ""
+            if not valeur.isdigit():
+                raise ErreurUsage(f"--parallele attend un nombre entier, reçu '{valeur}'")
+            options["parallele"] = max(1, int(valeur))
+        elif mot == "--simulation":
+            options["simulation"] = True
+        elif mot.lower().endswith(".xml"):
+            options["camt"] = mot
+        else:
+            options["numero"] = mot
+    return options
+
 # ============================================
 # SCRIPT PRINCIPAL
 # ============================================
@@ -235,81 +498,32 @@ def main():
     print("  FACTURE PAYEE - Eta Consult Sàrl")
     print("=" * 50)
 
+    try:
+        options = lire_arguments(sys.argv[1:])
+    except ErreurUsage as e:
+        print(f"[X] {e}")
+        print(USAGE)
+        sys.exit(1)
+
+    # Mode rapprochement: toutes les factures ouvertes payées
+    if options["rapprochement"]:
+        try:
+            resultats = rapprochement(options["camt"], options["parallele"], options["simulation"])
+        except requests.exceptions.HTTPError as e:
+            print(f"\n[X] Erreur API: {e}")
+            sys.exit(1)
+        sys.exit(0 if all(r["statut"] == "ok" for r in resultats.values()) else 1)
+
     # Prendre le numéro de facture en argument
-    if len(sys.argv) > 1:
-        numero_facture = sys.argv[1].strip()
+    if options["numero"]:
+        numero_facture = options["numero"].strip()
     else:
         print("[X] Numéro de facture requis!")
-        print("Usage: python script.py <numero_facture>")
+        print(USAGE)
         sys.exit(1)
 
     try:
-        # 1. Récupérer la facture
-        print(f"\n[BEXIO] Récupération de la facture {numero_facture}...")
-        facture = get_facture(numero_facture)
-
-        titre = facture.get("title", "")
-        document_nr = facture.get("document_nr", "")
-        montant = facture.get("total", 0)
-
-        print(f"   Titre: {titre}")
-        print(f"   Montant: {montant} CHF")
-        print(f"   Référence: {document_nr}")
-
-        # 2. Parser le titre
-        infos = parse_titre_facture(titre)
-        if not infos:
-            print("[X] Impossible de parser le titre de la facture")
-            print(f"    Format attendu: 'Type - Rue num, NPA, Localité'")
-            sys.exit(1)
-
-        rue = infos["rue"]
-        localite = infos["localite"]
-
-        # 3. Trouver le dossier projet
-        dossier_projet = trouver_dossier_projet(rue, localite)
-        if not dossier_projet:
-            print("[X] Dossier projet introuvable sur le serveur")
-            print(f"    Recherché: {rue}, {localite}")
-            sys.exit(1)
-
-        # 4. Télécharger et sauvegarder le PDF de la facture
-        print(f"\n[PDF] Téléchargement de la facture...")
-        try:
-            pdf_base64 = get_facture_pdf(numero_facture)
-            if pdf_base64:
-                pdf_bytes = base64.b64decode(pdf_base64)
-
-                # Créer le dossier facture s'il n'existe pas
-                dossier_facture = dossier_projet / "1. Admin" / "12. Facture"
-                dossier_facture.mkdir(parents=True, exist_ok=True)
-
-                # Sauvegarder le PDF
-                pdf_path = dossier_facture / f"{document_nr}.pdf"
-                pdf_path.write_bytes(pdf_bytes)
-                print(f"   [OK] PDF sauvegardé: {pdf_path}")
-            else:
-                print(f"   [!] PDF non disponible")
-        except Exception as e:
-            print(f"   [!] Erreur PDF: {e}")
-            # On continue quand même pour marquer comme payé
-
-        # 5. Marquer comme payée dans Bexio
-        print(f"\n[BEXIO] Marquage de la facture comme payée...")
-        marquer_facture_payee_bexio(numero_facture)
-
-        # 6. Mettre à jour Notion
-        print(f"\n[NOTION] Recherche de la page...")
-        page = chercher_page_notion(rue, localite)
-
-        if page:
-            page_id = page["id"]
-            titre_page = page["properties"]["Nom"]["title"][0]["text"]["content"] if page["properties"]["Nom"]["title"] else ""
-            print(f"   [OK] Page trouvée: {titre_page}")
-
-            marquer_facture_payee(page_id)
-        else:
-            print(f"   [!] Page Notion non trouvée pour {rue}, {localite}")
+        dossier_projet, document_nr = traiter_facture(numero_facture)
 
         # Résumé
         print("\n" + "=" * 50)
@@ -319,6 +533,9 @@ def main():
         print("=" * 50)
         sys.exit(0)
 
+    except FactureIntrouvable as e:
+        print(f"[X] {e}")
+        sys.exit(1)
     except requests.exceptions.HTTPError as e:
         print(f"\n[X] Erreur API: {e}")
         sys.exit(1)
@@ -329,4 +546,7 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    finally:
+        http_client.print_report()
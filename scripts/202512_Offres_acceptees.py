@@ -11,9 +11,23 @@ import json
 import requests
 from datetime import datetime
 from pathlib import Path
-import shutil
-import base64
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from functools import lru_cache
 from dotenv import load_dotenv
+import http_client
+from address_normalizer import address_key, normalize_locality, normalize_street
+from file_copy import copy_files
+from notion_mirror import NotionMirror, get_page_title
+from pdf_stream import download_base64_pdf
+from project_folder_index import ProjectFolderIndex
+from workflow_stages import StageRunner, captured_stdout
+
+try:
+    import fcntl
+except ImportError:  # Windows: pas de verrou entre processus
+    fcntl = None
 
 # Charger les variables d'environnement depuis .env (remonte au dossier parent)
 env_path = Path(__file__).resolve().parent.parent / '.env'
@@ -52,6 +66,68 @@ DOSSIER_MODELES = get_default_path(
     "/home/etaconsult/modeles"
 )
 
+# Fichier d'etat des offres deja traitees (reprise du mode batch)
+ETAT_OFFRES = Path(os.environ.get(
+    "OFFRES_ACCEPTEES_ETAT_PATH",
+    Path(__file__).resolve().parent.parent / "offres_acceptees_etat.json"
+))
+
+# Statut Bexio d'une offre acceptee (kb_item_status_id)
+STATUT_OFFRE_ACCEPTEE = 3
+
+# Client HTTP partage: session poolee par hote, timeout, retries et metriques
+SESSION = http_client.get_client()
+
+# Index des dossiers partage entre les offres d'un batch
+_index_dossiers = None
+_index_lock = threading.Lock()
+
+def get_index_dossiers():
+    """Retourne l'index des dossiers projet (charge une seule fois)"""
+    global _index_dossiers
+    if _index_dossiers is None:
+        _index_dossiers = ProjectFolderIndex(DOSSIERS_ACTIFS)
+    return _index_dossiers
+
+def chercher_dossier_existant(rue, localite):
+    """Dossier projet deja cree pour ce batiment (meme rue, numero et localite), ou None"""
+    with _index_lock:
+        return get_index_dossiers().find_existing(rue, localite)
+
+# Miroir Notion partage entre les offres d'un batch
+_miroir_notion = None
+_miroir_synchronise = False
+_miroir_lock = threading.Lock()
+
+def get_miroir_notion():
+    """Retourne le miroir local de la base Notion (synchronise une fois par execution, en incremental)"""
+    global _miroir_notion, _miroir_synchronise
+    with _miroir_lock:
+        if _miroir_notion is None:
+            _miroir_notion = NotionMirror(NOTION_TOKEN, NOTION_DATABASE_ID, session=SESSION)
+        if not _miroir_synchronise:
+            try:
+                _miroir_notion.sync()
+                _miroir_synchronise = True
+            except requests.exceptions.RequestException as e:
+                print(f"   [!] Synchronisation Notion impossible, utilisation du miroir local: {e}")
+    return _miroir_notion
+
+def chercher_page_notion_existante(rue, localite):
+    """Page Notion deja creee pour ce batiment, ou None"""
+    return get_miroir_notion().find(rue, localite, same_number=True)
+
+# Un verrou par batiment et par ressource: deux offres du meme batiment dans un batch
+# ne peuvent pas verifier puis creer chacune leur dossier ou leur page Notion
+_verrous_batiments = {}
+_verrous_lock = threading.Lock()
+
+def verrou_batiment(ressource, rue, localite):
+    """Verrou de la ressource ("dossier" ou "notion") pour ce batiment (rue, numero et localite)"""
+    cle = (ressource, normalize_street(rue), normalize_locality(localite))
+    with _verrous_lock:
+        return _verrous_batiments.setdefault(cle, threading.Lock())
+
 # ============================================
 # FONCTIONS BEXIO
 # ============================================
@@ -63,21 +139,48 @@ def get_offre(numero_offre):
         "Authorization": f"Bearer {BEXIO_TOKEN}",
         "Accept": "application/json"
     }
-    response = requests.get(url, headers=headers)
+    response = SESSION.get(url, headers=headers)
     response.raise_for_status()
     return response.json()
 
-def get_offre_pdf(numero_offre):
-    """Recupere le PDF d'une offre en base64"""
+def get_offre_pdf(numero_offre, pdf_path):
+    """Telecharge le PDF d'une offre directement dans pdf_path (decodage base64 en flux)"""
     url = f"https://api.bexio.com/2.0/kb_offer/{numero_offre}/pdf"
     headers = {
         "Authorization": f"Bearer {BEXIO_TOKEN}",
         "Accept": "application/json"
     }
-    response = requests.get(url, headers=headers)
-    response.raise_for_status()
-    data = response.json()
-    return data.get("content", "")
+    return download_base64_pdf(SESSION, url, headers, pdf_path)
+
+def get_offres_acceptees(depuis=None):
+    """
+    Recupere les IDs de toutes les offres acceptees dans Bexio (pagine)
+
+    Args:
+        depuis: Date "AAAA-MM-JJ" optionnelle (offres modifiees depuis cette date)
+    """
+    url = "https://api.bexio.com/2.0/kb_offer/search"
+    headers = {
+        "Authorization": f"Bearer {BEXIO_TOKEN}",
+        "Accept": "application/json",
+        "Content-Type": "application/json"
+    }
+    criteres = [{"field": "kb_item_status_id", "value": str(STATUT_OFFRE_ACCEPTEE), "criteria": "="}]
+    if depuis:
+        criteres.append({"field": "updated_at", "value": depuis, "criteria": ">="})
+
+    ids = []
+    limite = 500
+    offset = 0
+    while True:
+        response = SESSION.post(url, headers=headers, json=criteres,
+                                params={"limit": limite, "offset": offset, "order_by": "id"})
+        response.raise_for_status()
+        page = response.json()
+        ids.extend(str(offre["id"]) for offre in page)
+        if len(page) < limite:
+            return ids
+        offset += limite
 
 # ============================================
 # PARSING ADRESSE
@@ -107,7 +210,7 @@ def parse_titre_offre(titre):
 # ============================================
 
 def creer_structure_dossiers(rue, localite):
-    """Cree la structure complete des dossiers projet"""
+    """Cree la structure complete des dossiers projet (ou complete le dossier existant du batiment)"""
     
     date_prefix = datetime.now().strftime("%Y%m")
     nom_dossier = f"{date_prefix}_{rue}_{localite}"
@@ -129,25 +232,48 @@ def creer_structure_dossiers(rue, localite):
         "5. Rapport/53. Annexes",
         "5. Rapport/54. CECB",
         "5. Rapport/55. CECB Plus",
-        datetime.now().strftime("%Y%m%d"),
     ]
+
+    with verrou_batiment("dossier", rue, localite):
+        dossier_existant = chercher_dossier_existant(rue, localite)
+        if dossier_existant:
+            # Jamais de second dossier pour le meme batiment: seuls les sous-dossiers manquants sont crees
+            print(f"\n[DOSSIER] Existant: {dossier_existant.name}")
+            for sous_dossier in sous_dossiers:
+                (dossier_existant / sous_dossier).mkdir(parents=True, exist_ok=True)
+            return dossier_existant
+
+        sous_dossiers.append(datetime.now().strftime("%Y%m%d"))
+        print(f"\n[DOSSIER] Creation: {dossier_principal.name}")
+        dossier_principal.mkdir(parents=True, exist_ok=True)
     
-    print(f"\n[DOSSIER] Creation: {nom_dossier}")
-    dossier_principal.mkdir(parents=True, exist_ok=True)
-    
-    for sous_dossier in sous_dossiers:
-        chemin = dossier_principal / sous_dossier
-        chemin.mkdir(parents=True, exist_ok=True)
-        print(f"   [OK] {sous_dossier}")
+        for sous_dossier in sous_dossiers:
+            chemin = dossier_principal / sous_dossier
+            chemin.mkdir(parents=True, exist_ok=True)
+            print(f"   [OK] {sous_dossier}")
+
+        # Enregistrer le nouveau dossier dans l'index utilise par Facture_payee
+        try:
+            with _index_lock:
+                get_index_dossiers().add_folder(dossier_principal)
+        except Exception as e:
+            print(f"   [!] Index dossiers non mis a jour: {e}")
     
-    return dossier_principal
+        return dossier_principal
 
 # ============================================
 # COPIE TEMPLATES
 # ============================================
 
 def copier_templates(dossier_projet, rue, localite):
-    """Copie et renomme les fichiers templates"""
+    """
+    Copie et renomme les fichiers templates (en parallele, reflink si possible)
+
+    Un fichier deja present n'est jamais ecrase: il peut contenir le travail en cours.
+
+    Returns:
+        Liste des fichiers copies ou deja presents
+    """
     
     nom_fichier = f"{rue}_{localite}"
     
@@ -158,23 +284,43 @@ def copier_templates(dossier_projet, rue, localite):
     ]
     
     print(f"\n[TEMPLATES] Copie:")
+    a_copier = []
     for template, destination, nouveau_nom in templates:
         source = DOSSIER_MODELES / template
-        dest = dossier_projet / destination / nouveau_nom
-        
         if source.exists():
-            shutil.copy2(source, dest)
-            print(f"   [OK] {template} -> {destination}/{nouveau_nom}")
+            a_copier.append((template, destination, nouveau_nom, source, dossier_projet / destination / nouveau_nom))
         else:
             print(f"   [!] Template non trouve: {template}")
 
+    resultats = copy_files([(source, dest) for _, _, _, source, dest in a_copier], overwrite=False)
+    erreurs = []
+    fichiers = []
+    for (template, destination, nouveau_nom, _, dest), resultat in zip(a_copier, resultats):
+        if isinstance(resultat, FileExistsError):
+            print(f"   [=] {destination}/{nouveau_nom} deja present, conserve")
+            fichiers.append(str(dest))
+        elif isinstance(resultat, Exception):
+            print(f"   [X] {template}: {resultat}")
+            erreurs.append(template)
+        else:
+            print(f"   [OK] {template} -> {destination}/{nouveau_nom} ({resultat})")
+            fichiers.append(str(dest))
+    if erreurs:
+        raise OSError(f"Copie impossible: {', '.join(erreurs)}")
+    return fichiers
+
 # ============================================
 # GEO.ADMIN.CH & RegBL
 # ============================================
 
 def get_coordonnees(rue, npa, localite):
-    """Recupere les coordonnees LV95 via geo.admin.ch"""
-    search_text = f"{rue} {npa} {localite}"
+    """Recupere les coordonnees LV95 via geo.admin.ch (cache sur l'adresse normalisee)"""
+    return _get_coordonnees_par_cle(address_key(rue, npa, localite))
+
+@lru_cache(maxsize=256)
+def _get_coordonnees_par_cle(cle):
+    """Recherche geo.admin.ch avec le texte d'origine de la cle"""
+    search_text = f"{cle.raw_rue} {cle.raw_npa} {cle.raw_localite}"
     url = "https://api3.geo.admin.ch/rest/services/api/SearchServer"
     params = {
         "searchText": search_text,
@@ -182,7 +328,7 @@ def get_coordonnees(rue, npa, localite):
         "type": "locations"
     }
     
-    response = requests.get(url, params=params)
+    response = SESSION.get(url, params=params)
     response.raise_for_status()
     data = response.json()
     
@@ -212,7 +358,7 @@ def get_regbl(x_lv95, y_lv95):
         "tolerance": "10"
     }
     
-    response = requests.get(url, params=params)
+    response = SESSION.get(url, params=params)
     response.raise_for_status()
     data = response.json()
     
@@ -267,8 +413,8 @@ Systeme 2: {regbl_data.get('gwaerzw2', 'N/A')} (energie: {regbl_data.get('genw2'
 # ============================================
 
 def creer_page_notion(rue, localite, montant_offre, type_projet="CECB"):
-    """Cree une page dans la base de donnees Notion"""
-    
+    """Cree une page dans la base de donnees Notion (sauf si le batiment en a deja une)"""
+
     url = "https://api.notion.com/v1/pages"
     headers = {
         "Authorization": f"Bearer {NOTION_TOKEN}",
@@ -296,18 +442,329 @@ def creer_page_notion(rue, localite, montant_offre, type_projet="CECB"):
             }
         }
     }
+
+    # Recherche et creation sous le verrou du batiment: une seule page par batiment dans un batch
+    with verrou_batiment("notion", rue, localite):
+        page_existante = chercher_page_notion_existante(rue, localite)
+        if page_existante:
+            print(f"\n[NOTION] Page existante: {get_page_title(page_existante)}")
+            return page_existante
+
+        print(f"\n[NOTION] Creation page...")
+        response = SESSION.post(url, headers=headers, json=data)
     
-    response = requests.post(url, headers=headers, json=data)
-    
-    # Debug
-    print(f"   Status: {response.status_code}")
+        # Debug
+        print(f"   Status: {response.status_code}")
     
-    if response.status_code == 200:
-        print(f"[OK] Page Notion creee: {rue} {localite}")
-        return response.json()
-    else:
-        print(f"[!] Erreur Notion: {response.text}")
+        if response.status_code == 200:
+            print(f"[OK] Page Notion creee: {rue} {localite}")
+            page = response.json()
+            # Repercuter la creation dans le miroir local (les offres suivantes la trouvent)
+            get_miroir_notion().record_page(page)
+            return page
+
+    # Etape en erreur (et non terminee sans page): elle sera refaite a la reprise
+    print(f"[!] Erreur Notion: {response.text}")
+    raise RuntimeError(f"Creation de la page Notion refusee ({response.status_code})")
+
+# ============================================
+# ETAPES DU WORKFLOW
+# ============================================
+
+# Etapes dont l'echec n'interrompt pas le script
+ETAPES_NON_BLOQUANTES = {"pdf"}
+
+# Etapes dont le resultat est conserve dans l'etat: elles ne sont pas refaites a la reprise
+ETAPES_REPRISE = ("dossier", "templates", "pdf", "rapport", "notion")
+
+def telecharger_pdf_offre(numero_offre, dossier_projet, document_nr):
+    """Etape PDF: telecharge le PDF de l'offre en flux dans 1. Admin/11. Offre"""
+    print(f"\n[PDF] Telechargement...")
+    pdf_path = get_offre_pdf(numero_offre, dossier_projet / "1. Admin" / "11. Offre" / f"{document_nr}.pdf")
+    if not pdf_path:
+        print(f"   [!] PDF non disponible")
         return None
+    print(f"   [OK] PDF sauvegarde: {document_nr}.pdf")
+    return pdf_path
+
+def rechercher_coordonnees(rue, npa, localite):
+    """Etape GEO: coordonnees LV95 de l'adresse"""
+    print(f"\n[GEO] Recherche geographique...")
+    x, y = get_coordonnees(rue, npa, localite)
+    if x and y:
+        print(f"   Coordonnees: {x}, {y}")
+    else:
+        print("   [!] Coordonnees non trouvees")
+    return x, y
+
+def rechercher_regbl(coordonnees):
+    """Etape RegBL: donnees du batiment aux coordonnees trouvees"""
+    x, y = coordonnees
+    if not (x and y):
+        return {}
+    regbl = get_regbl(x, y)
+    if regbl:
+        print(f"   EGID: {regbl.get('egid', 'N/A')}")
+        print(f"   Annee: {regbl.get('gbauj', 'N/A')}")
+    else:
+        print("   [!] Pas de donnees RegBL trouvees")
+    return regbl
+
+# ============================================
+# TRAITEMENT D'UNE OFFRE
+# ============================================
+
+class OffreInvalide(ValueError):
+    """Titre d'offre impossible a parser"""
+    pass
+
+def traiter_offre(numero_offre, forcer=False):
+    """
+    Traite une offre acceptee de bout en bout
+
+    Chaque etape de ETAPES_REPRISE terminee est enregistree dans l'etat: apres
+    un echec, seules les etapes manquantes sont refaites. Si le batiment a deja
+    un dossier projet ou une page Notion, ils sont reutilises (jamais dupliques)
+    et le PDF, les templates et le rapport y sont ajoutes.
+
+    Args:
+        numero_offre: Numero de l'offre Bexio
+        forcer: Refaire toutes les etapes, meme celles deja faites
+
+    Returns:
+        Chemin du dossier projet
+
+    Raises:
+        OffreInvalide: Si le titre ne contient pas d'adresse exploitable
+        RuntimeError: Si une etape bloquante a echoue
+        requests.exceptions.HTTPError: Si l'offre n'a pas pu etre recuperee
+    """
+    # 1. Recuperer l'offre
+    print(f"\n[BEXIO] Recuperation de l'offre {numero_offre}...")
+    offre = get_offre(numero_offre)
+
+    titre = offre.get("title", "")
+    document_nr = offre.get("document_nr", "")
+    montant = offre.get("total", 0)
+
+    print(f"   Titre: {titre}")
+    print(f"   Montant: {montant} CHF")
+
+    # 2. Parser le titre
+    infos = parse_titre_offre(titre)
+    if not infos:
+        raise OffreInvalide(f"Titre non exploitable: {titre}")
+
+    rue = infos["rue"]
+    npa = infos["npa"]
+    localite = infos["localite"]
+    type_projet = infos["type"]
+
+    # Reprise: etapes deja faites lors d'une execution precedente
+    etapes_faites = {} if forcer else charger_etat().get(numero_offre, {}).get("etapes", {})
+
+    def etape(nom, fonction):
+        """Etape reprise depuis l'etat si elle est deja faite, sinon executee puis enregistree"""
+        if nom in etapes_faites:
+            valeur = etapes_faites[nom]
+
+            def reprise(r):
+                print(f"\n[{nom.upper()}] Deja fait (reprise): {valeur}")
+                return Path(valeur) if nom == "dossier" else valeur
+            return reprise
+
+        def executer(r):
+            valeur = fonction(r)
+            enregistrer_etape(numero_offre, nom, valeur)
+            return valeur
+        return executer
+
+    # 3-7. Etapes independantes executees en parallele:
+    #   dossier -> templates
+    #   dossier -> pdf (ecrit en flux directement dans le dossier)
+    #   geo -> regbl + dossier -> rapport
+    #   notion
+    runner = StageRunner()
+    runner.add("dossier", etape("dossier", lambda r: creer_structure_dossiers(rue, localite)))
+    runner.add("templates", etape("templates", lambda r: copier_templates(r["dossier"], rue, localite)), ["dossier"])
+    runner.add("pdf", etape("pdf", lambda r: telecharger_pdf_offre(numero_offre, r["dossier"], document_nr)), ["dossier"])
+    if "rapport" in etapes_faites:
+        runner.add("rapport", etape("rapport", None), ["dossier"])
+    else:
+        runner.add("geo", lambda r: rechercher_coordonnees(rue, npa, localite))
+        runner.add("regbl", lambda r: rechercher_regbl(r["geo"]), ["geo"])
+        runner.add("rapport", etape("rapport", lambda r: r["regbl"] and generer_rapport_regbl(r["regbl"], r["dossier"], rue, localite)), ["regbl", "dossier"])
+    runner.add("notion", etape("notion", lambda r: creer_page_notion(rue, localite, montant, type_projet)))
+    runner.run()
+    runner.print_report()
+
+    # Les erreurs PDF ne bloquent pas le workflow (comme auparavant)
+    erreurs = [e for e in runner.failed() if e.name not in ETAPES_NON_BLOQUANTES]
+    if erreurs:
+        details = ", ".join(f"{etape.name}: {etape.error}" for etape in erreurs)
+        raise RuntimeError(f"Etape(s) en erreur - {details}")
+
+    return runner.results["dossier"].value
+
+# ============================================
+# ETAT DES OFFRES TRAITEES
+# ============================================
+
+# Statuts des offres qui ne sont plus reprises par le mode batch
+STATUTS_TERMINES = ("ok",)
+
+# Verrou entre les threads d'un batch (flock ne suffit pas sous Windows)
+_etat_lock = threading.Lock()
+
+def charger_etat():
+    """Charge l'etat des offres deja traitees {numero: {statut, etapes, ...}}"""
+    if ETAT_OFFRES.exists():
+        try:
+            with open(ETAT_OFFRES, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"[!] Etat des offres illisible ({e}), reprise a zero")
+    return {}
+
+def enregistrer_etat(etat):
+    """Ecrit l'etat de maniere atomique"""
+    tmp = ETAT_OFFRES.with_suffix(".tmp")
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(etat, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, ETAT_OFFRES)
+
+@contextmanager
+def etat_verrouille():
+    """
+    Relit l'etat sous verrou, puis le reecrit (lecture-modification-ecriture)
+
+    Le verrou (POSIX) serialise aussi les executions simultanees du script
+    (batch planifie et offre lancee depuis l'interface): aucune mise a jour perdue.
+    """
+    lock_path = ETAT_OFFRES.with_name(ETAT_OFFRES.name + ".lock")
+    with _etat_lock:
+        lock_file = None
+        try:
+            if fcntl is not None:
+                lock_file = open(lock_path, "a")
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            etat = charger_etat()
+            yield etat
+            enregistrer_etat(etat)
+        finally:
+            if lock_file is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+                lock_file.close()
+
+def enregistrer_etape(numero_offre, nom, valeur):
+    """Enregistre le resultat d'une etape terminee (les etapes sans resultat seront refaites)"""
+    if nom not in ETAPES_REPRISE or not valeur:
+        return
+    if isinstance(valeur, dict):
+        valeur = valeur.get("id", True)
+    elif isinstance(valeur, Path):
+        valeur = str(valeur)
+    with etat_verrouille() as etat:
+        etat.setdefault(numero_offre, {}).setdefault("etapes", {})[nom] = valeur
+
+# ============================================
+# MODE BATCH
+# ============================================
+
+def traiter_batch(numeros, parallele=4, forcer=False):
+    """
+    Traite plusieurs offres avec une concurrence bornee
+
+    Les offres deja traitees avec succes (fichier d'etat) sont ignorees. Une
+    offre en erreur est reprise a l'etape qui a echoue.
+
+    Args:
+        numeros: Liste des numeros d'offres
+        parallele: Nombre d'offres traitees simultanement
+        forcer: Retraiter aussi les offres deja marquees comme traitees
+
+    Returns:
+        Dict {numero: {"statut": "ok"|"erreur", ...}} pour les offres traitees
+    """
+    etat = charger_etat()
+    a_traiter = [n for n in numeros if forcer or etat.get(n, {}).get("statut") not in STATUTS_TERMINES]
+    ignorees = len(numeros) - len(a_traiter)
+
+    print(f"\n[BATCH] {len(a_traiter)} offre(s) a traiter, {ignorees} deja traitee(s)")
+
+    def traiter(numero):
+        debut = datetime.now()
+        with captured_stdout() as sortie:
+            try:
+                dossier = traiter_offre(numero, forcer)
+                resultat = {"statut": "ok", "dossier": str(dossier)}
+            except Exception as e:
+                resultat = {"statut": "erreur", "erreur": str(e)}
+        resultat["duree"] = round((datetime.now() - debut).total_seconds(), 2)
+        resultat["date"] = datetime.now().isoformat(timespec="seconds")
+        return numero, resultat, sortie.getvalue()
+
+    resultats = {}
+    with ThreadPoolExecutor(max_workers=parallele) as executor:
+        futures = [executor.submit(traiter, numero) for numero in a_traiter]
+        # Enregistrer l'etat des qu'une offre se termine (reprise fiable)
+        for future in as_completed(futures):
+            numero, resultat, sortie = future.result()
+            print(f"\n{'-' * 50}\n[OFFRE {numero}]")
+            print(sortie, end="")
+            resultats[numero] = resultat
+            with etat_verrouille() as etat:
+                etat.setdefault(numero, {}).update(resultat)
+
+    # Resume
+    ok = [n for n, r in resultats.items() if r["statut"] == "ok"]
+    ko = [n for n, r in resultats.items() if r["statut"] not in STATUTS_TERMINES]
+    print("\n" + "=" * 50)
+    print(f"[BATCH] {len(ok)} reussie(s), {len(ko)} en erreur, {ignorees} ignoree(s)")
+    for numero in ok:
+        print(f"   [OK] {numero} ({resultats[numero]['duree']}s) -> {resultats[numero]['dossier']}")
+    for numero in ko:
+        print(f"   [X]  {numero}: {resultats[numero]['erreur']}")
+    print("=" * 50)
+    return resultats
+
+class ErreurUsage(ValueError):
+    """Ligne de commande invalide"""
+    pass
+
+USAGE = "Usage: python script.py <numero_offre> | <numero1> <numero2> ... | --acceptees [--parallele N] [--forcer]"
+
+def lire_arguments(argv):
+    """
+    Analyse la ligne de commande (ou le champ unique de l'interface web)
+
+    Usage:
+        python script.py <numero_offre>
+        python script.py <numero1> <numero2> ...   (ou "12,13,14")
+        python script.py --acceptees [--depuis AAAA-MM-JJ]
+        options: --parallele N, --forcer
+
+    Raises:
+        ErreurUsage: Si une option a une valeur invalide
+    """
+    options = {"numeros": [], "acceptees": False, "depuis": None, "parallele": 4, "forcer": False}
+    mots = [m for arg in argv for m in re.split(r"[,;\s]+", arg) if m]
+    while mots:
+        mot = mots.pop(0)
+        if mot in ("--acceptees", "acceptees"):
+            options["acceptees"] = True
+        elif mot == "--depuis" and mots:
+            options["depuis"] = mots.pop(0)
+        elif mot == "--parallele":
+            valeur = mots.pop(0) if mots else ""
+            if not valeur.isdigit():
+                raise ErreurUsage(f"--parallele attend un nombre entier, recu '{valeur}'")
+            options["parallele"] = max(1, int(valeur))
+        elif mot == "--forcer":
+            options["forcer"] = True
+        else:
+            options["numeros"].append(mot)
+    return options
 
 # ============================================
 # SCRIPT PRINCIPAL
@@ -318,79 +775,43 @@ def main():
     print("  OFFRE ACCEPTEE - Eta Consult Sarl")
     print("=" * 50)
     
-    # Prendre le numero d'offre en argument ou le demander
-    if len(sys.argv) > 1:
-        numero_offre = sys.argv[1].strip()
-    else:
-        numero_offre = input("\nNumero d'offre Bexio: ").strip()
+    # Prendre le(s) numero(s) d'offre en argument ou le demander
+    try:
+        if len(sys.argv) > 1:
+            options = lire_arguments(sys.argv[1:])
+        else:
+            options = lire_arguments([input("\nNumero d'offre Bexio: ").strip()])
+    except ErreurUsage as e:
+        print(f"[X] {e}")
+        print(USAGE)
+        sys.exit(1)
     
-    if not numero_offre:
+    if not options["numeros"] and not options["acceptees"]:
         print("[X] Numero d'offre requis!")
-        print("Usage: python script.py <numero_offre>")
+        print(USAGE)
         sys.exit(1)
+
+    # Mode batch: plusieurs offres ou toutes les offres acceptees
+    if options["acceptees"] or len(options["numeros"]) > 1:
+        try:
+            numeros = options["numeros"]
+            if options["acceptees"]:
+                print(f"\n[BEXIO] Recherche des offres acceptees...")
+                numeros = numeros + [n for n in get_offres_acceptees(options["depuis"]) if n not in numeros]
+            resultats = traiter_batch(numeros, options["parallele"], options["forcer"])
+        except requests.exceptions.HTTPError as e:
+            print(f"\n[X] Erreur API: {e}")
+            sys.exit(1)
+        sys.exit(0 if all(r["statut"] in STATUTS_TERMINES for r in resultats.values()) else 1)
+
+    numero_offre = options["numeros"][0]
     
     try:
-        # 1. Recuperer l'offre
-        print(f"\n[BEXIO] Recuperation de l'offre {numero_offre}...")
-        offre = get_offre(numero_offre)
-        
-        titre = offre.get("title", "")
-        document_nr = offre.get("document_nr", "")
-        montant = offre.get("total", 0)
-        
-        print(f"   Titre: {titre}")
-        print(f"   Montant: {montant} CHF")
-        
-        # 2. Parser le titre
-        infos = parse_titre_offre(titre)
-        if not infos:
-            print("[X] Impossible de continuer sans les infos d'adresse")
-            input("\nAppuie sur Entree pour fermer...")
-            return
-        
-        rue = infos["rue"]
-        npa = infos["npa"]
-        localite = infos["localite"]
-        type_projet = infos["type"]
-        
-        # 3. Creer les dossiers
-        dossier_projet = creer_structure_dossiers(rue, localite)
-        
-        # 4. Copier les templates
-        copier_templates(dossier_projet, rue, localite)
-        
-        # 5. Telecharger et sauvegarder le PDF de l'offre
-        print(f"\n[PDF] Telechargement...")
-        try:
-            pdf_base64 = get_offre_pdf(numero_offre)
-            if pdf_base64:
-                pdf_bytes = base64.b64decode(pdf_base64)
-                pdf_path = dossier_projet / "1. Admin" / "11. Offre" / f"{document_nr}.pdf"
-                pdf_path.write_bytes(pdf_bytes)
-                print(f"   [OK] PDF sauvegarde: {document_nr}.pdf")
-        except Exception as e:
-            print(f"   [!] Erreur PDF: {e}")
-        
-        # 6. Recuperer coordonnees et RegBL
-        print(f"\n[GEO] Recherche geographique...")
-        x, y = get_coordonnees(rue, npa, localite)
-        
-        if x and y:
-            print(f"   Coordonnees: {x}, {y}")
-            regbl = get_regbl(x, y)
-            
-            if regbl:
-                print(f"   EGID: {regbl.get('egid', 'N/A')}")
-                print(f"   Annee: {regbl.get('gbauj', 'N/A')}")
-                generer_rapport_regbl(regbl, dossier_projet, rue, localite)
-            else:
-                print("   [!] Pas de donnees RegBL trouvees")
-        else:
-            print("   [!] Coordonnees non trouvees")
-        
-        # 7. Creer la page Notion
-        print(f"\n[NOTION] Creation page...")
-        creer_page_notion(rue, localite, montant, type_projet)
+        dossier_projet = traiter_offre(numero_offre, options["forcer"])
+
+        with etat_verrouille() as etat:
+            etat.setdefault(numero_offre, {}).update({"statut": "ok", "dossier": str(dossier_projet),
+                                                      "date": datetime.now().isoformat(timespec="seconds")})
         
         # Resume
         print("\n" + "=" * 50)
@@ -399,6 +820,11 @@ def main():
         print("=" * 50)
         sys.exit(0)
 
+    except OffreInvalide as e:
+        print(f"[!] {e}")
+        print("[X] Impossible de continuer sans les infos d'adresse")
+        input("\nAppuie sur Entree pour fermer...")
+        return
     except requests.exceptions.HTTPError as e:
         print(f"\n[X] Erreur API: {e}")
         sys.exit(1)
@@ -409,4 +835,7 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    finally:
+        http_client.print_report()
@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+"""
+Normalisation des adresses suisses pour les clés de cache et les recherches
+Produit des formes canoniques indépendantes de la casse, des accents,
+des apostrophes et des abréviations de type de rue
+"""
+
+import re
+import unicodedata
+from typing import List, Optional, Tuple
+
+
+# ==========================================
+# TABLES DE NORMALISATION
+# ==========================================
+
+# Variantes d'apostrophes rencontrées dans Bexio, Notion et les noms de dossiers
+APOSTROPHES = "'’‘ʼ´`"
+
+# Abréviations de types de rue -> forme complète
+STREET_TYPES = {
+    "rte": "route",
+    "rt": "route",
+    "r": "rue",
+    "av": "avenue",
+    "ave": "avenue",
+    "ch": "chemin",
+    "chem": "chemin",
+    "che": "chemin",
+    "bd": "boulevard",
+    "boul": "boulevard",
+    "pl": "place",
+    "imp": "impasse",
+    "all": "allee",
+    "sent": "sentier",
+    "prom": "promenade",
+    "pass": "passage",
+    "qu": "quai",
+    "str": "strasse",
+    "st": "saint",
+    "ste": "sainte",
+}
+
+# Types de rue complets (trop courants pour discriminer une adresse)
+STREET_TYPE_WORDS = set(STREET_TYPES.values()) - {"saint", "sainte"}
+
+# Articles et prépositions ignorés lors de la comparaison par mots
+STOP_WORDS = {"de", "du", "des", "la", "le", "les", "l", "d", "en", "sur", "a", "au", "aux"}
+
+# Numéro de maison normalisé (ex: "21", "16b")
+HOUSE_NUMBER_PATTERN = re.compile(r"^\d+[a-z]?$")
+
+
+# ==========================================
+# NORMALISATION DE BASE
+# ==========================================
+
+def normalize_text(text: Optional[str]) -> str:
+    """
+    Normalise un texte libre: minuscules, sans accents, ponctuation remplacée par des espaces
+
+    Args:
+        text: Texte à normaliser
+
+    Returns:
+        Texte normalisé (mots séparés par un seul espace)
+
+    Exemple:
+        "Route de l'Hôpital 16b" -> "route de l hopital 16b"
+    """
+    if not text:
+        return ""
+
+    decomposed = unicodedata.normalize("NFKD", str(text))
+    without_accents = "".join(c for c in decomposed if not unicodedata.combining(c))
+    lowered = without_accents.lower()
+
+    for apostrophe in APOSTROPHES:
+        lowered = lowered.replace(apostrophe, " ")
+
+    # Points, virgules, tirets, underscores, etc. -> espace
+    cleaned = re.sub(r"[^a-z0-9]+", " ", lowered)
+    return " ".join(cleaned.split())
+
+
+def _expand_abbreviations(normalized: str) -> str:
+    """Remplace les abréviations de type de rue par leur forme complète"""
+    return " ".join(STREET_TYPES.get(word, word) for word in normalized.split())
+
+
+def normalize_street(rue: Optional[str]) -> str:
+    """
+    Normalise une rue avec numéro
+
+    Args:
+        rue: Rue et numéro (ex: "Rte de Genève 5")
+
+    Returns:
+        Forme canonique (ex: "route de geneve 5")
+    """
+    return _expand_abbreviations(normalize_text(rue))
+
+
+def normalize_locality(localite: Optional[str]) -> str:
+    """
+    Normalise une localité
+
+    Args:
+        localite: Localité (ex: "St-Prex")
+
+    Returns:
+        Forme canonique (ex: "saint prex")
+    """
+    return _expand_abbreviations(normalize_text(localite))
+
+
+def normalize_npa(npa: Optional[str]) -> str:
+    """Normalise un code postal (chiffres uniquement)"""
+    return re.sub(r"\D", "", str(npa or ""))
+
+
+def normalize_address(adresse: Optional[str]) -> str:
+    """
+    Normalise une adresse complète sur une ligne
+
+    Args:
+        adresse: Adresse libre (ex: "Rte de Genève 5, 1180 Rolle, Suisse")
+
+    Returns:
+        Forme canonique (ex: "route de geneve 5 1180 rolle suisse")
+    """
+    return _expand_abbreviations(normalize_text(adresse))
+
+
+# ==========================================
+# CLÉS CANONIQUES
+# ==========================================
+
+class AddressKey:
+    """
+    Clé de cache d'adresse
+
+    L'égalité et le hash portent uniquement sur la forme canonique
+    (rue, npa, localité), tandis que les valeurs d'origine sont conservées
+    pour interroger les API externes avec le texte saisi par l'utilisateur.
+    """
+
+    __slots__ = ("rue", "npa", "localite", "raw_rue", "raw_npa", "raw_localite")
+
+    def __init__(self, rue: str, npa: str, localite: str):
+        """
+        Initialise la clé
+
+        Args:
+            rue: Rue et numéro
+            npa: Code postal
+            localite: Localité
+        """
+        self.raw_rue = rue
+        self.raw_npa = npa
+        self.raw_localite = localite
+        self.rue = normalize_street(rue)
+        self.npa = normalize_npa(npa)
+        self.localite = normalize_locality(localite)
+
+    def as_tuple(self) -> Tuple[str, str, str]:
+        """Retourne la forme canonique (rue, npa, localité)"""
+        return (self.rue, self.npa, self.localite)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, AddressKey):
+            return NotImplemented
+        return self.as_tuple() == other.as_tuple()
+
+    def __hash__(self) -> int:
+        return hash(self.as_tuple())
+
+    def __repr__(self) -> str:
+        return f"AddressKey({self.rue!r}, {self.npa!r}, {self.localite!r})"
+
+
+def address_key(rue: str, npa: str, localite: str) -> AddressKey:
+    """
+    Construit la clé canonique d'une adresse
+
+    Args:
+        rue: Rue et numéro
+        npa: Code postal
+        localite: Localité
+
+    Returns:
+        AddressKey utilisable comme clé de dictionnaire ou de lru_cache
+    """
+    return AddressKey(rue, npa, localite)
+
+
+# ==========================================
+# COMPARAISON PAR MOTS
+# ==========================================
+
+def street_tokens(rue: Optional[str], min_length: int = 3) -> List[str]:
+    """
+    Extrait les mots significatifs d'une rue
+
+    Ignore les types de rue, les articles, les numéros et les mots trop courts.
+
+    Args:
+        rue: Rue et numéro (ex: "Chem. du Treizou 21")
+        min_length: Longueur minimale d'un mot significatif
+
+    Returns:
+        Liste de mots normalisés (ex: ["treizou"])
+    """
+    return [
+        word for word in normalize_street(rue).split()
+        if len(word) >= min_length
+        and word not in STREET_TYPE_WORDS
+        and word not in STOP_WORDS
+        and not word.isdigit()
+    ]
+
+
+def contains_phrase(text: str, phrase: str) -> bool:
+    """
+    Vérifie si une phrase normalisée apparaît comme suite de mots entiers dans un texte normalisé
+
+    Args:
+        text: Texte normalisé
+        phrase: Phrase normalisée
+
+    Returns:
+        True si la phrase est présente
+    """
+    if not phrase:
+        return False
+    return f" {phrase} " in f" {text} "
+
+
+def house_numbers(rue: Optional[str]) -> List[str]:
+    """
+    Extrait les numéros de maison d'une rue
+
+    Args:
+        rue: Rue et numéro (ex: "Rte de Genève 5b")
+
+    Returns:
+        Numéros normalisés (ex: ["5b"])
+    """
+    return [word for word in normalize_street(rue).split() if HOUSE_NUMBER_PATTERN.match(word)]
+
+
+def address_matches(text: str, rue: str, localite: str, same_number: bool = False) -> bool:
+    """
+    Vérifie qu'un libellé (nom de dossier, titre Notion) correspond à une adresse
+
+    La localité doit être présente et au moins un mot significatif de la rue aussi.
+
+    Args:
+        text: Libellé à tester (ex: "202512_Chem. du Treizou 21_Trélex")
+        rue: Rue recherchée
+        localite: Localité recherchée
+        same_number: Exiger aussi les numéros de maison de la rue (même bâtiment)
+
+    Returns:
+        True si le libellé correspond
+    """
+    normalized = normalize_address(text)
+    if not contains_phrase(normalized, normalize_locality(localite)):
+        return False
+
+    words = set(normalized.split())
+    if same_number and not all(number in words for number in house_numbers(rue)):
+        return False
+    return any(token in words for token in street_tokens(rue))
@@ -9,6 +9,8 @@ import json
 from typing import Dict, Optional, Any
 from functools import wraps
 
+from http_client import get_client
+
 logger = logging.getLogger(__name__)
 
 
@@ -46,6 +48,7 @@ class BexioClient:
     - Gestion d'erreurs robuste
     - Logging détaillé
     - Timeout configuré
+    - Session poolée et retries (http_client)
     - Headers standardisés
     """
 
@@ -64,6 +67,7 @@ class BexioClient:
             "Authorization": f"Bearer {api_token}"
         }
         self.timeout = 30  # Timeout en secondes
+        self.http = get_client()
 
     @safe_api_call
     def get(self, endpoint: str, params: Optional[Dict] = None) -> Any:
@@ -83,7 +87,7 @@ class BexioClient:
         url = f"{self.base_url}{endpoint}"
         logger.debug(f"GET {url} avec params: {params}")
 
-        response = requests.get(
+        response = self.http.get(
             url,
             headers=self.headers,
             params=params,
@@ -112,7 +116,7 @@ class BexioClient:
         logger.debug(f"POST {url}")
         logger.debug(f"Payload: {json.dumps(data, indent=2, ensure_ascii=False)}")
 
-        response = requests.post(
+        response = self.http.post(
             url,
             headers=self.headers,
             json=data,
@@ -154,7 +158,7 @@ class BexioClient:
         url = f"{self.base_url}{endpoint}"
         logger.debug(f"PUT {url}")
 
-        response = requests.put(
+        response = self.http.put(
             url,
             headers=self.headers,
             json=data,
@@ -183,7 +187,7 @@ class BexioClient:
         logger.debug(f"PATCH {url}")
         logger.debug(f"Payload: {json.dumps(data, indent=2, ensure_ascii=False)}")
 
-        response = requests.patch(
+        response = self.http.patch(
             url,
             headers=self.headers,
             json=data,
@@ -224,7 +228,7 @@ class BexioClient:
         url = f"{self.base_url}{endpoint}"
         logger.debug(f"DELETE {url}")
 
-        response = requests.delete(
+        response = self.http.delete(
             url,
             headers=self.headers,
             timeout=self.timeout
@@ -249,6 +253,41 @@ class BexioClient:
         """
         return self.get("/2.0/contact", params={"search": search_term})
 
+    def list_contacts(self, offset: int = 0, limit: int = 2000, order_by: str = "id") -> list:
+        """
+        Liste une page de contacts (parcours complet)
+
+        Args:
+            offset: Nombre de contacts à sauter
+            limit: Taille de la page (maximum Bexio: 2000)
+            order_by: Champ de tri
+
+        Returns:
+            Liste de contacts
+        """
+        return self.get("/2.0/contact", params={"offset": offset, "limit": limit, "order_by": order_by})
+
+    def search_contacts_by_criteria(
+        self,
+        criteria: list,
+        offset: int = 0,
+        limit: int = 2000,
+        order_by: str = "id"
+    ) -> list:
+        """
+        Recherche des contacts par critères (POST /2.0/contact/search)
+
+        Args:
+            criteria: Liste de {"field", "value", "criteria"} (ex: updated_at >= ...)
+            offset: Nombre de contacts à sauter
+            limit: Taille de la page (maximum Bexio: 2000)
+            order_by: Champ de tri
+
+        Returns:
+            Liste de contacts
+        """
+        return self.post(f"/2.0/contact/search?offset={offset}&limit={limit}&order_by={order_by}", criteria)
+
     def create_contact(self, contact_data: Dict) -> Dict:
         """
         Crée un nouveau contact dans Bexio
@@ -0,0 +1,324 @@
+# -*- coding: utf-8 -*-
+"""
+Miroir local SQLite des contacts Bexio
+Chargement complet paginé, rafraîchissement incrémental (updated_at) et recherche
+par email, nom normalisé et type de contact sans appel à l'API
+"""
+
+import json
+import os
+import sqlite3
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from address_normalizer import normalize_text
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_FILE = Path(__file__).resolve().parent.parent / "bexio_contacts.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS contacts (
+    id INTEGER PRIMARY KEY,
+    contact_type_id INTEGER,
+    mail TEXT,
+    name_key TEXT,
+    updated_at TEXT,
+    contact_json TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_contacts_mail ON contacts (mail);
+CREATE INDEX IF NOT EXISTS idx_contacts_name ON contacts (name_key, contact_type_id);
+CREATE TABLE IF NOT EXISTS contact_relations (
+    company_id INTEGER NOT NULL,
+    contact_sub_id INTEGER NOT NULL,
+    PRIMARY KEY (company_id, contact_sub_id)
+);
+CREATE TABLE IF NOT EXISTS relation_state (
+    company_id INTEGER PRIMARY KEY,
+    fetched_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sync_state (
+    base_url TEXT PRIMARY KEY,
+    updated_at TEXT,
+    full_sync_at REAL
+);
+"""
+
+
+def contact_name_key(name: Optional[str]) -> str:
+    """Clé de recherche d'un nom (casse, accents et ponctuation ignorés)"""
+    return normalize_text(name)
+
+
+class BexioContactMirror:
+    """
+    Copie locale des contacts Bexio
+
+    - sync(): parcours complet paginé, ou seulement les contacts modifiés depuis
+      le dernier updated_at connu (POST /2.0/contact/search)
+    - refresh(): synchronisation incrémentale, complète si la dernière date de plus de FULL_SYNC_INTERVAL
+      (seul un parcours complet voit les contacts supprimés dans Bexio). Lancée en
+      arrière-plan par la planification "sync_contacts_bexio", jamais pendant un devis
+    - is_stale(): miroir jamais chargé ou parcours complet plus ancien que STALE_AFTER
+      (synchronisation planifiée arrêtée): les recherches repassent alors par l'API
+    - find_by_email() / find_by_name(): recherches locales indexées
+    - record_contact(): écriture directe (write-through) après création ou mise à jour
+    - get_relations() / record_relations() / invalidate_relations(): cache des personnes
+      de contact par entreprise (vidé à chaque parcours complet)
+    """
+
+    PAGE_SIZE = 2000
+    FULL_SYNC_INTERVAL = 24 * 3600
+    # Un parcours complet manqué est toléré
+    STALE_AFTER = 2 * FULL_SYNC_INTERVAL
+
+    def __init__(self, bexio_client, db_path: Optional[Path] = None):
+        """
+        Initialise le miroir
+
+        Args:
+            bexio_client: Instance de BexioClient
+            db_path: Fichier SQLite (par défaut: bexio_contacts.db à la racine, ou $BEXIO_CONTACT_MIRROR_PATH)
+        """
+        self.bexio = bexio_client
+        if db_path is None:
+            db_path = Path(os.environ.get("BEXIO_CONTACT_MIRROR_PATH", DEFAULT_DB_FILE))
+        self.db_path = Path(db_path)
+
+        # Connexion partagée entre threads, accès sérialisés par le verrou
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        """Ferme la connexion SQLite"""
+        self.conn.close()
+
+    # ==========================================
+    # SYNCHRONISATION
+    # ==========================================
+
+    def _state(self) -> Optional[sqlite3.Row]:
+        return self.conn.execute(
+            "SELECT updated_at, full_sync_at FROM sync_state WHERE base_url = ?", (self.bexio.base_url,)
+        ).fetchone()
+
+    def _iter_contacts(self, since: Optional[str]) -> Iterator[Dict]:
+        """Parcourt les contacts page par page (tous, ou modifiés depuis since)"""
+        offset = 0
+        while True:
+            if since:
+                # >= : updated_at est à la seconde, un contact modifié dans la même seconde n'est pas perdu
+                page = self.bexio.search_contacts_by_criteria(
+                    [{"field": "updated_at", "value": since, "criteria": ">="}],
+                    offset=offset, limit=self.PAGE_SIZE, order_by="updated_at"
+                )
+            else:
+                page = self.bexio.list_contacts(offset=offset, limit=self.PAGE_SIZE)
+
+            for contact in page:
+                yield contact
+
+            if len(page) < self.PAGE_SIZE:
+                break
+            offset += len(page)
+
+    def sync(self, full: bool = False) -> int:
+        """
+        Synchronise le miroir avec Bexio
+
+        Args:
+            full: True pour tout re-télécharger (les contacts supprimés sont alors retirés)
+
+        Returns:
+            Nombre de contacts reçus
+        """
+        with self._lock:
+            state = self._state()
+            since = None if full or state is None else state["updated_at"]
+            full = since is None
+            latest = since
+            seen_ids = set()
+            count = 0
+
+            for contact in self._iter_contacts(since):
+                self._upsert(contact)
+                seen_ids.add(contact["id"])
+                count += 1
+                updated = contact.get("updated_at")
+                if updated and (latest is None or updated > latest):
+                    latest = updated
+
+            full_sync_at = state["full_sync_at"] if state is not None else None
+            if full:
+                for row in self.conn.execute("SELECT id FROM contacts").fetchall():
+                    if row["id"] not in seen_ids:
+                        self.conn.execute("DELETE FROM contacts WHERE id = ?", (row["id"],))
+                self.conn.execute("DELETE FROM contact_relations")
+                self.conn.execute("DELETE FROM relation_state")
+                full_sync_at = time.time()
+
+            self.conn.execute(
+                "INSERT OR REPLACE INTO sync_state (base_url, updated_at, full_sync_at) VALUES (?, ?, ?)",
+                (self.bexio.base_url, latest, full_sync_at)
+            )
+            self.conn.commit()
+
+        logger.info(f"🔄 Miroir contacts Bexio: {count} contact(s) synchronisé(s){' (complet)' if full else ''}")
+        return count
+
+    def refresh(self) -> int:
+        """
+        Synchronisation incrémentale, ou complète si la dernière date de plus de FULL_SYNC_INTERVAL
+
+        Returns:
+            Nombre de contacts reçus
+        """
+        with self._lock:
+            state = self._state()
+            stale = (
+                state is None
+                or state["full_sync_at"] is None
+                or time.time() - state["full_sync_at"] > self.FULL_SYNC_INTERVAL
+            )
+            return self.sync(full=stale)
+
+    def is_stale(self) -> bool:
+        """
+        True si le miroir n'a jamais été chargé ou si son dernier parcours complet
+        date de plus de STALE_AFTER
+        """
+        with self._lock:
+            state = self._state()
+        return (
+            state is None
+            or state["full_sync_at"] is None
+            or time.time() - state["full_sync_at"] > self.STALE_AFTER
+        )
+
+    # ==========================================
+    # ÉCRITURE
+    # ==========================================
+
+    def _upsert(self, contact: Dict):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO contacts (id, contact_type_id, mail, name_key, updated_at, contact_json) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                contact["id"],
+                contact.get("contact_type_id"),
+                (contact.get("mail") or "").strip().lower(),
+                contact_name_key(contact.get("name_1")),
+                contact.get("updated_at"),
+                json.dumps(contact, ensure_ascii=False),
+            )
+        )
+
+    def record_contact(self, contact: Dict):
+        """
+        Enregistre un contact renvoyé par l'API (write-through après POST/PATCH)
+
+        Args:
+            contact: Objet contact Bexio complet
+        """
+        if not contact or "id" not in contact:
+            return
+        with self._lock:
+            self._upsert(contact)
+            self.conn.commit()
+
+    # ==========================================
+    # RECHERCHE
+    # ==========================================
+
+    def _find(self, column: str, value: str, contact_type: Optional[int]) -> Optional[Dict]:
+        if not value:
+            return None
+        query = f"SELECT contact_json FROM contacts WHERE {column} = ?"
+        params = [value]
+        if contact_type is not None:
+            query += " AND contact_type_id = ?"
+            params.append(contact_type)
+        # Plus ancien contact en premier, comme l'ordre par défaut de Bexio
+        query += " ORDER BY id LIMIT 1"
+        with self._lock:
+            row = self.conn.execute(query, params).fetchone()
+        return json.loads(row["contact_json"]) if row else None
+
+    def find_by_email(self, email: str, contact_type: Optional[int] = None) -> Optional[Dict]:
+        """
+        Cherche un contact par email exact (insensible à la casse)
+
+        Args:
+            email: Adresse email
+            contact_type: Type de contact (1=Privé, 2=Société) ou None
+
+        Returns:
+            Contact trouvé ou None
+        """
+        return self._find("mail", (email or "").strip().lower(), contact_type)
+
+    def find_by_name(self, name: str, contact_type: Optional[int] = None) -> Optional[Dict]:
+        """
+        Cherche un contact par nom (name_1) normalisé
+
+        Args:
+            name: Nom à rechercher
+            contact_type: Type de contact (1=Privé, 2=Société) ou None
+
+        Returns:
+            Contact trouvé ou None
+        """
+        return self._find("name_key", contact_name_key(name), contact_type)
+
+    # ==========================================
+    # RELATIONS ENTREPRISE-PERSONNE
+    # ==========================================
+
+    def get_relations(self, company_id: int) -> Optional[List[int]]:
+        """
+        Personnes de contact connues d'une entreprise
+
+        Args:
+            company_id: ID de l'entreprise
+
+        Returns:
+            Liste des contact_sub_id, ou None si les relations ne sont pas en cache
+        """
+        with self._lock:
+            if self.conn.execute("SELECT 1 FROM relation_state WHERE company_id = ?", (company_id,)).fetchone() is None:
+                return None
+            rows = self.conn.execute(
+                "SELECT contact_sub_id FROM contact_relations WHERE company_id = ? ORDER BY contact_sub_id", (company_id,)
+            ).fetchall()
+        return [row["contact_sub_id"] for row in rows]
+
+    def record_relations(self, company_id: int, relations: List[Dict]):
+        """
+        Remplace les relations en cache d'une entreprise
+
+        Args:
+            company_id: ID de l'entreprise
+            relations: Réponse de GET /2.0/contact/{id}/contact_relation
+        """
+        with self._lock:
+            self.conn.execute("DELETE FROM contact_relations WHERE company_id = ?", (company_id,))
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO contact_relations (company_id, contact_sub_id) VALUES (?, ?)",
+                [(company_id, rel["contact_sub_id"]) for rel in relations if rel.get("contact_sub_id") is not None]
+            )
+            self.conn.execute(
+                "INSERT OR REPLACE INTO relation_state (company_id, fetched_at) VALUES (?, ?)", (company_id, time.time())
+            )
+            self.conn.commit()
+
+    def invalidate_relations(self, company_id: int):
+        """Oublie les relations en cache d'une entreprise (après création d'une relation)"""
+        with self._lock:
+            self.conn.execute("DELETE FROM contact_relations WHERE company_id = ?", (company_id,))
+            self.conn.execute("DELETE FROM relation_state WHERE company_id = ?", (company_id,))
+            self.conn.commit()
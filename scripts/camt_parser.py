@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+Lecture des relevés bancaires ISO 20022 (camt.053 / camt.054)
+Extrait les crédits reçus pour le rapprochement des factures
+"""
+
+import re
+import logging
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def _local(tag: str) -> str:
+    """Nom de balise sans espace de noms ("{urn:...}Ntry" -> "Ntry")"""
+    return tag.rsplit("}", 1)[-1]
+
+
+def _child(element: Optional[ET.Element], *path: str) -> Optional[ET.Element]:
+    """Descend un chemin de balises en ignorant les espaces de noms"""
+    for name in path:
+        if element is None:
+            return None
+        element = next((c for c in element if _local(c.tag) == name), None)
+    return element
+
+
+def _text(element: Optional[ET.Element], *path: str) -> str:
+    found = _child(element, *path)
+    return (found.text or "").strip() if found is not None else ""
+
+
+def _iter(element: ET.Element, name: str):
+    """Parcourt tous les descendants portant un nom de balise donné"""
+    return (e for e in element.iter() if _local(e.tag) == name)
+
+
+def normalize_reference(value: str) -> str:
+    """Normalise une référence (majuscules, sans espaces ni ponctuation)"""
+    return re.sub(r"[^A-Z0-9]", "", (value or "").upper())
+
+
+def reference_pattern(document_nr: str) -> re.Pattern:
+    """
+    Motif d'un numéro de document comme mot entier, séparateurs tolérés
+
+    "RE-00123" est trouvé dans "Facture RE 00123 merci", mais "RE-0001" ne
+    correspond pas à "RE-00012" (le chiffre suivant fait partie du numéro).
+
+    Args:
+        document_nr: Numéro de document Bexio (ex: "RE-00123")
+
+    Returns:
+        Expression régulière à appliquer à un texte en majuscules
+    """
+    chars = normalize_reference(document_nr)
+    return re.compile(r"(?<![A-Z0-9])" + r"[^A-Z0-9]*".join(map(re.escape, chars)) + r"(?![A-Z0-9])")
+
+
+def parse_camt_credits(path: Path) -> List[Dict]:
+    """
+    Extrait les crédits d'un fichier camt.053 ou camt.054
+
+    Une écriture groupée (plusieurs TxDtls) produit un paiement par transaction.
+
+    Args:
+        path: Fichier XML exporté depuis l'e-banking
+
+    Returns:
+        Liste de dicts: montant (float), devise, date, reference (QR/SCOR), texte (communication libre)
+    """
+    root = ET.parse(str(path)).getroot()
+    credits = []
+
+    for entry in _iter(root, "Ntry"):
+        if _text(entry, "CdtDbtInd") != "CRDT":
+            continue
+
+        entry_amount = _child(entry, "Amt")
+        date = _text(entry, "BookgDt", "Dt") or _text(entry, "ValDt", "Dt")
+        transactions = list(_iter(entry, "TxDtls")) or [entry]
+
+        for tx in transactions:
+            amount = _child(tx, "Amt")
+            if amount is None:
+                amount = _child(tx, "AmtDtls", "TxAmt", "Amt")
+            if amount is None and len(transactions) == 1:
+                amount = entry_amount
+            if amount is None:
+                continue
+
+            reference = _text(tx, "RmtInf", "Strd", "CdtrRefInf", "Ref")
+            texte = " ".join(
+                (e.text or "").strip() for e in _iter(tx, "Ustrd")
+            ) or _text(entry, "AddtlNtryInf")
+
+            try:
+                montant = float(amount.text)
+            except (TypeError, ValueError):
+                logger.warning(f"⚠️  Montant illisible dans le relevé: {amount.text!r}")
+                continue
+
+            credits.append({
+                "montant": montant,
+                "devise": amount.get("Ccy", "CHF"),
+                "date": date,
+                "reference": reference,
+                "texte": texte,
+            })
+
+    logger.info(f"🏦 {len(credits)} crédit(s) lu(s) dans {Path(path).name}")
+    return credits
@@ -10,13 +10,18 @@ import logging
 from pathlib import Path
 from typing import Dict, Any, Optional
 
-# Configuration du logger
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Désactiver le proxy PythonAnywhere pour les appels API externes
-os.environ['NO_PROXY'] = '*'
-os.environ['no_proxy'] = '*'
+
+def disable_proxy():
+    """
+    Désactive le proxy PythonAnywhere pour les appels API externes
+
+    À appeler par le script avant ses premiers appels HTTP (l'import du module
+    ne modifie pas l'environnement).
+    """
+    os.environ['NO_PROXY'] = '*'
+    os.environ['no_proxy'] = '*'
 
 
 class ConfigManager:
@@ -5,8 +5,11 @@ Gère la création et la recherche de contacts (Privé et Société)
 """
 
 import logging
-from typing import Dict, Optional
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
 from bexio_client import BexioClient
+import metrics_store
 
 logger = logging.getLogger(__name__)
 
@@ -20,15 +23,19 @@ class ContactManager:
     - Société: Entreprise avec personne de contact associée
     """
 
-    def __init__(self, bexio_client: BexioClient, config: dict):
+    def __init__(self, bexio_client: BexioClient, config: dict, contact_mirror=None):
         """
         Initialise le gestionnaire de contacts
 
         Args:
             bexio_client: Instance du client Bexio
             config: Configuration contenant CONTACT_TYPES, SALUTATIONS, BEXIO_IDS
+            contact_mirror: BexioContactMirror optionnel (recherches locales, write-through),
+                synchronisé en arrière-plan: jamais rafraîchi pendant un devis
         """
         self.bexio = bexio_client
+        self.mirror = contact_mirror
+        self._mirror_stale = None
         self.contact_types = config.get("CONTACT_TYPES", {"Privé": 1, "Société": 2})
         self.salutations = config.get("SALUTATIONS", {"Mme": 1, "M.": 2, "Mx": None})
         self.bexio_ids = config.get("BEXIO_IDS", {})
@@ -148,6 +155,7 @@ class ContactManager:
 
         # Créer le contact
         created_contact = self.bexio.create_contact(payload)
+        self._record_contact(created_contact)
 
         # Vérifier immédiatement le type du contact créé
         logger.info(f"   ✅ Contact créé - ID: {created_contact.get('id')}, contact_type_id: {created_contact.get('contact_type_id')}")
@@ -162,6 +170,7 @@ class ContactManager:
                 "address": data["rue_facturation"]
             }
             updated_contact = self.bexio.update_contact(created_contact['id'], update_payload)
+            self._record_contact(updated_contact)
             logger.info(f"   ✅ Adresse mise à jour: {data['rue_facturation']}")
             return updated_contact
         except Exception as e:
@@ -184,36 +193,64 @@ class ContactManager:
         """
         logger.info(f"🏢 Gestion contact entreprise: {data['nom_entreprise']}")
 
-        # 1. Chercher/créer l'entreprise
+        # 1. et 2. Entreprise et personne de contact sont indépendantes: en parallèle
+        # (copy_context: les appels des threads restent rattachés au span de trace courant)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            company_future = executor.submit(contextvars.copy_context().run, self._get_or_create_company, data)
+            person_future = executor.submit(contextvars.copy_context().run, self._get_or_create_person, data)
+            company, company_created = company_future.result()
+            person, person_created = person_future.result()
+
+        # 3. Créer l'association si elle n'existe pas
+        self._ensure_contact_relation(company["id"], person["id"], is_new=company_created or person_created)
+
+        return {
+            "contact_id": company["id"],
+            "contact_sub_id": person["id"]
+        }
+
+    def _get_or_create_company(self, data: dict) -> Tuple[dict, bool]:
+        """
+        Cherche l'entreprise par nom, la crée si elle n'existe pas
+
+        Args:
+            data: Données du formulaire
+
+        Returns:
+            (entreprise, True si elle vient d'être créée)
+        """
         company = self._search_contact_by_name(
             data["nom_entreprise"],
             contact_type=self.contact_types["Société"]
         )
 
-        if not company:
-            logger.info(f"   → Création d'une nouvelle entreprise")
-            company = self._create_company_contact(data)
-        else:
+        if company:
             logger.info(f"   → Entreprise existante trouvée (ID: {company['id']})")
+            return company, False
+
+        logger.info(f"   → Création d'une nouvelle entreprise")
+        return self._create_company_contact(data), True
+
+    def _get_or_create_person(self, data: dict) -> Tuple[dict, bool]:
+        """
+        Cherche la personne de contact par email, la crée si elle n'existe pas
 
-        # 2. Chercher/créer la personne de contact
+        Args:
+            data: Données du formulaire
+
+        Returns:
+            (personne, True si elle vient d'être créée)
+        """
         person = None
         if data.get("email"):
             person = self._search_contact_by_email(data["email"])
 
-        if not person:
-            logger.info(f"   → Création d'un nouveau contact pour {data['prenom']} {data['nom_famille']}")
-            person = self._create_private_contact(data)
-        else:
+        if person:
             logger.info(f"   → Personne existante trouvée (ID: {person['id']})")
+            return person, False
 
-        # 3. Créer l'association si elle n'existe pas
-        self._ensure_contact_relation(company["id"], person["id"])
-
-        return {
-            "contact_id": company["id"],
-            "contact_sub_id": person["id"]
-        }
+        logger.info(f"   → Création d'un nouveau contact pour {data['prenom']} {data['nom_famille']}")
+        return self._create_private_contact(data), True
 
     def _create_company_contact(self, data: dict) -> dict:
         """
@@ -239,6 +276,7 @@ class ContactManager:
 
         logger.debug(f"   📤 Payload entreprise: {payload}")
         created_company = self.bexio.create_contact(payload)
+        self._record_contact(created_company)
 
         # Mettre à jour l'adresse via un UPDATE
         try:
@@ -247,44 +285,105 @@ class ContactManager:
                 "address": data["rue_facturation"]
             }
             updated_company = self.bexio.update_contact(created_company['id'], update_payload)
+            self._record_contact(updated_company)
             logger.info(f"   ✅ Adresse mise à jour: {data['rue_facturation']}")
             return updated_company
         except Exception as e:
             logger.warning(f"   ⚠️  Impossible de mettre à jour l'adresse: {e}")
             return created_company
 
-    def _ensure_contact_relation(self, company_id: int, person_id: int):
+    def _ensure_contact_relation(self, company_id: int, person_id: int, is_new: bool = False):
         """
         Vérifie et crée l'association entreprise-personne si nécessaire
 
         Args:
             company_id: ID de l'entreprise
             person_id: ID de la personne
+            is_new: True si l'entreprise ou la personne vient d'être créée (aucune relation possible)
         """
         try:
-            # Récupérer les relations existantes
-            relations = self.bexio.get_contact_relations(company_id)
-
-            # Vérifier si l'association existe déjà
-            for rel in relations:
-                if rel.get("contact_sub_id") == person_id:
+            if not is_new:
+                # Relations en cache: aucun appel si l'association est déjà connue
+                cached = self._mirror_call("get_relations", company_id)
+                metrics_store.record_cache("bexio_relations", cached is not None and person_id in cached)
+                if cached is not None and person_id in cached:
                     logger.info(f"   → Association entreprise-personne déjà existante")
                     return
 
+                # Récupérer les relations existantes
+                relations = self.bexio.get_contact_relations(company_id)
+                self._mirror_call("record_relations", company_id, relations)
+
+                # Vérifier si l'association existe déjà
+                for rel in relations:
+                    if rel.get("contact_sub_id") == person_id:
+                        logger.info(f"   → Association entreprise-personne déjà existante")
+                        return
+
             # Créer l'association
             self.bexio.create_contact_relation(company_id, person_id)
+            self._mirror_call("invalidate_relations", company_id)
             logger.info(f"   → Association entreprise-personne créée")
 
         except Exception as e:
             logger.warning(f"⚠️  Erreur lors de la création de l'association: {e}")
 
+    # ==========================================
+    # MIROIR LOCAL
+    # ==========================================
+
+    def _find_in_mirror(self, finder, *args) -> Optional[dict]:
+        """
+        Recherche dans le miroir local, sans le rafraîchir (planification "sync_contacts_bexio")
+
+        Un contact absent peut avoir été créé dans Bexio depuis la dernière
+        synchronisation: l'appelant le cherche alors avec ?search=, comme quand
+        le miroir est périmé.
+
+        Args:
+            finder: Méthode de recherche du miroir (find_by_email, find_by_name)
+            *args: Arguments de la recherche
+
+        Returns:
+            Contact trouvé, ou None (absent du miroir, ou miroir périmé)
+        """
+        if self._mirror_stale is None:
+            self._mirror_stale = self.mirror.is_stale()
+            if self._mirror_stale:
+                logger.warning("⚠️  Miroir de contacts périmé (synchronisation planifiée arrêtée?), recherche Bexio")
+        if self._mirror_stale:
+            return None
+        contact = finder(*args)
+        metrics_store.record_cache("bexio_contacts", contact is not None)
+        return contact
+
+    def _mirror_call(self, method: str, *args):
+        """
+        Appelle une méthode du miroir local sans jamais faire échouer le devis
+
+        Returns:
+            Résultat de la méthode, ou None (pas de miroir ou erreur)
+        """
+        if self.mirror is None:
+            return None
+        try:
+            return getattr(self.mirror, method)(*args)
+        except Exception as e:
+            logger.warning(f"⚠️  Miroir de contacts ({method}) indisponible: {e}")
+            return None
+
+    def _record_contact(self, contact: dict):
+        """Reporte un contact créé ou modifié dans le miroir local"""
+        self._mirror_call("record_contact", contact)
+
     # ==========================================
     # RECHERCHE
     # ==========================================
 
     def _search_contact_by_email(self, email: str) -> Optional[dict]:
         """
-        Recherche un contact par email
+        Recherche un contact par email: miroir local, puis /2.0/contact?search=
+        si absent du miroir ou miroir périmé (le contact trouvé y est alors enregistré)
 
         Args:
             email: Adresse email
@@ -295,6 +394,14 @@ class ContactManager:
         if not email:
             return None
 
+        if self.mirror is not None:
+            try:
+                contact = self._find_in_mirror(self.mirror.find_by_email, email)
+                if contact is not None:
+                    return contact
+            except Exception as e:
+                logger.warning(f"⚠️  Miroir de contacts indisponible, recherche Bexio: {e}")
+
         try:
             results = self.bexio.search_contacts(email)
             if not results:
@@ -304,6 +411,7 @@ class ContactManager:
             for contact in results:
                 contact_email = contact.get("mail") or ""
                 if contact_email.lower() == email.lower():
+                    self._record_contact(contact)
                     return contact
 
         except Exception as e:
@@ -317,7 +425,8 @@ class ContactManager:
         contact_type: Optional[int] = None
     ) -> Optional[dict]:
         """
-        Recherche un contact par nom
+        Recherche un contact par nom: miroir local, puis /2.0/contact?search=
+        si absent du miroir ou miroir périmé (le contact trouvé y est alors enregistré)
 
         Args:
             name: Nom à rechercher
@@ -329,6 +438,14 @@ class ContactManager:
         if not name:
             return None
 
+        if self.mirror is not None:
+            try:
+                contact = self._find_in_mirror(self.mirror.find_by_name, name, contact_type)
+                if contact is not None:
+                    return contact
+            except Exception as e:
+                logger.warning(f"⚠️  Miroir de contacts indisponible, recherche Bexio: {e}")
+
         try:
             results = self.bexio.search_contacts(name)
             if not results:
@@ -338,6 +455,7 @@ class ContactManager:
             for contact in results:
                 if contact.get("name_1", "").lower() == name.lower():
                     if contact_type is None or contact.get("contact_type_id") == contact_type:
+                        self._record_contact(contact)
                         return contact
 
         except Exception as e:
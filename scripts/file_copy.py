@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+Copie rapide de fichiers (templates CAO / Lesosai)
+Essaie dans l'ordre: reflink copy-on-write (FICLONE), os.copy_file_range,
+puis copie bufferisée. Les métadonnées sont copiées comme shutil.copy2.
+"""
+
+import os
+import errno
+import shutil
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# ioctl Linux: clone de fichier (Btrfs, XFS reflink=1, bcachefs...)
+FICLONE = 0x40049409
+
+BUFFER_SIZE = 1024 * 1024
+
+# Erreurs signifiant "stratégie non supportée ici" (et non une vraie erreur d'E/S)
+_UNSUPPORTED = {errno.EXDEV, errno.EINVAL, errno.ENOSYS, errno.EBADF, errno.EPERM, errno.ENOTTY,
+                getattr(errno, "EOPNOTSUPP", errno.ENOSYS), getattr(errno, "ENOTSUP", errno.ENOSYS)}
+
+
+class StrategyUnavailable(OSError):
+    """La stratégie de copie n'est pas disponible sur ce système de fichiers"""
+    pass
+
+
+def _reflink(src_fd: int, dst_fd: int, size: int):
+    try:
+        import fcntl
+    except ImportError:
+        raise StrategyUnavailable("reflink non disponible sur cette plateforme")
+    try:
+        fcntl.ioctl(dst_fd, FICLONE, src_fd)
+    except OSError as e:
+        if e.errno in _UNSUPPORTED:
+            raise StrategyUnavailable(str(e))
+        raise
+
+
+def _copy_file_range(src_fd: int, dst_fd: int, size: int):
+    if not hasattr(os, "copy_file_range"):
+        raise StrategyUnavailable("os.copy_file_range non disponible")
+    copied = 0
+    while copied < size:
+        try:
+            n = os.copy_file_range(src_fd, dst_fd, size - copied)
+        except OSError as e:
+            if copied == 0 and e.errno in _UNSUPPORTED:
+                raise StrategyUnavailable(str(e))
+            raise
+        if n == 0:
+            break
+        copied += n
+
+
+def _buffered(src_fd: int, dst_fd: int, size: int):
+    with open(src_fd, "rb", closefd=False) as fsrc, open(dst_fd, "wb", closefd=False) as fdst:
+        shutil.copyfileobj(fsrc, fdst, BUFFER_SIZE)
+
+
+STRATEGIES: Dict[str, Callable[[int, int, int], None]] = {
+    "reflink": _reflink,
+    "copy_file_range": _copy_file_range,
+    "buffered": _buffered,
+}
+
+
+def copy_file(source: Path, destination: Path, strategies: Optional[Iterable[str]] = None,
+              overwrite: bool = True) -> str:
+    """
+    Copie un fichier avec la stratégie la plus rapide disponible
+
+    Args:
+        source: Fichier source
+        destination: Fichier destination
+        strategies: Ordre des stratégies à essayer (défaut: toutes, de la plus rapide à la plus sûre)
+        overwrite: False pour ne jamais écraser une destination existante (création exclusive)
+
+    Returns:
+        Nom de la stratégie utilisée
+
+    Raises:
+        FileExistsError: Si overwrite est False et que la destination existe déjà
+        OSError: Si la copie échoue (ou si aucune stratégie n'est disponible)
+    """
+    names = list(strategies or STRATEGIES)
+    size = os.path.getsize(source)
+
+    with open(source, "rb") as fsrc, open(destination, "wb" if overwrite else "xb") as fdst:
+        src_fd, dst_fd = fsrc.fileno(), fdst.fileno()
+        try:
+            for name in names:
+                try:
+                    STRATEGIES[name](src_fd, dst_fd, size)
+                    break
+                except StrategyUnavailable as e:
+                    logger.debug(f"Copie {name} indisponible pour {source}: {e}")
+                    os.lseek(src_fd, 0, os.SEEK_SET)
+                    os.lseek(dst_fd, 0, os.SEEK_SET)
+                    os.ftruncate(dst_fd, 0)
+            else:
+                raise StrategyUnavailable(f"Aucune stratégie de copie disponible parmi {names}")
+        except BaseException:
+            # Ne pas laisser une copie partielle (elle passerait ensuite pour un fichier existant)
+            fdst.close()
+            os.unlink(destination)
+            raise
+
+    shutil.copystat(source, destination)
+    return name
+
+
+def copy_files(pairs: List[Tuple[Path, Path]], max_workers: int = 3, overwrite: bool = True) -> List[object]:
+    """
+    Copie plusieurs fichiers en parallèle
+
+    Args:
+        pairs: Liste de (source, destination)
+        max_workers: Nombre de copies simultanées
+        overwrite: False pour ne jamais écraser une destination existante (voir copy_file)
+
+    Returns:
+        Pour chaque paire, dans l'ordre: le nom de la stratégie utilisée, ou l'exception levée
+    """
+    def run(pair):
+        try:
+            return copy_file(*pair, overwrite=overwrite)
+        except OSError as e:
+            return e
+
+    if not pairs:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(pairs)))) as executor:
+        return list(executor.map(run, pairs))
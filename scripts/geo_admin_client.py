@@ -9,6 +9,9 @@ import logging
 from typing import Optional, Dict
 from functools import lru_cache
 from datetime import datetime
+from address_normalizer import AddressKey, address_key
+from http_client import get_client
+import metrics_store
 
 logger = logging.getLogger(__name__)
 
@@ -29,13 +32,14 @@ class GeoAdminClient:
     CACHE_SIZE = 100  # Nombre maximum d'entrées en cache
 
     @classmethod
-    @lru_cache(maxsize=CACHE_SIZE)
     def get_building_data_cached(cls, adresse: str, npa: str, localite: str) -> Optional[Dict]:
         """
         Version avec cache de get_building_data
 
-        Le cache est basé sur (adresse, npa, localite) et garde les 100 dernières recherches.
-        Cache vidé automatiquement lorsque plein (LRU = Least Recently Used).
+        Le cache est basé sur la forme normalisée de (adresse, npa, localite)
+        (voir address_normalizer) : "Rte de Genève 5" et "Route de Genève 5 "
+        partagent la même entrée. Il garde les 100 dernières recherches
+        (LRU = Least Recently Used).
 
         Args:
             adresse: Rue et numéro
@@ -45,8 +49,17 @@ class GeoAdminClient:
         Returns:
             Dictionnaire des données du bâtiment ou None si non trouvé
         """
-        logger.info(f"🔍 Recherche bâtiment (avec cache): {adresse}, {npa} {localite}")
-        return cls.get_building_data(adresse, npa, localite)
+        misses = cls._get_building_data_by_key.cache_info().misses
+        result = cls._get_building_data_by_key(address_key(adresse, npa, localite))
+        metrics_store.record_cache("geo_admin", cls._get_building_data_by_key.cache_info().misses == misses)
+        return result
+
+    @classmethod
+    @lru_cache(maxsize=CACHE_SIZE)
+    def _get_building_data_by_key(cls, key: AddressKey) -> Optional[Dict]:
+        """Recherche mise en cache sur la clé canonique, avec le texte d'origine pour l'API"""
+        logger.info(f"🔍 Recherche bâtiment (avec cache): {key.raw_rue}, {key.raw_npa} {key.raw_localite}")
+        return cls.get_building_data(key.raw_rue, key.raw_npa, key.raw_localite)
 
     @staticmethod
     def get_building_data(adresse: str, npa: str, localite: str) -> Optional[Dict]:
@@ -78,7 +91,7 @@ class GeoAdminClient:
         }
 
         try:
-            response = requests.get(GeoAdminClient.BASE_URL, params=params, timeout=30)
+            response = get_client().get(GeoAdminClient.BASE_URL, params=params, timeout=30)
             response.raise_for_status()
             data = response.json()
 
@@ -107,7 +120,7 @@ class GeoAdminClient:
                 "sr": "4326"  # WGS84 pour les coordonnées
             }
 
-            response = requests.get(feature_url, params=feature_params, timeout=30)
+            response = get_client().get(feature_url, params=feature_params, timeout=30)
             response.raise_for_status()
             feature_data = response.json()
 
@@ -172,7 +185,7 @@ class GeoAdminClient:
     @classmethod
     def clear_cache(cls):
         """Vide le cache des recherches de bâtiments"""
-        cls.get_building_data_cached.cache_clear()
+        cls._get_building_data_by_key.cache_clear()
         logger.info("🗑️  Cache geo.admin.ch vidé")
 
     @classmethod
@@ -183,4 +196,4 @@ class GeoAdminClient:
         Returns:
             Named tuple avec hits, misses, maxsize, currsize
         """
-        return cls.get_building_data_cached.cache_info()
+        return cls._get_building_data_by_key.cache_info()
@@ -0,0 +1,354 @@
+# -*- coding: utf-8 -*-
+"""
+Couche HTTP partagée des scripts (Bexio, Notion, geo.admin, Google, Graph)
+Une session poolée par hôte, timeout par défaut, retries avec backoff
+et métriques de latence / erreurs par hôte
+
+$HTTP_HOST_OVERRIDES redirige des hôtes vers d'autres URLs (serveurs locaux des
+benchmarks), ex: "api.bexio.com=http://127.0.0.1:8101,api3.geo.admin.ch=http://127.0.0.1:8102"
+$HTTP_FIXTURES_MODE enregistre ou rejoue les réponses (voir http_fixtures.py)
+"""
+
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import metrics_store
+import tracing
+from http_fixtures import HttpFixtures
+
+logger = logging.getLogger(__name__)
+
+# Timeout par défaut (secondes) appliqué quand l'appelant n'en précise pas
+DEFAULT_TIMEOUT = float(os.environ.get("HTTP_TIMEOUT", 30))
+
+# Retries: erreurs de connexion (toutes méthodes) et réponses 429/5xx (méthodes idempotentes)
+DEFAULT_RETRIES = int(os.environ.get("HTTP_RETRIES", 3))
+BACKOFF_FACTOR = 0.5
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+RETRY_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+# Connexions gardées ouvertes par hôte (threads des modes batch)
+POOL_SIZE = 10
+
+
+# ==========================================
+# MÉTRIQUES PAR HÔTE
+# ==========================================
+
+class HostMetrics:
+    """Compteurs d'un hôte: requêtes, erreurs, retries et latences"""
+
+    def __init__(self, host: str):
+        self.host = host
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.statuses: Dict[int, int] = {}
+
+    @property
+    def average_time(self) -> float:
+        return self.total_time / self.requests if self.requests else 0.0
+
+    def to_dict(self) -> Dict:
+        return {
+            "host": self.host,
+            "requests": self.requests,
+            "errors": self.errors,
+            "retries": self.retries,
+            "total_time": round(self.total_time, 4),
+            "max_time": round(self.max_time, 4),
+            "statuses": {str(k): v for k, v in sorted(self.statuses.items())},
+        }
+
+
+class HttpMetrics:
+    """Métriques HTTP agrégées par hôte (thread-safe)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hosts: Dict[str, HostMetrics] = {}
+
+    def record(self, host: str, duration: float, status: Optional[int] = None,
+               error: bool = False, retries: int = 0):
+        """
+        Enregistre une requête terminée
+
+        Args:
+            host: Hôte appelé
+            duration: Durée totale (retries compris) en secondes
+            status: Code HTTP final (None si exception)
+            error: True si exception réseau ou réponse 5xx
+            retries: Nombre de nouvelles tentatives effectuées
+        """
+        with self._lock:
+            metrics = self.hosts.get(host)
+            if metrics is None:
+                metrics = self.hosts[host] = HostMetrics(host)
+            metrics.requests += 1
+            metrics.total_time += duration
+            metrics.max_time = max(metrics.max_time, duration)
+            metrics.retries += retries
+            if error:
+                metrics.errors += 1
+            if status is not None:
+                metrics.statuses[status] = metrics.statuses.get(status, 0) + 1
+
+        # Mêmes mesures vers /metrics, agrégées entre processus
+        metrics_store.observe("http_request_duration_seconds", duration, {"host": host},
+                              help="Durée des appels HTTP sortants par hôte (retries compris)")
+        metrics_store.inc("http_requests_total", {"host": host, "status": status if status is not None else "exception"},
+                          help="Appels HTTP sortants par hôte et code de réponse")
+        if error:
+            metrics_store.inc("http_errors_total", {"host": host},
+                              help="Appels HTTP sortants en erreur (exception réseau ou 5xx)")
+        if retries:
+            metrics_store.inc("http_retries_total", {"host": host}, retries,
+                              help="Nouvelles tentatives HTTP par hôte")
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Copie des métriques {hôte: dict}"""
+        with self._lock:
+            return {host: m.to_dict() for host, m in self.hosts.items()}
+
+    def reset(self):
+        with self._lock:
+            self.hosts.clear()
+
+    def print_report(self):
+        """Affiche les appels, erreurs et latences par hôte"""
+        with self._lock:
+            hosts = sorted(self.hosts.values(), key=lambda m: m.host)
+        if not hosts:
+            return
+        print(f"\n[HTTP] Hotes:")
+        for m in hosts:
+            print(f"   {m.host:<32} {m.requests:4d} appel(s)  moy {m.average_time:5.2f}s  "
+                  f"max {m.max_time:5.2f}s  erreurs {m.errors}  retries {m.retries}")
+
+
+class StepReport:
+    """
+    Appels HTTP et durée par étape d'un script
+
+    Les compteurs sont pris sur les métriques globales avant/après chaque étape:
+    les appels faits en parallèle dans une étape lui sont bien attribués,
+    les étapes elles-mêmes doivent être séquentielles.
+    """
+
+    def __init__(self, metrics: Optional[HttpMetrics] = None):
+        self.metrics = metrics or get_client().metrics
+        self.steps: List[Dict] = []
+
+    def _totals(self) -> Dict[str, int]:
+        return {host: m["requests"] for host, m in self.metrics.snapshot().items()}
+
+    @contextmanager
+    def step(self, name: str):
+        """Mesure le bloc comme étape "name" (durée, appels par hôte, span de trace)"""
+        before = self._totals()
+        start = time.perf_counter()
+        try:
+            with tracing.span(name):
+                yield
+        finally:
+            duration = time.perf_counter() - start
+            calls = {
+                host: count - before.get(host, 0)
+                for host, count in self._totals().items()
+                if count - before.get(host, 0)
+            }
+            self.steps.append({"name": name, "duration": round(duration, 4), "calls": calls})
+
+    def print_report(self):
+        """Affiche durée et nombre d'appels HTTP de chaque étape"""
+        if not self.steps:
+            return
+        print(f"\n[HTTP] Etapes:")
+        for step in self.steps:
+            hosts = ", ".join(f"{host} {count}" for host, count in sorted(step["calls"].items()))
+            print(f"   {step['name']:<24} {step['duration']:6.2f}s  {sum(step['calls'].values()):3d} appel(s)"
+                  f"{'  (' + hosts + ')' if hosts else ''}")
+
+
+# ==========================================
+# SESSIONS
+# ==========================================
+
+def parse_host_overrides(value: Optional[str]) -> Dict[str, str]:
+    """
+    Lit une liste "hôte=url,hôte=url"
+
+    Args:
+        value: Valeur de $HTTP_HOST_OVERRIDES
+
+    Returns:
+        {hôte en minuscules: URL de base sans "/" final}
+    """
+    overrides = {}
+    for item in (value or "").split(","):
+        host, _, target = item.strip().partition("=")
+        if host and target:
+            overrides[host.strip().lower()] = target.strip().rstrip("/")
+    return overrides
+
+
+def resolve_url(url: str, host_overrides: Dict[str, str]) -> str:
+    """URL réellement appelée (hôte remplacé par sa cible dans host_overrides)"""
+    parts = urlsplit(url)
+    target = host_overrides.get(parts.netloc.lower())
+    if target is None:
+        return url
+    base = urlsplit(target)
+    return urlunsplit((base.scheme, base.netloc, base.path + parts.path, parts.query, parts.fragment))
+
+
+class HttpSession(requests.Session):
+    """Session d'un hôte: timeout par défaut, retries et mesure de chaque requête"""
+
+    def __init__(self, host: str, metrics: HttpMetrics, timeout: float = DEFAULT_TIMEOUT,
+                 retries: int = DEFAULT_RETRIES, host_overrides: Optional[Dict[str, str]] = None,
+                 fixtures: Optional[HttpFixtures] = None):
+        super().__init__()
+        self.host = host
+        self.metrics = metrics
+        self.timeout = timeout
+        self.host_overrides = host_overrides or {}
+        self.fixtures = fixtures
+
+        retry = Retry(
+            total=retries,
+            backoff_factor=BACKOFF_FACTOR,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=RETRY_METHODS,
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE, max_retries=retry)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
+    def request(self, method, url, *args, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+
+        with tracing.span(f"HTTP {method.upper()}", tracing.CLIENT,
+                          **{"http.request.method": method.upper(), "server.address": self.host,
+                             "url.path": urlsplit(url).path}) as span:
+            fixtures = self.fixtures if self.fixtures is not None and self.fixtures.handles(url) else None
+            start = time.perf_counter()
+            try:
+                if fixtures is not None and fixtures.mode == "replay":
+                    response = fixtures.replay(method, url, kwargs)
+                else:
+                    response = super().request(method, resolve_url(url, self.host_overrides), *args, **kwargs)
+                    if fixtures is not None:
+                        fixtures.record(method, url, kwargs, response, time.perf_counter() - start)
+            except requests.exceptions.RequestException:
+                self.metrics.record(self.host, time.perf_counter() - start, error=True)
+                raise
+
+            history = getattr(getattr(response.raw, "retries", None), "history", None) or ()
+            self.metrics.record(
+                self.host,
+                time.perf_counter() - start,
+                status=response.status_code,
+                error=response.status_code >= 500,
+                retries=len(history),
+            )
+            if span is not None:
+                span.set_attribute("http.response.status_code", response.status_code)
+                if history:
+                    span.set_attribute("http.request.resend_count", len(history))
+                if response.status_code >= 400:
+                    span.set_error(f"HTTP {response.status_code}")
+            return response
+
+
+class HttpClient:
+    """
+    Point d'entrée unique: choisit la session de l'hôte de chaque URL
+
+    S'utilise comme une requests.Session (get, post, put, patch, delete, request).
+    """
+
+    def __init__(self, timeout: float = DEFAULT_TIMEOUT, retries: int = DEFAULT_RETRIES,
+                 host_overrides: Optional[Dict[str, str]] = None, fixtures: Optional[HttpFixtures] = None):
+        self.timeout = timeout
+        self.retries = retries
+        if host_overrides is None:
+            host_overrides = parse_host_overrides(os.environ.get("HTTP_HOST_OVERRIDES"))
+        self.host_overrides = host_overrides
+        self.fixtures = fixtures if fixtures is not None else HttpFixtures.from_env()
+        self.metrics = HttpMetrics()
+        self._sessions: Dict[str, HttpSession] = {}
+        self._lock = threading.Lock()
+
+    def session(self, url: str) -> HttpSession:
+        """Retourne (ou crée) la session poolée de l'hôte de l'URL"""
+        host = urlsplit(url).netloc.lower()
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = self._sessions[host] = HttpSession(host, self.metrics, self.timeout, self.retries,
+                                                             self.host_overrides, self.fixtures)
+        return session
+
+    def resolve(self, url: str) -> str:
+        """URL réellement appelée (hôte redirigé par host_overrides)"""
+        return resolve_url(url, self.host_overrides)
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        # Redirection et cassette appliquées par la session: métriques sur l'hôte d'origine
+        return self.session(url).request(method, url, **kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url: str, **kwargs) -> requests.Response:
+        return self.request("PUT", url, **kwargs)
+
+    def patch(self, url: str, **kwargs) -> requests.Response:
+        return self.request("PATCH", url, **kwargs)
+
+    def delete(self, url: str, **kwargs) -> requests.Response:
+        return self.request("DELETE", url, **kwargs)
+
+    def close(self):
+        """Ferme toutes les sessions"""
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+
+_client: Optional[HttpClient] = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> HttpClient:
+    """Retourne le client HTTP partagé du processus"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
+
+
+def print_report():
+    """Affiche les métriques HTTP du processus (si des appels ont eu lieu)"""
+    if _client is not None:
+        _client.metrics.print_report()
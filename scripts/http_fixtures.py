@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""
+Enregistrement et rejeu des réponses HTTP (cassettes JSONL)
+
+Branché dans http_client: tous les appels des scripts (BexioClient, GeoAdminClient,
+QuoteCalculator, requêtes directes des scripts 202512_*) passent par là.
+
+- HTTP_FIXTURES_MODE=record: les requêtes partent normalement, chaque réponse est
+  ajoutée à la cassette
+- HTTP_FIXTURES_MODE=replay: aucune requête réseau, la réponse enregistrée est rendue
+  (HttpFixtureMissing si la requête n'a pas été enregistrée)
+- HTTP_FIXTURES: fichier de la cassette (défaut: http_fixtures.jsonl à la racine)
+- HTTP_REPLAY_LATENCY: délai ajouté au rejeu, en ms, ou "recorded" pour la durée enregistrée
+
+Ni les en-têtes de requête (Authorization) ni les paramètres de clé (key, token...)
+ne sont enregistrés; les hôtes d'authentification ne sont jamais enregistrés ni rejoués.
+
+Exemple (devis rejoué hors ligne, miroir de contacts vierge pour des requêtes identiques):
+    HTTP_FIXTURES_MODE=record HTTP_FIXTURES=devis.jsonl python scripts/202512_Creer_devis.py '<json>'
+    HTTP_FIXTURES_MODE=replay HTTP_FIXTURES=devis.jsonl BEXIO_CONTACT_MIRROR_PATH=/tmp/vide.db \\
+        python scripts/202512_Creer_devis.py '<json>'
+"""
+
+import os
+import json
+import time
+import base64
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FIXTURES_FILE = Path(__file__).resolve().parent.parent / "http_fixtures.jsonl"
+
+MODES = ("record", "replay")
+
+# Paramètres d'URL retirés avant enregistrement et comparaison (clés d'API)
+SECRET_PARAMS = frozenset({"key", "api_key", "apikey", "token", "access_token", "client_secret"})
+
+# Hôtes jamais enregistrés ni rejoués (jetons OAuth)
+PASSTHROUGH_HOSTS = frozenset({"login.microsoftonline.com"})
+
+# En-têtes de réponse conservés (Location: suivi des copies Graph)
+KEPT_HEADERS = ("Content-Type", "Location", "Retry-After")
+
+
+class HttpFixtureMissing(requests.exceptions.ConnectionError):
+    """Requête absente de la cassette en mode replay (traitée comme une erreur réseau)"""
+
+
+def _canonical_url(url: str, params=None) -> str:
+    """URL complète (params inclus) sans paramètres secrets, requête triée"""
+    if params:
+        url = requests.Request("GET", url, params=params).prepare().url
+    parts = urlsplit(url)
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                   if k.lower() not in SECRET_PARAMS)
+    return urlunsplit((parts.scheme, parts.netloc.lower(), parts.path, urlencode(query), ""))
+
+
+def _body_hash(kwargs: Dict) -> str:
+    if kwargs.get("json") is not None:
+        raw = json.dumps(kwargs["json"], sort_keys=True, ensure_ascii=False).encode("utf-8")
+    elif kwargs.get("data") is not None:
+        data = kwargs["data"]
+        if isinstance(data, dict):
+            raw = urlencode(sorted(data.items())).encode("utf-8")
+        elif isinstance(data, str):
+            raw = data.encode("utf-8")
+        elif isinstance(data, bytes):
+            raw = data
+        else:
+            # Flux (upload par morceaux): non comparable, seule l'URL compte
+            raw = b""
+    else:
+        raw = b""
+    return hashlib.sha256(raw).hexdigest()[:16]
+
+
+class HttpFixtures:
+    """Cassette d'une session d'enregistrement ou de rejeu (thread-safe)"""
+
+    def __init__(self, path: Path, mode: str, latency: Optional[str] = None):
+        """
+        Args:
+            path: Fichier JSONL de la cassette
+            mode: "record" ou "replay"
+            latency: Délai de rejeu en ms, "recorded", ou None (aucun)
+        """
+        if mode not in MODES:
+            raise ValueError(f"Mode de cassette inconnu: {mode} (attendu: {', '.join(MODES)})")
+        self.path = Path(path)
+        self.mode = mode
+        self.latency = latency
+        self._lock = threading.Lock()
+        self._entries: Optional[Dict[Tuple[str, str], List[Dict]]] = None
+        self._positions: Dict[Tuple, int] = {}
+
+    @classmethod
+    def from_env(cls) -> Optional["HttpFixtures"]:
+        """Cassette configurée par $HTTP_FIXTURES_MODE / $HTTP_FIXTURES, ou None"""
+        mode = os.environ.get("HTTP_FIXTURES_MODE", "").strip().lower()
+        if not mode:
+            return None
+        return cls(Path(os.environ.get("HTTP_FIXTURES") or DEFAULT_FIXTURES_FILE), mode,
+                   os.environ.get("HTTP_REPLAY_LATENCY") or None)
+
+    @staticmethod
+    def handles(url: str) -> bool:
+        """False pour les hôtes d'authentification (toujours appelés réellement)"""
+        return urlsplit(url).netloc.lower() not in PASSTHROUGH_HOSTS
+
+    # ==========================================
+    # ENREGISTREMENT
+    # ==========================================
+
+    def record(self, method: str, url: str, kwargs: Dict, response: requests.Response, duration: float):
+        """
+        Ajoute une réponse réelle à la cassette
+
+        Args:
+            method: Méthode HTTP
+            url: URL d'origine (avant redirection d'hôte)
+            kwargs: Arguments de la requête (params, json, data)
+            response: Réponse reçue (son contenu est lu)
+            duration: Durée de l'appel en secondes
+        """
+        content = response.content
+        try:
+            body, encoding = content.decode("utf-8"), "text"
+        except UnicodeDecodeError:
+            body, encoding = base64.b64encode(content).decode("ascii"), "base64"
+
+        entry = {
+            "method": method.upper(),
+            "url": _canonical_url(url, kwargs.get("params")),
+            "body_hash": _body_hash(kwargs),
+            "status": response.status_code,
+            "reason": response.reason,
+            "headers": {k: response.headers[k] for k in KEPT_HEADERS if k in response.headers},
+            "body": body,
+            "encoding": encoding,
+            "duration": round(duration, 4),
+        }
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+    # ==========================================
+    # REJEU
+    # ==========================================
+
+    def _load(self) -> Dict[Tuple[str, str], List[Dict]]:
+        if self._entries is None:
+            entries: Dict[Tuple[str, str], List[Dict]] = {}
+            if self.path.exists():
+                with open(self.path, encoding="utf-8") as f:
+                    for line in f:
+                        if line.strip():
+                            entry = json.loads(line)
+                            entries.setdefault((entry["method"], entry["url"]), []).append(entry)
+            self._entries = entries
+        return self._entries
+
+    def _next(self, key: Tuple, candidates: List[Dict]) -> Dict:
+        """Réponses d'une même requête rendues dans l'ordre enregistré, la dernière ensuite"""
+        position = self._positions.get(key, 0)
+        self._positions[key] = position + 1
+        return candidates[min(position, len(candidates) - 1)]
+
+    def replay(self, method: str, url: str, kwargs: Dict) -> requests.Response:
+        """
+        Réponse enregistrée pour la requête
+
+        Cherche d'abord même méthode, URL et corps; à défaut même méthode et URL
+        (corps contenant une date par exemple).
+
+        Raises:
+            HttpFixtureMissing: Si aucune réponse n'a été enregistrée pour cette URL
+        """
+        method = method.upper()
+        canonical = _canonical_url(url, kwargs.get("params"))
+        body_hash = _body_hash(kwargs)
+        with self._lock:
+            candidates = self._load().get((method, canonical), [])
+            exact = [e for e in candidates if e["body_hash"] == body_hash]
+            if exact:
+                entry = self._next((method, canonical, body_hash), exact)
+            elif candidates:
+                entry = self._next((method, canonical), candidates)
+            else:
+                entry = None
+        if entry is None:
+            raise HttpFixtureMissing(f"Aucune réponse enregistrée pour {method} {canonical} ({self.path})")
+
+        if self.latency == "recorded":
+            time.sleep(entry.get("duration", 0))
+        elif self.latency:
+            time.sleep(float(self.latency) / 1000)
+
+        response = requests.Response()
+        response.status_code = entry["status"]
+        response.reason = entry.get("reason")
+        response.headers = CaseInsensitiveDict(entry.get("headers", {}))
+        if entry.get("encoding") == "base64":
+            response._content = base64.b64decode(entry["body"])
+        else:
+            response._content = entry["body"].encode("utf-8")
+        response._content_consumed = True
+        response.encoding = "utf-8"
+        response.url = url
+        response.request = requests.Request(method, url, params=kwargs.get("params")).prepare()
+        return response
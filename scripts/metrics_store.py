@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+"""
+Métriques au format Prometheus partagées entre processus
+Chaque processus (workers Flask, scripts lancés par /run_script) accumule ses
+compteurs et histogrammes en mémoire puis les ajoute à un fichier SQLite commun;
+/metrics lit ce fichier et produit le format texte d'exposition Prometheus
+"""
+
+import os
+import json
+import atexit
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_FILE = Path(__file__).resolve().parent.parent / "metrics.db"
+
+# Bornes des histogrammes de durée (secondes): appels HTTP, requêtes SQL, scripts jusqu'à 5 min
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+PREFIX = "script_runner_"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS families (
+    name TEXT PRIMARY KEY,
+    type TEXT NOT NULL,
+    help TEXT
+);
+CREATE TABLE IF NOT EXISTS samples (
+    sample TEXT NOT NULL,
+    labels TEXT NOT NULL,
+    family TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (sample, labels)
+);
+"""
+
+_lock = threading.Lock()
+_pending: Dict[Tuple[str, str], Tuple[str, float]] = {}
+_families: Dict[str, Tuple[str, str]] = {}
+_atexit_registered = False
+
+
+def get_db_path() -> Path:
+    """Fichier SQLite des métriques (metrics.db à la racine, ou $METRICS_DB_PATH)"""
+    return Path(os.environ.get("METRICS_DB_PATH", DEFAULT_DB_FILE))
+
+
+def _labels_key(labels: Optional[Dict[str, object]]) -> str:
+    return json.dumps({k: str(v) for k, v in (labels or {}).items()}, sort_keys=True, ensure_ascii=False)
+
+
+def _add(family: str, sample: str, labels: Optional[Dict[str, object]], value: float):
+    """Ajoute value à un échantillon en attente (appelé sous _lock)"""
+    global _atexit_registered
+    key = (sample, _labels_key(labels))
+    _pending[key] = (family, _pending.get(key, (family, 0.0))[1] + value)
+    if not _atexit_registered:
+        # Les scripts écrivent leurs métriques une seule fois, à la fin du processus
+        atexit.register(flush)
+        _atexit_registered = True
+
+
+# ==========================================
+# ENREGISTREMENT
+# ==========================================
+
+def inc(name: str, labels: Optional[Dict[str, object]] = None, value: float = 1.0, help: str = ""):
+    """
+    Incrémente un compteur
+
+    Args:
+        name: Nom du compteur, sans préfixe (ex: "script_runs_total")
+        labels: Étiquettes {nom: valeur}
+        value: Incrément
+        help: Description (ligne # HELP)
+    """
+    family = PREFIX + name
+    with _lock:
+        _families.setdefault(family, ("counter", help))
+        _add(family, family, labels, value)
+
+
+def observe(name: str, value: float, labels: Optional[Dict[str, object]] = None,
+            buckets: Tuple[float, ...] = DEFAULT_BUCKETS, help: str = ""):
+    """
+    Ajoute une observation à un histogramme (_bucket cumulatifs, _sum, _count)
+
+    Args:
+        name: Nom de l'histogramme, sans préfixe (ex: "script_duration_seconds")
+        value: Valeur observée (secondes)
+        labels: Étiquettes {nom: valeur}
+        buckets: Bornes supérieures des buckets
+        help: Description (ligne # HELP)
+    """
+    family = PREFIX + name
+    labels = dict(labels or {})
+    with _lock:
+        _families.setdefault(family, ("histogram", help))
+        # Tous les buckets, même à 0: un histogramme sans bucket "le" incomplet pour histogram_quantile
+        for bound in buckets:
+            _add(family, family + "_bucket", {**labels, "le": _format_value(bound)}, 1 if value <= bound else 0)
+        _add(family, family + "_bucket", {**labels, "le": "+Inf"}, 1)
+        _add(family, family + "_sum", labels, value)
+        _add(family, family + "_count", labels, 1)
+
+
+def record_cache(cache: str, hit: bool):
+    """Compte un accès à un cache (le taux de succès se calcule depuis hit / miss)"""
+    inc("cache_requests_total", {"cache": cache, "result": "hit" if hit else "miss"},
+        help="Accès aux caches (geo.admin, distances, miroirs locaux) par résultat")
+
+
+# ==========================================
+# PERSISTANCE
+# ==========================================
+
+def _connect(db_path: Path) -> sqlite3.Connection:
+    conn = sqlite3.connect(str(db_path), timeout=10)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def flush(db_path: Optional[Path] = None) -> int:
+    """
+    Ajoute les métriques en attente au fichier partagé et les remet à zéro
+
+    Args:
+        db_path: Fichier SQLite (par défaut: get_db_path())
+
+    Returns:
+        Nombre d'échantillons écrits (0 si rien en attente ou en cas d'erreur; les
+        échantillons non écrits restent en attente pour le flush suivant)
+    """
+    with _lock:
+        if not _pending:
+            return 0
+        pending = dict(_pending)
+        families = dict(_families)
+        _pending.clear()
+
+    try:
+        conn = _connect(Path(db_path) if db_path else get_db_path())
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO families (name, type, help) VALUES (?, ?, ?)",
+                    [(name, kind, help) for name, (kind, help) in families.items()]
+                )
+                conn.executemany(
+                    "INSERT INTO samples (sample, labels, family, value) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (sample, labels) DO UPDATE SET value = value + excluded.value",
+                    [(sample, labels, family, value) for (sample, labels), (family, value) in pending.items()]
+                )
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        logger.warning(f"⚠️  Métriques non enregistrées: {e}")
+        with _lock:
+            for (sample, labels), (family, value) in pending.items():
+                key = (sample, labels)
+                _pending[key] = (family, _pending.get(key, (family, 0.0))[1] + value)
+        return 0
+    return len(pending)
+
+
+def reset(db_path: Optional[Path] = None):
+    """Vide les métriques en attente et le fichier partagé"""
+    with _lock:
+        _pending.clear()
+    conn = _connect(Path(db_path) if db_path else get_db_path())
+    try:
+        with conn:
+            conn.execute("DELETE FROM samples")
+            conn.execute("DELETE FROM families")
+    finally:
+        conn.close()
+
+
+# ==========================================
+# EXPOSITION
+# ==========================================
+
+def _format_value(value: float) -> str:
+    if value == int(value):
+        return str(int(value)) if abs(value) < 1e15 else repr(float(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    # "le" en dernier, comme les clients Prometheus officiels
+    keys = sorted(labels, key=lambda k: (k == "le", k))
+    return "{" + ",".join(f'{k}="{_escape(labels[k])}"' for k in keys) + "}"
+
+
+def _sort_key(family: str, sample: str, labels: Dict[str, str]):
+    others = json.dumps({k: v for k, v in labels.items() if k != "le"}, sort_keys=True)
+    suffix = sample[len(family):]
+    rank = {"": 0, "_bucket": 0, "_sum": 1, "_count": 2}.get(suffix, 3)
+    le = labels.get("le")
+    bound = float("inf") if le == "+Inf" else float(le) if le is not None else 0.0
+    return others, rank, bound
+
+
+def render(db_path: Optional[Path] = None) -> str:
+    """
+    Produit les métriques agrégées au format texte Prometheus (version 0.0.4)
+
+    Args:
+        db_path: Fichier SQLite (par défaut: get_db_path())
+
+    Returns:
+        Texte d'exposition (les métriques en attente du processus courant sont d'abord écrites)
+    """
+    flush(db_path)
+    conn = _connect(Path(db_path) if db_path else get_db_path())
+    try:
+        families = conn.execute("SELECT name, type, help FROM families ORDER BY name").fetchall()
+        rows = conn.execute("SELECT family, sample, labels, value FROM samples").fetchall()
+    finally:
+        conn.close()
+
+    samples: Dict[str, list] = {}
+    for family, sample, labels, value in rows:
+        samples.setdefault(family, []).append((sample, json.loads(labels), value))
+
+    lines = []
+    for name, kind, help in families:
+        if help:
+            lines.append(f"# HELP {name} {_escape(help)}")
+        lines.append(f"# TYPE {name} {kind}")
+        for sample, labels, value in sorted(samples.get(name, []), key=lambda s: _sort_key(name, s[0], s[1])):
+            lines.append(f"{sample}{_format_labels(labels)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
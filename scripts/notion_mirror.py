@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+"""
+Miroir local SQLite de la base de données Notion des projets
+Synchronisation incrémentale (last_edited_time + pagination) et recherche indexée par adresse
+"""
+
+import json
+import os
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+import requests
+
+from address_normalizer import address_matches, normalize_address, street_tokens
+from http_client import get_client
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_FILE = Path(__file__).resolve().parent.parent / "notion_mirror.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    last_edited_time TEXT NOT NULL,
+    page_json TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS page_words (
+    word TEXT NOT NULL,
+    page_id TEXT NOT NULL,
+    PRIMARY KEY (word, page_id)
+);
+CREATE INDEX IF NOT EXISTS idx_page_words_page ON page_words (page_id);
+CREATE TABLE IF NOT EXISTS sync_state (
+    database_id TEXT PRIMARY KEY,
+    last_edited_time TEXT
+);
+"""
+
+
+def get_page_title(page: Dict, property_name: str = "Nom") -> str:
+    """Extrait le titre d'une page Notion (propriété titre "Nom")"""
+    title = page.get("properties", {}).get(property_name, {}).get("title", [])
+    return "".join(
+        part.get("plain_text") or part.get("text", {}).get("content", "")
+        for part in title
+    )
+
+
+def get_search_text(page: Dict) -> str:
+    """Texte indexé et comparé à l'adresse: titre et propriété Localisation"""
+    localisation = "".join(
+        part.get("plain_text") or part.get("text", {}).get("content", "")
+        for part in page.get("properties", {}).get("Localisation", {}).get("rich_text", [])
+    )
+    return f"{get_page_title(page)} {localisation}".strip()
+
+
+class NotionMirror:
+    """
+    Copie locale des pages d'une base Notion
+
+    - sync(): ne récupère que les pages modifiées depuis la dernière synchronisation
+      (filtre last_edited_time) en suivant tous les curseurs (has_more / next_cursor)
+    - find(): recherche par mots normalisés de rue et localité via un index SQL
+    - record_page(): écriture directe (write-through) après une mise à jour via l'API
+    """
+
+    API_URL = "https://api.notion.com/v1"
+    NOTION_VERSION = "2022-06-28"
+    PAGE_SIZE = 100
+
+    def __init__(self, token: str, database_id: str, db_path: Optional[Path] = None, timeout: int = 30,
+                 session: Optional[requests.Session] = None):
+        """
+        Initialise le miroir
+
+        Args:
+            token: Token d'intégration Notion
+            database_id: ID de la base de données des projets
+            db_path: Fichier SQLite (par défaut: notion_mirror.db à la racine, ou $NOTION_MIRROR_PATH)
+            timeout: Timeout des requêtes HTTP en secondes
+            session: Session HTTP (par défaut: client partagé http_client)
+        """
+        self.token = token
+        self.database_id = database_id
+        self.timeout = timeout
+        self.http = session or get_client()
+        if db_path is None:
+            db_path = Path(os.environ.get("NOTION_MIRROR_PATH", DEFAULT_DB_FILE))
+        self.db_path = Path(db_path)
+
+        # Connexion partagée entre threads, accès sérialisés par le verrou
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        """Ferme la connexion SQLite"""
+        self.conn.close()
+
+    # ==========================================
+    # SYNCHRONISATION
+    # ==========================================
+
+    def _headers(self) -> Dict[str, str]:
+        return {
+            "Authorization": f"Bearer {self.token}",
+            "Content-Type": "application/json",
+            "Notion-Version": self.NOTION_VERSION
+        }
+
+    def _iter_pages(self, since: Optional[str]) -> Iterator[Dict]:
+        """Parcourt toutes les pages de la requête, page de résultats par page de résultats"""
+        url = f"{self.API_URL}/databases/{self.database_id}/query"
+        body = {
+            "page_size": self.PAGE_SIZE,
+            "sorts": [{"timestamp": "last_edited_time", "direction": "ascending"}]
+        }
+        if since:
+            # Notion arrondit last_edited_time à la minute: on_or_after évite de rater une page
+            body["filter"] = {
+                "timestamp": "last_edited_time",
+                "last_edited_time": {"on_or_after": since}
+            }
+
+        while True:
+            response = self.http.post(url, headers=self._headers(), json=body, timeout=self.timeout)
+            response.raise_for_status()
+            data = response.json()
+
+            for page in data.get("results", []):
+                yield page
+
+            if not data.get("has_more") or not data.get("next_cursor"):
+                break
+            body["start_cursor"] = data["next_cursor"]
+
+    def get_last_sync(self) -> Optional[str]:
+        """Retourne le last_edited_time le plus récent déjà synchronisé"""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT last_edited_time FROM sync_state WHERE database_id = ?",
+                (self.database_id,)
+            ).fetchone()
+        return row["last_edited_time"] if row else None
+
+    def sync(self, full: bool = False) -> int:
+        """
+        Synchronise le miroir avec Notion
+
+        Args:
+            full: True pour tout re-télécharger (les pages archivées sont alors retirées)
+
+        Returns:
+            Nombre de pages mises à jour
+        """
+        with self._lock:
+            since = None if full else self.get_last_sync()
+            latest = since
+            seen_ids = set()
+            count = 0
+
+            for page in self._iter_pages(since):
+                self._upsert(page)
+                seen_ids.add(page["id"])
+                count += 1
+                edited = page.get("last_edited_time")
+                if edited and (latest is None or edited > latest):
+                    latest = edited
+
+            if full:
+                # Les pages absentes d'une synchronisation complète ont été archivées ou supprimées
+                for row in self.conn.execute("SELECT id FROM pages").fetchall():
+                    if row["id"] not in seen_ids:
+                        self._delete(row["id"])
+
+            if latest:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO sync_state (database_id, last_edited_time) VALUES (?, ?)",
+                    (self.database_id, latest)
+                )
+            self.conn.commit()
+
+        logger.info(f"🔄 Miroir Notion: {count} page(s) synchronisée(s)")
+        return count
+
+    # ==========================================
+    # ÉCRITURE
+    # ==========================================
+
+    def _upsert(self, page: Dict):
+        """Insère ou remplace une page et ses mots indexés"""
+        if page.get("archived") or page.get("in_trash"):
+            self._delete(page["id"])
+            return
+
+        title = get_page_title(page)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO pages (id, title, last_edited_time, page_json) VALUES (?, ?, ?, ?)",
+            (page["id"], title, page.get("last_edited_time", ""), json.dumps(page, ensure_ascii=False))
+        )
+        self.conn.execute("DELETE FROM page_words WHERE page_id = ?", (page["id"],))
+        words = set(normalize_address(get_search_text(page)).split())
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO page_words (word, page_id) VALUES (?, ?)",
+            [(word, page["id"]) for word in words]
+        )
+
+    def _delete(self, page_id: str):
+        self.conn.execute("DELETE FROM pages WHERE id = ?", (page_id,))
+        self.conn.execute("DELETE FROM page_words WHERE page_id = ?", (page_id,))
+
+    def record_page(self, page: Dict):
+        """
+        Enregistre une page renvoyée par l'API (write-through après PATCH/POST)
+
+        Args:
+            page: Objet page Notion complet
+        """
+        with self._lock:
+            self._upsert(page)
+            self.conn.commit()
+
+    # ==========================================
+    # RECHERCHE
+    # ==========================================
+
+    def find(self, rue: str, localite: str, same_number: bool = False) -> Optional[Dict]:
+        """
+        Cherche la page d'un projet par rue et localité
+
+        Args:
+            rue: Rue et numéro
+            localite: Localité
+            same_number: Exiger aussi le numéro de maison (même bâtiment)
+
+        Returns:
+            Page Notion (dict) la plus récemment modifiée qui correspond, ou None
+        """
+        tokens = street_tokens(rue)
+        if not tokens:
+            return None
+
+        placeholders = ",".join("?" for _ in tokens)
+        with self._lock:
+            rows = self.conn.execute(
+                f"""
+                SELECT DISTINCT p.page_json, p.last_edited_time
+                FROM page_words w JOIN pages p ON p.id = w.page_id
+                WHERE w.word IN ({placeholders})
+                ORDER BY p.last_edited_time DESC
+                """,
+                tokens
+            ).fetchall()
+
+        for row in rows:
+            page = json.loads(row["page_json"])
+            if address_matches(get_search_text(page), rue, localite, same_number):
+                return page
+        return None
@@ -4,14 +4,33 @@ Client OneDrive pour gérer les fichiers via l'API Microsoft Graph
 Permet de créer des dossiers et uploader des fichiers depuis PythonAnywhere
 """
 
+import io
+import os
+import time
+import threading
+from contextlib import contextmanager
 import requests
-import msal
 import logging
-from pathlib import Path
-from typing import Optional, Dict, List
+from pathlib import Path, PurePosixPath
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, BinaryIO, Optional, Dict, List, Tuple, Union
+from urllib.parse import quote
+
+from http_client import get_client
+
+if TYPE_CHECKING:
+    import msal
 
 logger = logging.getLogger(__name__)
 
+# Cache de tokens MSAL partagé entre processus (workers Flask, scripts)
+DEFAULT_TOKEN_CACHE_FILE = Path(__file__).resolve().parent.parent / "onedrive_token_cache.json"
+
+try:
+    import fcntl
+except ImportError:  # Windows: pas de verrou inter-processus, écriture atomique seulement
+    fcntl = None
+
 
 class OneDriveClient:
     """
@@ -26,7 +45,24 @@ class OneDriveClient:
     GRAPH_API_ENDPOINT = "https://graph.microsoft.com/v1.0"
     SCOPES = ["https://graph.microsoft.com/.default"]
 
-    def __init__(self, client_id: str, client_secret: str, tenant_id: str = "common"):
+    # Limite Graph du nombre de requêtes par appel JSON $batch
+    BATCH_LIMIT = 20
+    BATCH_RETRIES = 3
+
+    # Suivi des copies côté serveur (monitor asynchrone)
+    COPY_TIMEOUT = 120
+    COPY_POLL_INTERVAL = 0.5
+
+    # Upload: PUT simple jusqu'à 4 Mo, session d'upload par morceaux au-delà
+    SIMPLE_UPLOAD_LIMIT = 4 * 1024 * 1024
+    UPLOAD_CHUNK_SIZE = 10 * 320 * 1024  # multiple de 320 Kio exigé par Graph
+    UPLOAD_RETRIES = 5
+
+    # Renouvellement anticipé du token (secondes avant expiration)
+    TOKEN_REFRESH_MARGIN = 300
+
+    def __init__(self, client_id: str, client_secret: str, tenant_id: str = "common",
+                 graph_endpoint: Optional[str] = None, token_cache_path: Optional[Path] = None):
         """
         Initialise le client OneDrive
 
@@ -34,42 +70,172 @@ class OneDriveClient:
             client_id: Application (client) ID
             client_secret: Client secret value
             tenant_id: Tenant ID (ou 'common' pour multi-tenant)
+            graph_endpoint: URL de l'API Graph (par défaut: GRAPH_API_ENDPOINT, ex: serveur local de test)
+            token_cache_path: Fichier du cache de tokens (défaut: onedrive_token_cache.json à la racine,
+                              ou $ONEDRIVE_TOKEN_CACHE_PATH)
         """
         self.client_id = client_id
         self.client_secret = client_secret
         self.tenant_id = tenant_id
         self.access_token = None
+        self.token_expires_at: Optional[float] = None
+        self.graph_endpoint = (graph_endpoint or self.GRAPH_API_ENDPOINT).rstrip("/")
+        if token_cache_path is None:
+            token_cache_path = Path(os.environ.get("ONEDRIVE_TOKEN_CACHE_PATH", DEFAULT_TOKEN_CACHE_FILE))
+        self.token_cache_path = Path(token_cache_path)
+        self._token_cache = None
+        self._token_lock = threading.Lock()
+        self._app = None
+        self._folder_refs: Dict[str, Dict] = {}
+
+    @property
+    def token_cache(self) -> "msal.SerializableTokenCache":
+        """Cache de tokens MSAL (msal n'est importé qu'au premier besoin d'un token)"""
+        if self._token_cache is None:
+            import msal
+            self._token_cache = msal.SerializableTokenCache()
+        return self._token_cache
+
+    @property
+    def app(self) -> "msal.ConfidentialClientApplication":
+        """
+        Application MSAL, créée au premier besoin
+
+        La création lit la configuration OpenID du tenant (un aller-retour vers
+        login.microsoftonline.com): elle n'a lieu que si aucun token valide n'est
+        en cache (_cached_token). Autorité publique connue: pas de découverte d'instance.
+        """
+        if self._app is None:
+            import msal
+            authority = f"https://login.microsoftonline.com/{self.tenant_id}"
+            self._app = msal.ConfidentialClientApplication(
+                client_id=self.client_id,
+                client_credential=self.client_secret,
+                authority=authority,
+                token_cache=self.token_cache,
+                http_client=get_client().session(authority),
+                instance_discovery=False
+            )
+        return self._app
+
+    # ==========================================
+    # CACHE DE TOKENS
+    # ==========================================
+
+    @contextmanager
+    def _locked_token_cache(self):
+        """
+        Recharge le cache disque sous verrou, puis le réécrit s'il a changé
+
+        Le verrou (POSIX) sérialise les renouvellements entre processus: un seul
+        processus contacte login.microsoftonline.com, les autres relisent son token.
+        """
+        lock_path = self.token_cache_path.with_name(self.token_cache_path.name + ".lock")
+        lock_file = None
+        try:
+            if fcntl is not None:
+                lock_file = open(lock_path, "a")
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+            if self.token_cache_path.exists():
+                try:
+                    self.token_cache.deserialize(self.token_cache_path.read_text(encoding="utf-8"))
+                except ValueError:
+                    logger.warning("⚠️  Cache de tokens OneDrive illisible, ignoré")
+
+            yield self.token_cache
+
+            if self.token_cache.has_state_changed:
+                tmp_path = self.token_cache_path.with_name(self.token_cache_path.name + ".tmp")
+                fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    f.write(self.token_cache.serialize())
+                os.replace(tmp_path, self.token_cache_path)
+                self.token_cache.has_state_changed = False
+        finally:
+            if lock_file is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+                lock_file.close()
+
+    def _token_is_fresh(self) -> bool:
+        if not self.access_token:
+            return False
+        # Token fourni sans expiration connue (ex: tests): considéré valide
+        if self.token_expires_at is None:
+            return True
+        return time.time() < self.token_expires_at - self.TOKEN_REFRESH_MARGIN
 
-        # Créer l'application MSAL
-        self.app = msal.ConfidentialClientApplication(
-            client_id=self.client_id,
-            client_credential=self.client_secret,
-            authority=f"https://login.microsoftonline.com/{self.tenant_id}"
-        )
+    def _cached_token(self) -> Optional[str]:
+        """
+        Token valide du cache disque, lu sans créer l'application MSAL
+
+        Returns:
+            Access token expirant dans plus de TOKEN_REFRESH_MARGIN secondes, sinon None
+        """
+        import msal
+        scopes = {scope.lower() for scope in self.SCOPES}
+        with self._locked_token_cache() as cache:
+            search = getattr(cache, "search", cache.find)
+            query = {"client_id": self.client_id, "realm": self.tenant_id}
+            for item in search(msal.TokenCache.CredentialType.ACCESS_TOKEN, query=query):
+                expires_on = int(item.get("expires_on", 0))
+                if scopes <= set(item.get("target", "").lower().split()) \
+                        and time.time() < expires_on - self.TOKEN_REFRESH_MARGIN:
+                    self.access_token = item["secret"]
+                    self.token_expires_at = expires_on
+                    return self.access_token
+        return None
+
+    def invalidate_token(self):
+        """Oublie le token courant (mémoire et cache disque), ex: après un 401"""
+        with self._token_lock:
+            self.access_token = None
+            self.token_expires_at = None
+            with self._locked_token_cache() as cache:
+                import msal
+                search = getattr(cache, "search", cache.find)
+                for item in list(search(msal.TokenCache.CredentialType.ACCESS_TOKEN)):
+                    cache.remove_at(item)
 
     def _get_access_token(self) -> str:
         """
         Obtient un access token via Client Credentials Flow
 
+        Ordre de recherche: token en mémoire encore valide, cache disque partagé
+        (lu directement, sans l'application MSAL ni son aller-retour de découverte),
+        puis login.microsoftonline.com.
+
         Returns:
             Access token valide
 
         Raises:
             Exception: Si l'authentification échoue
         """
-        if self.access_token:
+        if self._token_is_fresh():
             return self.access_token
 
-        result = self.app.acquire_token_for_client(scopes=self.SCOPES)
+        with self._token_lock:
+            if self._token_is_fresh():
+                return self.access_token
+            if self._cached_token():
+                logger.debug("Token OneDrive repris du cache")
+                return self.access_token
+
+            with self._locked_token_cache():
+                result = self.app.acquire_token_for_client(scopes=self.SCOPES)
+
+            if "access_token" in result:
+                self.access_token = result["access_token"]
+                self.token_expires_at = time.time() + int(result.get("expires_in", 3600))
+                if result.get("token_source") == "cache":
+                    logger.debug("Token OneDrive repris du cache")
+                else:
+                    logger.info("✅ Authentification OneDrive réussie")
+                return self.access_token
 
-        if "access_token" in result:
-            self.access_token = result["access_token"]
-            logger.info("✅ Authentification OneDrive réussie")
-            return self.access_token
-        else:
             error = result.get("error_description", result.get("error", "Unknown error"))
-            logger.error(f"❌ Échec authentification OneDrive: {error}")
-            raise Exception(f"Impossible d'obtenir le token OneDrive: {error}")
+        logger.error(f"❌ Échec authentification OneDrive: {error}")
+        raise Exception(f"Impossible d'obtenir le token OneDrive: {error}")
 
     def _make_request(self, method: str, endpoint: str, **kwargs) -> requests.Response:
         """
@@ -77,22 +243,95 @@ class OneDriveClient:
 
         Args:
             method: Méthode HTTP (GET, POST, PUT, etc.)
-            endpoint: Endpoint de l'API (ex: '/me/drive/root/children')
+            endpoint: Endpoint de l'API (ex: '/me/drive/root/children') ou URL complète
+                      renvoyée par Graph (@odata.nextLink, @odata.deltaLink)
             **kwargs: Arguments additionnels pour requests
 
+        Un 401 (token révoqué ou expiré plus tôt que prévu) invalide le cache
+        et la requête est rejouée une fois avec un nouveau token.
+
         Returns:
             Response object
         """
-        token = self._get_access_token()
+        headers = dict(kwargs.pop("headers", {}))
+        url = endpoint if endpoint.startswith("http") else f"{self.graph_endpoint}{endpoint}"
 
-        headers = kwargs.pop("headers", {})
-        headers["Authorization"] = f"Bearer {token}"
-
-        url = f"{self.GRAPH_API_ENDPOINT}{endpoint}"
-        response = requests.request(method, url, headers=headers, **kwargs)
+        for attempt in range(2):
+            headers["Authorization"] = f"Bearer {self._get_access_token()}"
+            response = get_client().request(method, url, headers=headers, **kwargs)
+            if response.status_code != 401 or attempt:
+                break
+            logger.warning("⚠️  Token OneDrive refusé (401), renouvellement")
+            self.invalidate_token()
 
         return response
 
+    @staticmethod
+    def _path_endpoint(path: str) -> str:
+        """Endpoint d'un élément par chemin, encodé (utilisable dans un $batch)"""
+        path = path.strip("/")
+        if not path:
+            return "/me/drive/root"
+        return f"/me/drive/root:/{quote(path)}:"
+
+    def _batch(self, batch_requests: List[Dict]) -> Dict[str, Dict]:
+        """
+        Exécute des requêtes via JSON $batch (BATCH_LIMIT requêtes par appel HTTP)
+
+        Les requêtes sont envoyées dans l'ordre donné: une dépendance (dependsOn)
+        vers une requête d'un lot précédent est retirée, ce lot ayant déjà été exécuté.
+        Les réponses 429/503/504 sont renvoyées dans un lot suivant après Retry-After.
+
+        Args:
+            batch_requests: Requêtes {"id", "method", "url", ["body", "headers", "dependsOn"]}
+
+        Returns:
+            Réponses par id de requête ({"id", "status", "headers", "body"})
+        """
+        results: Dict[str, Dict] = {}
+        pending = list(batch_requests)
+
+        for attempt in range(self.BATCH_RETRIES + 1):
+            to_retry = []
+            delay = 0.0
+
+            for start in range(0, len(pending), self.BATCH_LIMIT):
+                chunk = pending[start:start + self.BATCH_LIMIT]
+                ids = {r["id"] for r in chunk}
+                body = []
+                for request in chunk:
+                    request = dict(request)
+                    depends_on = [d for d in request.pop("dependsOn", []) if d in ids]
+                    if depends_on:
+                        request["dependsOn"] = depends_on
+                    body.append(request)
+
+                response = self._make_request("POST", "/$batch", json={"requests": body})
+                if response.status_code != 200:
+                    logger.error(f"❌ Erreur $batch: {response.status_code}")
+                    for request in chunk:
+                        results[request["id"]] = {"id": request["id"], "status": response.status_code, "body": response.text}
+                    continue
+
+                by_id = {r["id"]: r for r in chunk}
+                for sub in response.json().get("responses", []):
+                    results[sub["id"]] = sub
+                    if sub.get("status") in (429, 503, 504) and attempt < self.BATCH_RETRIES:
+                        to_retry.append(by_id[sub["id"]])
+                        retry_after = (sub.get("headers") or {}).get("Retry-After", 1)
+                        try:
+                            delay = max(delay, float(retry_after))
+                        except (TypeError, ValueError):
+                            delay = max(delay, 1.0)
+
+            if not to_retry:
+                break
+            logger.warning(f"⚠️  {len(to_retry)} requête(s) $batch limitée(s), nouvel essai dans {delay:.0f}s")
+            time.sleep(delay)
+            pending = to_retry
+
+        return results
+
     def create_folder(self, folder_path: str, parent_path: str = "") -> Optional[Dict]:
         """
         Crée un dossier dans OneDrive
@@ -136,21 +375,64 @@ class OneDriveClient:
 
     def create_folder_structure(self, base_path: str, subfolders: List[str]) -> bool:
         """
-        Crée une structure de dossiers imbriqués
+        Crée une structure de dossiers imbriqués via $batch
+
+        Les dossiers sont triés par profondeur: un dossier dépend (dependsOn) de la
+        création de son parent dans le même lot. Un arbre projet complet (≤ 20 dossiers)
+        est ainsi créé en un seul appel HTTP. Les dossiers existants sont conservés.
 
         Args:
             base_path: Chemin de base (ex: "/Documents_Eta Consult/12. Dossiers actifs/202501_Projet")
-            subfolders: Liste des sous-dossiers à créer
+            subfolders: Liste des sous-dossiers à créer (ex: "1. Admin/11. Offre")
 
         Returns:
             True si succès, False sinon
         """
-        success = True
-
+        base_path = base_path.strip("/")
+        folders = set()
         for subfolder in subfolders:
-            full_path = f"{base_path}/{subfolder}"
-            result = self.create_folder(Path(subfolder).name, str(Path(full_path).parent))
-            if result is None:
+            parts = PurePosixPath(subfolder.strip("/")).parts
+            for depth in range(1, len(parts) + 1):
+                folders.add("/".join(parts[:depth]))
+
+        ordered = sorted(folders, key=lambda f: (f.count("/"), f))
+        ids = {folder: str(n) for n, folder in enumerate(ordered, 1)}
+        batch_requests = []
+        for folder in ordered:
+            parent, _, name = folder.rpartition("/")
+            parent_path = "/".join(p for p in (base_path, parent) if p)
+            request = {
+                "id": ids[folder],
+                "method": "POST",
+                "url": f"{self._path_endpoint(parent_path)}/children",
+                "headers": {"Content-Type": "application/json"},
+                "body": {"name": name, "folder": {}, "@microsoft.graph.conflictBehavior": "fail"}
+            }
+            if parent:
+                request["dependsOn"] = [ids[parent]]
+            batch_requests.append(request)
+
+        results = self._batch(batch_requests)
+
+        # 424: le parent existait déjà (409) -> relancer les enfants sans dépendance
+        while True:
+            blocked = [r for r in batch_requests if results.get(r["id"], {}).get("status") == 424
+                       and all(results.get(d, {}).get("status") in (200, 201, 409) for d in r.get("dependsOn", []))]
+            if not blocked:
+                break
+            for request in blocked:
+                request.pop("dependsOn", None)
+            results.update(self._batch(blocked))
+
+        success = True
+        for folder in ordered:
+            status = results.get(ids[folder], {}).get("status")
+            if status in (200, 201):
+                logger.info(f"✅ Dossier créé: {folder}")
+            elif status == 409:
+                logger.info(f"ℹ️  Dossier existant: {folder}")
+            else:
+                logger.error(f"❌ Erreur création dossier {folder}: {status}")
                 success = False
 
         return success
@@ -159,6 +441,8 @@ class OneDriveClient:
         """
         Upload un fichier dans OneDrive
 
+        Au-delà de SIMPLE_UPLOAD_LIMIT, passe par une session d'upload (upload_large_file).
+
         Args:
             file_content: Contenu du fichier en bytes
             file_name: Nom du fichier
@@ -167,6 +451,9 @@ class OneDriveClient:
         Returns:
             Dict avec les infos du fichier uploadé ou None si erreur
         """
+        if len(file_content) > self.SIMPLE_UPLOAD_LIMIT:
+            return self.upload_large_file(io.BytesIO(file_content), file_name, destination_path)
+
         # Construire l'endpoint
         if destination_path:
             encoded_path = ":/" + destination_path.strip("/") + f"/{file_name}:/content"
@@ -187,6 +474,141 @@ class OneDriveClient:
             logger.error(response.text)
             return None
 
+    def _create_upload_session(self, file_name: str, destination_path: str) -> Optional[str]:
+        """Ouvre une session d'upload et retourne son uploadUrl (pré-authentifiée)"""
+        item_path = "/".join(p for p in (destination_path.strip("/"), file_name) if p)
+        data = {"item": {"@microsoft.graph.conflictBehavior": "replace"}}
+        response = self._make_request("POST", f"{self._path_endpoint(item_path)}/createUploadSession", json=data)
+        if response.status_code != 200:
+            logger.error(f"❌ Erreur création session d'upload {file_name}: {response.status_code}")
+            logger.error(response.text)
+            return None
+        return response.json().get("uploadUrl")
+
+    @staticmethod
+    def _next_offset(session_status: Dict) -> int:
+        """Premier octet attendu par le serveur ("nextExpectedRanges": ["26-"])"""
+        ranges = session_status.get("nextExpectedRanges") or ["0-"]
+        return int(ranges[0].split("-")[0])
+
+    def upload_large_file(self, source: Union[str, Path, BinaryIO], file_name: str,
+                          destination_path: str = "", chunk_size: Optional[int] = None) -> Optional[Dict]:
+        """
+        Upload un fichier par morceaux via une session d'upload (createUploadSession)
+
+        Un seul morceau est en mémoire à la fois. Après une erreur, l'upload reprend
+        à la plage attendue par le serveur (nextExpectedRanges); une session expirée
+        est recréée depuis le début.
+
+        Args:
+            source: Chemin local ou flux binaire positionnable (seek)
+            file_name: Nom du fichier dans OneDrive
+            destination_path: Dossier de destination
+            chunk_size: Taille des morceaux (multiple de 320 Kio, défaut: UPLOAD_CHUNK_SIZE)
+
+        Returns:
+            Dict avec les infos du fichier uploadé ou None si erreur
+        """
+        chunk_size = chunk_size or self.UPLOAD_CHUNK_SIZE
+        stream = open(source, "rb") if isinstance(source, (str, Path)) else source
+        try:
+            stream.seek(0, os.SEEK_END)
+            total = stream.tell()
+            if total == 0:
+                return self.upload_file(b"", file_name, destination_path)
+
+            upload_url = self._create_upload_session(file_name, destination_path)
+            if not upload_url:
+                return None
+
+            http = get_client()
+            offset = 0
+            failures = 0
+            while True:
+                stream.seek(offset)
+                chunk = stream.read(min(chunk_size, total - offset))
+                end = offset + len(chunk) - 1
+                headers = {"Content-Range": f"bytes {offset}-{end}/{total}"}
+
+                try:
+                    # uploadUrl est pré-authentifiée: pas d'en-tête Authorization
+                    response = http.put(upload_url, headers=headers, data=chunk)
+                    status = response.status_code
+                except requests.exceptions.RequestException as e:
+                    logger.warning(f"⚠️  Morceau {offset}-{end} de {file_name} interrompu: {e}")
+                    response, status = None, None
+
+                if status in (200, 201):
+                    logger.info(f"✅ Fichier uploadé: {file_name} ({total} octets)")
+                    return response.json()
+                if status == 202:
+                    offset = self._next_offset(response.json())
+                    failures = 0
+                    continue
+
+                failures += 1
+                if failures > self.UPLOAD_RETRIES:
+                    logger.error(f"❌ Erreur upload {file_name}: abandon après {failures} échecs ({status})")
+                    http.delete(upload_url)
+                    return None
+                time.sleep(min(2 ** failures * 0.25, 10))
+
+                # Reprendre là où le serveur s'est arrêté
+                try:
+                    status_response = http.get(upload_url)
+                except requests.exceptions.RequestException:
+                    continue
+                if status_response.status_code == 404:
+                    logger.warning(f"⚠️  Session d'upload expirée pour {file_name}, nouvelle session")
+                    upload_url = self._create_upload_session(file_name, destination_path)
+                    if not upload_url:
+                        return None
+                    offset = 0
+                elif status_response.status_code == 200:
+                    offset = self._next_offset(status_response.json())
+        finally:
+            if stream is not source:
+                stream.close()
+
+    def upload_path(self, local_path: Union[str, Path], destination_path: str = "",
+                    file_name: Optional[str] = None) -> Optional[Dict]:
+        """
+        Upload un fichier local (PUT simple ou session d'upload selon la taille)
+
+        Args:
+            local_path: Fichier à envoyer
+            destination_path: Dossier de destination
+            file_name: Nom dans OneDrive (défaut: nom du fichier local)
+
+        Returns:
+            Dict avec les infos du fichier uploadé ou None si erreur
+        """
+        local_path = Path(local_path)
+        file_name = file_name or local_path.name
+        if local_path.stat().st_size <= self.SIMPLE_UPLOAD_LIMIT:
+            return self.upload_file(local_path.read_bytes(), file_name, destination_path)
+        return self.upload_large_file(local_path, file_name, destination_path)
+
+    def upload_files(self, uploads: List[Tuple[Union[str, Path], str, Optional[str]]],
+                     max_workers: int = 4) -> List[Optional[Dict]]:
+        """
+        Upload plusieurs fichiers locaux en parallèle
+
+        Graph impose l'ordre des morceaux d'un même fichier: le parallélisme
+        porte sur les fichiers, chacun dans sa propre session.
+
+        Args:
+            uploads: Liste de (chemin local, dossier de destination, nom ou None)
+            max_workers: Nombre d'uploads simultanés
+
+        Returns:
+            Pour chaque fichier, dans l'ordre: infos du fichier uploadé ou None
+        """
+        if not uploads:
+            return []
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(uploads)))) as executor:
+            return list(executor.map(lambda u: self.upload_path(*u), uploads))
+
     def upload_text_file(self, content: str, file_name: str, destination_path: str = "") -> Optional[Dict]:
         """
         Upload un fichier texte dans OneDrive
@@ -218,14 +640,61 @@ class OneDriveClient:
         else:
             endpoint = "/me/drive/root/children"
 
-        response = self._make_request("GET", endpoint)
+        items = []
+        while endpoint:
+            response = self._make_request("GET", endpoint)
+            if response.status_code != 200:
+                logger.error(f"❌ Erreur listing dossier: {response.status_code}")
+                return None
+            data = response.json()
+            items.extend(data.get("value", []))
+            # Graph pagine au-delà de 200 éléments
+            endpoint = data.get("@odata.nextLink")
 
+        return items
+
+    def get_item(self, item_path: str) -> Optional[Dict]:
+        """
+        Récupère les métadonnées d'un élément par chemin
+
+        Args:
+            item_path: Chemin du fichier ou dossier (vide = racine)
+
+        Returns:
+            Dict de l'élément ou None s'il n'existe pas
+        """
+        response = self._make_request("GET", self._path_endpoint(item_path))
         if response.status_code == 200:
+            return response.json()
+        if response.status_code != 404:
+            logger.error(f"❌ Erreur lecture {item_path}: {response.status_code}")
+        return None
+
+    def delta_pages(self, folder_path: str = "", delta_link: Optional[str] = None):
+        """
+        Parcourt les changements d'une arborescence via /delta
+
+        Sans delta_link, renvoie l'état complet; avec le lien de la synchronisation
+        précédente, seulement les éléments créés, modifiés ou supprimés depuis.
+
+        Args:
+            folder_path: Dossier suivi (vide = tout le drive)
+            delta_link: @odata.deltaLink de la synchronisation précédente
+
+        Yields:
+            (éléments de la page, deltaLink final ou None tant qu'il reste des pages)
+
+        Raises:
+            requests.exceptions.HTTPError: Erreur Graph (410: lien expiré, resynchronisation complète requise)
+        """
+        endpoint = delta_link or f"{self._path_endpoint(folder_path)}/delta"
+        while endpoint:
+            response = self._make_request("GET", endpoint)
+            response.raise_for_status()
             data = response.json()
-            return data.get("value", [])
-        else:
-            logger.error(f"❌ Erreur listing dossier: {response.status_code}")
-            return None
+            next_link = data.get("@odata.nextLink")
+            yield data.get("value", []), data.get("@odata.deltaLink")
+            endpoint = next_link
 
     def download_file(self, file_path: str) -> Optional[bytes]:
         """
@@ -249,9 +718,116 @@ class OneDriveClient:
             logger.error(f"❌ Erreur download {file_path}: {response.status_code}")
             return None
 
+    def _folder_references(self, folder_paths: List[str]) -> Dict[str, Optional[Dict]]:
+        """
+        Résout les dossiers de destination en parentReference {driveId, id} (avec cache)
+
+        Les dossiers inconnus sont résolus ensemble en un seul $batch.
+        """
+        missing = sorted({p.strip("/") for p in folder_paths} - set(self._folder_refs))
+        if missing:
+            results = self._batch([
+                {"id": str(n), "method": "GET", "url": self._path_endpoint(path)}
+                for n, path in enumerate(missing, 1)
+            ])
+            for n, path in enumerate(missing, 1):
+                result = results.get(str(n), {})
+                if result.get("status") == 200:
+                    item = result["body"]
+                    self._folder_refs[path] = {
+                        "driveId": item.get("parentReference", {}).get("driveId"),
+                        "id": item["id"]
+                    }
+                else:
+                    logger.error(f"❌ Dossier de destination introuvable: {path} ({result.get('status')})")
+        return {p: self._folder_refs.get(p.strip("/")) for p in folder_paths}
+
+    def wait_for_copy(self, monitor_url: str, timeout: Optional[float] = None) -> Optional[str]:
+        """
+        Attend la fin d'une copie côté serveur
+
+        Args:
+            monitor_url: URL renvoyée dans l'en-tête Location de /copy (sans authentification)
+            timeout: Durée maximale d'attente en secondes (défaut: COPY_TIMEOUT)
+
+        Returns:
+            ID de l'élément copié ("" si Graph ne le fournit pas), None si échec ou timeout
+        """
+        deadline = time.monotonic() + (timeout or self.COPY_TIMEOUT)
+        interval = self.COPY_POLL_INTERVAL
+
+        while True:
+            response = get_client().get(monitor_url, allow_redirects=False)
+            if response.status_code == 303:
+                return ""
+            if response.status_code in (200, 202):
+                status = response.json()
+                if status.get("status") == "completed":
+                    return status.get("resourceId", "")
+                if status.get("status") == "failed":
+                    logger.error(f"❌ Copie échouée: {status.get('error', status)}")
+                    return None
+            else:
+                logger.error(f"❌ Erreur suivi de copie: {response.status_code}")
+                return None
+
+            if time.monotonic() >= deadline:
+                logger.error(f"❌ Copie non terminée après {timeout or self.COPY_TIMEOUT}s")
+                return None
+            time.sleep(interval)
+            interval = min(interval * 2, 5)
+
+    def copy_files(self, copies: List[Tuple[str, str, Optional[str]]], wait: bool = True) -> List[bool]:
+        """
+        Copie plusieurs fichiers côté serveur (action Graph /copy)
+
+        Les dossiers de destination sont résolus puis toutes les copies lancées en
+        deux appels $batch; aucun contenu ne transite par ce serveur.
+
+        Args:
+            copies: Liste de (chemin source, dossier de destination, nouveau nom ou None)
+            wait: Attendre la fin des copies (suivi des monitors)
+
+        Returns:
+            Pour chaque copie, True si réussie (ou lancée si wait=False)
+        """
+        refs = self._folder_references([dest for _, dest, _ in copies])
+
+        batch_requests = []
+        for n, (source_path, destination_folder_path, new_name) in enumerate(copies, 1):
+            parent = refs.get(destination_folder_path)
+            if parent is None:
+                continue
+            batch_requests.append({
+                "id": str(n),
+                "method": "POST",
+                "url": f"{self._path_endpoint(source_path)}/copy?@microsoft.graph.conflictBehavior=replace",
+                "headers": {"Content-Type": "application/json"},
+                "body": {"parentReference": parent, "name": new_name or Path(source_path).name}
+            })
+        results = self._batch(batch_requests) if batch_requests else {}
+
+        success = []
+        for n, (source_path, _, new_name) in enumerate(copies, 1):
+            result = results.get(str(n), {})
+            monitor_url = (result.get("headers") or {}).get("Location")
+            if result.get("status") != 202 or not monitor_url:
+                if result:
+                    logger.error(f"❌ Erreur copie {source_path}: {result.get('status')}")
+                success.append(False)
+            elif not wait:
+                success.append(True)
+            else:
+                ok = self.wait_for_copy(monitor_url) is not None
+                if ok:
+                    logger.info(f"✅ Fichier copié: {new_name or Path(source_path).name}")
+                success.append(ok)
+
+        return success
+
     def copy_file(self, source_path: str, destination_folder_path: str, new_name: Optional[str] = None) -> bool:
         """
-        Copie un fichier vers un autre emplacement
+        Copie un fichier vers un autre emplacement (copie côté serveur)
 
         Args:
             source_path: Chemin source du fichier
@@ -261,13 +837,4 @@ class OneDriveClient:
         Returns:
             True si succès, False sinon
         """
-        # Télécharger le fichier
-        content = self.download_file(source_path)
-        if content is None:
-            return False
-
-        # Uploader dans la nouvelle destination
-        file_name = new_name or Path(source_path).name
-        result = self.upload_file(content, file_name, destination_folder_path)
-
-        return result is not None
+        return self.copy_files([(source_path, destination_folder_path, new_name)])[0]
@@ -0,0 +1,354 @@
+# -*- coding: utf-8 -*-
+"""
+Index local SQLite de l'arborescence OneDrive "Dossiers actifs"
+Tenu à jour par l'API Graph /delta: seuls les changements depuis le dernier
+deltaLink sont téléchargés; les recherches de dossiers sont servies localement
+"""
+
+import os
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import requests
+
+from address_normalizer import street_tokens
+from project_folder_index import analyze_folder_name, rank_folders
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_FILE = Path(__file__).resolve().parent.parent / "onedrive_index.db"
+
+# Plusieurs dossiers suivis peuvent partager le même fichier: chaque ligne porte son root_path
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    root_path TEXT NOT NULL,
+    id TEXT NOT NULL,
+    parent_id TEXT,
+    name TEXT NOT NULL,
+    is_folder INTEGER NOT NULL,
+    last_modified REAL,
+    size INTEGER,
+    path TEXT,
+    depth INTEGER,
+    PRIMARY KEY (root_path, id)
+);
+CREATE INDEX IF NOT EXISTS idx_items_parent ON items (root_path, parent_id);
+CREATE INDEX IF NOT EXISTS idx_items_path ON items (root_path, path);
+CREATE TABLE IF NOT EXISTS folder_words (
+    root_path TEXT NOT NULL,
+    word TEXT NOT NULL,
+    item_id TEXT NOT NULL,
+    PRIMARY KEY (root_path, word, item_id)
+);
+CREATE TABLE IF NOT EXISTS sync_state (
+    root_path TEXT PRIMARY KEY,
+    root_id TEXT,
+    scope TEXT,
+    delta_link TEXT
+);
+CREATE TEMP TABLE IF NOT EXISTS changed_items (id TEXT PRIMARY KEY, deleted INTEGER NOT NULL);
+"""
+
+# Erreurs Graph signifiant "delta non supporté sur un sous-dossier" (OneDrive Business)
+FOLDER_DELTA_UNSUPPORTED = (400, 403, 501)
+
+
+def _timestamp(value: Optional[str]) -> Optional[float]:
+    """Convertit lastModifiedDateTime ISO 8601 en timestamp"""
+    if not value:
+        return None
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+
+class OneDriveFolderIndex:
+    """
+    Copie locale de l'arborescence d'un dossier OneDrive
+
+    - sync(): applique les changements /delta depuis le dernier deltaLink
+      (si OneDrive Business refuse /delta sur un sous-dossier, suit tout le drive
+      et ne garde que la sous-arborescence)
+    - exists() / get() / list_children(): existence et contenu par chemin relatif
+    - find(): dossiers projet ("AAAAMM_Rue_Localité") classés comme ProjectFolderIndex
+    """
+
+    def __init__(self, client, root_path: str, db_path: Optional[Path] = None):
+        """
+        Initialise l'index
+
+        Args:
+            client: OneDriveClient authentifié
+            root_path: Dossier suivi (ex: "/Documents_Eta Consult/12. Dossiers actifs")
+            db_path: Fichier SQLite (par défaut: onedrive_index.db à la racine, ou $ONEDRIVE_INDEX_PATH)
+        """
+        self.client = client
+        self.root_path = root_path.strip("/")
+        if db_path is None:
+            db_path = Path(os.environ.get("ONEDRIVE_INDEX_PATH", DEFAULT_DB_FILE))
+        self.db_path = Path(db_path)
+
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self._migrate()
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        """Ferme la connexion SQLite"""
+        self.conn.close()
+
+    def _migrate(self):
+        """Index créé avant root_path: supprimé, la prochaine synchronisation est complète"""
+        columns = [row["name"] for row in self.conn.execute("PRAGMA table_info(items)")]
+        if columns and "root_path" not in columns:
+            logger.info("ℹ️  Index OneDrive d'un format précédent: resynchronisation complète")
+            self.conn.executescript("""
+                DROP TABLE items;
+                DROP TABLE IF EXISTS folder_words;
+                DROP TABLE IF EXISTS sync_state;
+            """)
+
+    # ==========================================
+    # SYNCHRONISATION
+    # ==========================================
+
+    def _state(self) -> Optional[sqlite3.Row]:
+        return self.conn.execute(
+            "SELECT root_id, scope, delta_link FROM sync_state WHERE root_path = ?", (self.root_path,)
+        ).fetchone()
+
+    def _reset(self, root: Dict):
+        """Vide l'index de ce dossier avant une synchronisation complète, en gardant l'élément racine"""
+        self.conn.execute("DELETE FROM items WHERE root_path = ?", (self.root_path,))
+        self.conn.execute("DELETE FROM folder_words WHERE root_path = ?", (self.root_path,))
+        self.conn.execute("DELETE FROM sync_state WHERE root_path = ?", (self.root_path,))
+        self.conn.execute("DELETE FROM changed_items")
+        self._apply_item(root)
+
+    def sync(self, full: bool = False) -> int:
+        """
+        Synchronise l'index avec OneDrive
+
+        Args:
+            full: True pour repartir d'un état complet (nouveau deltaLink)
+
+        Returns:
+            Nombre d'éléments reçus (créés, modifiés ou supprimés)
+        """
+        with self._lock:
+            self.conn.execute("DELETE FROM changed_items")
+            state = None if full else self._state()
+            if state is None:
+                root = self.client.get_item(self.root_path)
+                if root is None:
+                    raise FileNotFoundError(f"Dossier OneDrive introuvable: {self.root_path}")
+                self._reset(root)
+                root_id, scope, delta_link = root["id"], self.root_path, None
+            else:
+                root_id, scope, delta_link = state["root_id"], state["scope"], state["delta_link"]
+
+            try:
+                count, delta_link = self._apply_delta(scope, delta_link)
+            except requests.exceptions.HTTPError as e:
+                status = e.response.status_code if e.response is not None else None
+                if status == 410:
+                    # deltaLink expiré: Graph exige une resynchronisation complète
+                    logger.warning("⚠️  Lien delta OneDrive expiré, resynchronisation complète")
+                    self.conn.rollback()
+                    return self.sync(full=True)
+                if status in FOLDER_DELTA_UNSUPPORTED and state is None and scope:
+                    logger.info("ℹ️  /delta refusé sur le sous-dossier, suivi du drive complet")
+                    self._reset(root)
+                    scope = ""
+                    count, delta_link = self._apply_delta(scope, None)
+                else:
+                    raise
+
+            self._rebuild_paths(root_id, scope)
+            self.conn.execute("DELETE FROM changed_items")
+            self.conn.execute(
+                "INSERT OR REPLACE INTO sync_state (root_path, root_id, scope, delta_link) VALUES (?, ?, ?, ?)",
+                (self.root_path, root_id, scope, delta_link)
+            )
+            self.conn.commit()
+
+        logger.info(f"🔄 Index OneDrive: {count} changement(s)")
+        return count
+
+    def _apply_delta(self, scope: str, delta_link: Optional[str]):
+        """Applique toutes les pages /delta; retourne (nombre d'éléments, nouveau deltaLink)"""
+        count = 0
+        final_link = delta_link
+        for items, link in self.client.delta_pages(scope, delta_link):
+            for item in items:
+                self._apply_item(item)
+                count += 1
+            if link:
+                final_link = link
+        return count, final_link
+
+    def _apply_item(self, item: Dict):
+        deleted = "deleted" in item or "@removed" in item
+        self.conn.execute("INSERT OR REPLACE INTO changed_items (id, deleted) VALUES (?, ?)",
+                          (item["id"], 1 if deleted else 0))
+        if deleted:
+            self.conn.execute("DELETE FROM items WHERE root_path = ? AND id = ?", (self.root_path, item["id"]))
+            return
+        self.conn.execute(
+            """
+            INSERT OR REPLACE INTO items (root_path, id, parent_id, name, is_folder, last_modified, size)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                self.root_path,
+                item["id"],
+                item.get("parentReference", {}).get("id"),
+                item.get("name", ""),
+                1 if "folder" in item else 0,
+                _timestamp(item.get("lastModifiedDateTime")),
+                item.get("size"),
+            )
+        )
+
+    def _rebuild_paths(self, root_id: str, scope: str):
+        """
+        Recalcule les chemins des éléments reçus par /delta et de leurs descendants
+
+        Un dossier renommé ou déplacé est reçu seul: ses descendants sont recalculés
+        depuis son nouveau chemin. Le reste de l'index n'est pas touché.
+        """
+        # Éléments reçus et enfants d'éléments supprimés, avec toute leur descendance
+        nodes = {
+            row["id"]: (row["parent_id"], row["name"], row["is_folder"])
+            for row in self.conn.execute(
+                """
+                WITH RECURSIVE affected(id) AS (
+                    SELECT id FROM changed_items WHERE deleted = 0
+                    UNION
+                    SELECT i.id FROM items i
+                    WHERE i.root_path = :root_path AND i.parent_id IN (SELECT id FROM changed_items WHERE deleted = 1)
+                    UNION
+                    SELECT i.id FROM items i JOIN affected a ON i.root_path = :root_path AND i.parent_id = a.id
+                )
+                SELECT i.id, i.parent_id, i.name, i.is_folder FROM items i JOIN affected a ON i.root_path = :root_path AND i.id = a.id
+                """,
+                {"root_path": self.root_path}
+            )
+        }
+
+        paths = {}
+
+        def resolve(item_id):
+            # Remonte jusqu'à un ancêtre dont le chemin est connu (déjà calculé ou inchangé en base)
+            chain = []
+            while item_id in nodes and item_id not in paths and item_id != root_id and item_id not in chain:
+                chain.append(item_id)
+                item_id = nodes[item_id][0]
+            if item_id == root_id:
+                base = ("", 0)
+            elif item_id in paths:
+                base = paths[item_id]
+            elif item_id in chain or item_id is None:
+                base = (None, None)
+            else:
+                row = self.conn.execute("SELECT path, depth FROM items WHERE root_path = ? AND id = ?",
+                                        (self.root_path, item_id)).fetchone()
+                base = (row["path"], row["depth"]) if row else (None, None)
+            for node in reversed(chain):
+                path, depth = base
+                name = nodes[node][1]
+                # Chemin NULL: hors de la racine (parent inconnu ou supprimé)
+                base = (None, None) if path is None else (name if path == "" else f"{path}/{name}", depth + 1)
+                paths[node] = base
+
+        for item_id in nodes:
+            if item_id == root_id:
+                paths[item_id] = ("", 0)
+            else:
+                resolve(item_id)
+
+        self.conn.executemany(
+            "UPDATE items SET path = ?, depth = ? WHERE root_path = ? AND id = ?",
+            [(path, depth, self.root_path, item_id) for item_id, (path, depth) in paths.items()]
+        )
+        if scope:
+            # Éléments orphelins (parent supprimé). En mode drive complet, les éléments hors
+            # de la racine sont conservés: un dossier déplacé dedans garde ainsi son contenu.
+            self.conn.execute("DELETE FROM items WHERE root_path = ? AND path IS NULL", (self.root_path,))
+
+        # Mots des dossiers projet (premier niveau) recalculés pour les éléments touchés
+        deleted = [row["id"] for row in self.conn.execute("SELECT id FROM changed_items WHERE deleted = 1")]
+        self.conn.executemany("DELETE FROM folder_words WHERE root_path = ? AND item_id = ?",
+                              [(self.root_path, item_id) for item_id in [*paths, *deleted]])
+        words = []
+        for item_id, (_, depth) in paths.items():
+            _, name, is_folder = nodes[item_id]
+            if depth != 1 or not is_folder:
+                continue
+            for word in set(analyze_folder_name(name, 0)["words"].split()):
+                words.append((self.root_path, word, item_id))
+        self.conn.executemany("INSERT OR IGNORE INTO folder_words (root_path, word, item_id) VALUES (?, ?, ?)", words)
+
+    # ==========================================
+    # RECHERCHE
+    # ==========================================
+
+    def get(self, relative_path: str) -> Optional[Dict]:
+        """Élément à un chemin relatif à la racine ("" = racine), ou None"""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT id, name, is_folder, last_modified, size, path FROM items WHERE root_path = ? AND path = ?",
+                (self.root_path, relative_path.strip("/"))
+            ).fetchone()
+        return dict(row) if row else None
+
+    def exists(self, relative_path: str) -> bool:
+        """True si le fichier ou dossier existe (d'après la dernière synchronisation)"""
+        return self.get(relative_path) is not None
+
+    def list_children(self, relative_path: str = "") -> List[Dict]:
+        """Contenu d'un dossier, trié par nom"""
+        parent = self.get(relative_path)
+        if parent is None:
+            return []
+        with self._lock:
+            rows = self.conn.execute(
+                """
+                SELECT id, name, is_folder, last_modified, size, path FROM items
+                WHERE root_path = ? AND parent_id = ? ORDER BY name
+                """,
+                (self.root_path, parent["id"])
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def find(self, rue: str, localite: str) -> List[str]:
+        """
+        Cherche les dossiers projet correspondant à une adresse
+
+        Args:
+            rue: Rue et numéro
+            localite: Localité
+
+        Returns:
+            Chemins OneDrive des dossiers candidats, du plus pertinent au moins pertinent
+        """
+        tokens = street_tokens(rue)
+        if not tokens:
+            return []
+
+        placeholders = ",".join("?" for _ in tokens)
+        with self._lock:
+            rows = self.conn.execute(
+                f"""
+                SELECT DISTINCT i.name, i.last_modified
+                FROM folder_words w JOIN items i ON i.root_path = w.root_path AND i.id = w.item_id
+                WHERE w.root_path = ? AND w.word IN ({placeholders})
+                """,
+                [self.root_path, *tokens]
+            ).fetchall()
+
+        folders = {row["name"]: analyze_folder_name(row["name"], row["last_modified"] or 0) for row in rows}
+        return [f"/{self.root_path}/{name}" for name in rank_folders(folders, folders, rue, localite)]
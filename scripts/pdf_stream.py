@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+"""
+Téléchargement en flux des PDF Bexio
+L'API renvoie {"name": ..., "mime": ..., "content": "<base64>"} : le JSON est lu
+par morceaux et le champ "content" est décodé au fil de l'eau dans un fichier
+temporaire, renommé atomiquement à la fin. La mémoire utilisée reste bornée
+quelle que soit la taille du PDF.
+"""
+
+import base64
+import codecs
+import os
+import re
+import tempfile
+import logging
+from pathlib import Path
+from typing import BinaryIO, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+# Échappements JSON possibles dans une chaîne base64 (\/ et retours à la ligne)
+_ESCAPE = re.compile(r"\\(u[0-9a-fA-F]{4}|.)", re.DOTALL)
+_INCOMPLETE_ESCAPE = re.compile(r"\\(u[0-9a-fA-F]{0,3})?$")
+_SIMPLE_ESCAPES = {"n": "\n", "r": "\r", "t": "\t", "b": "", "f": ""}
+
+
+def _replace_escape(match) -> str:
+    sequence = match.group(1)
+    if len(sequence) == 5:
+        return chr(int(sequence[1:], 16))
+    return _SIMPLE_ESCAPES.get(sequence, sequence)
+
+
+def _unescape(text: str) -> str:
+    """Décode les échappements JSON d'un fragment de chaîne"""
+    if "\\" not in text:
+        return text
+    return _ESCAPE.sub(_replace_escape, text)
+
+
+class _Base64Writer:
+    """Décode du base64 par blocs de 4 caractères et écrit le binaire dans un fichier"""
+
+    def __init__(self, output: BinaryIO):
+        self.output = output
+        self.pending = ""
+        self.size = 0
+
+    def feed(self, text: str):
+        text = self.pending + "".join(text.split())
+        usable = len(text) - len(text) % 4
+        if usable:
+            data = base64.b64decode(text[:usable])
+            self.output.write(data)
+            self.size += len(data)
+        self.pending = text[usable:]
+
+    def close(self):
+        if self.pending:
+            # Padding manquant en fin de flux
+            self.feed("=" * (-len(self.pending) % 4))
+
+
+class _ContentScanner:
+    """
+    Lecteur JSON minimal en flux: repère la clé "content" de l'objet racine
+    et transmet sa valeur au _Base64Writer sans jamais la garder en mémoire
+    """
+
+    def __init__(self, writer: _Base64Writer, key: str = "content"):
+        self.writer = writer
+        self.key = key
+        self.buffer = ""
+        self.depth = 0
+        self.last_string: Optional[str] = None
+        self.expect_value_for: Optional[str] = None
+        self.awaiting_content = False
+        self.streaming = False
+        self.found = False
+        self.done = False
+
+    def feed(self, text: str):
+        self.buffer += text
+        while self.buffer and not self.done:
+            if self.streaming:
+                if not self._stream_value():
+                    return
+            elif not self._scan_token():
+                return
+
+    def _stream_value(self) -> bool:
+        """Consomme la valeur base64; retourne False s'il faut plus de données"""
+        buf = self.buffer
+        end = self._string_end(buf, 0)
+        if end is None:
+            # Garder un échappement incomplet (\ ou \uXX) pour le morceau suivant
+            match = _INCOMPLETE_ESCAPE.search(buf)
+            keep = match.start() if match else len(buf)
+            self.writer.feed(_unescape(buf[:keep]))
+            self.buffer = buf[keep:]
+            return False
+
+        self.writer.feed(_unescape(buf[:end]))
+        self.buffer = buf[end + 1:]
+        self.streaming = False
+        self.found = True
+        self.done = True
+        return True
+
+    def _scan_token(self) -> bool:
+        """Avance d'un jeton hors de la valeur recherchée; False s'il faut plus de données"""
+        buf = self.buffer.lstrip()
+        self.buffer = buf
+        if not buf:
+            return False
+        char = buf[0]
+
+        if self.awaiting_content:
+            self.awaiting_content = False
+            if char == '"':
+                self.buffer = buf[1:]
+                self.streaming = True
+            else:
+                # "content": null
+                self.done = True
+            return True
+
+        if char == '"':
+            end = self._string_end(buf, 1)
+            if end is None:
+                return False
+            value = buf[1:end]
+            self.buffer = buf[end + 1:]
+            if self.expect_value_for is not None:
+                self.expect_value_for = None
+            else:
+                self.last_string = value
+            return True
+
+        if char == ":":
+            self.buffer = buf[1:]
+            if self.depth == 1 and self.last_string == self.key:
+                self.awaiting_content = True
+                return True
+            self.expect_value_for = self.last_string
+            return True
+
+        if char in "{[":
+            self.depth += 1
+        elif char in "}]":
+            self.depth -= 1
+        if char in ",{}[]":
+            self.last_string = None
+            self.expect_value_for = None
+        self.buffer = buf[1:]
+        return True
+
+    @staticmethod
+    def _string_end(buf: str, start: int) -> Optional[int]:
+        """Index du premier guillemet non échappé à partir de start, ou None si absent"""
+        i = start
+        while True:
+            i = buf.find('"', i)
+            if i == -1:
+                return None
+            backslashes = 0
+            j = i - 1
+            while j >= 0 and buf[j] == "\\":
+                backslashes += 1
+                j -= 1
+            if backslashes % 2 == 0:
+                return i
+            i += 1
+
+
+def write_base64_json_content(chunks: Iterable[bytes], destination: Path) -> Optional[Path]:
+    """
+    Décode le champ "content" d'une réponse JSON lue par morceaux vers un fichier
+
+    Le fichier est écrit dans un fichier temporaire du même dossier puis renommé
+    atomiquement: un PDF partiellement écrit n'apparaît jamais à destination.
+
+    Args:
+        chunks: Morceaux bruts de la réponse (ex: response.iter_content())
+        destination: Chemin final du PDF
+
+    Returns:
+        Le chemin du fichier écrit, ou None si la réponse ne contient pas de PDF
+    """
+    destination = Path(destination)
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(prefix=".", suffix=".part", dir=str(destination.parent))
+    decoder = codecs.getincrementaldecoder("utf-8")()
+
+    try:
+        with os.fdopen(fd, "wb") as output:
+            writer = _Base64Writer(output)
+            scanner = _ContentScanner(writer)
+            for chunk in chunks:
+                if chunk:
+                    scanner.feed(decoder.decode(chunk))
+                if scanner.done:
+                    break
+            writer.close()
+
+        if not scanner.found or writer.size == 0:
+            os.unlink(tmp_name)
+            return None
+
+        os.replace(tmp_name, destination)
+        return destination
+    except BaseException:
+        if os.path.exists(tmp_name):
+            os.unlink(tmp_name)
+        raise
+
+
+def download_base64_pdf(http, url: str, headers: dict, destination: Path, timeout: Optional[float] = None) -> Optional[Path]:
+    """
+    Télécharge un PDF Bexio ({"content": base64}) directement sur disque
+
+    Args:
+        http: Session requests (ou module requests)
+        url: Endpoint .../pdf
+        headers: En-têtes d'authentification
+        destination: Chemin final du PDF
+        timeout: Timeout HTTP en secondes
+
+    Returns:
+        Le chemin du PDF, ou None si l'API ne renvoie pas de contenu
+
+    Raises:
+        requests.exceptions.HTTPError: Si l'API répond en erreur
+    """
+    with http.get(url, headers=headers, stream=True, timeout=timeout) as response:
+        response.raise_for_status()
+        path = write_base64_json_content(response.iter_content(chunk_size=CHUNK_SIZE), destination)
+
+    if path:
+        logger.info(f"📄 PDF écrit en flux: {path} ({path.stat().st_size} octets)")
+    return path
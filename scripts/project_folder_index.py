@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+"""
+Index persistant des dossiers projet de "Dossiers actifs"
+Évite de parcourir tout le partage à chaque recherche de dossier
+"""
+
+import json
+import os
+import re
+import logging
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from address_normalizer import (address_matches, contains_phrase, house_numbers, normalize_address,
+                                normalize_locality, normalize_street, street_tokens)
+
+logger = logging.getLogger(__name__)
+
+# Format des noms de dossiers créés par 202512_Offres_acceptees: "AAAAMM_Rue n_Localité"
+FOLDER_NAME_PATTERN = re.compile(r"^(?P<date>\d{6})_(?P<rue>.+)_(?P<localite>[^_]+)$")
+
+DEFAULT_INDEX_FILE = Path(__file__).resolve().parent.parent / "project_folders_index.json"
+
+
+def analyze_folder_name(name: str, mtime: float) -> Dict:
+    """Extrait les formes normalisées d'un nom de dossier projet"""
+    match = FOLDER_NAME_PATTERN.match(name)
+    return {
+        "mtime": mtime,
+        "words": normalize_address(name),
+        "rue": normalize_street(match.group("rue")) if match else "",
+        "localite": normalize_locality(match.group("localite")) if match else "",
+    }
+
+
+def rank_folders(folders: Dict[str, Dict], candidates: Iterable[str], rue: str, localite: str) -> List[str]:
+    """
+    Classe des dossiers candidats par pertinence pour une adresse
+
+    Args:
+        folders: Entrées analysées par nom de dossier (voir analyze_folder_name)
+        candidates: Noms partageant au moins un mot de rue avec l'adresse
+        rue: Rue et numéro
+        localite: Localité
+
+    Returns:
+        Noms des dossiers dont la localité correspond, du plus pertinent au moins pertinent
+    """
+    localite_norm = normalize_locality(localite)
+    rue_norm = normalize_street(rue)
+    tokens = street_tokens(rue)
+    numbers = set(house_numbers(rue))
+
+    scored = []
+    for name in candidates:
+        entry = folders[name]
+        if not contains_phrase(entry["words"], localite_norm):
+            continue
+        words = set(entry["words"].split())
+        score = sum(1 for token in tokens if token in words)
+        if numbers & words:
+            score += 2
+        # Même type de rue: "Rue du Lac 15" avant "Chemin du Lac 15"
+        if entry["rue"] == rue_norm:
+            score += 1
+        if entry["localite"] == localite_norm:
+            score += 4
+        scored.append((score, entry["mtime"], name))
+
+    scored.sort(reverse=True)
+    return [name for _, _, name in scored]
+
+
+class ProjectFolderIndex:
+    """
+    Index des dossiers projet par mots normalisés de rue et de localité
+
+    Le fichier d'index est construit une seule fois puis rafraîchi de manière
+    incrémentale: si le mtime du dossier racine n'a pas changé, aucun dossier
+    n'a été ajouté, supprimé ou renommé et l'index est réutilisé tel quel.
+    Sinon seuls les dossiers nouveaux ou modifiés sont ré-analysés.
+
+    La recherche passe par un index inversé (mot -> dossiers), sans parcourir
+    le partage, et classe les candidats ambigus par pertinence.
+    """
+
+    VERSION = 1
+
+    def __init__(self, root: Path, index_file: Optional[Path] = None):
+        """
+        Initialise l'index
+
+        Args:
+            root: Dossier racine des projets (DOSSIERS_ACTIFS)
+            index_file: Fichier JSON de persistance (par défaut: project_folders_index.json
+                        à la racine de l'application, ou $PROJECT_INDEX_PATH)
+        """
+        self.root = Path(root)
+        if index_file is None:
+            index_file = Path(os.environ.get("PROJECT_INDEX_PATH", DEFAULT_INDEX_FILE))
+        self.index_file = Path(index_file)
+
+        self.root_mtime: Optional[float] = None
+        self.folders: Dict[str, Dict] = {}
+        self._by_word: Dict[str, set] = {}
+        self._loaded = False
+
+    # ==========================================
+    # CONSTRUCTION ET RAFRAÎCHISSEMENT
+    # ==========================================
+
+    def refresh(self) -> bool:
+        """
+        Met l'index à jour depuis le disque si nécessaire
+
+        Returns:
+            True si l'index a été modifié
+        """
+        if not self._loaded:
+            self._load()
+
+        root_mtime = self.root.stat().st_mtime
+        if root_mtime == self.root_mtime and self.folders:
+            return False
+
+        current = {}
+        with os.scandir(self.root) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    current[entry.name] = entry.stat().st_mtime
+
+        changed = False
+        for name in list(self.folders):
+            if name not in current:
+                del self.folders[name]
+                changed = True
+
+        for name, mtime in current.items():
+            known = self.folders.get(name)
+            if known is None or known["mtime"] != mtime:
+                self.folders[name] = self._analyze_folder(name, mtime)
+                changed = True
+
+        self.root_mtime = root_mtime
+        if changed:
+            logger.info(f"🗂️  Index dossiers mis à jour: {len(self.folders)} dossiers")
+        self._rebuild_word_index()
+        self._save()
+        return changed
+
+    def add_folder(self, folder: Path):
+        """
+        Ajoute un dossier fraîchement créé sans relire la racine
+
+        Args:
+            folder: Dossier projet créé sous la racine
+        """
+        if not self._loaded:
+            self._load()
+        folder = Path(folder)
+        self.folders[folder.name] = self._analyze_folder(folder.name, folder.stat().st_mtime)
+        self.root_mtime = self.root.stat().st_mtime
+        self._index_folder(folder.name, self.folders[folder.name])
+        self._save()
+
+    @staticmethod
+    def _analyze_folder(name: str, mtime: float) -> Dict:
+        """Extrait les formes normalisées d'un nom de dossier"""
+        return analyze_folder_name(name, mtime)
+
+    def _rebuild_word_index(self):
+        """Reconstruit l'index inversé en mémoire"""
+        self._by_word = {}
+        for name, entry in self.folders.items():
+            self._index_folder(name, entry)
+
+    def _index_folder(self, name: str, entry: Dict):
+        """Ajoute les mots d'un dossier à l'index inversé"""
+        for word in set(entry["words"].split()):
+            self._by_word.setdefault(word, set()).add(name)
+
+    # ==========================================
+    # RECHERCHE
+    # ==========================================
+
+    def find(self, rue: str, localite: str) -> List[Path]:
+        """
+        Cherche les dossiers correspondant à une adresse
+
+        Args:
+            rue: Rue et numéro
+            localite: Localité
+
+        Returns:
+            Dossiers candidats, du plus pertinent au moins pertinent
+        """
+        self.refresh()
+
+        candidates = set()
+        for token in street_tokens(rue):
+            candidates |= self._by_word.get(token, set())
+
+        return [self.root / name for name in rank_folders(self.folders, candidates, rue, localite)]
+
+    def find_existing(self, rue: str, localite: str) -> Optional[Path]:
+        """
+        Cherche le dossier projet du même bâtiment (rue, numéro et localité)
+
+        Args:
+            rue: Rue et numéro
+            localite: Localité
+
+        Returns:
+            Dossier le plus pertinent, ou None si aucun dossier ne porte cette adresse
+        """
+        for folder in self.find(rue, localite):
+            if address_matches(folder.name, rue, localite, same_number=True):
+                return folder
+        return None
+
+    # ==========================================
+    # PERSISTANCE
+    # ==========================================
+
+    def _load(self):
+        """Charge l'index depuis le fichier JSON s'il correspond à la même racine"""
+        self._loaded = True
+        if not self.index_file.exists():
+            return
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.warning(f"⚠️  Index dossiers illisible, reconstruction: {e}")
+            return
+
+        if data.get("version") != self.VERSION or data.get("root") != str(self.root):
+            return
+        self.root_mtime = data.get("root_mtime")
+        self.folders = data.get("folders", {})
+        self._rebuild_word_index()
+
+    def _save(self):
+        """Écrit l'index de manière atomique"""
+        data = {
+            "version": self.VERSION,
+            "root": str(self.root),
+            "root_mtime": self.root_mtime,
+            "folders": self.folders,
+        }
+        tmp_file = self.index_file.with_suffix(self.index_file.suffix + ".tmp")
+        try:
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_file, self.index_file)
+        except Exception as e:
+            logger.warning(f"⚠️  Impossible de sauvegarder l'index dossiers: {e}")
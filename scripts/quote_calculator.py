@@ -8,9 +8,11 @@ import logging
 import requests
 from typing import Dict, Tuple, Optional
 from validators import validate_pricing_data
+from address_normalizer import normalize_address
+from http_client import get_client
+import metrics_store
+import tracing
 
-# Configuration du logger
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
@@ -23,6 +25,10 @@ class QuoteCalculator:
     - Prix CECB Plus = Prix CECB × plus_factor (max: plus_price_max)
     """
 
+    # Cache des distances, partagé entre instances, clé = (origine, destination) normalisées
+    _distance_cache: Dict[Tuple[str, str], float] = {}
+    DISTANCE_CACHE_SIZE = 100
+
     def __init__(self, tarifs: dict, google_maps_api_key: str, eta_consult_address: str):
         """
         Initialise le calculateur avec les tarifs
@@ -192,7 +198,8 @@ class QuoteCalculator:
         localite_batiment = form_data.get("localite_batiment", form_data["localite_facturation"])
         destination = f"{adresse_batiment}, {npa_batiment} {localite_batiment}, Suisse"
 
-        distance_km = self.calculate_distance_google_maps(self.eta_consult_address, destination)
+        with tracing.span("distance"):
+            distance_km = self.calculate_distance_google_maps(self.eta_consult_address, destination)
 
         # 4. Calculer les prix CECB et CECB Plus
         cecb_price = self.calculate_cecb_price(distance_km, s_eq, is_plus=False)
@@ -275,6 +282,13 @@ class QuoteCalculator:
             logger.warning("⚠️  Google Maps API key manquante - distance = 0 km")
             return 0
 
+        cache_key = (normalize_address(origin), normalize_address(destination))
+        metrics_store.record_cache("distance", cache_key in self._distance_cache)
+        if cache_key in self._distance_cache:
+            distance_km = self._distance_cache[cache_key]
+            logger.info(f"   Distance Google Maps (cache): {distance_km} km")
+            return distance_km
+
         url = "https://maps.googleapis.com/maps/api/distancematrix/json"
 
         params = {
@@ -285,7 +299,7 @@ class QuoteCalculator:
         }
 
         try:
-            response = requests.get(url, params=params, timeout=30)
+            response = get_client().get(url, params=params, timeout=30)
             response.raise_for_status()
             data = response.json()
 
@@ -308,8 +322,21 @@ class QuoteCalculator:
             distance_km = round(distance_m / 1000, 2)
 
             logger.info(f"   Distance Google Maps: {distance_km} km")
+            self._store_distance(cache_key, distance_km)
             return distance_km
 
         except requests.exceptions.RequestException as e:
             logger.error(f"❌ Erreur API Google Maps: {e}")
             return 0
+
+    @classmethod
+    def _store_distance(cls, cache_key: Tuple[str, str], distance_km: float):
+        """Ajoute une distance au cache en évinçant la plus ancienne entrée si plein"""
+        if len(cls._distance_cache) >= cls.DISTANCE_CACHE_SIZE:
+            cls._distance_cache.pop(next(iter(cls._distance_cache)))
+        cls._distance_cache[cache_key] = distance_km
+
+    @classmethod
+    def clear_distance_cache(cls):
+        """Vide le cache des distances"""
+        cls._distance_cache.clear()
@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+"""
+Profilage à la demande des scripts lancés par /run_script
+
+Modes:
+- cprofile: profil déterministe (cProfile), artefact .prof lisible par pstats / snakeviz
+- sample: échantillonnage de la pile du thread principal toutes les 5 ms (surcoût faible)
+- importtime: python -X importtime, temps d'import de chaque module (démarrage de l'interpréteur)
+
+Usage (lancé par app.py, le code de sortie du script est conservé):
+    python scripts/script_profiler.py --mode cprofile --output run.prof scripts/202512_Creer_devis.py '<json>'
+"""
+
+import os
+import sys
+import json
+import pstats
+import runpy
+import argparse
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+MODES = ('cprofile', 'sample', 'importtime')
+
+DEFAULT_PROFILES_DIR = Path(__file__).resolve().parent.parent / "profiles"
+
+ARTIFACT_SUFFIXES = {
+    'cprofile': '.prof',
+    'sample': '.samples.json',
+    'importtime': '.importtime.txt',
+}
+
+SAMPLE_INTERVAL = 0.005
+TOP_N = 20
+
+
+def get_profiles_dir() -> Path:
+    """Dossier des artefacts de profilage (profiles/ à la racine, ou $PROFILES_DIR)"""
+    return Path(os.environ.get("PROFILES_DIR") or DEFAULT_PROFILES_DIR)
+
+
+def artifact_path(run_id: int, script_id: str, mode: str) -> Path:
+    """Chemin de l'artefact d'une exécution (le dossier est créé si besoin)"""
+    directory = get_profiles_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory / f"{run_id}_{script_id}{ARTIFACT_SUFFIXES[mode]}"
+
+
+def build_command(mode: str, script_path: str, script_args: List[str], artifact: Path) -> List[str]:
+    """
+    Commande qui exécute le script sous le profileur demandé
+
+    Args:
+        mode: 'cprofile', 'sample' ou 'importtime'
+        script_path: Chemin du script
+        script_args: Arguments du script
+        artifact: Fichier de sortie du profil (ignoré pour importtime: lu sur stderr)
+
+    Returns:
+        Liste d'arguments pour subprocess
+    """
+    if mode not in MODES:
+        raise ValueError(f"Mode de profilage inconnu: {mode}")
+    if mode == 'importtime':
+        return ['python', '-X', 'importtime', script_path] + list(script_args)
+    return ['python', os.path.abspath(__file__), '--mode', mode, '--output', str(artifact),
+            script_path] + list(script_args)
+
+
+def split_importtime(stderr: str) -> Tuple[str, str]:
+    """
+    Sépare les lignes "import time:" du reste de stderr
+
+    Returns:
+        (stderr du script, lignes importtime)
+    """
+    script_lines, import_lines = [], []
+    for line in (stderr or '').splitlines(keepends=True):
+        (import_lines if line.startswith('import time:') else script_lines).append(line)
+    return ''.join(script_lines), ''.join(import_lines)
+
+
+# ==========================================
+# RÉSUMÉS (TOP N)
+# ==========================================
+
+def _function_label(filename: str, lineno: int, name: str) -> str:
+    if filename == '~':
+        # Fonctions C (ex: <built-in method time.sleep>)
+        return name
+    return f"{os.path.basename(filename)}:{lineno}({name})"
+
+
+def _is_wrapper(label: str) -> bool:
+    """Cadres ajoutés par run_profiled (runpy, ce module): exclus des résumés"""
+    return label.startswith(('<frozen runpy>', 'runpy.py', 'script_profiler.py'))
+
+
+def summarize_cprofile(artifact: Path, limit: int = TOP_N) -> Dict:
+    stats = pstats.Stats(str(artifact))
+    rows = []
+    for (filename, lineno, name), (cc, ncalls, tottime, cumtime, _) in stats.stats.items():
+        label = _function_label(filename, lineno, name)
+        if _is_wrapper(label):
+            continue
+        rows.append({
+            'function': label,
+            'calls': ncalls,
+            'self': round(tottime, 4),
+            'cumulative': round(cumtime, 4),
+        })
+    rows.sort(key=lambda r: r['cumulative'], reverse=True)
+    return {'mode': 'cprofile', 'total': round(stats.total_tt, 4), 'unit': 's', 'functions': rows[:limit]}
+
+
+def summarize_samples(artifact: Path, limit: int = TOP_N) -> Dict:
+    with open(artifact, encoding='utf-8') as f:
+        data = json.load(f)
+    # Le GIL espace parfois les échantillons: chacun vaut la durée mesurée / nombre d'échantillons
+    interval = data['duration'] / data['samples'] if data['samples'] else data['interval']
+    rows = [
+        {'function': name, 'calls': None, 'self': round(own * interval, 4), 'cumulative': round(total * interval, 4)}
+        for name, (own, total) in data['functions'].items()
+        if not _is_wrapper(name)
+    ]
+    rows.sort(key=lambda r: (r['self'], r['cumulative']), reverse=True)
+    return {'mode': 'sample', 'total': round(data['duration'], 4), 'unit': 's',
+            'samples': data['samples'], 'functions': rows[:limit]}
+
+
+def summarize_importtime(artifact: Path, limit: int = TOP_N) -> Dict:
+    rows = []
+    with open(artifact, encoding='utf-8') as f:
+        for line in f:
+            # import time: self [us] | cumulative | imported package
+            parts = line[len('import time:'):].split('|')
+            if len(parts) != 3 or not parts[0].strip().isdigit():
+                continue
+            rows.append({
+                'function': parts[2].rstrip(),
+                'calls': None,
+                'self': int(parts[0]) / 1e6,
+                'cumulative': int(parts[1]) / 1e6,
+            })
+    # Modules de premier niveau (sans indentation): leur cumul couvre tout l'import
+    total = sum(r['cumulative'] for r in rows if not r['function'].startswith('  '))
+    rows.sort(key=lambda r: r['self'], reverse=True)
+    for row in rows:
+        row['function'] = row['function'].strip()
+    return {'mode': 'importtime', 'total': round(total, 4), 'unit': 's', 'modules': len(rows), 'functions': rows[:limit]}
+
+
+def summarize(mode: str, artifact: Path, limit: int = TOP_N) -> Optional[Dict]:
+    """
+    Fonctions (ou modules) les plus coûteuses d'un artefact de profilage
+
+    Args:
+        mode: 'cprofile', 'sample' ou 'importtime'
+        artifact: Fichier écrit par le profileur
+        limit: Nombre de lignes conservées
+
+    Returns:
+        {'mode', 'total', 'unit', 'functions': [{'function', 'calls', 'self', 'cumulative'}]},
+        ou None si l'artefact est absent ou illisible
+    """
+    summarizers = {'cprofile': summarize_cprofile, 'sample': summarize_samples, 'importtime': summarize_importtime}
+    try:
+        return summarizers[mode](Path(artifact), limit)
+    except (OSError, ValueError, KeyError, TypeError, EOFError):
+        return None
+
+
+# ==========================================
+# EXÉCUTION SOUS PROFILEUR
+# ==========================================
+
+class StackSampler:
+    """Échantillonne la pile d'un thread à intervalle fixe (temps propre et inclusif par fonction)"""
+
+    def __init__(self, thread_id: int, interval: float = SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = 0
+        self.functions: Dict[str, List[int]] = {}
+        self.duration = 0.0
+        self._started = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def start(self):
+        self._started = time.perf_counter()
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self._started
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            self.samples += 1
+            seen = set()
+            leaf = True
+            while frame is not None:
+                code = frame.f_code
+                key = _function_label(code.co_filename, code.co_firstlineno, code.co_name)
+                counts = self.functions.setdefault(key, [0, 0])
+                if leaf:
+                    counts[0] += 1
+                    leaf = False
+                if key not in seen:
+                    # Récursion: une seule fois par échantillon dans le temps inclusif
+                    counts[1] += 1
+                    seen.add(key)
+                frame = frame.f_back
+
+    def dump(self, output: Path):
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump({'interval': self.interval, 'duration': self.duration, 'samples': self.samples,
+                       'functions': self.functions}, f)
+
+
+def run_profiled(mode: str, output: Path, script_path: str, script_args: List[str]):
+    """
+    Exécute un script comme "python script args" sous cProfile ou l'échantillonneur
+
+    L'artefact est écrit même si le script échoue; SystemExit et les exceptions
+    du script sont propagées (même code de sortie que sans profilage).
+    """
+    sys.argv = [script_path] + list(script_args)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(script_path)))
+
+    if mode == 'cprofile':
+        import cProfile
+        profiler = cProfile.Profile()
+        try:
+            profiler.runcall(runpy.run_path, script_path, run_name='__main__')
+        finally:
+            profiler.dump_stats(str(output))
+    else:
+        sampler = StackSampler(threading.get_ident())
+        sampler.start()
+        try:
+            runpy.run_path(script_path, run_name='__main__')
+        finally:
+            sampler.stop()
+            sampler.dump(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exécute un script sous profileur")
+    parser.add_argument('--mode', choices=('cprofile', 'sample'), required=True)
+    parser.add_argument('--output', required=True, help="Fichier de l'artefact")
+    parser.add_argument('script')
+    parser.add_argument('args', nargs=argparse.REMAINDER)
+    options = parser.parse_args()
+    run_profiled(options.mode, Path(options.output), options.script, options.args)
+
+
+if __name__ == "__main__":
+    main()
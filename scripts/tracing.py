@@ -0,0 +1,422 @@
+# -*- coding: utf-8 -*-
+"""
+Traces légères compatibles OpenTelemetry (spans OTLP/JSON)
+
+- Contexte W3C "traceparent": reçu en en-tête HTTP par Flask, transmis aux scripts
+  par la variable d'environnement TRACEPARENT; les spans des deux processus
+  partagent ainsi le même trace_id
+- Export: une requête OTLP/JSON par ligne dans traces.jsonl (lisible par le
+  receiver "otlpjsonfile" du collector) et/ou POST vers $OTEL_EXPORTER_OTLP_ENDPOINT
+- traces.jsonl est renommé en traces.jsonl.1 au-delà de $TRACES_MAX_MB (une seule
+  archive conservée); l'envoi au collector se fait dans un thread d'arrière-plan,
+  jamais pendant la requête Flask
+- Actif si TRACING_ENABLED=1 ou si le processus a reçu un TRACEPARENT
+
+Usage:
+    python scripts/tracing.py [trace_id]    # arbre des spans d'une trace (défaut: la dernière)
+"""
+
+import os
+import sys
+import json
+import time
+import atexit
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TRACES_FILE = Path(__file__).resolve().parent.parent / "traces.jsonl"
+
+# SpanKind OTLP
+INTERNAL = 1
+SERVER = 2
+CLIENT = 3
+
+# Status OTLP
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+OTLP_BATCH_SIZE = 50
+
+# Intervalle maximal entre deux envois au collector (secondes)
+OTLP_FLUSH_INTERVAL = 2.0
+
+# Spans conservés en attente si le collector est injoignable (les plus anciens sont abandonnés)
+OTLP_MAX_PENDING = 2000
+
+# Taille de traces.jsonl avant rotation (Mo)
+TRACES_MAX_MB = float(os.environ.get("TRACES_MAX_MB", 50))
+
+_current: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+_export_lock = threading.Lock()
+_otlp_batch: List[Dict] = []
+_otlp_wake = threading.Event()
+_otlp_thread: Optional[threading.Thread] = None
+_otlp_pid: Optional[int] = None
+_atexit_registered = False
+
+
+def _random_id(nbytes: int) -> str:
+    """Identifiant hexadécimal aléatoire (os.urandom, comme secrets.token_hex sans importer hmac)"""
+    return os.urandom(nbytes).hex()
+
+
+def is_enabled() -> bool:
+    """True si les spans doivent être enregistrés dans ce processus"""
+    return os.environ.get("TRACING_ENABLED") == "1" or "TRACEPARENT" in os.environ
+
+
+def get_traces_path() -> Path:
+    """Fichier des spans (traces.jsonl à la racine, ou $TRACES_PATH)"""
+    return Path(os.environ.get("TRACES_PATH", DEFAULT_TRACES_FILE))
+
+
+def parse_traceparent(value: Optional[str]) -> Optional[Tuple[str, str]]:
+    """
+    Lit un en-tête W3C traceparent
+
+    Args:
+        value: "00-<trace_id 32 hex>-<span_id 16 hex>-<flags>"
+
+    Returns:
+        (trace_id, span_id), ou None si absent ou invalide
+    """
+    parts = (value or "").strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None
+    if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+        return None
+    return parts[1], parts[2]
+
+
+# ==========================================
+# SPANS
+# ==========================================
+
+class Span:
+    """Opération mesurée: nom, parent, début/fin (ns), attributs et statut"""
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], kind: int = INTERNAL,
+                 attributes: Optional[Dict] = None, remote_parent: bool = False):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = _random_id(8)
+        self.parent_id = parent_id
+        self.remote_parent = remote_parent
+        self.kind = kind
+        self.attributes = dict(attributes or {})
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.status = None
+        self.status_message = ""
+        self._token = None
+
+    @property
+    def traceparent(self) -> str:
+        """En-tête W3C pour propager ce span comme parent"""
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def set_error(self, message: str):
+        self.status = STATUS_ERROR
+        self.status_message = message[:500]
+
+    def end(self):
+        """Termine le span, le retire du contexte courant et l'exporte"""
+        if self.end_ns is not None:
+            return
+        self.end_ns = time.time_ns()
+        if self._token is not None:
+            try:
+                _current.reset(self._token)
+            except ValueError:
+                # Terminé depuis un autre contexte (thread): le contexte d'origine n'est plus actif
+                pass
+            self._token = None
+        _export(self)
+
+    def to_otlp(self) -> Dict:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or time.time_ns()),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in self.attributes.items()],
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        if self.status is not None:
+            span["status"] = {"code": self.status, "message": self.status_message}
+        return span
+
+
+def _otlp_value(value) -> Dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def current_trace_id() -> Optional[str]:
+    """trace_id du span courant (None si aucune trace en cours)"""
+    span = _current.get()
+    return span.trace_id if span else None
+
+
+def start_span(name: str, kind: int = INTERNAL, parent: Optional[str] = None, **attributes) -> Optional[Span]:
+    """
+    Démarre un span et en fait le span courant (à terminer par span.end())
+
+    Le parent est, dans l'ordre: l'en-tête traceparent fourni, le span courant,
+    puis $TRACEPARENT (span du processus Flask qui a lancé le script).
+
+    Args:
+        name: Nom de l'opération
+        kind: INTERNAL, SERVER ou CLIENT
+        parent: En-tête traceparent entrant (optionnel)
+        **attributes: Attributs du span
+
+    Returns:
+        Span démarré, ou None si le traçage est désactivé
+    """
+    if not is_enabled():
+        return None
+
+    remote = parse_traceparent(parent)
+    local = _current.get()
+    if remote is None and local is None:
+        remote = parse_traceparent(os.environ.get("TRACEPARENT"))
+
+    if remote is not None:
+        span = Span(name, remote[0], remote[1], kind, attributes, remote_parent=True)
+    elif local is not None:
+        span = Span(name, local.trace_id, local.span_id, kind, attributes)
+    else:
+        span = Span(name, _random_id(16), None, kind, attributes)
+
+    span._token = _current.set(span)
+    return span
+
+
+@contextmanager
+def span(name: str, kind: int = INTERNAL, **attributes):
+    """
+    Mesure le bloc comme un span enfant du span courant
+
+    Une exception marque le span en erreur (sauf sys.exit(0)) puis est relancée.
+    Produit None si le traçage est désactivé.
+    """
+    current = start_span(name, kind, **attributes)
+    if current is None:
+        yield None
+        return
+    try:
+        yield current
+    except BaseException as e:
+        if not (isinstance(e, SystemExit) and e.code in (0, None)):
+            current.set_error(f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        current.end()
+
+
+def inject_env(environ: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """
+    Copie de l'environnement avec TRACEPARENT = span courant (pour un sous-processus)
+
+    Args:
+        environ: Environnement de base (défaut: os.environ)
+
+    Returns:
+        Nouvel environnement; sans span courant, TRACEPARENT est retiré
+    """
+    env = dict(os.environ if environ is None else environ)
+    current = _current.get()
+    if current is not None:
+        env["TRACEPARENT"] = current.traceparent
+    else:
+        env.pop("TRACEPARENT", None)
+    return env
+
+
+# ==========================================
+# EXPORT
+# ==========================================
+
+def _resource() -> Dict:
+    return {"attributes": [
+        {"key": "service.name", "value": {"stringValue": os.environ.get("OTEL_SERVICE_NAME", "script-runner")}},
+        {"key": "process.pid", "value": {"intValue": str(os.getpid())}},
+        {"key": "process.command", "value": {"stringValue": os.path.basename(sys.argv[0]) if sys.argv else ""}},
+    ]}
+
+
+def _request(spans: List[Dict]) -> Dict:
+    """Enveloppe ExportTraceServiceRequest OTLP/JSON"""
+    return {"resourceSpans": [{
+        "resource": _resource(),
+        "scopeSpans": [{"scope": {"name": "script-runner"}, "spans": spans}],
+    }]}
+
+
+def _write_line(line: str):
+    """Ajoute une ligne à traces.jsonl, renommé en traces.jsonl.1 au-delà de TRACES_MAX_MB"""
+    path = get_traces_path()
+    with _export_lock:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(line)
+            size = f.tell()
+        if size >= TRACES_MAX_MB * 1024 * 1024:
+            # Un autre processus peut avoir renommé le fichier entre-temps: sans conséquence
+            try:
+                os.replace(path, path.with_name(path.name + ".1"))
+            except FileNotFoundError:
+                pass
+
+
+def _export(span: Span):
+    global _atexit_registered
+    data = span.to_otlp()
+    try:
+        _write_line(json.dumps(_request([data]), ensure_ascii=False) + "\n")
+    except OSError as e:
+        logger.warning(f"⚠️  Span non enregistré: {e}")
+
+    if not os.environ.get("OTEL_EXPORTER_OTLP_ENDPOINT"):
+        return
+    with _export_lock:
+        _otlp_batch.append(data)
+        del _otlp_batch[:-OTLP_MAX_PENDING]
+        if not _atexit_registered:
+            # Scripts: les derniers spans sont envoyés à la sortie du processus
+            atexit.register(flush_otlp)
+            _atexit_registered = True
+        full = len(_otlp_batch) >= OTLP_BATCH_SIZE
+    _start_exporter()
+    # Fin d'une requête Flask ou d'un script: envoyer sans attendre l'intervalle
+    if full or span.parent_id is None or span.remote_parent:
+        _otlp_wake.set()
+
+
+def _start_exporter():
+    """Démarre le thread d'envoi au collector (un par processus, relancé après un fork)"""
+    global _otlp_thread, _otlp_pid
+    with _export_lock:
+        if _otlp_pid == os.getpid() and _otlp_thread is not None and _otlp_thread.is_alive():
+            return
+        _otlp_pid = os.getpid()
+        _otlp_thread = threading.Thread(target=_exporter_loop, name="otlp-exporter", daemon=True)
+        _otlp_thread.start()
+
+
+def _exporter_loop():
+    while True:
+        _otlp_wake.wait(OTLP_FLUSH_INTERVAL)
+        _otlp_wake.clear()
+        flush_otlp()
+
+
+def flush_otlp():
+    """Envoie les spans en attente au collector OTLP/HTTP ($OTEL_EXPORTER_OTLP_ENDPOINT)"""
+    endpoint = os.environ.get("OTEL_EXPORTER_OTLP_ENDPOINT")
+    with _export_lock:
+        spans = list(_otlp_batch)
+        _otlp_batch.clear()
+    if not endpoint or not spans:
+        return
+    # Importé ici: sans collector, le traçage ne charge pas requests
+    import requests
+    try:
+        # requests direct (pas http_client): l'export ne doit pas créer de spans ni de métriques
+        response = requests.post(f"{endpoint.rstrip('/')}/v1/traces", json=_request(spans), timeout=5)
+        response.raise_for_status()
+    except requests.exceptions.RequestException as e:
+        logger.warning(f"⚠️  Export OTLP impossible ({len(spans)} span(s)): {e}")
+
+
+# ==========================================
+# LECTURE D'UNE TRACE
+# ==========================================
+
+def load_trace(trace_id: Optional[str] = None, path: Optional[Path] = None) -> List[Dict]:
+    """
+    Rassemble les spans d'une trace écrits par tous les processus
+
+    Args:
+        trace_id: Trace à lire (défaut: celle du dernier span enregistré)
+        path: Fichier des spans (défaut: get_traces_path()), archive .1 comprise
+
+    Returns:
+        Spans OTLP (dict) avec "process.command" ajouté, triés par début
+    """
+    path = Path(path) if path else get_traces_path()
+    files = [p for p in (path.with_name(path.name + ".1"), path) if p.exists()]
+
+    spans = []
+    for file in files:
+        with open(file, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    request = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                for resource_spans in request.get("resourceSpans", []):
+                    resource = {a["key"]: next(iter(a["value"].values()))
+                                for a in resource_spans.get("resource", {}).get("attributes", [])}
+                    for scope in resource_spans.get("scopeSpans", []):
+                        for item in scope.get("spans", []):
+                            item["process.command"] = resource.get("process.command", "")
+                            spans.append(item)
+
+    if trace_id is None and spans:
+        trace_id = spans[-1]["traceId"]
+    return sorted((s for s in spans if s["traceId"] == trace_id), key=lambda s: int(s["startTimeUnixNano"]))
+
+
+def format_trace(spans: List[Dict]) -> str:
+    """Arbre des spans avec décalage et durée en millisecondes"""
+    if not spans:
+        return "Aucun span"
+    ids = {s["spanId"] for s in spans}
+    children: Dict[Optional[str], List[Dict]] = {}
+    for s in spans:
+        parent = s.get("parentSpanId") if s.get("parentSpanId") in ids else None
+        children.setdefault(parent, []).append(s)
+    origin = int(spans[0]["startTimeUnixNano"])
+
+    lines = [f"Trace {spans[0]['traceId']}"]
+
+    def walk(parent, depth):
+        for s in children.get(parent, []):
+            start = (int(s["startTimeUnixNano"]) - origin) / 1e6
+            duration = (int(s["endTimeUnixNano"]) - int(s["startTimeUnixNano"])) / 1e6
+            error = "  [ERREUR]" if s.get("status", {}).get("code") == STATUS_ERROR else ""
+            lines.append(f"{start:9.1f} ms {duration:9.1f} ms  {'  ' * depth}{s['name']}  ({s['process.command']}){error}")
+            walk(s["spanId"], depth + 1)
+
+    walk(None, 0)
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    print(format_trace(load_trace(sys.argv[1] if len(sys.argv) > 1 else None)))
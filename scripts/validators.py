@@ -7,11 +7,6 @@ Fonctions de validation et gestion d'erreurs robuste
 import logging
 from typing import Optional, Dict, Any
 
-# Configuration du logger
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
 
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""
+Exécution d'étapes de workflow en graphe de dépendances
+Les étapes indépendantes tournent en parallèle (threads); la sortie de chaque étape
+est affichée d'un bloc dès qu'elle se termine, sans s'entremêler avec les autres
+"""
+
+import io
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+
+# ==========================================
+# CAPTURE DE LA SORTIE PAR THREAD
+# ==========================================
+
+class _ThreadLocalStdout(io.TextIOBase):
+    """
+    Remplace sys.stdout pendant l'exécution: chaque étape écrit dans son propre tampon
+    afin que les print() des étapes parallèles ne s'entremêlent pas
+    """
+
+    def __init__(self, real_stdout):
+        self.real_stdout = real_stdout
+        self.local = threading.local()
+
+    def write(self, text):
+        buffer = getattr(self.local, "buffer", None)
+        if buffer is not None:
+            return buffer.write(text)
+        return self.real_stdout.write(text)
+
+    def flush(self):
+        self.real_stdout.flush()
+
+
+_stdout_lock = threading.Lock()
+_stdout_users = 0
+
+
+@contextmanager
+def captured_stdout():
+    """
+    Capture les print() du thread courant dans un tampon
+
+    Peut être imbriqué et utilisé depuis plusieurs threads à la fois: sys.stdout
+    n'est remplacé qu'une fois, puis restauré quand plus aucun thread ne capture.
+
+    Yields:
+        io.StringIO contenant la sortie du thread
+    """
+    global _stdout_users
+    with _stdout_lock:
+        if _stdout_users == 0:
+            sys.stdout = _ThreadLocalStdout(sys.stdout)
+        _stdout_users += 1
+        router = sys.stdout
+
+    buffer = io.StringIO()
+    previous = getattr(router.local, "buffer", None)
+    router.local.buffer = buffer
+    try:
+        yield buffer
+    finally:
+        router.local.buffer = previous
+        with _stdout_lock:
+            _stdout_users -= 1
+            if _stdout_users == 0:
+                sys.stdout = router.real_stdout
+
+
+class StageResult:
+    """Résultat d'une étape: valeur, erreur éventuelle, durée et sortie capturée"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+        self.skipped = False
+        self.duration = 0.0
+        self.output = ""
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and not self.skipped
+
+
+class StageRunner:
+    """
+    Exécute des étapes dépendantes les unes des autres
+
+    Chaque étape est une fonction recevant le dict {nom_dépendance: valeur}.
+    Une étape démarre dès que toutes ses dépendances ont réussi; si une
+    dépendance échoue, l'étape est marquée comme ignorée. Les print() d'une
+    étape sont affichés dès sa fin (un script arrêté par son timeout garde
+    ainsi la sortie des étapes terminées).
+
+    Exemple:
+        runner = StageRunner()
+        runner.add("dossier", lambda r: creer_dossier())
+        runner.add("templates", lambda r: copier(r["dossier"]), depends_on=["dossier"])
+        runner.run()
+        runner.print_report()
+    """
+
+    def __init__(self, max_workers: int = 4):
+        """
+        Initialise le moteur
+
+        Args:
+            max_workers: Nombre maximum d'étapes exécutées simultanément
+        """
+        self.max_workers = max_workers
+        self.stages: Dict[str, Dict] = {}
+        self.results: Dict[str, StageResult] = {}
+        self.total_duration = 0.0
+
+    def add(self, name: str, func: Callable[[Dict[str, Any]], Any], depends_on: Iterable[str] = ()):
+        """
+        Déclare une étape (l'ordre de déclaration est l'ordre du journal)
+
+        Args:
+            name: Nom unique de l'étape
+            func: Fonction appelée avec les valeurs des dépendances
+            depends_on: Noms des étapes à terminer avant celle-ci
+        """
+        depends_on = list(depends_on)
+        for dep in depends_on:
+            if dep not in self.stages:
+                raise ValueError(f"Dépendance inconnue pour '{name}': {dep}")
+        self.stages[name] = {"func": func, "depends_on": depends_on}
+
+    def _execute(self, name: str, inputs: Dict[str, Any]) -> StageResult:
+        result = StageResult(name)
+        with captured_stdout() as buffer:
+            start = time.perf_counter()
+            try:
+                result.value = self.stages[name]["func"](inputs)
+            except Exception as e:
+                result.error = e
+            finally:
+                result.duration = time.perf_counter() - start
+        result.output = buffer.getvalue()
+        return result
+
+    def run(self) -> Dict[str, StageResult]:
+        """
+        Exécute toutes les étapes
+
+        Returns:
+            Résultats par nom d'étape
+        """
+        pending = dict(self.stages)
+        running = {}
+        start = time.perf_counter()
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                while pending or running:
+                    for name in list(pending):
+                        deps = pending[name]["depends_on"]
+                        if any(d in self.results and not self.results[d].ok for d in deps):
+                            skipped = StageResult(name)
+                            skipped.skipped = True
+                            self.results[name] = skipped
+                            del pending[name]
+                        elif all(d in self.results for d in deps):
+                            inputs = {d: self.results[d].value for d in deps}
+                            running[executor.submit(self._execute, name, inputs)] = name
+                            del pending[name]
+
+                    if not running:
+                        continue
+
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        result = future.result()
+                        self.results[running.pop(future)] = result
+                        if result.output:
+                            print(result.output, end="", flush=True)
+        finally:
+            self.total_duration = time.perf_counter() - start
+
+        return self.results
+
+    def failed(self) -> List[StageResult]:
+        """Retourne les étapes en erreur, dans l'ordre de déclaration"""
+        return [self.results[n] for n in self.stages if n in self.results and self.results[n].error]
+
+    def print_log(self):
+        """Réaffiche la sortie de chaque étape dans l'ordre de déclaration (déjà affichée par run())"""
+        for name in self.stages:
+            result = self.results.get(name)
+            if result and result.output:
+                print(result.output, end="")
+
+    def print_report(self):
+        """Affiche les durées par étape et la durée totale"""
+        print(f"\n[DUREES] Etapes:")
+        for name in self.stages:
+            result = self.results.get(name)
+            if result is None:
+                continue
+            if result.skipped:
+                status = "ignoree"
+            elif result.error:
+                status = f"erreur: {result.error}"
+            else:
+                status = "ok"
+            print(f"   {name:<14} {result.duration:6.2f}s  {status}")
+        print(f"   {'total':<14} {self.total_duration:6.2f}s")
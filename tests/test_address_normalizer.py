@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+Tests unitaires pour address_normalizer
+Vérifie que les variantes d'une même adresse produisent la même clé
+"""
+
+import sys
+import os
+
+# Configurer l'encodage UTF-8 pour Windows
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+# Ajouter le répertoire parent au path pour importer les modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+from address_normalizer import (address_key, address_matches, normalize_street,
+                                normalize_locality, street_tokens)
+
+
+# ==========================================
+# TESTS DE NORMALISATION
+# ==========================================
+
+def test_normalisation_abreviations_et_espaces():
+    """Test des abréviations de type de rue et des espaces superflus"""
+    print("\n🧪 Test 1: Abréviations et espaces")
+
+    assert normalize_street("Rte de Genève 5") == "route de geneve 5"
+    assert normalize_street("  Route de  Genève 5 ") == "route de geneve 5"
+    assert normalize_street("Chem. du Treizou 21") == "chemin du treizou 21"
+    print("✅ Abréviations développées")
+
+
+def test_normalisation_apostrophes_et_accents():
+    """Test des variantes d'apostrophes et des accents"""
+    print("\n🧪 Test 2: Apostrophes et accents")
+
+    assert normalize_street("Route de l'Hôpital 16b") == normalize_street("route de l’Hopital 16B")
+    assert normalize_locality("St-Légier") == "saint legier"
+    print("✅ Apostrophes et accents normalisés")
+
+
+def test_cle_adresse_equivalente():
+    """Test de l'égalité des clés de cache pour deux saisies équivalentes"""
+    print("\n🧪 Test 3: Clés d'adresse")
+
+    key_a = address_key("Rte de Genève 5", "1180", "Rolle")
+    key_b = address_key("Route de Genève 5 ", " 1180", "ROLLE")
+
+    assert key_a == key_b, f"❌ Clés différentes: {key_a} / {key_b}"
+    assert hash(key_a) == hash(key_b)
+    assert key_b.raw_rue == "Route de Genève 5 ", "❌ Le texte d'origine doit être conservé"
+    print(f"✅ Clé commune: {key_a}")
+
+
+# ==========================================
+# TESTS DE CORRESPONDANCE
+# ==========================================
+
+def test_mots_significatifs_rue():
+    """Test de l'extraction des mots significatifs"""
+    print("\n🧪 Test 4: Mots significatifs")
+
+    tokens = street_tokens("Chem. du Treizou 21")
+    assert tokens == ["treizou"], f"❌ Mots incorrects: {tokens}"
+    print(f"✅ Mots: {tokens}")
+
+
+def test_correspondance_dossier():
+    """Test de la correspondance entre un nom de dossier et une adresse"""
+    print("\n🧪 Test 5: Correspondance dossier")
+
+    assert address_matches("202512_Chem. du Treizou 21_Trélex", "Chemin du Treizou 21", "Trelex")
+    assert not address_matches("202512_Chem. du Treizou 21_Trélex", "Rue du Lac 3", "Trélex")
+    # La localité doit correspondre à des mots entiers
+    assert not address_matches("202512_Rue du Lac 3_Rolleville", "Rue du Lac 3", "Rolle")
+    # Même bâtiment: le numéro doit aussi correspondre
+    assert address_matches("202512_Rue du Lac 3_Trélex", "Rue du Lac 5", "Trélex")
+    assert not address_matches("202512_Rue du Lac 3_Trélex", "Rue du Lac 5", "Trélex", same_number=True)
+    assert address_matches("202512_Rte du Lac 3b_Trélex", "Route du Lac 3b", "Trelex", same_number=True)
+    print("✅ Correspondances correctes")
+
+
+# ==========================================
+# EXÉCUTION DES TESTS
+# ==========================================
+
+def run_all_tests():
+    """Lance tous les tests"""
+    print("=" * 60)
+    print("🧪 TESTS UNITAIRES - address_normalizer")
+    print("=" * 60)
+
+    tests = [
+        test_normalisation_abreviations_et_espaces,
+        test_normalisation_apostrophes_et_accents,
+        test_cle_adresse_equivalente,
+        test_mots_significatifs_rue,
+        test_correspondance_dossier
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except AssertionError as e:
+            print(f"❌ {test.__name__} ÉCHOUÉ: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"❌ {test.__name__} ERREUR: {e}")
+            failed += 1
+
+    print("\n" + "=" * 60)
+    print(f"📊 RÉSULTATS: {passed} tests réussis, {failed} tests échoués")
+    print("=" * 60)
+
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
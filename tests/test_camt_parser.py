@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+Tests unitaires pour camt_parser
+Crédits des relevés camt.053 et camt.054, motif des numéros de document
+"""
+
+import sys
+import os
+import tempfile
+from pathlib import Path
+
+# Configurer l'encodage UTF-8 pour Windows
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+# Ajouter le répertoire parent au path pour importer les modules
+SCRIPTS_DIR = os.path.join(os.path.dirname(__file__), '..', 'scripts')
+sys.path.insert(0, SCRIPTS_DIR)
+
+from camt_parser import parse_camt_credits, reference_pattern
+
+# Avis de crédit (camt.054): une écriture groupée de deux paiements QR, un débit
+CAMT_054 = """<?xml version="1.0" encoding="UTF-8"?>
+<Document xmlns="urn:iso:std:iso:20022:tech:xsd:camt.054.001.08">
+  <BkToCstmrDbtCdtNtfctn>
+    <Ntfctn>
+      <Ntry>
+        <Amt Ccy="CHF">2651.00</Amt>
+        <CdtDbtInd>CRDT</CdtDbtInd>
+        <BookgDt><Dt>2026-03-02</Dt></BookgDt>
+        <NtryDtls>
+          <TxDtls>
+            <Amt Ccy="CHF">1500.00</Amt>
+            <RmtInf><Strd><CdtrRefInf><Ref>210000000003139471430009017</Ref></CdtrRefInf></Strd></RmtInf>
+          </TxDtls>
+          <TxDtls>
+            <AmtDtls><TxAmt><Amt Ccy="CHF">1151.00</Amt></TxAmt></AmtDtls>
+            <RmtInf><Ustrd>Facture RE-00123</Ustrd><Ustrd>merci</Ustrd></RmtInf>
+          </TxDtls>
+        </NtryDtls>
+      </Ntry>
+      <Ntry>
+        <Amt Ccy="CHF">80.00</Amt>
+        <CdtDbtInd>DBIT</CdtDbtInd>
+        <BookgDt><Dt>2026-03-02</Dt></BookgDt>
+      </Ntry>
+    </Ntfctn>
+  </BkToCstmrDbtCdtNtfctn>
+</Document>
+"""
+
+# Relevé de compte (camt.053): écriture simple sans TxDtls, montant illisible ignoré
+CAMT_053 = """<?xml version="1.0" encoding="UTF-8"?>
+<Document xmlns="urn:iso:std:iso:20022:tech:xsd:camt.053.001.04">
+  <BkToCstmrStmt>
+    <Stmt>
+      <Ntry>
+        <Amt Ccy="EUR">980.50</Amt>
+        <CdtDbtInd>CRDT</CdtDbtInd>
+        <ValDt><Dt>2026-03-05</Dt></ValDt>
+        <AddtlNtryInf>Paiement RE-00124 Dupont</AddtlNtryInf>
+      </Ntry>
+      <Ntry>
+        <Amt Ccy="CHF">n/a</Amt>
+        <CdtDbtInd>CRDT</CdtDbtInd>
+        <BookgDt><Dt>2026-03-06</Dt></BookgDt>
+      </Ntry>
+    </Stmt>
+  </BkToCstmrStmt>
+</Document>
+"""
+
+
+def ecrire(contenu, nom):
+    chemin = Path(tempfile.mkdtemp()) / nom
+    chemin.write_text(contenu, encoding="utf-8")
+    return chemin
+
+
+def test_camt_054():
+    """Écriture groupée: un crédit par transaction, débits ignorés"""
+    print("\n🧪 Test 1: Avis de crédit camt.054")
+
+    credits = parse_camt_credits(ecrire(CAMT_054, "avis.xml"))
+    assert credits == [
+        {"montant": 1500.0, "devise": "CHF", "date": "2026-03-02",
+         "reference": "210000000003139471430009017", "texte": ""},
+        {"montant": 1151.0, "devise": "CHF", "date": "2026-03-02",
+         "reference": "", "texte": "Facture RE-00123 merci"},
+    ], credits
+
+    print("   ✅ 2 crédits, montant de TxDtls ou de AmtDtls")
+
+
+def test_camt_053():
+    """Écriture simple: montant et texte de l'écriture, date de valeur à défaut de comptabilisation"""
+    print("\n🧪 Test 2: Relevé camt.053")
+
+    credits = parse_camt_credits(ecrire(CAMT_053, "releve.xml"))
+    assert credits == [
+        {"montant": 980.5, "devise": "EUR", "date": "2026-03-05",
+         "reference": "", "texte": "Paiement RE-00124 Dupont"},
+    ], credits
+
+    print("   ✅ 1 crédit, montant illisible ignoré")
+
+
+def test_motif_numero():
+    """Numéro comme mot entier, séparateurs tolérés"""
+    print("\n🧪 Test 3: Motif des numéros de document")
+
+    motif = reference_pattern("RE-0001")
+    assert motif.search("FACTURE RE-0001 MERCI")
+    assert motif.search("RE 0001") and motif.search("RE0001")
+    assert not motif.search("FACTURE RE-00012")
+    assert not motif.search("PRE-0001")
+    assert reference_pattern("RE-00012").search("PAIEMENT RE-00012/2026")
+
+    print("   ✅ RE-0001 distinct de RE-00012")
+
+
+# ==========================================
+# EXÉCUTION DES TESTS
+# ==========================================
+
+def run_all_tests():
+    """Exécute tous les tests"""
+    print("=" * 60)
+    print("🚀 TESTS UNITAIRES - RELEVÉS CAMT")
+    print("=" * 60)
+
+    tests = [
+        test_camt_054,
+        test_camt_053,
+        test_motif_numero
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except AssertionError as e:
+            print(f"❌ {test.__name__} ÉCHOUÉ: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"❌ {test.__name__} ERREUR: {e}")
+            failed += 1
+
+    print("\n" + "=" * 60)
+    print(f"📊 RÉSULTATS: {passed} tests réussis, {failed} tests échoués")
+    print("=" * 60)
+
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
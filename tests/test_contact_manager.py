@@ -0,0 +1,302 @@
+# -*- coding: utf-8 -*-
+"""
+Tests unitaires pour ContactManager et le miroir local des contacts Bexio
+Utilise un client Bexio simulé (contacts en mémoire, appels comptés)
+"""
+
+import sys
+import os
+import time
+import tempfile
+
+# Configurer l'encodage UTF-8 pour Windows
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+# Ajouter le répertoire parent au path pour importer les modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+from bexio_contact_mirror import BexioContactMirror
+from contact_manager import ContactManager
+
+
+# ==========================================
+# CLIENT BEXIO SIMULÉ
+# ==========================================
+
+class FakeBexio:
+    """Contacts en mémoire, mêmes méthodes que BexioClient; chaque appel est enregistré"""
+
+    base_url = "https://bexio.test"
+
+    def __init__(self):
+        self.contacts = {}
+        self.relations = {}
+        self.calls = []
+        self.clock = 0
+
+    def add(self, **fields) -> dict:
+        self.clock += 1
+        contact = {"id": len(self.contacts) + 1, "updated_at": f"2025-01-01 00:00:{self.clock:02d}", **fields}
+        self.contacts[contact["id"]] = contact
+        return dict(contact)
+
+    def list_contacts(self, offset=0, limit=2000, order_by="id"):
+        self.calls.append(("list", offset))
+        return [dict(c) for c in sorted(self.contacts.values(), key=lambda c: c["id"])][offset:offset + limit]
+
+    def search_contacts_by_criteria(self, criteria, offset=0, limit=2000, order_by="id"):
+        self.calls.append(("criteria", offset))
+        since = criteria[0]["value"]
+        found = sorted((c for c in self.contacts.values() if c["updated_at"] >= since), key=lambda c: c["updated_at"])
+        return [dict(c) for c in found][offset:offset + limit]
+
+    def search_contacts(self, term):
+        self.calls.append(("search", term))
+        return [dict(c) for c in self.contacts.values() if term.lower() in str(c).lower()]
+
+    def create_contact(self, payload):
+        self.calls.append(("create", payload.get("name_1")))
+        return self.add(**payload)
+
+    def update_contact(self, contact_id, payload):
+        self.calls.append(("update", contact_id))
+        self.clock += 1
+        self.contacts[contact_id].update(payload, updated_at=f"2025-01-01 00:00:{self.clock:02d}")
+        return dict(self.contacts[contact_id])
+
+    def get_contact_relations(self, company_id):
+        self.calls.append(("relations", company_id))
+        return list(self.relations.get(company_id, []))
+
+    def create_contact_relation(self, company_id, person_id):
+        self.calls.append(("create_relation", company_id))
+        relation = {"contact_id": company_id, "contact_sub_id": person_id}
+        self.relations.setdefault(company_id, []).append(relation)
+        return relation
+
+
+CONFIG = {"CONTACT_TYPES": {"Privé": 1, "Société": 2}, "SALUTATIONS": {"Mme": 1, "M.": 2}}
+
+FORM_PRIVE = {
+    "type_contact": "Privé",
+    "prenom": "Anne",
+    "nom_famille": "Rochat",
+    "email": "anne.rochat@example.ch",
+    "rue_facturation": "Rue du Lac 4",
+    "npa_facturation": "1400",
+    "localite_facturation": "Yverdon-les-Bains",
+}
+
+
+def new_mirror(bexio, synced=True) -> BexioContactMirror:
+    """Miroir temporaire, chargé comme par la synchronisation planifiée (synced=True)"""
+    mirror = BexioContactMirror(bexio, db_path=os.path.join(tempfile.mkdtemp(), "contacts.db"))
+    if synced:
+        mirror.sync()
+        bexio.calls.clear()
+    return mirror
+
+
+# ==========================================
+# TESTS
+# ==========================================
+
+def test_miroir_sync_complet_et_recherche():
+    """Chargement paginé, recherches locales par email, nom normalisé et type"""
+    print("\n🧪 Test 1: Miroir - synchronisation complète et recherche")
+
+    bexio = FakeBexio()
+    for i in range(4):
+        bexio.add(contact_type_id=1, name_1=f"Personne {i}", mail=f"p{i}@example.ch")
+    bexio.add(contact_type_id=2, name_1="Régie Müller SA", mail="info@muller.ch")
+
+    mirror = new_mirror(bexio, synced=False)
+    mirror.PAGE_SIZE = 2
+    assert mirror.sync() == 5
+    assert [call for call in bexio.calls if call[0] == "list"] == [("list", 0), ("list", 2), ("list", 4)]
+
+    bexio.calls.clear()
+    assert mirror.find_by_email("P3@Example.ch")["name_1"] == "Personne 3"
+    assert mirror.find_by_name("regie muller sa", contact_type=2)["id"] == 5
+    assert mirror.find_by_name("Régie Müller SA", contact_type=1) is None
+    assert bexio.calls == []
+
+    print("   ✅ 5 contacts chargés en 3 pages, recherches sans appel API")
+
+
+def test_miroir_incremental_et_suppressions():
+    """Refresh incrémental par updated_at; un parcours complet retire les contacts supprimés"""
+    print("\n🧪 Test 2: Miroir - rafraîchissement incrémental")
+
+    bexio = FakeBexio()
+    bexio.add(contact_type_id=1, name_1="Ancien", mail="ancien@example.ch")
+    mirror = new_mirror(bexio)
+
+    bexio.add(contact_type_id=1, name_1="Nouveau", mail="nouveau@example.ch")
+    bexio.calls.clear()
+    assert mirror.refresh() == 2  # >= : le dernier contact connu est renvoyé une seconde fois
+    assert bexio.calls == [("criteria", 0)]
+    assert mirror.find_by_email("nouveau@example.ch") is not None
+
+    del bexio.contacts[1]
+    mirror.sync(full=True)
+    assert mirror.find_by_email("ancien@example.ch") is None
+
+    print("   ✅ Nouveau contact vu en 1 appel, contact supprimé retiré au parcours complet")
+
+
+def test_contact_manager_write_through():
+    """Un contact créé par ContactManager est retrouvé localement au devis suivant"""
+    print("\n🧪 Test 3: ContactManager - write-through du miroir")
+
+    bexio = FakeBexio()
+    mirror = new_mirror(bexio)
+
+    # Absent du miroir: une recherche ?search= (créé dans Bexio depuis la synchronisation?), puis création
+    first = ContactManager(bexio, CONFIG, contact_mirror=mirror).get_or_create_contact(dict(FORM_PRIVE))
+    assert bexio.calls[:2] == [("search", "anne.rochat@example.ch"), ("create", "Rochat")]
+    assert not any(call[0] in ("list", "criteria") for call in bexio.calls)
+
+    bexio.calls.clear()
+    second = ContactManager(bexio, CONFIG, contact_mirror=mirror).get_or_create_contact(dict(FORM_PRIVE))
+    assert second == first
+    assert bexio.calls == []
+
+    print(f"   ✅ Contact {first['contact_id']} retrouvé sans aucun appel Bexio")
+
+
+def test_miroir_perime_sans_synchronisation():
+    """Le devis ne synchronise jamais le miroir: contact absent ou miroir périmé -> ?search="""
+    print("\n🧪 Test 4: ContactManager - miroir absent ou périmé")
+
+    # Contact créé dans Bexio après la dernière synchronisation: trouvé par ?search=, puis en local
+    bexio = FakeBexio()
+    mirror = new_mirror(bexio)
+    existing = bexio.add(contact_type_id=1, name_1="Rochat", name_2="Anne", mail="anne.rochat@example.ch")
+    result = ContactManager(bexio, CONFIG, contact_mirror=mirror).get_or_create_contact(dict(FORM_PRIVE))
+    assert result["contact_id"] == existing["id"]
+    assert bexio.calls == [("search", "anne.rochat@example.ch")]
+    bexio.calls.clear()
+    ContactManager(bexio, CONFIG, contact_mirror=mirror).get_or_create_contact(dict(FORM_PRIVE))
+    assert bexio.calls == []
+
+    # Miroir jamais chargé: aucun parcours paginé pendant le devis
+    bexio = FakeBexio()
+    for i in range(50):
+        bexio.add(contact_type_id=1, name_1=f"Personne {i}", mail=f"p{i}@example.ch")
+    mirror = new_mirror(bexio, synced=False)
+    assert mirror.is_stale()
+    result = ContactManager(bexio, CONFIG, contact_mirror=mirror).get_or_create_contact(
+        dict(FORM_PRIVE, email="p7@example.ch"))
+    assert result["contact_id"] == 8
+    assert bexio.calls == [("search", "p7@example.ch")]
+
+    # Dernier parcours complet trop ancien (planification arrêtée): le miroir n'est plus cru
+    mirror.sync()
+    assert not mirror.is_stale()
+    bexio.contacts[8]["mail"] = "nouvelle.adresse@example.ch"
+    mirror.conn.execute("UPDATE sync_state SET full_sync_at = ?", (time.time() - mirror.STALE_AFTER - 60,))
+    assert mirror.is_stale()
+    bexio.calls.clear()
+    result = ContactManager(bexio, CONFIG, contact_mirror=mirror).get_or_create_contact(
+        dict(FORM_PRIVE, email="p7@example.ch"))
+    assert ("search", "p7@example.ch") in bexio.calls and ("create", "Rochat") in bexio.calls
+    assert not any(call[0] in ("list", "criteria") for call in bexio.calls)
+
+    print("   ✅ Recherche ?search= seulement, jamais de synchronisation pendant le devis")
+
+
+def test_contact_manager_sans_miroir():
+    """Sans miroir, la recherche passe toujours par /2.0/contact?search="""
+    print("\n🧪 Test 5: ContactManager - recherche Bexio sans miroir")
+
+    bexio = FakeBexio()
+    existing = bexio.add(contact_type_id=1, name_1="Rochat", name_2="Anne", mail="anne.rochat@example.ch")
+
+    result = ContactManager(bexio, CONFIG).get_or_create_contact(dict(FORM_PRIVE))
+    assert result == {"contact_id": existing["id"], "contact_sub_id": None}
+    assert bexio.calls == [("search", "anne.rochat@example.ch")]
+
+    print("   ✅ Contact existant trouvé par la recherche Bexio")
+
+
+def test_societe_relations_en_cache():
+    """Entreprise + personne: relation créée sans GET au 1er devis, aucun appel au 2e"""
+    print("\n🧪 Test 6: ContactManager - entreprise, personne et relation en cache")
+
+    bexio = FakeBexio()
+    mirror = new_mirror(bexio)
+    form = dict(FORM_PRIVE, type_contact="Société", nom_entreprise="Régie du Nord SA")
+
+    first = ContactManager(bexio, CONFIG, contact_mirror=mirror).get_or_create_contact(dict(form))
+    assert sorted(call[0] for call in bexio.calls if call[0] in ("create", "update")) == ["create"] * 2 + ["update"] * 2
+    assert ("relations", first["contact_id"]) not in bexio.calls  # entreprise neuve: aucune relation à lire
+    assert bexio.relations[first["contact_id"]][0]["contact_sub_id"] == first["contact_sub_id"]
+
+    # 2e devis: relation lue une fois puis mise en cache
+    bexio.calls.clear()
+    second = ContactManager(bexio, CONFIG, contact_mirror=mirror).get_or_create_contact(dict(form))
+    assert second == first
+    assert bexio.calls == [("relations", first["contact_id"])]
+
+    bexio.calls.clear()
+    ContactManager(bexio, CONFIG, contact_mirror=mirror).get_or_create_contact(dict(form))
+    assert bexio.calls == []
+
+    # Nouvelle personne pour la même entreprise: relation créée, cache invalidé
+    bexio.calls.clear()
+    other = dict(form, prenom="Luc", nom_famille="Favre", email="luc.favre@example.ch")
+    third = ContactManager(bexio, CONFIG, contact_mirror=mirror).get_or_create_contact(other)
+    assert third["contact_id"] == first["contact_id"]
+    assert ("create_relation", first["contact_id"]) in bexio.calls
+    assert mirror.get_relations(first["contact_id"]) is None
+
+    print("   ✅ 2e devis: 1 lecture des relations, 3e devis: aucun appel")
+
+
+# ==========================================
+# EXÉCUTION DES TESTS
+# ==========================================
+
+def run_all_tests():
+    """Exécute tous les tests"""
+    print("=" * 60)
+    print("🚀 TESTS UNITAIRES - CONTACTS BEXIO")
+    print("=" * 60)
+
+    tests = [
+        test_miroir_sync_complet_et_recherche,
+        test_miroir_incremental_et_suppressions,
+        test_contact_manager_write_through,
+        test_miroir_perime_sans_synchronisation,
+        test_contact_manager_sans_miroir,
+        test_societe_relations_en_cache
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except AssertionError as e:
+            print(f"❌ {test.__name__} ÉCHOUÉ: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"❌ {test.__name__} ERREUR: {e}")
+            failed += 1
+
+    print("\n" + "=" * 60)
+    print(f"📊 RÉSULTATS: {passed} tests réussis, {failed} tests échoués")
+    print("=" * 60)
+
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+Tests unitaires pour 202512_Facture_payee.py
+Rapprochement des paiements, factures soldées dans Bexio et ligne de commande
+"""
+
+import sys
+import os
+import importlib.util
+
+# Configurer l'encodage UTF-8 pour Windows
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+# Ajouter le répertoire parent au path pour importer les modules
+SCRIPTS_DIR = os.path.join(os.path.dirname(__file__), '..', 'scripts')
+sys.path.insert(0, SCRIPTS_DIR)
+
+spec = importlib.util.spec_from_file_location("facture_payee", os.path.join(SCRIPTS_DIR, "202512_Facture_payee.py"))
+facture_payee = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(facture_payee)
+
+
+def facture(id, document_nr, total, restant=None):
+    return {"id": id, "document_nr": document_nr, "total": str(total), "total_remaining_payments": restant,
+            "title": f"CECB - Rue du Lac {id}, 1180, Rolle"}
+
+
+def credit(montant, reference="", texte=""):
+    return {"montant": montant, "devise": "CHF", "date": "2026-03-02", "reference": reference, "texte": texte}
+
+
+def test_rapprochement():
+    """Numéro comme mot entier et montant identique"""
+    print("\n🧪 Test 1: Rapprochement des paiements")
+
+    factures = [facture(1, "RE-0001", 1500), facture(2, "RE-00012", 1500), facture(3, "RE-00124", "980.50")]
+
+    # Paiement de RE-00012: jamais attribué à RE-0001 (préfixe commun)
+    resultat = facture_payee.rapprocher_paiements(factures, [credit(1500.0, texte="Facture RE-00012")])
+    assert [f["id"] for f, _ in resultat] == [2], resultat
+
+    # Paiement de RE-0001, séparateurs différents ou référence SCOR
+    for paiement in (credit(1500.0, texte="facture re 0001, merci"), credit(1500.0, reference="RF18RE0001")):
+        resultat = facture_payee.rapprocher_paiements(factures, [paiement])
+        assert [f["id"] for f, _ in resultat] == [1], (paiement, resultat)
+
+    # Montant différent: pas de correspondance
+    assert facture_payee.rapprocher_paiements(factures, [credit(980.0, texte="RE-00124")]) == []
+    assert facture_payee.rapprocher_paiements(factures, [credit(1499.99, texte="RE-0001")]) == []
+
+    # Deux paiements de la même facture: rapprochée une seule fois
+    resultat = facture_payee.rapprocher_paiements(factures, [credit(980.5, texte="RE-00124"),
+                                                              credit(980.5, texte="RE-00124 rappel")])
+    assert [(f["id"], c["texte"]) for f, c in resultat] == [(3, "RE-00124")]
+
+    print("   ✅ RE-0001 et RE-00012 distingués, montants différents ignorés")
+
+
+def test_soldee_dans_bexio():
+    """Solde restant nul (à l'arrondi près) ou absent"""
+    print("\n🧪 Test 2: Factures soldées dans Bexio")
+
+    assert facture_payee.est_soldee_dans_bexio(facture(1, "RE-1", 100, "0.00"))
+    assert facture_payee.est_soldee_dans_bexio(facture(1, "RE-1", 100, 0.004))
+    assert not facture_payee.est_soldee_dans_bexio(facture(1, "RE-1", 100, "50.00"))
+    assert not facture_payee.est_soldee_dans_bexio(facture(1, "RE-1", 100, None))
+    assert not facture_payee.est_soldee_dans_bexio(facture(1, "RE-1", 100, "n/a"))
+
+    print("   ✅ Seules les factures sans solde restant")
+
+
+def test_lire_arguments():
+    """Numéro seul, rapprochement avec options, chemin camt avec espaces, --parallele invalide"""
+    print("\n🧪 Test 3: Ligne de commande")
+
+    assert facture_payee.lire_arguments(["RE-00123"])["numero"] == "RE-00123"
+
+    # Champ unique de l'interface web
+    options = facture_payee.lire_arguments(["--rapprochement releve.XML --parallele 8 --simulation"])
+    assert (options["rapprochement"], options["camt"], options["parallele"], options["simulation"]) == \
+        (True, "releve.XML", 8, True)
+    assert facture_payee.lire_arguments(["rapprochement", "--parallele", "0"])["parallele"] == 1
+
+    # Chemin camt avec espaces (arguments de la ligne de commande), avant ou après --rapprochement
+    chemin = "/srv/Relevés 2026/camt053 mars.xml"
+    for argv in (["--rapprochement", chemin], [chemin, "--rapprochement"]):
+        options = facture_payee.lire_arguments(argv)
+        assert (options["rapprochement"], options["camt"], options["numero"]) == (True, chemin, None), options
+
+    for argv in (["--rapprochement", "--parallele", "abc"], ["--rapprochement", "--parallele"],
+                 ["--parallele", "-2"]):
+        try:
+            facture_payee.lire_arguments(argv)
+            assert False, f"ErreurUsage attendue pour {argv}"
+        except facture_payee.ErreurUsage:
+            pass
+
+    print("   ✅ Options lues, erreur d'usage pour --parallele invalide")
+
+
+# ==========================================
+# EXÉCUTION DES TESTS
+# ==========================================
+
+def run_all_tests():
+    """Lance tous les tests"""
+    print("=" * 60)
+    print("🧪 TESTS UNITAIRES - Facture payée")
+    print("=" * 60)
+
+    tests = [
+        test_rapprochement,
+        test_soldee_dans_bexio,
+        test_lire_arguments
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except AssertionError as e:
+            print(f"❌ {test.__name__} ÉCHOUÉ: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"❌ {test.__name__} ERREUR: {e}")
+            failed += 1
+
+    print("\n" + "=" * 60)
+    print(f"📊 RÉSULTATS: {passed} tests réussis, {failed} tests échoués")
+    print("=" * 60)
+
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""
+Tests unitaires pour file_copy
+Chaîne reflink -> copy_file_range -> copie bufferisée, erreurs de copy_files, mode sans écrasement
+"""
+
+import sys
+import os
+import tempfile
+from pathlib import Path
+
+# Configurer l'encodage UTF-8 pour Windows
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+# Ajouter le répertoire parent au path pour importer les modules
+SCRIPTS_DIR = os.path.join(os.path.dirname(__file__), '..', 'scripts')
+sys.path.insert(0, SCRIPTS_DIR)
+
+import file_copy
+from file_copy import StrategyUnavailable, copy_file, copy_files
+
+# Plus grand que BUFFER_SIZE: plusieurs tours de boucle pour la copie bufferisée
+CONTENU = os.urandom(file_copy.BUFFER_SIZE * 2 + 12345)
+
+
+def creer_source(nom="Rue n°_Localité.3dm", contenu=CONTENU):
+    """Fichier source avec une date de modification ancienne (vérifie copystat)"""
+    base = Path(tempfile.mkdtemp())
+    source = base / nom
+    source.write_bytes(contenu)
+    os.utime(source, (1700000000, 1700000000))
+    return base, source
+
+
+def indisponible(nom, ecrit=b""):
+    """Stratégie qui écrit éventuellement un début de copie puis se déclare indisponible"""
+    appels = []
+
+    def strategie(src_fd, dst_fd, size):
+        appels.append(nom)
+        if ecrit:
+            os.write(dst_fd, ecrit)
+            os.lseek(src_fd, 1000, os.SEEK_SET)
+        raise StrategyUnavailable(f"{nom} non supporté")
+    return strategie, appels
+
+
+def test_strategies_forcees():
+    """Chaque stratégie forcée seule: copie identique, ou StrategyUnavailable sans fichier laissé"""
+    print("\n🧪 Test 1: Stratégies forcées")
+
+    base, source = creer_source()
+    utilisees = []
+    for nom in file_copy.STRATEGIES:
+        destination = base / f"{nom}.3dm"
+        try:
+            assert copy_file(source, destination, strategies=[nom]) == nom
+        except StrategyUnavailable:
+            # reflink sur ext4/tmpfs, copy_file_range hors Linux
+            assert nom != "buffered"
+            assert not destination.exists(), f"Copie partielle laissée par {nom}"
+            continue
+        assert destination.read_bytes() == CONTENU, nom
+        assert int(destination.stat().st_mtime) == 1700000000, nom
+        utilisees.append(nom)
+    assert "buffered" in utilisees
+
+    # Fichier vide: aucune stratégie ne boucle
+    vide = base / "vide.gh"
+    vide.write_bytes(b"")
+    for nom in ("copy_file_range", "buffered"):
+        try:
+            copy_file(vide, base / f"vide_{nom}.gh", strategies=[nom])
+        except StrategyUnavailable:
+            continue
+        assert (base / f"vide_{nom}.gh").read_bytes() == b""
+
+    print(f"   ✅ Stratégies disponibles ici: {', '.join(utilisees)}")
+
+
+def test_chaine_de_repli():
+    """Stratégie indisponible: la suivante repart de zéro (source rembobinée, destination tronquée)"""
+    print("\n🧪 Test 2: Chaîne de repli")
+
+    base, source = creer_source()
+    originales = dict(file_copy.STRATEGIES)
+    try:
+        # reflink indisponible après avoir écrit des octets: copy_file_range (ou buffered) prend le relais
+        file_copy.STRATEGIES["reflink"], appels = indisponible("reflink", ecrit=b"x" * 5000)
+        nom = copy_file(source, base / "repli.3dm")
+        assert appels == ["reflink"] and nom in ("copy_file_range", "buffered"), nom
+        assert (base / "repli.3dm").read_bytes() == CONTENU
+
+        # reflink et copy_file_range indisponibles: copie bufferisée
+        file_copy.STRATEGIES["copy_file_range"], appels_cfr = indisponible("copy_file_range", ecrit=b"y" * 10)
+        assert copy_file(source, base / "bufferise.3dm") == "buffered"
+        assert appels_cfr == ["copy_file_range"]
+        assert (base / "bufferise.3dm").read_bytes() == CONTENU
+
+        # Aucune stratégie disponible: erreur, pas de copie partielle
+        file_copy.STRATEGIES["buffered"], _ = indisponible("buffered", ecrit=b"z")
+        try:
+            copy_file(source, base / "aucune.3dm")
+            assert False, "StrategyUnavailable attendue"
+        except StrategyUnavailable as e:
+            assert "buffered" in str(e)
+        assert not (base / "aucune.3dm").exists()
+
+        # Vraie erreur d'E/S: pas de repli, l'erreur remonte et la copie partielle est supprimée
+        def disque_plein(src_fd, dst_fd, size):
+            os.write(dst_fd, b"debut")
+            raise OSError(28, "No space left on device")
+        file_copy.STRATEGIES["reflink"] = disque_plein
+        file_copy.STRATEGIES["buffered"] = originales["buffered"]
+        try:
+            copy_file(source, base / "plein.3dm")
+            assert False, "OSError attendue"
+        except StrategyUnavailable:
+            assert False, "Erreur d'E/S traitée comme stratégie indisponible"
+        except OSError as e:
+            assert e.errno == 28
+        assert not (base / "plein.3dm").exists()
+    finally:
+        file_copy.STRATEGIES.clear()
+        file_copy.STRATEGIES.update(originales)
+
+    print("   ✅ reflink -> copy_file_range -> buffered, erreurs d'E/S non masquées")
+
+
+def test_erreurs_copy_files():
+    """copy_files rend, dans l'ordre des paires, la stratégie utilisée ou l'exception"""
+    print("\n🧪 Test 3: Erreurs de copy_files")
+
+    base, source = creer_source()
+    pairs = [
+        (source, base / "a.3dm"),
+        (base / "absent.gh", base / "b.gh"),
+        (source, base / "dossier inexistant" / "c.bld"),
+        (source, base / "d.3dm"),
+    ]
+    resultats = copy_files(pairs, max_workers=3)
+    assert len(resultats) == 4
+    assert resultats[0] in file_copy.STRATEGIES and resultats[3] in file_copy.STRATEGIES, resultats
+    assert isinstance(resultats[1], FileNotFoundError) and "absent.gh" in str(resultats[1])
+    assert isinstance(resultats[2], FileNotFoundError)
+    assert (base / "a.3dm").read_bytes() == CONTENU and (base / "d.3dm").read_bytes() == CONTENU
+    assert not (base / "b.gh").exists()
+    assert copy_files([]) == []
+
+    print("   ✅ 2 copies, 2 erreurs rendues à leur position")
+
+
+def test_sans_ecrasement():
+    """overwrite=False: une destination existante n'est jamais écrasée ni supprimée"""
+    print("\n🧪 Test 4: Mode sans écrasement")
+
+    base, source = creer_source()
+    existant = base / "Rue du Lac 15_Rolle.3dm"
+    existant.write_bytes(b"travail de l'ingenieur")
+
+    try:
+        copy_file(source, existant, overwrite=False)
+        assert False, "FileExistsError attendue"
+    except FileExistsError:
+        pass
+    assert existant.read_bytes() == b"travail de l'ingenieur"
+
+    resultats = copy_files([(source, existant), (source, base / "nouveau.3dm")], overwrite=False)
+    assert isinstance(resultats[0], FileExistsError) and resultats[1] in file_copy.STRATEGIES
+    assert existant.read_bytes() == b"travail de l'ingenieur"
+    assert (base / "nouveau.3dm").read_bytes() == CONTENU
+
+    # Par défaut, la destination est remplacée
+    assert copy_file(source, existant) in file_copy.STRATEGIES
+    assert existant.read_bytes() == CONTENU
+
+    print("   ✅ Fichier existant conservé, nouveau fichier copié")
+
+
+# ==========================================
+# EXÉCUTION DES TESTS
+# ==========================================
+
+def run_all_tests():
+    """Lance tous les tests"""
+    print("=" * 60)
+    print("🧪 TESTS UNITAIRES - Copie de fichiers")
+    print("=" * 60)
+
+    tests = [
+        test_strategies_forcees,
+        test_chaine_de_repli,
+        test_erreurs_copy_files,
+        test_sans_ecrasement
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except AssertionError as e:
+            print(f"❌ {test.__name__} ÉCHOUÉ: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"❌ {test.__name__} ERREUR: {e}")
+            failed += 1
+
+    print("\n" + "=" * 60)
+    print(f"📊 RÉSULTATS: {passed} tests réussis, {failed} tests échoués")
+    print("=" * 60)
+
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+"""
+Tests unitaires pour http_client
+Redirection d'hôtes vers un serveur local ($HTTP_HOST_OVERRIDES), retries,
+timeout par défaut et métriques par hôte
+"""
+
+import sys
+import os
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer, ThreadingHTTPServer
+
+import requests
+
+# Configurer l'encodage UTF-8 pour Windows
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+# Ajouter le répertoire parent au path pour importer les modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+import http_client
+from http_client import HttpClient, parse_host_overrides
+
+
+class EchoHandler(BaseHTTPRequestHandler):
+    """Renvoie le chemin reçu"""
+
+    def do_GET(self):
+        data = json.dumps({"path": self.path}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ScenarioHandler(BaseHTTPRequestHandler):
+    """
+    Réponses scriptées par dernier segment du chemin, requêtes reçues comptées par (méthode, segment)
+
+    /instable: 503 deux fois puis 200; /limite: 429 (Retry-After: 0) puis 200;
+    /panne: toujours 500; /absent: 404; /lent: 200 après 1 s
+    """
+
+    received = {}
+    lock = threading.Lock()
+
+    def _respond(self):
+        path = "/" + self.path.split("?")[0].rsplit("/", 1)[-1]
+        with self.lock:
+            count = self.received[(self.command, path)] = self.received.get((self.command, path), 0) + 1
+        if path == "/instable":
+            status = 503 if count <= 2 else 200
+        elif path == "/limite":
+            status = 429 if count == 1 else 200
+        elif path == "/panne":
+            status = 500
+        elif path == "/absent":
+            status = 404
+        else:
+            if path == "/lent":
+                time.sleep(1)
+            status = 200
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+        data = json.dumps({"tentative": count}).encode("utf-8")
+        try:
+            self.send_response(status)
+            if status == 429:
+                self.send_header("Retry-After", "0")
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # client parti après son timeout (/lent)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _respond
+
+    def log_message(self, format, *args):
+        pass
+
+
+def demarrer_scenarios():
+    """Serveur local des scénarios, compteurs remis à zéro"""
+    ScenarioHandler.received = {}
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ScenarioHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def test_redirection_hote():
+    """L'URL Bexio est servie localement; métriques et session restent celles de api.bexio.com"""
+    print("\n🧪 Test 1: Redirection d'hôte")
+
+    server = HTTPServer(("127.0.0.1", 0), EchoHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        local = f"http://127.0.0.1:{server.server_port}/"
+        overrides = parse_host_overrides(f" API.bexio.com={local} , invalide, geo=")
+        assert overrides == {"api.bexio.com": local.rstrip("/")}
+
+        client = HttpClient(retries=0, host_overrides=overrides)
+        response = client.get("https://api.bexio.com/2.0/contact", params={"search": "Rochat"})
+        assert response.json() == {"path": "/2.0/contact?search=Rochat"}
+        assert client.resolve("https://api.notion.com/v1/pages") == "https://api.notion.com/v1/pages"
+        assert list(client.metrics.snapshot()) == ["api.bexio.com"]
+        client.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    print(f"   ✅ api.bexio.com -> {local}")
+
+
+def test_retries():
+    """Nouvelle tentative sur 429/5xx pour les méthodes idempotentes seulement, jamais pour POST"""
+    print("\n🧪 Test 2: Retries")
+
+    server, local = demarrer_scenarios()
+    backoff = http_client.BACKOFF_FACTOR
+    http_client.BACKOFF_FACTOR = 0
+    try:
+        client = HttpClient(retries=3, host_overrides={"api.bexio.com": local})
+        url = "https://api.bexio.com"
+
+        # GET et PUT: 503, 503 puis 200
+        for method in ("GET", "PUT"):
+            ScenarioHandler.received.clear()
+            response = client.request(method, f"{url}/instable")
+            assert (response.status_code, response.json()) == (200, {"tentative": 3}), method
+            assert ScenarioHandler.received == {(method, "/instable"): 3}
+
+        # POST et PATCH: une seule tentative, le 503 est rendu à l'appelant (pas de second devis)
+        for method in ("POST", "PATCH"):
+            ScenarioHandler.received.clear()
+            response = client.request(method, f"{url}/instable", json={"title": "Offre"})
+            assert response.status_code == 503, method
+            assert ScenarioHandler.received == {(method, "/instable"): 1}
+
+        # 429: relancé (Retry-After respecté); 4xx: jamais
+        ScenarioHandler.received.clear()
+        assert client.get(f"{url}/limite").status_code == 200
+        assert client.get(f"{url}/absent").status_code == 404
+        assert ScenarioHandler.received == {("GET", "/limite"): 2, ("GET", "/absent"): 1}
+
+        # Panne persistante: retries épuisés, dernière réponse rendue sans exception
+        ScenarioHandler.received.clear()
+        assert client.delete(f"{url}/panne").status_code == 500
+        assert ScenarioHandler.received == {("DELETE", "/panne"): 4}
+        client.close()
+    finally:
+        http_client.BACKOFF_FACTOR = backoff
+        server.shutdown()
+        server.server_close()
+
+    print("   ✅ GET/PUT/DELETE relancés sur 429/5xx, POST/PATCH et 404 jamais")
+
+
+def test_timeout_par_defaut():
+    """Timeout appliqué quand l'appelant n'en donne pas, valeur explicite prioritaire"""
+    print("\n🧪 Test 3: Timeout par défaut")
+
+    assert HttpClient().session("https://api.bexio.com/2.0").timeout == http_client.DEFAULT_TIMEOUT
+
+    server, local = demarrer_scenarios()
+    try:
+        client = HttpClient(timeout=0.2, retries=0, host_overrides={"api3.geo.admin.ch": local})
+        debut = time.perf_counter()
+        try:
+            client.get("https://api3.geo.admin.ch/lent")
+            assert False, "Timeout attendu"
+        except requests.exceptions.ConnectionError as e:
+            # Retry épuisé: requests rend le ReadTimeout sous forme de ConnectionError
+            assert "Read timed out" in str(e), e
+        assert time.perf_counter() - debut < 0.9
+        assert client.get("https://api3.geo.admin.ch/lent", timeout=5).status_code == 200
+        client.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    print("   ✅ Requête lente interrompue à 0.2 s, timeout explicite respecté")
+
+
+def test_metriques_par_hote():
+    """Appels, statuts, erreurs et retries comptés séparément pour chaque hôte"""
+    print("\n🧪 Test 4: Métriques par hôte")
+
+    server, local = demarrer_scenarios()
+    backoff = http_client.BACKOFF_FACTOR
+    http_client.BACKOFF_FACTOR = 0
+    try:
+        client = HttpClient(retries=2, host_overrides={"api.bexio.com": local, "api.notion.com": local})
+        client.get("https://api.bexio.com/instable")
+        client.get("https://api.bexio.com/absent")
+        client.post("https://api.notion.com/v1/panne", json={})
+        client.get("https://api.notion.com/v1/pages")
+        client.close()
+    finally:
+        http_client.BACKOFF_FACTOR = backoff
+        server.shutdown()
+        server.server_close()
+
+    # Hôte fermé: erreur de connexion comptée comme erreur, sans statut
+    ferme = HttpClient(retries=0, host_overrides={"api.google.com": "http://127.0.0.1:9"})
+    try:
+        ferme.get("https://api.google.com/maps")
+        assert False, "ConnectionError attendue"
+    except requests.exceptions.ConnectionError:
+        pass
+
+    bexio = client.metrics.snapshot()["api.bexio.com"]
+    notion = client.metrics.snapshot()["api.notion.com"]
+    assert (bexio["requests"], bexio["retries"], bexio["errors"], bexio["statuses"]) == \
+        (2, 2, 0, {"200": 1, "404": 1}), bexio
+    assert (notion["requests"], notion["retries"], notion["errors"], notion["statuses"]) == \
+        (2, 0, 1, {"200": 1, "500": 1}), notion
+    assert bexio["max_time"] <= bexio["total_time"]
+    google = ferme.metrics.snapshot()["api.google.com"]
+    assert (google["requests"], google["errors"], google["statuses"]) == (1, 1, {})
+
+    print("   ✅ api.bexio.com: 2 appels, 2 retries; api.notion.com: 1 erreur 500")
+
+
+# ==========================================
+# EXÉCUTION DES TESTS
+# ==========================================
+
+def run_all_tests():
+    """Exécute tous les tests"""
+    print("=" * 60)
+    print("🚀 TESTS UNITAIRES - CLIENT HTTP")
+    print("=" * 60)
+
+    tests = [
+        test_redirection_hote,
+        test_retries,
+        test_timeout_par_defaut,
+        test_metriques_par_hote
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except AssertionError as e:
+            print(f"❌ {test.__name__} ÉCHOUÉ: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"❌ {test.__name__} ERREUR: {e}")
+            failed += 1
+
+    print("\n" + "=" * 60)
+    print(f"📊 RÉSULTATS: {passed} tests réussis, {failed} tests échoués")
+    print("=" * 60)
+
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+Tests unitaires pour http_fixtures
+Enregistrement puis rejeu hors ligne, et création de devis rejouée de bout en bout
+"""
+
+import sys
+import os
+import json
+import time
+import tempfile
+import threading
+import subprocess
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from pathlib import Path
+
+# Configurer l'encodage UTF-8 pour Windows
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+# Ajouter le répertoire parent au path pour importer les modules
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / 'scripts'))
+
+from http_client import HttpClient
+from http_fixtures import HttpFixtures, HttpFixtureMissing
+
+CASSETTE_DEVIS = ROOT / 'tests' / 'fixtures' / 'creer_devis_cecb.jsonl'
+
+CONFIG_PY = '''BEXIO_API_TOKEN = "rejeu"
+GOOGLE_MAPS_API_KEY = "rejeu"
+BEXIO_BASE_URL = "https://api.bexio.com"
+ETA_CONSULT_ADDRESS = "Route de l'Hôpital 16b, 1180 Rolle, Suisse"
+BEXIO_IDS = {"user_id": 1, "currency_id": 1, "language_id": 2, "country_id": 1,
+             "unit_id": 3, "tax_id": 28, "mwst_type": 0, "template_slug": "standard"}
+'''
+
+
+class CompteurHandler(BaseHTTPRequestHandler):
+    """Renvoie la méthode, le chemin et un compteur d'appels"""
+
+    appels = 0
+
+    def _repondre(self):
+        CompteurHandler.appels += 1
+        longueur = int(self.headers.get("Content-Length") or 0)
+        corps = self.rfile.read(longueur).decode("utf-8") if longueur else ""
+        data = json.dumps({"method": self.command, "path": self.path, "corps": corps,
+                           "appel": CompteurHandler.appels}).encode("utf-8")
+        self.send_response(201 if self.command == "POST" else 200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_GET = do_POST = _repondre
+
+    def log_message(self, format, *args):
+        pass
+
+
+def test_enregistrement_et_rejeu():
+    """Les réponses enregistrées sont rendues sans réseau, dans l'ordre, sans la clé d'API"""
+    print("\n🧪 Test 1: Enregistrement puis rejeu")
+
+    cassette = Path(tempfile.mkdtemp()) / "cassette.jsonl"
+    server = HTTPServer(("127.0.0.1", 0), CompteurHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    overrides = {"api.bexio.com": f"http://127.0.0.1:{server.server_port}"}
+    try:
+        client = HttpClient(retries=0, host_overrides=overrides, fixtures=HttpFixtures(cassette, "record"))
+        premier = client.get("https://api.bexio.com/2.0/contact", params={"search": "Rochat", "key": "secret"}).json()
+        second = client.get("https://api.bexio.com/2.0/contact", params={"key": "secret", "search": "Rochat"}).json()
+        cree = client.post("https://api.bexio.com/2.0/contact", json={"name_1": "Rochat"})
+        client.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    urls = [json.loads(line)["url"] for line in cassette.read_text(encoding="utf-8").splitlines()]
+    assert urls[0] == urls[1] == "https://api.bexio.com/2.0/contact?search=Rochat"
+    assert (premier["appel"], second["appel"]) == (1, 2)
+
+    # Serveur arrêté: tout vient de la cassette
+    client = HttpClient(retries=0, fixtures=HttpFixtures(cassette, "replay", latency="30"))
+    debut = time.perf_counter()
+    assert client.get("https://api.bexio.com/2.0/contact?key=autre&search=Rochat").json()["appel"] == 1
+    assert client.get("https://api.bexio.com/2.0/contact", params={"search": "Rochat"}).json()["appel"] == 2
+    # Au-delà des réponses enregistrées: la dernière est rendue à nouveau
+    assert client.get("https://api.bexio.com/2.0/contact", params={"search": "Rochat"}).json()["appel"] == 2
+    assert time.perf_counter() - debut >= 0.09
+
+    rejoue = client.post("https://api.bexio.com/2.0/contact", json={"name_1": "Rochat"})
+    assert rejoue.status_code == 201 and rejoue.json() == cree.json()
+    assert client.metrics.snapshot()["api.bexio.com"]["requests"] == 4
+
+    try:
+        client.get("https://api.bexio.com/2.0/kb_offer/1")
+        assert False, "HttpFixtureMissing attendu"
+    except HttpFixtureMissing as e:
+        assert "/2.0/kb_offer/1" in str(e)
+
+    print("   ✅ 4 réponses rejouées, requête inconnue signalée")
+
+
+def test_devis_rejoue_hors_ligne():
+    """202512_Creer_devis.py complet sans réseau, depuis la cassette enregistrée"""
+    print("\n🧪 Test 2: Création de devis rejouée")
+
+    dossier = Path(tempfile.mkdtemp())
+    (dossier / "config.py").write_text(CONFIG_PY, encoding="utf-8")
+    form_data = {
+        "type_certificat": "CECB", "type_contact": "Privé", "prenom": "Anne", "nom_famille": "Rochat",
+        "email": "anne.rochat@example.ch", "rue_facturation": "Rue du Lac 4", "npa_facturation": "1400",
+        "localite_facturation": "Yverdon-les-Bains",
+    }
+    env = dict(
+        os.environ,
+        HTTP_FIXTURES_MODE="replay",
+        HTTP_FIXTURES=str(CASSETTE_DEVIS),
+        BEXIO_CONTACT_MIRROR_PATH=str(dossier / "contacts.db"),
+        METRICS_DB_PATH=str(dossier / "metrics.db"),
+        PYTHONPATH=str(dossier),
+        HTTP_HOST_OVERRIDES="",
+    )
+    env.pop("TRACEPARENT", None)
+
+    debut = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, str(ROOT / "scripts" / "202512_Creer_devis.py"), json.dumps(form_data, ensure_ascii=False)],
+        env=env, capture_output=True, text=True, encoding="utf-8", cwd=str(ROOT)
+    )
+    duree = time.perf_counter() - debut
+    sortie = result.stdout + result.stderr
+
+    assert result.returncode == 0, sortie[-2000:]
+    assert "Numéro: AN-01002" in sortie
+    assert "api.bexio.com" in sortie and "maps.googleapis.com" in sortie
+
+    print(f"   ✅ Devis AN-01002 créé hors ligne en {duree:.2f} s (démarrage Python compris)")
+
+
+# ==========================================
+# EXÉCUTION DES TESTS
+# ==========================================
+
+def run_all_tests():
+    """Exécute tous les tests"""
+    print("=" * 60)
+    print("🚀 TESTS UNITAIRES - CASSETTES HTTP")
+    print("=" * 60)
+
+    tests = [
+        test_enregistrement_et_rejeu,
+        test_devis_rejoue_hors_ligne
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except AssertionError as e:
+            print(f"❌ {test.__name__} ÉCHOUÉ: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"❌ {test.__name__} ERREUR: {e}")
+            failed += 1
+
+    print("\n" + "=" * 60)
+    print(f"📊 RÉSULTATS: {passed} tests réussis, {failed} tests échoués")
+    print("=" * 60)
+
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+Tests unitaires pour idempotency
+Clés dérivées des arguments normalisés, réservation et rattachement
+"""
+
+import sys
+import os
+import json
+import tempfile
+
+# Configurer l'encodage UTF-8 pour Windows
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+# Ajouter la racine au path pour importer les modules de l'application
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from flask import Flask
+
+import idempotency
+from models import db
+
+
+def creer_app():
+    """Application minimale sur une base SQLite temporaire"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}"
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def test_cle_formulaire_normalise():
+    """Casse, espaces, ordre des champs et champs vides ne changent pas la clé"""
+    print("\n🧪 Test 1: Clé dérivée du formulaire normalisé")
+
+    form = {"prenom": "Anne", "nom_famille": "Rochat", "rue_facturation": "Rue du Lac 4", "remarques": ""}
+    variante = {"rue_facturation": "  rue du  lac 4 ", "nom_famille": "ROCHAT", "prenom": "Anne"}
+    autre = dict(form, rue_facturation="Rue du Lac 6")
+
+    def cle(user, donnees, **kwargs):
+        return idempotency.compute_key(user, "creer_devis", {"form_data": json.dumps(donnees)},
+                                       derive_from_args=True, **kwargs)[0]
+
+    assert cle("u1", form) == cle("u1", variante)
+    assert cle("u1", form) != cle("u1", autre)
+    assert cle("u1", form) != cle("u2", form)
+    assert cle("u1", form) != cle("u1", form, profile="cprofile")
+
+    # Jeton client prioritaire; sans jeton ni dérivation, pas d'idempotence
+    assert idempotency.compute_key("u1", "offres_acceptees", {"numero_offre": "12"}, client_key="abc")[1] == "client"
+    assert idempotency.compute_key("u1", "offres_acceptees", {"numero_offre": "12"}) == (None, None)
+
+    print("   ✅ Clés identiques pour des formulaires équivalents")
+
+
+def test_reservation_et_liberation():
+    """Une seule exécution par clé; la clé est libérée après échec ou expiration"""
+    print("\n🧪 Test 2: Réservation et libération des clés")
+
+    app = creer_app()
+    with app.app_context():
+        key, source = idempotency.compute_key("u1", "creer_devis", {"form_data": "{}"}, derive_from_args=True)
+
+        assert idempotency.claim(key, "creer_devis", "u1", source) is None
+        idempotency.attach_run(key, 7)
+        en_cours = idempotency.claim(key, "creer_devis", "u1", source)
+        assert en_cours.status == "running" and en_cours.run_id == 7
+
+        idempotency.record_result(key, {"success": True, "run_id": 7, "stdout": "AN-01002"}, 200)
+        reussie = idempotency.claim(key, "creer_devis", "u1", source)
+        payload, status = idempotency.replay_response(reussie)
+        assert (payload["stdout"], payload["idempotent_replay"], status) == ("AN-01002", True, 200)
+
+        # Fenêtre écoulée: nouvelle exécution
+        assert idempotency.claim(key, "creer_devis", "u1", source, window=0) is None
+
+        # Échec: la requête suivante relance le script
+        idempotency.record_result(key, {"success": False, "run_id": 8}, 200)
+        assert idempotency.claim(key, "creer_devis", "u1", source) is None
+
+        # Timeout, annulation ou worker arrêté après le lancement: devis peut-être créé, clé conservée
+        for payload, http_status in [({"success": False, "run_id": 9, "outcome_unknown": True}, 408),
+                                     ({"success": False, "cancelled": True, "run_id": 9, "outcome_unknown": True}, 200),
+                                     ({"success": False, "run_id": 9, "outcome_unknown": True}, 500)]:
+            idempotency.record_result(key, payload, http_status)
+            inconnue = idempotency.claim(key, "creer_devis", "u1", source)
+            assert inconnue is not None and inconnue.status == "unknown"
+            assert idempotency.replay_response(inconnue)[1] == http_status
+        assert idempotency.claim(key, "creer_devis", "u1", source, window=0) is None
+
+    print("   ✅ Exécution en cours, réussie ou interrompue rattachées, échec et expiration libérés")
+
+
+# ==========================================
+# EXÉCUTION DES TESTS
+# ==========================================
+
+def run_all_tests():
+    """Exécute tous les tests"""
+    print("=" * 60)
+    print("🚀 TESTS UNITAIRES - IDEMPOTENCE DE /run_script")
+    print("=" * 60)
+
+    tests = [
+        test_cle_formulaire_normalise,
+        test_reservation_et_liberation
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except AssertionError as e:
+            print(f"❌ {test.__name__} ÉCHOUÉ: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"❌ {test.__name__} ERREUR: {e}")
+            failed += 1
+
+    print("\n" + "=" * 60)
+    print(f"📊 RÉSULTATS: {passed} tests réussis, {failed} tests échoués")
+    print("=" * 60)
+
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+Tests unitaires pour metrics_store
+Agrégation entre processus et format d'exposition Prometheus
+"""
+
+import sys
+import os
+import subprocess
+import tempfile
+from pathlib import Path
+
+# Configurer l'encodage UTF-8 pour Windows
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+# Ajouter le répertoire parent au path pour importer les modules
+SCRIPTS_DIR = os.path.join(os.path.dirname(__file__), '..', 'scripts')
+sys.path.insert(0, SCRIPTS_DIR)
+
+import metrics_store
+
+
+def test_histogramme_et_compteur():
+    """Buckets cumulatifs (vides compris), _sum/_count, étiquettes échappées"""
+    print("\n🧪 Test 1: Histogramme et compteur")
+
+    db_path = Path(tempfile.mkdtemp()) / "metrics.db"
+    metrics_store.observe("test_duration_seconds", 0.3, {"script_id": "creer_devis"}, buckets=(0.1, 0.5, 1))
+    metrics_store.observe("test_duration_seconds", 2, {"script_id": "creer_devis"}, buckets=(0.1, 0.5, 1))
+    metrics_store.inc("test_runs_total", {"host": 'a"b'}, help="Compteur de test")
+
+    lines = metrics_store.render(db_path).splitlines()
+    assert "# TYPE script_runner_test_duration_seconds histogram" in lines
+    buckets = [line for line in lines if line.startswith("script_runner_test_duration_seconds_bucket")]
+    assert buckets == [
+        'script_runner_test_duration_seconds_bucket{script_id="creer_devis",le="0.1"} 0',
+        'script_runner_test_duration_seconds_bucket{script_id="creer_devis",le="0.5"} 1',
+        'script_runner_test_duration_seconds_bucket{script_id="creer_devis",le="1"} 1',
+        'script_runner_test_duration_seconds_bucket{script_id="creer_devis",le="+Inf"} 2',
+    ]
+    assert 'script_runner_test_duration_seconds_sum{script_id="creer_devis"} 2.3' in lines
+    assert 'script_runner_test_duration_seconds_count{script_id="creer_devis"} 2' in lines
+    assert "# HELP script_runner_test_runs_total Compteur de test" in lines
+    assert 'script_runner_test_runs_total{host="a\\"b"} 1' in lines
+
+    print("   ✅ Format d'exposition correct")
+
+
+def test_agregation_entre_processus():
+    """Les métriques d'un sous-processus (écrites à sa sortie) s'ajoutent à celles du parent"""
+    print("\n🧪 Test 2: Agrégation entre processus")
+
+    db_path = Path(tempfile.mkdtemp()) / "metrics.db"
+    code = "import metrics_store; metrics_store.inc('test_calls_total', {'host': 'api.bexio.com'}, 2)"
+    env = dict(os.environ, METRICS_DB_PATH=str(db_path), PYTHONPATH=SCRIPTS_DIR)
+    for _ in range(2):
+        subprocess.run([sys.executable, "-c", code], env=env, check=True)
+
+    metrics_store.inc("test_calls_total", {"host": "api.bexio.com"})
+    assert 'script_runner_test_calls_total{host="api.bexio.com"} 5' in metrics_store.render(db_path).splitlines()
+
+    print("   ✅ 2 + 2 + 1 appels agrégés")
+
+
+def test_flush_en_echec():
+    """Écriture impossible: les échantillons restent en attente et sont écrits au flush suivant"""
+    print("\n🧪 Test 3: Flush en échec")
+
+    dossier = Path(tempfile.mkdtemp())
+    metrics_store.inc("test_retries_total", {"host": "api.notion.com"}, 3)
+    assert metrics_store.flush(dossier / "absent" / "metrics.db") == 0
+    metrics_store.inc("test_retries_total", {"host": "api.notion.com"})
+
+    lines = metrics_store.render(dossier / "metrics.db").splitlines()
+    assert 'script_runner_test_retries_total{host="api.notion.com"} 4' in lines
+
+    print("   ✅ 3 + 1 retries écrits après l'échec")
+
+
+# ==========================================
+# EXÉCUTION DES TESTS
+# ==========================================
+
+def run_all_tests():
+    """Exécute tous les tests"""
+    print("=" * 60)
+    print("🚀 TESTS UNITAIRES - MÉTRIQUES")
+    print("=" * 60)
+
+    tests = [
+        test_histogramme_et_compteur,
+        test_agregation_entre_processus,
+        test_flush_en_echec
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except AssertionError as e:
+            print(f"❌ {test.__name__} ÉCHOUÉ: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"❌ {test.__name__} ERREUR: {e}")
+            failed += 1
+
+    print("\n" + "=" * 60)
+    print(f"📊 RÉSULTATS: {passed} tests réussis, {failed} tests échoués")
+    print("=" * 60)
+
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""
+Tests unitaires pour notion_mirror
+Pagination par curseur, synchronisation incrémentale (on_or_after) et write-through
+"""
+
+import sys
+import os
+import json
+import tempfile
+from pathlib import Path
+
+# Configurer l'encodage UTF-8 pour Windows
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+# Ajouter le répertoire parent au path pour importer les modules
+SCRIPTS_DIR = os.path.join(os.path.dirname(__file__), '..', 'scripts')
+sys.path.insert(0, SCRIPTS_DIR)
+
+from notion_mirror import NotionMirror
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+    def json(self):
+        return self.data
+
+    def raise_for_status(self):
+        pass
+
+
+class FakeNotion:
+    """Endpoint /databases/<id>/query: tri par last_edited_time, filtre on_or_after, curseurs"""
+
+    def __init__(self, pages):
+        self.pages = {page["id"]: page for page in pages}
+        self.requests = []
+
+    def post(self, url, headers=None, json=None, timeout=None):
+        assert url.endswith("/databases/base-projets/query")
+        self.requests.append(dict(json))
+        pages = sorted(self.pages.values(), key=lambda p: (p["last_edited_time"], p["id"]))
+        since = json.get("filter", {}).get("last_edited_time", {}).get("on_or_after")
+        if since:
+            pages = [p for p in pages if p["last_edited_time"] >= since]
+        start = int(json.get("start_cursor") or 0)
+        end = start + json["page_size"]
+        has_more = end < len(pages)
+        return FakeResponse({"results": pages[start:end], "has_more": has_more,
+                             "next_cursor": str(end) if has_more else None})
+
+
+def page(page_id, titre, edited, **autres):
+    return dict({"id": page_id, "last_edited_time": edited,
+                 "properties": {"Nom": {"title": [{"plain_text": titre}]}}}, **autres)
+
+
+PAGES = [
+    page("p1", "Rue du Lac 15 Rolle", "2026-01-01T08:00:00.000Z"),
+    page("p2", "Chemin des Vignes 3 Mont-sur-Rolle", "2026-01-02T08:00:00.000Z"),
+    page("p3", "Avenue de la Gare 2 Nyon", "2026-01-03T08:00:00.000Z"),
+    page("p4", "Route de Genève 5 Rolle", "2026-01-04T08:00:00.000Z"),
+    page("p5", "Rue du Lac 17 Rolle", "2026-01-05T08:00:00.000Z"),
+]
+
+
+def creer_miroir(notion):
+    mirror = NotionMirror("token", "base-projets", db_path=Path(tempfile.mkdtemp()) / "notion.db", session=notion)
+    mirror.PAGE_SIZE = 2
+    return mirror
+
+
+def ids(mirror):
+    return sorted(row["id"] for row in mirror.conn.execute("SELECT id FROM pages"))
+
+
+def test_pagination():
+    """Synchronisation complète: tous les curseurs suivis jusqu'à has_more = false"""
+    print("\n🧪 Test 1: Pagination has_more / next_cursor")
+
+    notion = FakeNotion(PAGES)
+    mirror = creer_miroir(notion)
+    assert mirror.sync() == 5
+    assert [r.get("start_cursor") for r in notion.requests] == [None, "2", "4"]
+    assert all("filter" not in r for r in notion.requests)
+    assert ids(mirror) == ["p1", "p2", "p3", "p4", "p5"]
+    assert mirror.get_last_sync() == "2026-01-05T08:00:00.000Z"
+
+    print("   ✅ 3 requêtes, 5 pages")
+
+
+def test_synchronisation_incrementale():
+    """Seules les pages modifiées depuis la dernière synchronisation (bornes comprises) sont relues"""
+    print("\n🧪 Test 2: Filtre on_or_after")
+
+    notion = FakeNotion(PAGES)
+    mirror = creer_miroir(notion)
+    mirror.sync()
+    notion.requests.clear()
+
+    # Rien de nouveau: seule la dernière page (même minute que la borne) est relue
+    assert mirror.sync() == 1
+    assert notion.requests[0]["filter"] == {"timestamp": "last_edited_time",
+                                            "last_edited_time": {"on_or_after": "2026-01-05T08:00:00.000Z"}}
+
+    # Page renommée, page archivée
+    notion.pages["p1"] = page("p1", "Rue du Lac 21 Rolle", "2026-01-06T09:00:00.000Z")
+    notion.pages["p3"] = page("p3", "Avenue de la Gare 2 Nyon", "2026-01-06T09:30:00.000Z", archived=True)
+    notion.requests.clear()
+    assert mirror.sync() == 3
+    assert len(notion.requests) == 2
+    assert ids(mirror) == ["p1", "p2", "p4", "p5"]
+    assert mirror.find("Rue du Lac 21", "Rolle", same_number=True)["id"] == "p1"
+    assert mirror.find("Rue du Lac 15", "Rolle", same_number=True) is None
+    assert mirror.get_last_sync() == "2026-01-06T09:30:00.000Z"
+
+    # Synchronisation complète: les pages disparues de Notion sont retirées
+    del notion.pages["p2"]
+    mirror.sync(full=True)
+    assert ids(mirror) == ["p1", "p4", "p5"]
+
+    print("   ✅ Pages modifiées seulement, archivées et supprimées retirées")
+
+
+def test_record_page():
+    """Écriture directe après un POST/PATCH: page trouvée sans synchronisation, mots réindexés"""
+    print("\n🧪 Test 3: record_page (write-through)")
+
+    notion = FakeNotion([])
+    mirror = creer_miroir(notion)
+    mirror.record_page(page("p9", "Rte de Genève 5 Rolle", "2026-02-01T10:00:00.000Z",
+                            properties={"Nom": {"title": [{"text": {"content": "Rte de Genève 5"}}]},
+                                        "Localisation": {"rich_text": [{"plain_text": "Rolle"}]}}))
+    assert notion.requests == []
+    trouvee = mirror.find("Route de Geneve 5", "Rolle", same_number=True)
+    assert trouvee is not None and trouvee["id"] == "p9"
+
+    mirror.record_page(page("p9", "Chemin des Vignes 3 Rolle", "2026-02-01T11:00:00.000Z"))
+    assert mirror.find("Route de Geneve 5", "Rolle") is None
+    assert mirror.find("Chemin des Vignes 3", "Rolle")["last_edited_time"] == "2026-02-01T11:00:00.000Z"
+    mots = {row["word"] for row in mirror.conn.execute("SELECT word FROM page_words WHERE page_id = 'p9'")}
+    assert "geneve" not in mots and "vignes" in mots
+
+    mirror.record_page(page("p9", "Chemin des Vignes 3 Rolle", "2026-02-01T12:00:00.000Z", in_trash=True))
+    assert ids(mirror) == []
+
+    print("   ✅ Page créée, renommée puis supprimée sans requête de synchronisation")
+
+
+# ==========================================
+# EXÉCUTION DES TESTS
+# ==========================================
+
+def run_all_tests():
+    """Exécute tous les tests"""
+    print("=" * 60)
+    print("🚀 TESTS UNITAIRES - MIROIR NOTION")
+    print("=" * 60)
+
+    tests = [
+        test_pagination,
+        test_synchronisation_incrementale,
+        test_record_page
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except AssertionError as e:
+            print(f"❌ {test.__name__} ÉCHOUÉ: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"❌ {test.__name__} ERREUR: {e}")
+            failed += 1
+
+    print("\n" + "=" * 60)
+    print(f"📊 RÉSULTATS: {passed} tests réussis, {failed} tests échoués")
+    print("=" * 60)
+
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+"""
+Tests unitaires pour 202512_Offres_acceptees.py
+Reprise par étape, projets existants réutilisés sans doublon, templates jamais écrasés
+"""
+
+import sys
+import os
+import json
+import tempfile
+import threading
+import importlib.util
+from pathlib import Path
+
+# Configurer l'encodage UTF-8 pour Windows
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+# Ajouter le répertoire parent au path pour importer les modules
+SCRIPTS_DIR = os.path.join(os.path.dirname(__file__), '..', 'scripts')
+sys.path.insert(0, SCRIPTS_DIR)
+
+import requests
+
+from notion_mirror import NotionMirror
+from project_folder_index import ProjectFolderIndex
+
+spec = importlib.util.spec_from_file_location("offres_acceptees", os.path.join(SCRIPTS_DIR, "202512_Offres_acceptees.py"))
+offres = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(offres)
+
+TEMPLATES = ["Rue n°_Localité.3dm", "Rue n°_Localité.gh", "Rue n°_Localité.bld"]
+
+
+class FakeResponse:
+    def __init__(self, data, status_code=200):
+        self.data = data
+        self.status_code = status_code
+        self.text = json.dumps(data)
+
+    def json(self):
+        return self.data
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code}")
+
+
+class FakeNotion:
+    """Session HTTP simulant la base Notion (requête du miroir et création de pages)"""
+
+    def __init__(self, pages=None):
+        self.pages = list(pages or [])
+        self.created = []
+        self.down = False
+
+    def post(self, url, headers=None, json=None, **kwargs):
+        if url.endswith("/query"):
+            return FakeResponse({"results": self.pages, "has_more": False, "next_cursor": None})
+        if self.down:
+            return FakeResponse({"message": "service unavailable"}, 503)
+        page = page_notion(f"page-{len(self.created) + 1}", json["properties"]["Nom"]["title"][0]["text"]["content"])
+        self.created.append(page)
+        self.pages.append(page)
+        return FakeResponse(page)
+
+
+def page_notion(page_id, titre):
+    return {"id": page_id, "last_edited_time": "2026-01-01T00:00:00.000Z",
+            "properties": {"Nom": {"title": [{"plain_text": titre}]}}}
+
+
+def preparer(notion=None):
+    """Dossiers, modèles, état et miroir Notion dans un répertoire temporaire"""
+    base = Path(tempfile.mkdtemp())
+    (base / "actifs").mkdir()
+    (base / "modeles").mkdir()
+    for template in TEMPLATES:
+        (base / "modeles" / template).write_bytes(b"modele " + template.encode("utf-8"))
+
+    offres.DOSSIERS_ACTIFS = base / "actifs"
+    offres.DOSSIER_MODELES = base / "modeles"
+    offres.ETAT_OFFRES = base / "etat.json"
+    offres.SESSION = notion or FakeNotion()
+    offres._index_dossiers = ProjectFolderIndex(base / "actifs", index_file=base / "index.json")
+    offres._miroir_notion = NotionMirror("token", "base", db_path=base / "notion.db", session=offres.SESSION)
+    offres._miroir_synchronise = False
+    offres.get_offre = lambda numero: {"title": "CECB - Rue du Lac 15, 1180, Rolle",
+                                       "document_nr": f"AN-{numero}", "total": 1500}
+    offres.get_offre_pdf = lambda numero, chemin: chemin.write_bytes(b"%PDF") and chemin
+    appels_geo = []
+    offres.get_coordonnees = lambda rue, npa, localite: appels_geo.append(rue) or (2515000, 1145000)
+    offres.get_regbl = lambda x, y: {"egid": 42, "gbauj": 1965}
+    return base, offres.SESSION, appels_geo
+
+
+def test_usage_parallele():
+    """--parallele sans nombre entier: erreur d'usage, pas de ValueError"""
+    print("\n🧪 Test 1: Option --parallele invalide")
+
+    for argv in (["--acceptees", "--parallele", "abc"], ["12", "--parallele"]):
+        try:
+            offres.lire_arguments(argv)
+            assert False, f"ErreurUsage attendue pour {argv}"
+        except offres.ErreurUsage:
+            pass
+    options = offres.lire_arguments(["12,13", "--parallele", "0"])
+    assert options["numeros"] == ["12", "13"] and options["parallele"] == 1
+
+    print("   ✅ Erreur d'usage signalée")
+
+
+def test_reprise_par_etape():
+    """Après un échec, seules les étapes manquantes sont refaites; les templates modifiés sont conservés"""
+    print("\n🧪 Test 2: Reprise par étape")
+
+    base, notion, appels_geo = preparer()
+    notion.down = True
+    try:
+        offres.traiter_offre("101")
+        assert False, "RuntimeError attendue (Notion indisponible)"
+    except RuntimeError as e:
+        assert "notion" in str(e)
+
+    etapes = offres.charger_etat()["101"]["etapes"]
+    assert set(etapes) == {"dossier", "templates", "pdf", "rapport"}, etapes
+    dossier = Path(etapes["dossier"])
+    assert dossier.name.endswith("_Rue du Lac 15_Rolle")
+    fichier_cao = dossier / "3. CAO" / "Rue du Lac 15_Rolle.3dm"
+    fichier_cao.write_bytes(b"travail de l'ingenieur")
+
+    notion.down = False
+    assert offres.traiter_offre("101") == dossier
+    assert len(appels_geo) == 1, "Étapes geo/regbl/rapport refaites"
+    assert fichier_cao.read_bytes() == b"travail de l'ingenieur"
+    assert len(notion.created) == 1
+    assert offres.charger_etat()["101"]["etapes"]["notion"] == "page-1"
+    assert [d.name for d in offres.DOSSIERS_ACTIFS.iterdir()] == [dossier.name]
+
+    # --forcer: tout est refait, sans écraser ni dupliquer
+    offres.traiter_offre("101", forcer=True)
+    assert fichier_cao.read_bytes() == b"travail de l'ingenieur"
+    assert len(notion.created) == 1 and len(list(offres.DOSSIERS_ACTIFS.iterdir())) == 1
+
+    print("   ✅ Notion seul refait, fichier CAO conservé, une seule page")
+
+
+def test_projets_existants():
+    """Bâtiment déjà suivi: dossier et page réutilisés, PDF, templates et rapport ajoutés"""
+    print("\n🧪 Test 3: Projets existants")
+
+    # Page Notion du même bâtiment, page d'un voisin (autre numéro)
+    notion = FakeNotion([page_notion("ancienne", "Rue du Lac 15 Rolle"), page_notion("voisin", "Rue du Lac 17 Rolle")])
+    preparer(notion)
+    resultats = offres.traiter_batch(["201"], parallele=1)
+    assert resultats["201"]["statut"] == "ok", resultats
+    assert notion.created == []
+    assert offres.charger_etat()["201"]["etapes"]["notion"] == "ancienne"
+
+    # Dossier créé hors du script pour le même bâtiment
+    preparer()
+    existant = offres.DOSSIERS_ACTIFS / "202401_Rue du Lac 15_Rolle"
+    existant.mkdir()
+    assert offres.traiter_offre("202") == existant
+    assert [d.name for d in offres.DOSSIERS_ACTIFS.iterdir()] == [existant.name]
+    assert (existant / "1. Admin" / "11. Offre" / "AN-202.pdf").exists()
+    assert (existant / "3. CAO" / "Rue du Lac 15_Rolle.3dm").exists()
+    assert (existant / "5. Rapport" / "53. Annexes" / "Rue du Lac 15_Rolle_RegBL.txt").exists()
+
+    # Relancer le batch: l'offre terminée n'est plus reprise
+    offres.traiter_batch(["202"], parallele=1)
+    assert offres.traiter_batch(["202"], parallele=1) == {}
+    assert offres.charger_etat()["202"]["statut"] == "ok"
+
+    print("   ✅ Aucun doublon, projet existant complété")
+
+
+def test_meme_batiment_en_parallele():
+    """Deux offres du même bâtiment dans un batch parallèle: un seul dossier, une seule page"""
+    print("\n🧪 Test 4: Même bâtiment en parallèle")
+
+    notion = FakeNotion()
+    preparer(notion)
+    post_origine = notion.post
+
+    def post_lent(url, **kwargs):
+        # Laisse à l'autre offre le temps de chercher la page pendant la création
+        if url.endswith("/pages"):
+            threading.Event().wait(0.2)
+        return post_origine(url, **kwargs)
+    notion.post = post_lent
+
+    resultats = offres.traiter_batch(["401", "402"], parallele=2)
+    assert all(r["statut"] == "ok" for r in resultats.values()), resultats
+    assert len(notion.created) == 1, notion.created
+    assert len(list(offres.DOSSIERS_ACTIFS.iterdir())) == 1
+    etat = offres.charger_etat()
+    assert etat["401"]["etapes"]["notion"] == etat["402"]["etapes"]["notion"] == "page-1"
+
+    print("   ✅ Une page Notion et un dossier pour les deux offres")
+
+
+def test_etat_verrouille():
+    """Mises à jour simultanées de l'état: aucune perdue"""
+    print("\n🧪 Test 5: État sous verrou")
+
+    preparer()
+
+    def marquer(numero):
+        for etape in offres.ETAPES_REPRISE:
+            offres.enregistrer_etape(numero, etape, f"{numero}-{etape}")
+
+    threads = [threading.Thread(target=marquer, args=(str(n),)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    etat = offres.charger_etat()
+    assert len(etat) == 8
+    assert all(len(entree["etapes"]) == len(offres.ETAPES_REPRISE) for entree in etat.values())
+
+    print("   ✅ 8 threads x 5 étapes enregistrées")
+
+
+def test_etapes_non_bloquantes():
+    """Un PDF indisponible n'interrompt pas l'offre; l'étape est refaite à la reprise"""
+    print("\n🧪 Test 6: Étapes non bloquantes")
+
+    assert offres.ETAPES_NON_BLOQUANTES == {"pdf"}
+    preparer()
+
+    def pdf_indisponible(numero, chemin):
+        raise ConnectionError("Bexio indisponible")
+    offres.get_offre_pdf = pdf_indisponible
+
+    dossier = offres.traiter_offre("301")
+    assert dossier.exists()
+    etapes = offres.charger_etat()["301"]["etapes"]
+    assert "pdf" not in etapes and {"dossier", "templates", "rapport", "notion"} <= set(etapes)
+
+    print("   ✅ Offre traitée malgré l'échec du PDF")
+
+
+# ==========================================
+# EXÉCUTION DES TESTS
+# ==========================================
+
+def run_all_tests():
+    """Lance tous les tests"""
+    print("=" * 60)
+    print("🧪 TESTS UNITAIRES - Offres acceptées")
+    print("=" * 60)
+
+    tests = [
+        test_usage_parallele,
+        test_reprise_par_etape,
+        test_projets_existants,
+        test_meme_batiment_en_parallele,
+        test_etat_verrouille,
+        test_etapes_non_bloquantes
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except AssertionError as e:
+            print(f"❌ {test.__name__} ÉCHOUÉ: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"❌ {test.__name__} ERREUR: {e}")
+            failed += 1
+
+    print("\n" + "=" * 60)
+    print(f"📊 RÉSULTATS: {passed} tests réussis, {failed} tests échoués")
+    print("=" * 60)
+
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,596 @@
+# -*- coding: utf-8 -*-
+"""
+Tests unitaires pour OneDriveClient
+Utilise un serveur Graph local (dossiers en mémoire, $batch, /copy, monitor et sessions d'upload)
+"""
+
+import sys
+import os
+import io
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+# Configurer l'encodage UTF-8 pour Windows
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+# Ajouter le répertoire parent au path pour importer les modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+from onedrive_client import OneDriveClient
+from onedrive_folder_index import OneDriveFolderIndex
+
+
+# ==========================================
+# SERVEUR GRAPH LOCAL
+# ==========================================
+
+class FakeGraph:
+    """État du drive simulé: chemins -> éléments, copies en cours, appels reçus"""
+
+    def __init__(self):
+        self.items = {"": {"id": "root", "folder": {}}}
+        self.copies = {}
+        self.uploads = {}
+        self.contents = {}
+        self.upload_faults = []
+        self.rejected_tokens = set()
+        self.version = 0
+        self.deleted = []
+        self.folder_delta_unsupported = False
+        self.calls = []
+        self.base_url = ""
+
+    def add(self, path, folder=True):
+        """Crée ou modifie un élément (nouvelle version visible par /delta)"""
+        self.version += 1
+        item = self.items.get(path) or {"id": f"id-{path}"}
+        item.update({"version": self.version, "lastModifiedDateTime": f"2026-01-01T00:{self.version // 60:02d}:{self.version % 60:02d}Z"})
+        item.setdefault("folder" if folder else "file", {})
+        self.items[path] = item
+
+    def remove(self, path):
+        self.version += 1
+        for item_path in [p for p in self.items if p == path or p.startswith(path + "/")]:
+            self.deleted.append((self.version, self.items.pop(item_path)["id"]))
+
+    def rename(self, path, new_path):
+        """Renomme un dossier: seul le dossier est reçu par /delta, pas ses descendants"""
+        self.version += 1
+        for item_path in [p for p in self.items if p == path or p.startswith(path + "/")]:
+            self.items[new_path + item_path[len(path):]] = self.items.pop(item_path)
+        self.items[new_path]["version"] = self.version
+
+    def delta(self, target, query):
+        """/delta: éléments du sous-arbre modifiés depuis le jeton, 2 par page"""
+        if target and self.folder_delta_unsupported:
+            return 400, {}, {"error": {"code": "invalidRequest"}}
+        token = int(query.get("token", ["-1"])[0])
+        skip = int(query.get("skip", ["0"])[0])
+        changes = []
+        for path, item in sorted(self.items.items()):
+            if (not target or path == target or path.startswith(target + "/")) and item.get("version", 0) > token:
+                parent = path.rpartition("/")[0]
+                entry = {k: v for k, v in item.items() if k != "version"}
+                entry.update(name=path.rpartition("/")[2] or "root",
+                             parentReference={"id": self.items[parent]["id"]} if path else {})
+                changes.append(entry)
+        changes += [{"id": item_id, "deleted": {}} for version, item_id in self.deleted if version > token]
+
+        base = f"{self.base_url}/v1.0/me/drive/root{(':/' + target + ':') if target else ''}/delta"
+        page = {"value": changes[skip:skip + 2]}
+        if skip + 2 < len(changes):
+            page["@odata.nextLink"] = f"{base}?token={token}&skip={skip + 2}"
+        else:
+            page["@odata.deltaLink"] = f"{base}?token={self.version}"
+        return 200, {}, page
+
+    def handle(self, method, url, body=None):
+        """Traite une requête Graph (aussi utilisé pour les requêtes d'un $batch)"""
+        path = unquote(urlsplit(url).path)
+        if path.startswith("/v1.0"):
+            path = path[len("/v1.0"):]
+
+        if path.startswith("/monitor/"):
+            copy = self.copies[path]
+            copy["polls"] += 1
+            if copy["polls"] < 2:
+                return 202, {}, {"status": "inProgress", "percentageComplete": 50}
+            self.items[copy["target"]] = {"id": f"id-{copy['target']}", "file": {}}
+            return 200, {}, {"status": "completed", "resourceId": f"id-{copy['target']}"}
+
+        if path.startswith("/upload/"):
+            return self.handle_upload(method, path, body)
+
+        target, action = self._parse(path)
+        if method == "GET" and action == "delta":
+            return self.delta(target, parse_qs(urlsplit(url).query))
+
+        if method == "GET" and action is None:
+            if target not in self.items:
+                return 404, {}, {"error": {"code": "itemNotFound"}}
+            return 200, {}, dict(self.items[target], parentReference={"driveId": "drive1"})
+
+        if method == "POST" and action == "children":
+            if target not in self.items:
+                return 404, {}, {"error": {"code": "itemNotFound"}}
+            new_path = f"{target}/{body['name']}".strip("/")
+            if new_path in self.items:
+                return 409, {}, {"error": {"code": "nameAlreadyExists"}}
+            self.items[new_path] = {"id": f"id-{new_path}", "folder": {}}
+            return 201, {}, self.items[new_path]
+
+        if method == "POST" and action == "copy":
+            if target not in self.items:
+                return 404, {}, {"error": {"code": "itemNotFound"}}
+            parent_id = body["parentReference"]["id"]
+            parent = next(p for p, item in self.items.items() if item["id"] == parent_id)
+            monitor = f"/monitor/{len(self.copies) + 1}"
+            self.copies[monitor] = {"target": f"{parent}/{body['name']}".strip("/"), "polls": 0}
+            return 202, {"Location": f"{self.base_url}{monitor}"}, {}
+
+        if method == "PUT" and action == "content":
+            self.contents[target] = body
+            self.items[target] = {"id": f"id-{target}", "file": {}, "size": len(body)}
+            return 201, {}, self.items[target]
+
+        if method == "POST" and action == "createUploadSession":
+            upload = f"/upload/{len(self.uploads) + 1}"
+            self.uploads[upload] = {"target": target, "data": bytearray(), "chunks": 0}
+            return 200, {}, {"uploadUrl": f"{self.base_url}{upload}", "nextExpectedRanges": ["0-"]}
+
+        return 400, {}, {"error": {"code": "invalidRequest", "path": path}}
+
+    def handle_upload(self, method, path, body):
+        """Session d'upload: PUT par plage, GET pour l'état, DELETE pour annuler"""
+        upload = self.uploads.get(path)
+        if upload is None:
+            return 404, {}, {"error": {"code": "itemNotFound"}}
+        received = len(upload["data"])
+        if method == "GET":
+            return 200, {}, {"nextExpectedRanges": [f"{received}-"]}
+        if method == "DELETE":
+            del self.uploads[path]
+            return 204, {}, {}
+
+        start, end, total = body["range"]
+        if start != received:
+            return 416, {}, {"error": {"code": "invalidRange"}}
+        upload["chunks"] += 1
+        fault = self.upload_faults.pop(0) if self.upload_faults else None
+        if fault == "error":
+            return 416, {}, {"error": {"code": "invalidRange"}}
+        data = body["data"]
+        if fault == "partial":
+            # Le serveur n'a conservé que la moitié du morceau
+            data = data[:len(data) // 2]
+        upload["data"] += data
+        if len(upload["data"]) == total:
+            self.contents[upload["target"]] = bytes(upload["data"])
+            self.items[upload["target"]] = {"id": f"id-{upload['target']}", "file": {}, "size": total}
+            return 201, {}, self.items[upload["target"]]
+        return 202, {}, {"nextExpectedRanges": [f"{len(upload['data'])}-"]}
+
+    @staticmethod
+    def _parse(path):
+        """"/me/drive/root:/a/b:/children" -> ("a/b", "children")"""
+        if path in ("/me/drive/root", "/me/drive/root/children", "/me/drive/root/delta"):
+            return "", (path.rpartition("/")[2] if path != "/me/drive/root" else None)
+        inner = path[len("/me/drive/root:/"):]
+        if ":/" in inner:
+            target, action = inner.split(":/", 1)
+            return target.strip("/"), action
+        return inner.rstrip(":").strip("/"), None
+
+    def batch(self, requests):
+        responses = {}
+        for request in requests:
+            if any(responses[d]["status"] >= 400 for d in request.get("dependsOn", [])):
+                responses[request["id"]] = {"id": request["id"], "status": 424, "body": {}}
+                continue
+            status, headers, body = self.handle(request["method"], request["url"], request.get("body"))
+            responses[request["id"]] = {"id": request["id"], "status": status, "headers": headers, "body": body}
+        return list(responses.values())
+
+
+def start_graph():
+    graph = FakeGraph()
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _reply(self, status, headers, body):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            for key, value in headers.items():
+                self.send_header(key, value)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _dispatch(self, method):
+            graph.calls.append((method, self.path))
+            token = (self.headers.get("Authorization") or "").replace("Bearer ", "")
+            if token in graph.rejected_tokens:
+                self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                return self._reply(401, {}, {"error": {"code": "InvalidAuthenticationToken"}})
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length) if length else b""
+            if method == "PUT":
+                content_range = self.headers.get("Content-Range")
+                body = raw
+                if content_range:
+                    span, total = content_range.split()[1].split("/")
+                    start, end = (int(v) for v in span.split("-"))
+                    body = {"range": (start, end, int(total)), "data": raw}
+            else:
+                body = json.loads(raw) if raw else None
+            if self.path == "/v1.0/$batch":
+                if len(body["requests"]) > 20:
+                    return self._reply(400, {}, {"error": "too many requests"})
+                return self._reply(200, {}, {"responses": graph.batch(body["requests"])})
+            self._reply(*graph.handle(method, self.path, body))
+
+        def do_GET(self):
+            self._dispatch("GET")
+
+        def do_POST(self):
+            self._dispatch("POST")
+
+        def do_PUT(self):
+            self._dispatch("PUT")
+
+        def do_DELETE(self):
+            self._dispatch("DELETE")
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    graph.base_url = f"http://127.0.0.1:{server.server_port}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    client = OneDriveClient("id", "secret", graph_endpoint=f"{graph.base_url}/v1.0")
+    client.access_token = "test-token"
+    client.COPY_POLL_INTERVAL = 0.01
+    return server, graph, client
+
+
+SOUS_DOSSIERS = ["1. Admin", "1. Admin/11. Offre", "1. Admin/12. Facture", "2. Photos",
+                 "3. CAO", "4. Lesosai", "5. Rapport", "5. Rapport/51. Annexes"]
+
+
+# ==========================================
+# TESTS
+# ==========================================
+
+def test_creation_structure_en_un_appel():
+    """Test de la création d'un arbre projet en un seul $batch"""
+    print("\n🧪 Test 1: Création de la structure")
+    server, graph, client = start_graph()
+    try:
+        graph.items["Dossiers actifs"] = {"id": "id-actifs", "folder": {}}
+        graph.items["Dossiers actifs/202601_Projet"] = {"id": "id-projet", "folder": {}}
+
+        assert client.create_folder_structure("/Dossiers actifs/202601_Projet", SOUS_DOSSIERS)
+        assert "Dossiers actifs/202601_Projet/1. Admin/11. Offre" in graph.items
+        assert "Dossiers actifs/202601_Projet/5. Rapport/51. Annexes" in graph.items
+        assert graph.calls == [("POST", "/v1.0/$batch")], f"❌ Appels: {graph.calls}"
+        print(f"✅ {len(SOUS_DOSSIERS)} dossiers créés en {len(graph.calls)} appel")
+    finally:
+        server.shutdown()
+
+
+def test_structure_existante_et_lots():
+    """Test des dossiers déjà existants et du découpage en lots de 20"""
+    print("\n🧪 Test 2: Dossiers existants et lots")
+    server, graph, client = start_graph()
+    try:
+        graph.items["P"] = {"id": "id-p", "folder": {}}
+        graph.items["P/1. Admin"] = {"id": "id-admin", "folder": {}}
+
+        sous_dossiers = ["1. Admin/11. Offre"] + [f"Lot/{n:02d}" for n in range(25)]
+        assert client.create_folder_structure("P", sous_dossiers)
+        assert "P/1. Admin/11. Offre" in graph.items
+        assert all(f"P/Lot/{n:02d}" in graph.items for n in range(25))
+        print(f"✅ {len(graph.items)} éléments, {len(graph.calls)} appels $batch")
+    finally:
+        server.shutdown()
+
+
+def test_copie_cote_serveur():
+    """Test de la copie côté serveur avec suivi du monitor"""
+    print("\n🧪 Test 3: Copie côté serveur")
+    server, graph, client = start_graph()
+    try:
+        graph.items["MODELE"] = {"id": "id-modele", "folder": {}}
+        graph.items["MODELE/Rue n°_Localité.3dm"] = {"id": "id-3dm", "file": {}}
+        graph.items["MODELE/Rue n°_Localité.gh"] = {"id": "id-gh", "file": {}}
+        graph.items["P"] = {"id": "id-p", "folder": {}}
+        graph.items["P/3. CAO"] = {"id": "id-cao", "folder": {}}
+
+        resultats = client.copy_files([
+            ("MODELE/Rue n°_Localité.3dm", "P/3. CAO", "Rue du Lac 3_Rolle.3dm"),
+            ("MODELE/Rue n°_Localité.gh", "P/3. CAO", "Rue du Lac 3_Rolle.gh"),
+            ("MODELE/absent.bld", "P/3. CAO", None),
+        ])
+        assert resultats == [True, True, False], f"❌ Résultats: {resultats}"
+        assert "P/3. CAO/Rue du Lac 3_Rolle.3dm" in graph.items
+        batch_calls = [c for c in graph.calls if c[1] == "/v1.0/$batch"]
+        assert len(batch_calls) == 2, f"❌ Appels $batch: {batch_calls}"
+        print(f"✅ Copies terminées ({len(graph.calls)} appels dont {len(batch_calls)} $batch)")
+    finally:
+        server.shutdown()
+
+
+def test_upload_session_reprise():
+    """Test de l'upload par morceaux avec reprise après erreur et accusé partiel"""
+    print("\n🧪 Test 4: Session d'upload")
+    server, graph, client = start_graph()
+    try:
+        graph.items["P"] = {"id": "id-p", "folder": {}}
+        contenu = os.urandom(5 * 320 * 1024 + 123)
+        graph.upload_faults = [None, "error", "partial"]
+
+        resultat = client.upload_large_file(io.BytesIO(contenu), "modele.3dm", "P", chunk_size=320 * 1024)
+        assert resultat is not None, "❌ Upload échoué"
+        assert graph.contents["P/modele.3dm"] == contenu, "❌ Contenu différent"
+        print(f"✅ {len(contenu)} octets envoyés en {graph.uploads['/upload/1']['chunks']} morceaux")
+    finally:
+        server.shutdown()
+
+
+def test_upload_fichiers_paralleles(tmp_path):
+    """Test de l'upload parallèle de fichiers locaux (simple et par session)"""
+    print("\n🧪 Test 5: Uploads parallèles")
+    server, graph, client = start_graph()
+    try:
+        graph.items["P"] = {"id": "id-p", "folder": {}}
+        client.SIMPLE_UPLOAD_LIMIT = 1024
+        petit = tmp_path / "offre.pdf"
+        petit.write_bytes(b"%PDF petit")
+        grand = tmp_path / "modele.3dm"
+        grand.write_bytes(os.urandom(3 * 320 * 1024))
+
+        resultats = client.upload_files([(petit, "P", None), (grand, "P", "Rue du Lac 3_Rolle.3dm")])
+        assert all(resultats), f"❌ Résultats: {resultats}"
+        assert graph.contents["P/offre.pdf"] == b"%PDF petit"
+        assert graph.contents["P/Rue du Lac 3_Rolle.3dm"] == grand.read_bytes()
+        print("✅ Deux fichiers envoyés")
+    finally:
+        server.shutdown()
+
+
+class FakeLogin:
+    """Transport HTTP de MSAL simulé: découverte du tenant et endpoint de token"""
+
+    AUTHORITY = "https://login.microsoftonline.com/tenant"
+
+    def __init__(self):
+        self.token_requests = 0
+        self.discovery_requests = 0
+
+    def _response(self, body):
+        class Response:
+            status_code = 200
+            headers = {"Content-Type": "application/json"}
+            text = json.dumps(body)
+
+            def raise_for_status(self):
+                pass
+
+        return Response()
+
+    def get(self, url, **kwargs):
+        self.discovery_requests += 1
+        return self._response({
+            "token_endpoint": f"{self.AUTHORITY}/oauth2/v2.0/token",
+            "authorization_endpoint": f"{self.AUTHORITY}/oauth2/v2.0/authorize",
+            "issuer": f"{self.AUTHORITY}/v2.0",
+        })
+
+    def post(self, url, **kwargs):
+        self.token_requests += 1
+        return self._response({"access_token": f"token-{self.token_requests}",
+                               "token_type": "Bearer", "expires_in": 3600})
+
+    def close(self):
+        pass
+
+
+class ClientMsal(OneDriveClient):
+    """OneDriveClient dont l'application MSAL passe par FakeLogin"""
+
+    def __init__(self, login, **kwargs):
+        super().__init__("id", "secret", tenant_id="tenant", **kwargs)
+        self.login = login
+
+    @property
+    def app(self):
+        import msal
+        if self._app is None:
+            self._app = msal.ConfidentialClientApplication(
+                "id", client_credential="secret", authority=FakeLogin.AUTHORITY,
+                token_cache=self.token_cache, http_client=self.login, instance_discovery=False
+            )
+        return self._app
+
+
+def client_msal(login, cache_path, graph_url="http://127.0.0.1:1/v1.0"):
+    return ClientMsal(login, graph_endpoint=graph_url, token_cache_path=cache_path)
+
+
+def test_cache_token_partage(tmp_path):
+    """Test du cache de tokens persistant partagé entre instances (processus)"""
+    print("\n🧪 Test 6: Cache de tokens")
+    login = FakeLogin()
+    cache_path = tmp_path / "tokens.json"
+
+    premier = client_msal(login, cache_path)
+    assert premier._get_access_token() == "token-1"
+    assert premier._get_access_token() == "token-1"
+    assert cache_path.exists(), "❌ Cache non persisté"
+
+    # Nouvelle instance (autre processus): token repris du disque, sans appel réseau
+    # (ni demande de token, ni découverte OpenID de l'application MSAL)
+    second = client_msal(login, cache_path)
+    assert second._get_access_token() == "token-1"
+    assert login.token_requests == 1, f"❌ {login.token_requests} demandes de token"
+    assert second._app is None and login.discovery_requests == 1, f"❌ {login.discovery_requests} découvertes"
+
+    # Token invalidé (ex: révoqué): nouvelle demande, visible des autres instances
+    second.invalidate_token()
+    assert second._get_access_token() == "token-2"
+    assert client_msal(login, cache_path)._get_access_token() == "token-2"
+    print(f"✅ {login.token_requests} demandes de token pour 3 instances")
+
+
+def test_retry_apres_401(tmp_path):
+    """Test du renouvellement transparent du token après un 401"""
+    print("\n🧪 Test 7: Retry après 401")
+    server, graph, _ = start_graph()
+    try:
+        login = FakeLogin()
+        client = client_msal(login, tmp_path / "tokens.json", f"{graph.base_url}/v1.0")
+        graph.items["P"] = {"id": "id-p", "folder": {}}
+        graph.rejected_tokens.add("token-1")
+
+        response = client._make_request("GET", "/me/drive/root:/P:")
+        assert response.status_code == 200, f"❌ Statut: {response.status_code}"
+        assert login.token_requests == 2
+        print("✅ Requête rejouée avec un nouveau token")
+    finally:
+        server.shutdown()
+
+
+def test_index_delta(tmp_path):
+    """Test de l'index local synchronisé par /delta (complet puis incrémental)"""
+    print("\n🧪 Test 8: Index OneDrive par /delta")
+    server, graph, client = start_graph()
+    try:
+        for path in ["Actifs", "Actifs/202511_Rue du Lac 3_Rolle", "Actifs/202511_Rue du Lac 3_Rolle/1. Admin",
+                     "Actifs/202512_Chemin du Treizou 21_Trélex", "Autre", "Autre/202401_Rue du Lac 3_Rolle"]:
+            graph.add(path)
+
+        index = OneDriveFolderIndex(client, "/Actifs", db_path=tmp_path / "index.db")
+        assert index.sync() == 4
+        assert index.exists("202511_Rue du Lac 3_Rolle/1. Admin")
+        assert index.find("Rue du Lac 3", "Rolle") == ["/Actifs/202511_Rue du Lac 3_Rolle"]
+        assert index.find("Chem. du Treizou 21", "Trelex") == ["/Actifs/202512_Chemin du Treizou 21_Trélex"]
+
+        # Changements: un dossier créé, un supprimé -> seuls ceux-ci sont reçus
+        graph.add("Actifs/202601_Route de Genève 5_Rolle")
+        graph.remove("Actifs/202511_Rue du Lac 3_Rolle")
+        assert index.sync() == 3, "❌ La synchronisation doit être incrémentale"
+        assert not index.exists("202511_Rue du Lac 3_Rolle/1. Admin")
+        assert index.find("Rte de Genève 5", "Rolle") == ["/Actifs/202601_Route de Genève 5_Rolle"]
+        assert [c["name"] for c in index.list_children("")] == [
+            "202512_Chemin du Treizou 21_Trélex", "202601_Route de Genève 5_Rolle"]
+        print("✅ Index complet puis incrémental")
+    finally:
+        server.shutdown()
+
+
+def test_index_renommage_et_racines(tmp_path):
+    """Test du recalcul incrémental des chemins et de deux dossiers suivis dans le même fichier"""
+    print("\n🧪 Test 10: Renommage et dossiers suivis multiples")
+    server, graph, client = start_graph()
+    try:
+        graph.add("Actifs")
+        for n in range(30):
+            graph.add(f"Actifs/2025{n:02d}_Rue du Lac {n}_Rolle")
+            graph.add(f"Actifs/2025{n:02d}_Rue du Lac {n}_Rolle/1. Admin")
+        graph.add("Actifs/202503_Rue du Lac 3_Rolle/1. Admin/Offre.pdf", folder=False)
+        graph.add("Archives")
+        graph.add("Archives/202101_Route de Genève 5_Rolle")
+
+        actifs = OneDriveFolderIndex(client, "Actifs", db_path=tmp_path / "index.db")
+        archives = OneDriveFolderIndex(client, "Archives", db_path=tmp_path / "index.db")
+        actifs.sync()
+        archives.sync()
+
+        # Dossier renommé: reçu seul, ses descendants suivent; le reste de l'index n'est pas réécrit
+        graph.rename("Actifs/202503_Rue du Lac 3_Rolle", "Actifs/202503_Rue du Lac 3A_Rolle")
+        avant = actifs.conn.total_changes
+        assert actifs.sync() == 1
+        assert actifs.conn.total_changes - avant < 20, actifs.conn.total_changes - avant
+        assert actifs.exists("202503_Rue du Lac 3A_Rolle/1. Admin/Offre.pdf")
+        assert not actifs.exists("202503_Rue du Lac 3_Rolle/1. Admin")
+        assert actifs.find("Rue du Lac 3A", "Rolle")[0] == "/Actifs/202503_Rue du Lac 3A_Rolle"
+
+        # Synchronisation complète d'un dossier suivi: l'autre est intact
+        actifs.sync(full=True)
+        assert archives.exists("202101_Route de Genève 5_Rolle")
+        assert archives.find("Rte de Genève 5", "Rolle") == ["/Archives/202101_Route de Genève 5_Rolle"]
+        assert actifs.find("Rte de Genève 5", "Rolle") == []
+        print("✅ Descendants recalculés, index des deux dossiers séparés")
+    finally:
+        server.shutdown()
+
+
+def test_index_delta_drive_complet(tmp_path):
+    """Test du repli sur /delta du drive quand le sous-dossier est refusé (OneDrive Business)"""
+    print("\n🧪 Test 9: Repli /delta du drive")
+    server, graph, client = start_graph()
+    try:
+        graph.folder_delta_unsupported = True
+        for path in ["Actifs", "Actifs/202511_Rue du Lac 3_Rolle", "Autre", "Autre/202401_Rue du Lac 3_Rolle"]:
+            graph.add(path)
+
+        index = OneDriveFolderIndex(client, "Actifs", db_path=tmp_path / "index.db")
+        index.sync()
+        assert index.find("Rue du Lac 3", "Rolle") == ["/Actifs/202511_Rue du Lac 3_Rolle"]
+        assert not index.exists("Autre")
+
+        graph.add("Actifs/202601_Route de Genève 5_Rolle")
+        assert index.sync() == 1
+        assert index.exists("202601_Route de Genève 5_Rolle")
+        print("✅ Sous-arborescence extraite du drive complet")
+    finally:
+        server.shutdown()
+
+
+# ==========================================
+# EXÉCUTION DES TESTS
+# ==========================================
+
+def run_all_tests():
+    """Lance tous les tests"""
+    print("=" * 60)
+    print("🧪 TESTS UNITAIRES - OneDriveClient")
+    print("=" * 60)
+
+    tests = [
+        test_creation_structure_en_un_appel,
+        test_structure_existante_et_lots,
+        test_copie_cote_serveur,
+        test_upload_session_reprise
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except AssertionError as e:
+            print(f"❌ {test.__name__} ÉCHOUÉ: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"❌ {test.__name__} ERREUR: {e}")
+            failed += 1
+
+    print("\n" + "=" * 60)
+    print(f"📊 RÉSULTATS: {passed} tests réussis, {failed} tests échoués")
+    print("=" * 60)
+
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
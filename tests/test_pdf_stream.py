@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+Tests unitaires pour pdf_stream
+Décodage en flux du champ "content" quel que soit le découpage des morceaux
+"""
+
+import sys
+import os
+import json
+import base64
+import tempfile
+from pathlib import Path
+
+# Configurer l'encodage UTF-8 pour Windows
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+# Ajouter le répertoire parent au path pour importer les modules
+SCRIPTS_DIR = os.path.join(os.path.dirname(__file__), '..', 'scripts')
+sys.path.insert(0, SCRIPTS_DIR)
+
+import pdf_stream
+
+# Octets choisis pour que le base64 contienne des "/" et des "+"
+PDF = b"%PDF-1.7\n" + bytes(range(256)) * 8 + b"\n%%EOF"
+
+
+def reponse_bexio(content, **autres):
+    """Réponse JSON comme l'API Bexio (PHP): "/" échappés, base64 coupé par des \\n"""
+    encoded = base64.b64encode(content).decode("ascii")
+    lignes = "\n".join(encoded[i:i + 76] for i in range(0, len(encoded), 76))
+    data = dict(autres, name="Facture é №1.pdf", mime="application/pdf", content=lignes)
+    return json.dumps(data, ensure_ascii=False).replace("/", "\\/").encode("utf-8")
+
+
+def morceaux(data, taille):
+    return [data[i:i + taille] for i in range(0, len(data), taille)]
+
+
+def dossier_vide():
+    return Path(tempfile.mkdtemp())
+
+
+def test_decoupages():
+    """Morceaux coupés au milieu des échappements \\/ et \\n et des caractères UTF-8 multi-octets"""
+    print("\n🧪 Test 1: Découpage des morceaux")
+
+    data = reponse_bexio(PDF)
+    assert b"\\/" in data and b"\\n" in data
+    debut_nom = data.index("é".encode("utf-8"))
+
+    tailles = list(range(1, 40)) + [75, 76, 77, 1000, 64 * 1024]
+    for taille in tailles:
+        destination = dossier_vide() / "facture.pdf"
+        assert pdf_stream.write_base64_json_content(morceaux(data, taille), destination) == destination
+        assert destination.read_bytes() == PDF, f"Morceaux de {taille} octets"
+
+    # Coupures explicites: dans "é" (2 octets), dans "№" (3 octets), entre "\\" et "/" ou "n"
+    echappement = data.index(b"\\/")
+    retour = data.index(b"\\n")
+    coupures = [debut_nom + 1, data.index("№".encode("utf-8")) + 1, data.index("№".encode("utf-8")) + 2,
+                echappement + 1, retour + 1]
+    for coupure in coupures:
+        destination = dossier_vide() / "facture.pdf"
+        pdf_stream.write_base64_json_content([data[:coupure], data[coupure:]], destination)
+        assert destination.read_bytes() == PDF, f"Coupure à l'octet {coupure}"
+
+    print(f"   ✅ {len(tailles)} tailles de morceaux et {len(coupures)} coupures ciblées")
+
+
+def test_cle_content_imbriquee():
+    """Seul le "content" de l'objet racine est décodé"""
+    print("\n🧪 Test 2: Clé \"content\" imbriquée")
+
+    leurre = base64.b64encode(b"pas le pdf").decode("ascii")
+    data = reponse_bexio(PDF, meta={"content": leurre, "liste": [{"content": leurre}]}, titre="content")
+    assert data.index(b'"meta"') < data.index(b'"content": "JVBER')
+    for taille in (1, 7, 4096):
+        destination = dossier_vide() / "facture.pdf"
+        pdf_stream.write_base64_json_content(morceaux(data, taille), destination)
+        assert destination.read_bytes() == PDF, f"Morceaux de {taille} octets"
+
+    # Sans "content" à la racine (ou null): pas de PDF, pas de fichier
+    for data in (json.dumps({"meta": {"content": leurre}}).encode(), b'{"content": null}'):
+        dossier = dossier_vide()
+        assert pdf_stream.write_base64_json_content([data], dossier / "facture.pdf") is None
+        assert list(dossier.iterdir()) == []
+
+    print("   ✅ Valeurs imbriquées ignorées")
+
+
+def test_nettoyage_apres_erreur():
+    """Téléchargement interrompu: ni PDF partiel ni fichier temporaire"""
+    print("\n🧪 Test 3: Fichier temporaire supprimé après une erreur")
+
+    data = reponse_bexio(PDF)
+
+    def flux_interrompu():
+        yield data[:500]
+        raise ConnectionError("connexion perdue")
+
+    dossier = dossier_vide()
+    try:
+        pdf_stream.write_base64_json_content(flux_interrompu(), dossier / "facture.pdf")
+        assert False, "ConnectionError attendue"
+    except ConnectionError:
+        pass
+    assert list(dossier.iterdir()) == []
+
+    # Un PDF existant n'est remplacé que par un téléchargement complet
+    destination = dossier / "facture.pdf"
+    destination.write_bytes(b"ancien")
+    try:
+        pdf_stream.write_base64_json_content(flux_interrompu(), destination)
+    except ConnectionError:
+        pass
+    assert [p.name for p in dossier.iterdir()] == ["facture.pdf"] and destination.read_bytes() == b"ancien"
+
+    print("   ✅ Aucun fichier .part restant, PDF existant conservé")
+
+
+# ==========================================
+# EXÉCUTION DES TESTS
+# ==========================================
+
+def run_all_tests():
+    """Exécute tous les tests"""
+    print("=" * 60)
+    print("🚀 TESTS UNITAIRES - PDF EN FLUX")
+    print("=" * 60)
+
+    tests = [
+        test_decoupages,
+        test_cle_content_imbriquee,
+        test_nettoyage_apres_erreur
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except AssertionError as e:
+            print(f"❌ {test.__name__} ÉCHOUÉ: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"❌ {test.__name__} ERREUR: {e}")
+            failed += 1
+
+    print("\n" + "=" * 60)
+    print(f"📊 RÉSULTATS: {passed} tests réussis, {failed} tests échoués")
+    print("=" * 60)
+
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
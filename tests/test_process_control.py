@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+Tests unitaires pour process_control
+Timeout, annulation du groupe de processus et limites CPU / mémoire
+"""
+
+import sys
+import os
+import time
+
+# Configurer l'encodage UTF-8 pour Windows
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+# Ajouter la racine au path pour importer les modules de l'application
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import process_control
+from process_control import Limits
+
+# Script qui lance un sous-processus puis attend: le groupe entier doit être arrêté
+SCRIPT_AVEC_ENFANT = """
+import subprocess, sys, time
+enfant = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"])
+print(enfant.pid, flush=True)
+time.sleep(60)
+"""
+
+
+# 8 threads actifs en même temps (pool de copies, requêtes parallèles): sous RLIMIT_AS,
+# les arènes malloc et les piles réservées suffisaient à dépasser 128 Mo
+SCRIPT_THREADS = """
+import threading
+barriere = threading.Barrier(8, timeout=5)
+def travail():
+    blocs = [bytearray(64 * 1024) for _ in range(20)]
+    barriere.wait()
+threads = [threading.Thread(target=travail) for _ in range(8)]
+for t in threads:
+    t.start()
+for t in threads:
+    t.join()
+"""
+
+
+def processus_existe(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    # Zombie pas encore récupéré par init: arrêté
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().split(")")[-1].split()[0] != "Z"
+    except OSError:
+        return True
+
+
+def test_limites_depuis_scripts():
+    """Limites lues dans SCRIPTS, timeout borné"""
+    print("\n🧪 Test 1: Limites déclarées dans SCRIPTS")
+
+    limits = Limits.from_config({"timeout": 120, "cpu_limit": 60, "memory_limit": 512})
+    assert (limits.timeout, limits.cpu_limit, limits.memory_limit) == (120, 60, 512)
+    assert Limits.from_config({}).timeout == process_control.DEFAULT_TIMEOUT
+    assert Limits.from_config({"timeout": 10 ** 6}).timeout == process_control.MAX_TIMEOUT
+
+    print("   ✅ Timeout, CPU et mémoire par script")
+
+
+def test_timeout_arrete_le_groupe():
+    """Au timeout, le script et ses sous-processus sont arrêtés"""
+    print("\n🧪 Test 2: Timeout du groupe de processus")
+
+    debut = time.perf_counter()
+    result = process_control.run([sys.executable, "-c", SCRIPT_AVEC_ENFANT], Limits(timeout=1),
+                                 poll_interval=0.1)
+    assert result.outcome == "timeout" and result.limit_exceeded == "timeout"
+    assert result.returncode is None
+    assert time.perf_counter() - debut < 5
+
+    enfant = int(result.stdout.split()[0])
+    time.sleep(0.2)
+    assert not processus_existe(enfant), "Sous-processus toujours actif"
+
+    print(f"   ✅ Arrêté après {result.duration:.1f} s, sous-processus compris")
+
+
+def test_annulation():
+    """should_cancel arrête le script en cours"""
+    print("\n🧪 Test 3: Annulation d'un script en cours")
+
+    debut = time.monotonic()
+    demarrage = []
+    result = process_control.run([sys.executable, "-c", "import time; time.sleep(60)"], Limits(timeout=60),
+                                 should_cancel=lambda: time.monotonic() - debut > 0.5,
+                                 on_start=lambda pid, enforced: demarrage.append((pid, enforced)),
+                                 poll_interval=0.1)
+    assert result.outcome == "cancelled" and result.limit_exceeded is None
+    assert result.duration < 5
+    assert demarrage == [(result.pid, ["timeout"])]
+
+    # Annulation demandée après la fin du script: son résultat fait foi
+    result = process_control.run([sys.executable, "-c", "print('AN-01002')"], Limits(timeout=30),
+                                 should_cancel=lambda: time.sleep(1) or True, poll_interval=0.01)
+    assert result.outcome == "exited" and result.returncode == 0 and result.stdout.strip() == "AN-01002"
+
+    # Script terminé normalement: sortie complète et code de retour
+    result = process_control.run([sys.executable, "-c", "print('é' * 100000)"], Limits(timeout=30))
+    assert result.outcome == "exited" and result.returncode == 0
+    assert len(result.stdout.strip()) == 100000
+
+    print("   ✅ Script arrêté moins d'une seconde après la demande")
+
+
+def test_limites_cpu_et_memoire():
+    """Le script est arrêté par RLIMIT_CPU et RLIMIT_DATA, la limite atteinte est identifiée"""
+    print("\n🧪 Test 4: Limites CPU et mémoire")
+
+    if process_control.resource is None:
+        print("   ⏭️  Limites non disponibles sur cette plateforme")
+        return
+
+    result = process_control.run([sys.executable, "-c", "while True: pass"], Limits(timeout=30, cpu_limit=1))
+    assert result.limit_exceeded == "cpu", (result.returncode, result.stderr[-300:])
+    assert "cpu" in result.enforced
+    assert result.duration < 10
+
+    result = process_control.run([sys.executable, "-c", "x = bytearray(400 * 1024 * 1024)"],
+                                 Limits(timeout=30, memory_limit=256))
+    assert result.returncode != 0 and result.limit_exceeded == "memory", result.stderr[-300:]
+
+    # Sous la limite: exécution normale, même avec de nombreux threads (arènes malloc)
+    result = process_control.run([sys.executable, "-c", "x = bytearray(50 * 1024 * 1024)"],
+                                 Limits(timeout=30, cpu_limit=10, memory_limit=256))
+    assert result.returncode == 0 and result.limit_exceeded is None, result.stderr[-300:]
+    result = process_control.run([sys.executable, "-c", SCRIPT_THREADS], Limits(timeout=30, memory_limit=128))
+    assert result.returncode == 0 and result.limit_exceeded is None, result.stderr[-300:]
+
+    # SIGKILL: limite CPU seulement si le temps CPU mesuré l'a atteinte (sinon OOM killer, admin...)
+    import signal
+    limits = Limits(timeout=30, cpu_limit=10)
+    assert process_control.detect_limit(-signal.SIGXCPU, "", limits) == "cpu"
+    assert process_control.detect_limit(-signal.SIGKILL, "", limits) is None
+    assert process_control.detect_limit(-signal.SIGKILL, "", limits, used_cpu=2.0) is None
+    assert process_control.detect_limit(-signal.SIGKILL, "", limits, used_cpu=14.5) == "cpu"
+    result = process_control.run([sys.executable, "-c", "import os, signal; os.kill(os.getpid(), signal.SIGKILL)"],
+                                 limits)
+    assert result.returncode == -signal.SIGKILL and result.limit_exceeded is None
+
+    print("   ✅ Dépassements CPU et mémoire détectés")
+
+
+# ==========================================
+# EXÉCUTION DES TESTS
+# ==========================================
+
+def run_all_tests():
+    """Exécute tous les tests"""
+    print("=" * 60)
+    print("🚀 TESTS UNITAIRES - LIMITES ET ANNULATION DES SCRIPTS")
+    print("=" * 60)
+
+    tests = [
+        test_limites_depuis_scripts,
+        test_timeout_arrete_le_groupe,
+        test_annulation,
+        test_limites_cpu_et_memoire
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except AssertionError as e:
+            print(f"❌ {test.__name__} ÉCHOUÉ: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"❌ {test.__name__} ERREUR: {e}")
+            failed += 1
+
+    print("\n" + "=" * 60)
+    print(f"📊 RÉSULTATS: {passed} tests réussis, {failed} tests échoués")
+    print("=" * 60)
+
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+Tests unitaires pour project_folder_index
+Classement des dossiers par rue, numéro et localité, rafraîchissement incrémental
+"""
+
+import sys
+import os
+import tempfile
+from pathlib import Path
+
+# Configurer l'encodage UTF-8 pour Windows
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+# Ajouter le répertoire parent au path pour importer les modules
+SCRIPTS_DIR = os.path.join(os.path.dirname(__file__), '..', 'scripts')
+sys.path.insert(0, SCRIPTS_DIR)
+
+import project_folder_index
+from project_folder_index import ProjectFolderIndex
+
+# Du plus ancien au plus récent: à score égal, le dossier le plus récent passerait devant
+DOSSIERS = [
+    "202401_Rue du Lac 15_Rolle",
+    "202402_Rue du Lac 17_Rolle",
+    "202403_Rue du Lac 15_Morges",
+    "202404_Rue du Lac 15_Mont-sur-Rolle",
+    "202405_Chemin du Lac 15_Rolle",
+    "202406_Avenue de la Gare 2_Rolle",
+]
+
+
+def creer_racine(noms=DOSSIERS):
+    """Dossiers actifs avec des mtime croissants, index dans le même répertoire temporaire"""
+    base = Path(tempfile.mkdtemp())
+    racine = base / "actifs"
+    racine.mkdir()
+    for i, nom in enumerate(noms):
+        (racine / nom).mkdir()
+        os.utime(racine / nom, (1_700_000_000 + i, 1_700_000_000 + i))
+    os.utime(racine, (1_700_000_100, 1_700_000_100))
+    return racine, base / "index.json"
+
+
+def test_classement():
+    """Rue, type de rue, numéro et localité exacts d'abord; autre localité exclue"""
+    print("\n🧪 Test 1: Classement par rue, numéro et localité")
+
+    racine, index_file = creer_racine()
+    index = ProjectFolderIndex(racine, index_file=index_file)
+
+    noms = [p.name for p in index.find("Rue du Lac 15", "Rolle")]
+    assert noms == [
+        "202401_Rue du Lac 15_Rolle",           # rue, numéro et localité
+        "202405_Chemin du Lac 15_Rolle",        # autre type de rue
+        "202402_Rue du Lac 17_Rolle",           # autre numéro
+        "202404_Rue du Lac 15_Mont-sur-Rolle",  # localité qui contient "Rolle"
+    ], noms
+
+    # Abréviations, casse et accents ignorés
+    assert index.find("r. du lac 15", "ROLLE")[0].name == "202401_Rue du Lac 15_Rolle"
+    assert index.find("Rue du Lac 15", "Morges")[0].name == "202403_Rue du Lac 15_Morges"
+    assert index.find("Rue du Lac 15", "Nyon") == []
+
+    # Même bâtiment uniquement: le numéro doit correspondre
+    assert index.find_existing("Rue du Lac 15", "Rolle").name == "202401_Rue du Lac 15_Rolle"
+    assert index.find_existing("Rue du Lac 19", "Rolle") is None
+
+    print("   ✅ 4 candidats classés, autre localité exclue")
+
+
+def test_mtime_racine():
+    """mtime de la racine inchangé: pas de parcours; sinon seuls les dossiers nouveaux sont analysés"""
+    print("\n🧪 Test 2: Rafraîchissement par mtime")
+
+    racine, index_file = creer_racine()
+    index = ProjectFolderIndex(racine, index_file=index_file)
+    assert index.refresh() is True
+
+    parcours = []
+    analyses = []
+    scandir = os.scandir
+    analyze = project_folder_index.analyze_folder_name
+
+    def compter_scandir(path):
+        parcours.append(path)
+        return scandir(path)
+
+    def compter_analyse(name, mtime):
+        analyses.append(name)
+        return analyze(name, mtime)
+
+    project_folder_index.os.scandir = compter_scandir
+    project_folder_index.analyze_folder_name = compter_analyse
+    try:
+        # Même processus, puis nouvelle instance relue depuis le fichier: aucun parcours
+        assert index.refresh() is False
+        relu = ProjectFolderIndex(racine, index_file=index_file)
+        assert [p.name for p in relu.find("Avenue de la Gare 2", "Rolle")] == ["202406_Avenue de la Gare 2_Rolle"]
+        assert parcours == [] and analyses == []
+
+        # Nouveau dossier: un parcours, une seule analyse
+        (racine / "202407_Route de Genève 5_Rolle").mkdir()
+        os.utime(racine, (1_700_000_200, 1_700_000_200))
+        assert relu.refresh() is True
+        assert len(parcours) == 1 and analyses == ["202407_Route de Genève 5_Rolle"]
+        assert relu.find_existing("Rte de Geneve 5", "Rolle").name == "202407_Route de Genève 5_Rolle"
+
+        # Dossier supprimé: retiré de l'index
+        (racine / "202402_Rue du Lac 17_Rolle").rmdir()
+        os.utime(racine, (1_700_000_300, 1_700_000_300))
+        assert "202402_Rue du Lac 17_Rolle" not in [p.name for p in relu.find("Rue du Lac 17", "Rolle")]
+        assert len(analyses) == 1
+    finally:
+        project_folder_index.os.scandir = scandir
+        project_folder_index.analyze_folder_name = analyze
+
+    print("   ✅ Racine inchangée: aucun parcours; 1 dossier ajouté: 1 analyse")
+
+
+# ==========================================
+# EXÉCUTION DES TESTS
+# ==========================================
+
+def run_all_tests():
+    """Exécute tous les tests"""
+    print("=" * 60)
+    print("🚀 TESTS UNITAIRES - INDEX DES DOSSIERS PROJET")
+    print("=" * 60)
+
+    tests = [
+        test_classement,
+        test_mtime_racine
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except AssertionError as e:
+            print(f"❌ {test.__name__} ÉCHOUÉ: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"❌ {test.__name__} ERREUR: {e}")
+            failed += 1
+
+    print("\n" + "=" * 60)
+    print(f"📊 RÉSULTATS: {passed} tests réussis, {failed} tests échoués")
+    print("=" * 60)
+
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
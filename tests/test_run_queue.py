@@ -0,0 +1,316 @@
+# -*- coding: utf-8 -*-
+"""
+Tests unitaires pour run_queue
+Ordre de passage (priorité, équité entre utilisateurs), limites de concurrence, annulation et orphelins
+"""
+
+import sys
+import os
+import time
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+# Configurer l'encodage UTF-8 pour Windows
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+# Ajouter la racine au path pour importer les modules de l'application
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from flask import Flask
+
+import run_queue
+import models
+from models import db, ScriptRun
+
+
+def creer_app():
+    """Application minimale sur une base SQLite temporaire"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}"
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def demande(run_id, script_id, user_id, priority=0):
+    return SimpleNamespace(id=run_id, script_id=script_id, user_id=user_id, priority=priority,
+                           created_at=datetime(2026, 1, 1) + timedelta(seconds=run_id))
+
+
+def test_ordre_de_passage():
+    """Priorité d'abord, puis les utilisateurs à tour de rôle; un script plein ne bloque pas les autres"""
+    print("\n🧪 Test 1: Ordre de passage")
+
+    # Alice a demandé 3 lots avant Bruno; le devis de Claire passe en premier
+    queued = [demande(1, "offres_acceptees", "alice"), demande(2, "offres_acceptees", "alice"),
+              demande(3, "facture_payee", "alice"), demande(4, "facture_payee", "bruno"),
+              demande(5, "creer_devis", "claire", priority=10)]
+    limits = {"offres_acceptees": 1, "facture_payee": 2, "creer_devis": None}
+
+    assert run_queue.admission_order(queued, [], limits, global_limit=3) == [5, 1, 4]
+    assert run_queue.admission_order(queued, [], limits, global_limit=10) == [5, 1, 4, 3]
+
+    # Limite globale atteinte par les exécutions en cours
+    running = [demande(10, "creer_devis", "claire") for _ in range(3)]
+    assert run_queue.admission_order(queued, running, limits, global_limit=3) == []
+
+    print("   ✅ Devis prioritaire, Alice et Bruno servis à tour de rôle")
+
+
+def test_limite_par_script():
+    """Jamais plus de 'max_concurrent' exécutions du même script, même avec plusieurs répartiteurs"""
+    print("\n🧪 Test 2: Limite de concurrence par script")
+
+    app = creer_app()
+    limits = {"offres_acceptees": 2}
+    with app.app_context():
+        for i in range(6):
+            db.session.add(ScriptRun(script_id="offres_acceptees", user_id=f"user{i % 2}", status="queued"))
+        db.session.commit()
+
+    lances = []
+    lock = threading.Lock()
+    barriere = threading.Barrier(4)
+
+    def repartiteur():
+        with app.app_context():
+            barriere.wait()
+            started, expired, _ = run_queue.dispatch(limits, global_limit=4)
+            with lock:
+                lances.extend(started)
+            assert expired == []
+
+    threads = [threading.Thread(target=repartiteur) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(lances) == 2 and len(set(lances)) == 2, lances
+
+    # Les répartiteurs suivants lancent le reste au fur et à mesure des fins
+    with app.app_context():
+        termines = 2
+        while termines < 6:
+            ScriptRun.query.filter_by(status="running").update({"status": "success"})
+            db.session.commit()
+            started, _, _ = run_queue.dispatch(limits, global_limit=4)
+            assert len(started) <= 2
+            termines += len(started)
+        assert ScriptRun.query.filter_by(status="queued").count() == 0
+        runs = ScriptRun.query.all()
+        assert all(r.started_at is not None and r.queue_wait >= 0 for r in runs)
+
+    print("   ✅ 4 répartiteurs concurrents, au plus 2 exécutions lancées")
+
+
+def test_delai_file_attente():
+    """Sans place libérée, l'exécution est abandonnée après le délai"""
+    print("\n🧪 Test 3: Délai d'attente dépassé")
+
+    app = creer_app()
+    limits = {"rapprochement_factures": 1}
+    with app.app_context():
+        occupe = ScriptRun(script_id="rapprochement_factures", status="queued")
+        run = ScriptRun(script_id="rapprochement_factures", status="queued")
+        db.session.add_all([occupe, run])
+        db.session.commit()
+        assert run_queue.dispatch(limits) == ([occupe.id], [], [])
+
+        time.sleep(0.6)
+        started, expired, _ = run_queue.dispatch(limits, timeout=0.5)
+        assert (started, expired) == ([], [run.id])
+        db.session.refresh(run)
+        assert run.status == "error" and "File d'attente" in run.error_message
+        # Abandonnée une seule fois
+        assert run_queue.expire_queued(0.5) == []
+
+    print("   ✅ Exécution abandonnée, jamais lancée")
+
+
+def test_annulation():
+    """Une exécution annulée quitte la file; une exécution orpheline libère sa place"""
+    print("\n🧪 Test 4: Annulation")
+
+    app = creer_app()
+    limits = {"rapprochement_factures": 1}
+    with app.app_context():
+        occupe = ScriptRun(script_id="rapprochement_factures", user_id="alice", status="queued")
+        en_attente = ScriptRun(script_id="rapprochement_factures", user_id="bruno", status="queued")
+        db.session.add_all([occupe, en_attente])
+        db.session.commit()
+        assert run_queue.dispatch(limits)[0] == [occupe.id]
+
+        # En attente derrière "occupe": annulée, jamais lancée
+        assert run_queue.cancel(en_attente, "bruno") == "cancelled"
+        assert en_attente.cancelled_by == "bruno"
+
+        # En cours avec un processus vivant: arrêt demandé au worker
+        occupe.pid = os.getpid()
+        db.session.commit()
+        assert run_queue.cancel(occupe, "admin") == "cancelling"
+        assert run_queue.cancel_requested(occupe.id)
+        assert db.session.get(ScriptRun, occupe.id).status == "running"
+
+        # Processus disparu (worker arrêté): close, la place est libérée
+        suivant = ScriptRun(script_id="rapprochement_factures", status="queued")
+        db.session.add(suivant)
+        db.session.commit()
+        assert run_queue.dispatch(limits)[0] == []
+        occupe.pid = 2 ** 22 + 1
+        db.session.commit()
+        assert run_queue.cancel(occupe, "admin") == "cancelled"
+        assert run_queue.dispatch(limits)[0] == [suivant.id]
+        assert db.session.get(ScriptRun, en_attente.id).status == "cancelled"
+
+    print("   ✅ Exécution retirée de la file, place d'une exécution orpheline libérée")
+
+
+def test_executions_orphelines():
+    """Worker arrêté: la place est libérée et l'exécution close par le répartiteur"""
+    print("\n🧪 Test 5: Exécutions orphelines")
+
+    app = creer_app()
+    limits = {"rapprochement_factures": 1}
+    with app.app_context():
+        occupe = ScriptRun(script_id="rapprochement_factures", status="queued")
+        suivant = ScriptRun(script_id="rapprochement_factures", status="queued")
+        db.session.add_all([occupe, suivant])
+        db.session.commit()
+        assert run_queue.dispatch(limits)[0] == [occupe.id]
+
+        # Signe de vie récent, processus vivant: la place reste occupée
+        occupe.pid = os.getpid()
+        db.session.commit()
+        run_queue.heartbeat(occupe.id, force=True)
+        assert run_queue.dispatch(limits) == ([], [], [])
+
+        # Processus disparu depuis plus de deux intervalles: close sans attendre HEARTBEAT_TTL
+        db.session.refresh(occupe)
+        occupe.pid = 2 ** 22 + 1
+        occupe.heartbeat_at = occupe.heartbeat_at - timedelta(seconds=2 * run_queue.HEARTBEAT_INTERVAL + 1)
+        db.session.commit()
+        assert run_queue.dispatch(limits) == ([suivant.id], [], [occupe.id])
+        db.session.refresh(occupe)
+        assert occupe.status == "error" and "worker" in occupe.error_message
+
+        # Processus inconnu, aucun signe de vie depuis HEARTBEAT_TTL: la place est libérée
+        suivant.heartbeat_at = suivant.started_at - timedelta(seconds=run_queue.HEARTBEAT_TTL + 1)
+        db.session.commit()
+        autre = ScriptRun(script_id="rapprochement_factures", status="queued")
+        db.session.add(autre)
+        db.session.commit()
+        assert run_queue.dispatch(limits) == ([autre.id], [], [suivant.id])
+
+    print("   ✅ Places libérées sans attendre le timeout maximal des scripts")
+
+
+def test_changement_heure():
+    """Signe de vie juste avant le passage à l'heure d'été: l'exécution vivante garde sa place"""
+    print("\n🧪 Test 6: Changement d'heure")
+
+    app = creer_app()
+    limits = {"rapprochement_factures": 1}
+    horloge = [datetime(2026, 3, 29, 0, 59, 50)]  # 01:59:50 à Zurich, 29 mars 2026
+    get_utc_time = run_queue.get_utc_time
+    run_queue.get_utc_time = lambda: horloge[0]
+    try:
+        with app.app_context():
+            en_cours = ScriptRun(script_id="rapprochement_factures", status="queued",
+                                 created_at=horloge[0] - timedelta(seconds=5))
+            en_attente = ScriptRun(script_id="rapprochement_factures", status="queued",
+                                   created_at=horloge[0] - timedelta(seconds=2))
+            db.session.add_all([en_cours, en_attente])
+            db.session.commit()
+            assert run_queue.dispatch(limits)[0] == [en_cours.id]
+            en_cours.pid = os.getpid()
+            db.session.commit()
+            run_queue.heartbeat(en_cours.id, force=True)
+
+            # 15 s plus tard, 03:00:05 à Zurich: une heure d'écart sur l'horloge murale
+            horloge[0] += timedelta(seconds=15)
+            assert models.to_local_time(horloge[0]) - models.to_local_time(horloge[0] - timedelta(seconds=15)) \
+                == timedelta(hours=1, seconds=15)
+            assert run_queue.dispatch(limits) == ([], [], [])
+            db.session.refresh(en_cours)
+            db.session.refresh(en_attente)
+            assert (en_cours.status, en_attente.status) == ("running", "queued")
+
+            # Passage à l'heure d'hiver (25 octobre 2026): un worker arrêté libère sa place après HEARTBEAT_TTL,
+            # pas une heure plus tard
+            horloge[0] = datetime(2026, 10, 25, 0, 59, 0)  # 02:59 heure d'été
+            en_cours.heartbeat_at = horloge[0]
+            en_cours.pid = None
+            en_attente.status = "cancelled"
+            db.session.commit()
+            horloge[0] += timedelta(seconds=run_queue.HEARTBEAT_TTL + 1)  # 02:00:01 heure d'hiver
+            assert run_queue.dispatch(limits) == ([], [], [en_cours.id])
+
+            # Signe de vie une heure dans le futur (enregistré en UTC+1 avant le passage à l'UTC,
+            # ou horloge reculée): processus vivant conservé et compté, processus disparu clos
+            vivant = ScriptRun(script_id="rapprochement_factures", status="running", pid=os.getpid(),
+                               started_at=horloge[0] + timedelta(hours=1), heartbeat_at=horloge[0] + timedelta(hours=1))
+            disparu = ScriptRun(script_id="facture_payee", status="running", pid=2 ** 22 + 1,
+                                started_at=horloge[0] + timedelta(hours=1), heartbeat_at=horloge[0] + timedelta(hours=1))
+            attente = ScriptRun(script_id="rapprochement_factures", status="queued", created_at=horloge[0])
+            db.session.add_all([vivant, disparu, attente])
+            db.session.commit()
+            assert run_queue.dispatch(limits) == ([], [], [disparu.id])
+            db.session.refresh(vivant)
+            assert vivant.status == "running"
+    finally:
+        run_queue.get_utc_time = get_utc_time
+
+    print("   ✅ Aucune exécution vivante close, aucun orphelin retenu une heure de plus")
+
+
+# ==========================================
+# EXÉCUTION DES TESTS
+# ==========================================
+
+def run_all_tests():
+    """Exécute tous les tests"""
+    print("=" * 60)
+    print("🚀 TESTS UNITAIRES - FILE D'ATTENTE DES SCRIPTS")
+    print("=" * 60)
+
+    tests = [
+        test_ordre_de_passage,
+        test_limite_par_script,
+        test_delai_file_attente,
+        test_annulation,
+        test_executions_orphelines,
+        test_changement_heure
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except AssertionError as e:
+            print(f"❌ {test.__name__} ÉCHOUÉ: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"❌ {test.__name__} ERREUR: {e}")
+            failed += 1
+
+    print("\n" + "=" * 60)
+    print(f"📊 RÉSULTATS: {passed} tests réussis, {failed} tests échoués")
+    print("=" * 60)
+
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
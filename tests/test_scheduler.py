@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+"""
+Tests unitaires pour scheduler
+Expressions cron, échéances réservées une seule fois et absence de chevauchement
+"""
+
+import sys
+import os
+import tempfile
+import threading
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+# Configurer l'encodage UTF-8 pour Windows
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+# Ajouter la racine au path pour importer les modules de l'application
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from flask import Flask
+
+import scheduler
+import models
+from models import db, Schedule, ScriptRun
+
+
+def creer_app():
+    """Application minimale sur une base SQLite temporaire"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}"
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def test_expressions_cron():
+    """Prochaine échéance des expressions usuelles, expressions invalides refusées"""
+    print("\n🧪 Test 1: Expressions cron")
+
+    # Lundi 5 janvier 2026, 10h17
+    lundi = datetime(2026, 1, 5, 10, 17, 42)
+    assert scheduler.next_run("30 2 * * *", lundi) == datetime(2026, 1, 6, 2, 30)
+    assert scheduler.next_run("*/15 * * * *", lundi) == datetime(2026, 1, 5, 10, 30)
+    assert scheduler.next_run("0 */4 * * 1-5", lundi) == datetime(2026, 1, 5, 12, 0)
+    assert scheduler.next_run("0 22 * * fri", lundi) == datetime(2026, 1, 9, 22, 0)
+    assert scheduler.next_run("0 6 1 feb,mar *", lundi) == datetime(2026, 2, 1, 6, 0)
+    assert scheduler.next_run("@daily", lundi) == datetime(2026, 1, 6, 0, 0)
+    assert scheduler.next_run("0 0 * * 7", lundi) == datetime(2026, 1, 11, 0, 0)
+
+    # Strictement après: l'échéance courante n'est pas rendue
+    assert scheduler.next_run("17 10 * * *", datetime(2026, 1, 5, 10, 17)) == datetime(2026, 1, 6, 10, 17)
+
+    # Jour du mois ET jour de la semaine restreints: l'un ou l'autre (comme cron)
+    assert scheduler.next_run("0 0 15 * mon", lundi) == datetime(2026, 1, 12, 0, 0)
+
+    for invalide in ["", "* * * *", "60 * * * *", "* * * * 8", "*/0 * * * *", "0 0 30 2 *", "a b c d e"]:
+        try:
+            scheduler.next_run(invalide, lundi)
+            assert False, f"CronError attendue pour '{invalide}'"
+        except scheduler.CronError:
+            pass
+
+    print("   ✅ Échéances correctes, 7 expressions invalides refusées")
+
+
+def test_echeances_sans_chevauchement():
+    """Une échéance crée une seule exécution; la suivante est sautée si la précédente tourne encore"""
+    print("\n🧪 Test 2: Échéances et chevauchement")
+
+    app = creer_app()
+    with app.app_context():
+        maintenant = models.get_utc_time()
+        debut = maintenant.replace(minute=maintenant.minute - maintenant.minute % 5, second=0, microsecond=0)
+        schedule = Schedule(name="Rapprochement", script_id="rapprochement_factures", cron="*/5 * * * *",
+                            next_run_at=debut)
+        db.session.add(schedule)
+        db.session.commit()
+
+        crees = scheduler.claim_due(debut)
+        assert len(crees) == 1
+        run = db.session.get(ScriptRun, crees[0][0])
+        assert (run.status, run.schedule_id) == ("queued", schedule.id)
+        assert schedule.next_run_at == debut + timedelta(minutes=5)
+
+        # Pas encore dû
+        assert scheduler.claim_due(debut + timedelta(minutes=1)) == []
+
+        # Échéance suivante pendant que la première exécution est en cours: sautée
+        run.status = "running"
+        run.started_at = run.created_at
+        db.session.commit()
+        assert scheduler.claim_due(debut + timedelta(minutes=5)) == []
+        saute = ScriptRun.query.filter_by(status="skipped").one()
+        assert f"#{run.id}" in saute.error_message and schedule.last_run_id == saute.id
+
+        # Première exécution terminée: la suivante est créée
+        run.status = "success"
+        db.session.commit()
+        assert len(scheduler.claim_due(debut + timedelta(minutes=10))) == 1
+
+        # Application arrêtée plusieurs heures: une seule exécution de rattrapage
+        assert scheduler.claim_due(debut + timedelta(hours=3)) == []  # la précédente est encore en attente
+        ScriptRun.query.filter_by(status="queued").update({"status": "success"})
+        db.session.commit()
+        assert len(scheduler.claim_due(debut + timedelta(hours=4))) == 1
+        assert schedule.next_run_at == debut + timedelta(hours=4, minutes=5)
+
+        # Désactivée: plus d'exécution
+        schedule.enabled = False
+        db.session.commit()
+        assert scheduler.claim_due(debut + timedelta(days=1)) == []
+
+    print("   ✅ Une exécution par échéance, chevauchement enregistré comme 'skipped'")
+
+
+def test_workers_concurrents():
+    """Plusieurs workers vérifient la même échéance: une seule exécution créée"""
+    print("\n🧪 Test 3: Planificateur dans plusieurs workers")
+
+    app = creer_app()
+    with app.app_context():
+        now = models.get_utc_time()
+        for i in range(3):
+            db.session.add(Schedule(name=f"Lot {i}", script_id="offres_acceptees_batch", cron="@hourly",
+                                    next_run_at=now - timedelta(minutes=1)))
+        db.session.commit()
+
+    crees = []
+    lock = threading.Lock()
+    barriere = threading.Barrier(6)
+
+    def worker():
+        with app.app_context():
+            barriere.wait()
+            runs = scheduler.claim_due(now)
+            with lock:
+                crees.extend(runs)
+
+    threads = [threading.Thread(target=worker) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert sorted(schedule_id for _, schedule_id in crees) == [1, 2, 3], crees
+    with app.app_context():
+        assert ScriptRun.query.count() == 3
+
+    # Boucle du planificateur: les échéances deviennent des exécutions en attente,
+    # transmises au répartiteur avec les arguments de la planification
+    with app.app_context():
+        schedule = db.session.get(Schedule, 1)
+        schedule.next_run_at = models.get_utc_time() - timedelta(minutes=1)
+        schedule.args = {"mode": "rapprochement"}
+        ScriptRun.query.update({"status": "success"})
+        db.session.commit()
+
+    en_attente = []
+    stop = threading.Event()
+
+    def dispatch():
+        en_attente.extend((r.schedule_id, r.args) for r in ScriptRun.query.filter_by(status="queued"))
+        stop.set()
+
+    scheduler.run_forever(app, dispatch, tick=0.05, stop=stop, interval=0.01)
+    assert en_attente == [(1, {"mode": "rapprochement"})], en_attente
+
+    print("   ✅ 6 workers, 3 échéances: 3 exécutions")
+
+
+def test_heure_locale():
+    """Cron en heure de Zurich, échéances enregistrées en UTC, changements d'heure"""
+    print("\n🧪 Test 4: Heure locale Europe/Zurich")
+
+    zurich = datetime.now(ZoneInfo("Europe/Zurich"))
+    assert abs(scheduler.local_now() - zurich.replace(tzinfo=None)) < timedelta(seconds=5)
+    assert abs(models.get_utc_time() - datetime.now(timezone.utc).replace(tzinfo=None)) < timedelta(seconds=5)
+    assert scheduler.local_now().tzinfo is None and models.get_utc_time().tzinfo is None
+
+    # Affichage: UTC -> UTC+2 en été, UTC+1 en hiver
+    assert models.to_local_time(datetime(2026, 7, 1, 10, 0)) == datetime(2026, 7, 1, 12, 0)
+    assert models.to_local_time(datetime(2026, 1, 15, 10, 0)) == datetime(2026, 1, 15, 11, 0)
+    assert models.utc_isoformat(datetime(2026, 1, 15, 10, 0)) == "2026-01-15T10:00:00+00:00"
+
+    # Chaque nuit à 6h locale: 4h UTC en été, 5h UTC en hiver
+    assert scheduler.next_run_utc("0 6 * * *", datetime(2026, 7, 1, 12, 0)) == datetime(2026, 7, 2, 4, 0)
+    assert scheduler.next_run_utc("0 6 * * *", datetime(2026, 1, 1, 12, 0)) == datetime(2026, 1, 2, 5, 0)
+
+    # Printemps (29 mars 2026, 01:00 UTC): 2h30 locale n'existe pas -> 3h30 heure d'été;
+    # les intervalles continuent à 3h00
+    assert scheduler.next_run_utc("30 2 * * *", datetime(2026, 3, 29, 0, 59)) == datetime(2026, 3, 29, 1, 30)
+    assert scheduler.next_run_utc("*/15 * * * *", datetime(2026, 3, 29, 0, 59)) == datetime(2026, 3, 29, 1, 0)
+
+    # Automne (25 octobre 2026, 01:00 UTC): 2h-2h59 vécue deux fois; heure fixe une seule fois,
+    # intervalles toutes les 15 minutes pendant les deux occurrences
+    assert scheduler.next_run_utc("30 2 * * *", datetime(2026, 10, 25, 0, 31)) == datetime(2026, 10, 26, 1, 30)
+    assert scheduler.next_run_utc("*/15 * * * *", datetime(2026, 10, 25, 0, 50)) == datetime(2026, 10, 25, 1, 0)
+    assert scheduler.next_run_utc("*/15 * * * *", datetime(2026, 10, 25, 1, 0)) == datetime(2026, 10, 25, 1, 15)
+
+    app = creer_app()
+    with app.app_context():
+        schedule = Schedule(name="Nuit", script_id="rapprochement_factures", cron="30 2 * * *",
+                            next_run_at=scheduler.next_run_utc("30 2 * * *", datetime(2026, 3, 28, 22, 0)))
+        db.session.add(schedule)
+        db.session.commit()
+        assert schedule.next_run_at == datetime(2026, 3, 29, 1, 30)
+        assert scheduler.claim_due(datetime(2026, 3, 29, 1, 29)) == []
+        assert len(scheduler.claim_due(datetime(2026, 3, 29, 1, 30))) == 1
+        assert schedule.next_run_at == datetime(2026, 3, 30, 0, 30)
+
+        ScriptRun.query.update({"status": "success"})
+        schedule.next_run_at = datetime(2026, 10, 25, 0, 30)
+        db.session.commit()
+        assert len(scheduler.claim_due(datetime(2026, 10, 25, 0, 31))) == 1
+        ScriptRun.query.update({"status": "success"})
+        db.session.commit()
+        assert scheduler.claim_due(datetime(2026, 10, 25, 1, 31)) == []  # 2h31 une seconde fois
+        assert schedule.next_run_at == datetime(2026, 10, 26, 1, 30)
+
+    print(f"   ✅ UTC{zurich.strftime('%z')} maintenant, changements d'heure sans échéance perdue ni doublée")
+
+
+# ==========================================
+# EXÉCUTION DES TESTS
+# ==========================================
+
+def run_all_tests():
+    """Exécute tous les tests"""
+    print("=" * 60)
+    print("🚀 TESTS UNITAIRES - PLANIFICATION DES SCRIPTS")
+    print("=" * 60)
+
+    tests = [
+        test_expressions_cron,
+        test_echeances_sans_chevauchement,
+        test_workers_concurrents,
+        test_heure_locale
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except AssertionError as e:
+            print(f"❌ {test.__name__} ÉCHOUÉ: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"❌ {test.__name__} ERREUR: {e}")
+            failed += 1
+
+    print("\n" + "=" * 60)
+    print(f"📊 RÉSULTATS: {passed} tests réussis, {failed} tests échoués")
+    print("=" * 60)
+
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+Tests unitaires pour script_profiler
+Exécution d'un script sous cProfile, échantillonneur et -X importtime
+"""
+
+import sys
+import os
+import subprocess
+import tempfile
+from pathlib import Path
+
+# Configurer l'encodage UTF-8 pour Windows
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+# Ajouter le répertoire parent au path pour importer les modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+import script_profiler
+
+SCRIPT = '''import sys, time
+
+def calcul_lent():
+    total = 0
+    deadline = time.perf_counter() + 0.2
+    while time.perf_counter() < deadline:
+        total += 1
+    return total
+
+if __name__ == "__main__":
+    calcul_lent()
+    print("argument:", sys.argv[1])
+    sys.exit(3)
+'''
+
+
+def run_under(mode):
+    """Lance le script de test sous un profileur; retourne (résultat, artefact)"""
+    directory = Path(tempfile.mkdtemp())
+    script = directory / "lent.py"
+    script.write_text(SCRIPT, encoding='utf-8')
+    artifact = directory / f"1_lent{script_profiler.ARTIFACT_SUFFIXES[mode]}"
+    cmd = script_profiler.build_command(mode, str(script), ['valeur'], artifact)
+    cmd[0] = sys.executable
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    return result, artifact
+
+
+def test_cprofile_et_echantillonnage():
+    """Le code de sortie et les arguments sont conservés; la fonction lente est en tête"""
+    print("\n🧪 Test 1: cProfile et échantillonnage")
+
+    for mode in ('cprofile', 'sample'):
+        result, artifact = run_under(mode)
+        assert result.returncode == 3, result.stderr
+        assert "argument: valeur" in result.stdout
+
+        summary = script_profiler.summarize(mode, artifact, limit=10)
+        assert summary is not None and summary['mode'] == mode
+        names = [row['function'] for row in summary['functions']]
+        assert any("calcul_lent" in name for name in names), names
+        slow = next(row for row in summary['functions'] if "calcul_lent" in row['function'])
+        assert slow['cumulative'] >= 0.1
+        print(f"   ✅ {mode}: {slow['function']} {slow['cumulative']:.3f} s")
+
+
+def test_importtime():
+    """Les lignes importtime sont retirées de stderr et résumées par module"""
+    print("\n🧪 Test 2: -X importtime")
+
+    result, artifact = run_under('importtime')
+    assert result.returncode == 3
+    stderr, import_lines = script_profiler.split_importtime(result.stderr)
+    assert "import time:" not in stderr
+    artifact.write_text(import_lines, encoding='utf-8')
+
+    summary = script_profiler.summarize('importtime', artifact)
+    assert summary['modules'] > 0 and summary['total'] > 0
+    assert all(not row['function'].startswith(' ') for row in summary['functions'])
+    assert script_profiler.summarize('cprofile', artifact.with_suffix('.absent')) is None
+
+    print(f"   ✅ {summary['modules']} modules importés en {summary['total']:.3f} s")
+
+
+# ==========================================
+# EXÉCUTION DES TESTS
+# ==========================================
+
+def run_all_tests():
+    """Exécute tous les tests"""
+    print("=" * 60)
+    print("🚀 TESTS UNITAIRES - PROFILAGE")
+    print("=" * 60)
+
+    tests = [
+        test_cprofile_et_echantillonnage,
+        test_importtime
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except AssertionError as e:
+            print(f"❌ {test.__name__} ÉCHOUÉ: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"❌ {test.__name__} ERREUR: {e}")
+            failed += 1
+
+    print("\n" + "=" * 60)
+    print(f"📊 RÉSULTATS: {passed} tests réussis, {failed} tests échoués")
+    print("=" * 60)
+
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
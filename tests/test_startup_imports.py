@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+Tests du démarrage des scripts
+Budget d'import de 202512_Creer_devis.py (python -X importtime) et imports sans effet de bord
+"""
+
+import sys
+import os
+import json
+import subprocess
+from pathlib import Path
+
+# Configurer l'encodage UTF-8 pour Windows
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent / 'scripts'
+
+# Import de 202512_Creer_devis.py (sans exécution de main): ~20 ms mesurées,
+# ~130 ms quand requests était chargé à l'import
+IMPORT_BUDGET_MS = 60
+
+# Dépendances lourdes chargées seulement par le code qui en a besoin
+HEAVY_MODULES = ("requests", "urllib3", "msal", "dotenv")
+
+# Exécuté dans un processus neuf: importe un fichier et décrit ce que l'import a changé
+IMPORT_PROBE = """
+import importlib.util, json, logging, os, sys
+avant = set(sys.modules)
+proxy = (os.environ.get("NO_PROXY"), os.environ.get("no_proxy"))
+for chemin in sys.argv[1:]:
+    spec = importlib.util.spec_from_file_location(os.path.basename(chemin)[:-3], chemin)
+    spec.loader.exec_module(importlib.util.module_from_spec(spec))
+print(json.dumps({
+    "modules": sorted(set(sys.modules) - avant),
+    "handlers": len(logging.getLogger().handlers),
+    "proxy_modifie": proxy != (os.environ.get("NO_PROXY"), os.environ.get("no_proxy")),
+}))
+"""
+
+
+def importer(*fichiers):
+    """
+    Importe des fichiers de scripts/ dans un processus neuf avec -X importtime
+
+    Returns:
+        (description JSON de l'import, durée cumulée des imports en ms)
+    """
+    env = {k: v for k, v in os.environ.items() if k not in ("NO_PROXY", "no_proxy", "PYTHONPATH")}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", IMPORT_PROBE, *[str(SCRIPTS_DIR / f) for f in fichiers]],
+        cwd=str(SCRIPTS_DIR), env=env, capture_output=True, text=True, encoding="utf-8"
+    )
+    assert result.returncode == 0, result.stderr[-2000:]
+    info = json.loads(result.stdout.strip().splitlines()[-1])
+
+    # Lignes "import time: self | cumulative | module": on additionne les imports de
+    # premier niveau faits par les fichiers importés (modules absents avant)
+    nouveaux = set(info["modules"])
+    total_us = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line.split("|")
+        if name.startswith(" ") and not name.startswith("  ") and name.strip() in nouveaux:
+            total_us += int(cumulative)
+    return info, total_us / 1000
+
+
+def test_budget_import_creer_devis():
+    """L'import du script ne charge pas la pile HTTP et reste sous le budget"""
+    print("\n🧪 Test 1: Budget d'import de 202512_Creer_devis.py")
+
+    # Meilleure de trois mesures (la première compile les .pyc)
+    mesures = [importer("202512_Creer_devis.py") for _ in range(3)]
+    info = mesures[0][0]
+    duree_ms = min(duree for _, duree in mesures)
+
+    charges = [m for m in HEAVY_MODULES if m in info["modules"]]
+    assert not charges, f"Dépendances chargées à l'import: {', '.join(charges)}"
+    assert duree_ms < IMPORT_BUDGET_MS, f"Import en {duree_ms:.1f} ms (budget: {IMPORT_BUDGET_MS} ms)"
+
+    print(f"   ✅ Import en {duree_ms:.1f} ms (budget: {IMPORT_BUDGET_MS} ms)")
+
+
+def test_imports_sans_effet_de_bord():
+    """Les modules de scripts/ ne configurent pas le logging et ne touchent pas l'environnement"""
+    print("\n🧪 Test 2: Modules importés sans effet de bord")
+
+    modules = sorted(p.name for p in SCRIPTS_DIR.glob("*.py")
+                     if not p.name[0].isdigit() and not p.name.startswith("exemple_"))
+    info, _ = importer(*modules)
+
+    assert info["handlers"] == 0, "logging.basicConfig appelé à l'import"
+    assert not info["proxy_modifie"], "NO_PROXY modifié à l'import"
+    assert "msal" not in info["modules"], "msal chargé sans demande de token"
+
+    print(f"   ✅ {len(modules)} modules importés sans effet de bord")
+
+
+# ==========================================
+# EXÉCUTION DES TESTS
+# ==========================================
+
+def run_all_tests():
+    """Exécute tous les tests"""
+    print("=" * 60)
+    print("🚀 TESTS - DÉMARRAGE DES SCRIPTS")
+    print("=" * 60)
+
+    tests = [
+        test_budget_import_creer_devis,
+        test_imports_sans_effet_de_bord
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except AssertionError as e:
+            print(f"❌ {test.__name__} ÉCHOUÉ: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"❌ {test.__name__} ERREUR: {e}")
+            failed += 1
+
+    print("\n" + "=" * 60)
+    print(f"📊 RÉSULTATS: {passed} tests réussis, {failed} tests échoués")
+    print("=" * 60)
+
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
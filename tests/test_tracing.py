@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+Tests unitaires pour tracing
+Propagation du contexte vers un sous-processus, reconstitution de la trace,
+envoi au collector en arrière-plan et rotation de traces.jsonl
+"""
+
+import sys
+import os
+import json
+import time
+import threading
+import subprocess
+import tempfile
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from pathlib import Path
+
+# Configurer l'encodage UTF-8 pour Windows
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+# Ajouter le répertoire parent au path pour importer les modules
+SCRIPTS_DIR = os.path.join(os.path.dirname(__file__), '..', 'scripts')
+sys.path.insert(0, SCRIPTS_DIR)
+
+import tracing
+
+
+def with_env(**values):
+    """Applique des variables d'environnement; retourne la fonction de restauration"""
+    saved = {key: os.environ.get(key) for key in values}
+    for key, value in values.items():
+        if value is None:
+            os.environ.pop(key, None)
+        else:
+            os.environ[key] = value
+
+    def restore():
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+    return restore
+
+
+def test_trace_sous_processus():
+    """Les spans du script rejoignent la trace du parent via TRACEPARENT"""
+    print("\n🧪 Test 1: Trace propagée à un sous-processus")
+
+    traces = Path(tempfile.mkdtemp()) / "traces.jsonl"
+    restore = with_env(TRACING_ENABLED="1", TRACES_PATH=str(traces), TRACEPARENT=None)
+    try:
+        incoming = "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"
+        with tracing.span("POST /run_script", tracing.SERVER) as server:
+            pass
+        root = tracing.start_span("POST /run_script", tracing.SERVER, parent=incoming)
+        assert root.trace_id == "4bf92f3577b34da6a3ce929d0e0e4736"
+
+        code = ("import sys, tracing\n"
+                "with tracing.span('creer_devis'):\n"
+                "    with tracing.span('contact'):\n"
+                "        pass\n"
+                "    with tracing.span('offre'):\n"
+                "        sys.exit(2)\n")
+        env = dict(tracing.inject_env(), PYTHONPATH=SCRIPTS_DIR, TRACING_ENABLED="0")
+        result = subprocess.run([sys.executable, "-c", code], env=env)
+        assert result.returncode == 2
+        root.end()
+    finally:
+        restore()
+
+    assert server.trace_id != root.trace_id
+    spans = tracing.load_trace(root.trace_id, traces)
+    names = {s["name"]: s for s in spans}
+    assert set(names) == {"POST /run_script", "creer_devis", "contact", "offre"}
+    assert names["creer_devis"]["parentSpanId"] == root.span_id
+    assert names["contact"]["parentSpanId"] == names["creer_devis"]["spanId"]
+    assert names["offre"]["status"]["code"] == tracing.STATUS_ERROR
+    assert "status" not in names["contact"]
+
+    tree = tracing.format_trace(spans)
+    assert "POST /run_script" in tree.splitlines()[1]
+    assert tree.splitlines()[2].split("creer_devis")[0].endswith("  ")
+
+    print(f"   ✅ {len(spans)} spans reliés à la trace {root.trace_id}")
+
+
+def test_desactive():
+    """Sans TRACING_ENABLED ni TRACEPARENT: aucun span, aucun fichier"""
+    print("\n🧪 Test 2: Traçage désactivé")
+
+    traces = Path(tempfile.mkdtemp()) / "traces.jsonl"
+    restore = with_env(TRACING_ENABLED=None, TRACEPARENT=None, TRACES_PATH=str(traces))
+    try:
+        with tracing.span("rien") as span:
+            assert span is None
+        assert "TRACEPARENT" not in tracing.inject_env()
+    finally:
+        restore()
+    assert not traces.exists()
+    assert tracing.parse_traceparent("00-" + "0" * 32 + "-00f067aa0ba902b7-01") is None
+
+    print("   ✅ Aucun span enregistré")
+
+
+def test_export_arriere_plan_et_rotation():
+    """Collector lent: span.end() n'attend pas l'envoi; traces.jsonl borné, trace lisible après rotation"""
+    print("\n🧪 Test 3: Export OTLP en arrière-plan et rotation")
+
+    recus = []
+
+    class CollectorLent(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            time.sleep(0.5)
+            recus.extend(s["name"] for s in json.loads(body)["resourceSpans"][0]["scopeSpans"][0]["spans"])
+            self.send_response(200)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), CollectorLent)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    traces = Path(tempfile.mkdtemp()) / "traces.jsonl"
+    restore = with_env(TRACING_ENABLED="1", TRACEPARENT=None, TRACES_PATH=str(traces),
+                       OTEL_EXPORTER_OTLP_ENDPOINT=f"http://127.0.0.1:{server.server_port}")
+    max_mb = tracing.TRACES_MAX_MB
+    tracing.TRACES_MAX_MB = 0.01
+    try:
+        debut = time.perf_counter()
+        with tracing.span("POST /run_script", tracing.SERVER) as root:
+            for i in range(40):
+                with tracing.span(f"etape {i}", detail="x" * 200):
+                    pass
+        duree = time.perf_counter() - debut
+        assert duree < 0.3, f"Requête bloquée par l'export: {duree:.2f} s"
+
+        attente = time.monotonic() + 10
+        while "POST /run_script" not in recus and time.monotonic() < attente:
+            time.sleep(0.05)
+        assert len(recus) == 41, len(recus)
+    finally:
+        tracing.TRACES_MAX_MB = max_mb
+        restore()
+        server.shutdown()
+
+    archive = traces.with_name("traces.jsonl.1")
+    assert archive.exists() and archive.stat().st_size < 0.01 * 1024 * 1024 + 2000
+    assert traces.stat().st_size < 0.01 * 1024 * 1024
+    spans = tracing.load_trace(root.trace_id, traces)
+    assert "POST /run_script" in {s["name"] for s in spans}
+
+    print(f"   ✅ Requête tracée en {duree * 1000:.0f} ms, 41 spans reçus, fichier renommé à 10 Ko")
+
+
+# ==========================================
+# EXÉCUTION DES TESTS
+# ==========================================
+
+def run_all_tests():
+    """Exécute tous les tests"""
+    print("=" * 60)
+    print("🚀 TESTS UNITAIRES - TRACES")
+    print("=" * 60)
+
+    tests = [
+        test_trace_sous_processus,
+        test_desactive,
+        test_export_arriere_plan_et_rotation
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except AssertionError as e:
+            print(f"❌ {test.__name__} ÉCHOUÉ: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"❌ {test.__name__} ERREUR: {e}")
+            failed += 1
+
+    print("\n" + "=" * 60)
+    print(f"📊 RÉSULTATS: {passed} tests réussis, {failed} tests échoués")
+    print("=" * 60)
+
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
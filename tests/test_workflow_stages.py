@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+Tests unitaires pour workflow_stages
+Ordre des dépendances, propagation des échecs et sortie affichée par étape
+"""
+
+import sys
+import os
+import io
+import time
+import threading
+
+# Configurer l'encodage UTF-8 pour Windows
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+# Ajouter le répertoire parent au path pour importer les modules
+SCRIPTS_DIR = os.path.join(os.path.dirname(__file__), '..', 'scripts')
+sys.path.insert(0, SCRIPTS_DIR)
+
+from workflow_stages import StageRunner
+
+
+def test_ordre_des_dependances():
+    """Une étape démarre après ses dépendances et reçoit leurs valeurs; les étapes indépendantes en parallèle"""
+    print("\n🧪 Test 1: Ordre des dépendances")
+
+    journal = []
+    lock = threading.Lock()
+    barriere = threading.Barrier(2, timeout=5)
+
+    def etape(nom, valeur, attendre=False):
+        def executer(r):
+            with lock:
+                journal.append(("debut", nom, dict(r)))
+            if attendre:
+                # geo et dossier tournent en même temps
+                barriere.wait()
+            with lock:
+                journal.append(("fin", nom))
+            return valeur
+        return executer
+
+    runner = StageRunner(max_workers=4)
+    runner.add("dossier", etape("dossier", "/projets/Rue du Lac 15", attendre=True))
+    runner.add("geo", etape("geo", (2515000, 1145000), attendre=True))
+    runner.add("regbl", etape("regbl", {"egid": 42}), ["geo"])
+    runner.add("rapport", etape("rapport", "rapport.pdf"), ["regbl", "dossier"])
+    results = runner.run()
+
+    position = {(e[0], e[1]): i for i, e in enumerate(journal)}
+    assert position[("debut", "regbl")] > position[("fin", "geo")]
+    assert position[("debut", "rapport")] > max(position[("fin", "regbl")], position[("fin", "dossier")])
+    entrees = {e[1]: e[2] for e in journal if e[0] == "debut"}
+    assert entrees["rapport"] == {"regbl": {"egid": 42}, "dossier": "/projets/Rue du Lac 15"}
+    assert all(r.ok for r in results.values()) and results["rapport"].value == "rapport.pdf"
+
+    try:
+        runner.add("notion", etape("notion", None), ["inconnue"])
+        assert False, "ValueError attendue"
+    except ValueError:
+        pass
+
+    print("   ✅ 4 étapes dans l'ordre, dossier et geo en parallèle")
+
+
+def test_propagation_des_echecs():
+    """Les étapes qui dépendent d'une étape en erreur sont ignorées, les autres continuent"""
+    print("\n🧪 Test 2: Propagation des échecs")
+
+    def echec(r):
+        raise RuntimeError("geo.admin indisponible")
+
+    runner = StageRunner()
+    runner.add("dossier", lambda r: "/projets/x")
+    runner.add("geo", echec)
+    runner.add("regbl", lambda r: {"egid": 42}, ["geo"])
+    runner.add("rapport", lambda r: "rapport.pdf", ["regbl", "dossier"])
+    runner.add("templates", lambda r: 3, ["dossier"])
+    results = runner.run()
+
+    assert str(results["geo"].error) == "geo.admin indisponible"
+    assert results["regbl"].skipped and results["rapport"].skipped
+    assert results["dossier"].ok and results["templates"].value == 3
+    assert [r.name for r in runner.failed()] == ["geo"]
+
+    print("   ✅ regbl et rapport ignorés, templates exécuté")
+
+
+def test_sortie_par_etape():
+    """La sortie d'une étape est affichée dès sa fin, d'un bloc, pendant que les autres continuent"""
+    print("\n🧪 Test 3: Sortie affichée à la fin de chaque étape")
+
+    sortie = io.StringIO()
+    vue_par_lente = []
+
+    def rapide(r):
+        print("[RAPIDE] debut")
+        print("[RAPIDE] fin")
+
+    def lente(r):
+        print("[LENTE] debut")
+        limite = time.monotonic() + 5
+        while "[RAPIDE] fin" not in sortie.getvalue() and time.monotonic() < limite:
+            time.sleep(0.01)
+        vue_par_lente.append("[RAPIDE] fin" in sortie.getvalue())
+        print("[LENTE] fin")
+
+    runner = StageRunner()
+    runner.add("lente", lente)
+    runner.add("rapide", rapide)
+    stdout = sys.stdout
+    sys.stdout = sortie
+    try:
+        runner.run()
+    finally:
+        sys.stdout = stdout
+
+    assert vue_par_lente == [True], "Sortie de l'étape rapide retenue jusqu'à la fin du workflow"
+    assert sortie.getvalue() == "[RAPIDE] debut\n[RAPIDE] fin\n[LENTE] debut\n[LENTE] fin\n", sortie.getvalue()
+
+    print("   ✅ Étape rapide affichée avant la fin de l'étape lente, sans entremêlement")
+
+
+# ==========================================
+# EXÉCUTION DES TESTS
+# ==========================================
+
+def run_all_tests():
+    """Exécute tous les tests"""
+    print("=" * 60)
+    print("🚀 TESTS UNITAIRES - ÉTAPES DE WORKFLOW")
+    print("=" * 60)
+
+    tests = [
+        test_ordre_des_dependances,
+        test_propagation_des_echecs,
+        test_sortie_par_etape
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except AssertionError as e:
+            print(f"❌ {test.__name__} ÉCHOUÉ: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"❌ {test.__name__} ERREUR: {e}")
+            failed += 1
+
+    print("\n" + "=" * 60)
+    print(f"📊 RÉSULTATS: {passed} tests réussis, {failed} tests échoués")
+    print("=" * 60)
+
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)